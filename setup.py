@@ -32,12 +32,15 @@ setup(
     package_dir={"": "src"},
     install_requires=[
         "pandas",
+        "pyarrow",
         "numpy",
         "transformers",
         "sentence-transformers",
         "tqdm",
         "datasets",
         "flask",
+        "orjson",
+        "prometheus-client",
         "flask-limiter",
         "waitress",
         "gunicorn",
@@ -10,17 +10,45 @@ Key Features:
     - Supports multiple pre-trained and custom Sentence Transformer models
     - Handles both anime and manga similarity searches
     - Implements rate limiting and CORS
-    - Provides memory management for GPU resources
+    - Keeps loaded models resident in an LRU registry with a memory budget
+    - Encodes queries with eager PyTorch or exported TorchScript or ONNX Runtime
+      graphs, configurable per model
+    - Memory-maps corpus embeddings once and shares them through the page cache
+    - Shares search indexes built in memory between worker processes, optionally
+      preloaded by the gunicorn master
+    - Scores all synopsis columns with a single fused matrix product
+    - Searches large indexes approximately through a persisted IVF index
+    - Caches ranked result lists and serves later pages through opaque cursors
+    - Filters results by genre, theme, type, start year and score with precomputed
+      bitmaps applied inside top-k selection
+    - Caches query embeddings so repeated descriptions skip the forward pass
+    - Assembles responses from pre-serialized row payloads
+    - Serializes JSON with orjson and compresses large responses with brotli or gzip
+    - Exposes per-stage latency histograms and cache, model and index gauges in the
+      Prometheus format, aggregated over all gunicorn workers
+    - Micro-batches concurrent query encodes of the same model
+    - Answers many descriptions per call with batched encoding, scoring and top-k,
+      optionally streamed as NDJSON
+    - Frees memory (garbage, CUDA cache, models) only under memory pressure or when
+      idle, instead of on every request
+    - Bounds the concurrent and queued searches of every worker and sheds the rest
+      with 503 and Retry-After
+    - Warms up configured models and indexes in every worker before it reports ready
     - Includes comprehensive logging
     - Returns paginated results with similarity scores
 
 The API endpoints are:
     - POST /anisearchmodel/anime: Find similar anime based on description
     - POST /anisearchmodel/manga: Find similar manga based on description
+    - POST /anisearchmodel/anime/batch: Find similar anime for many descriptions
+    - POST /anisearchmodel/manga/batch: Find similar manga for many descriptions
+    - GET /metrics: Prometheus metrics
+    - GET /ready: 200 once the worker has warmed up, 503 before
 """
 
 # pylint: disable=import-error, global-variable-not-assigned, global-statement
 
+import functools
 import os
 import warnings
 import logging
@@ -28,18 +56,87 @@ import gc
 import threading
 import time
 import sys
-from typing import Any, List, Dict, Tuple
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple, Union
 from concurrent_log_handler import ConcurrentRotatingFileHandler
-from flask import Flask, request, jsonify, abort, Response, make_response
+from flask import (
+    Flask,
+    g,
+    request,
+    jsonify,
+    abort,
+    Response,
+    make_response,
+    stream_with_context,
+)
 from flask_cors import CORS
 import numpy as np
-import pandas as pd
 import torch
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
 from werkzeug.exceptions import HTTPException
-from custom_transformer import CustomT5EncoderModel
+from custom_transformer import CustomT5EncoderModel  # noqa: F401  # pylint: disable=unused-import
+from dataset_io import read_dataset  # pylint: disable=import-error no-name-in-module
+from serving.model_registry import ModelRegistry  # pylint: disable=import-error no-name-in-module
+from serving.embedding_store import EmbeddingStore, embeddings_path  # pylint: disable=import-error no-name-in-module
+from serving.search_index import (  # pylint: disable=import-error no-name-in-module
+    SYNOPSIS_COLUMNS,
+    SearchIndex,
+    load_or_build_search_index,
+)
+from serving.topk import group_ids_for  # pylint: disable=import-error no-name-in-module
+from serving.cache import TTLCache  # pylint: disable=import-error no-name-in-module
+from serving.batcher import EncodeScheduler  # pylint: disable=import-error no-name-in-module
+from serving.shared_segments import segment_name, share_search_index  # pylint: disable=import-error no-name-in-module
+from serving.payload_store import load_or_build_payload_store  # pylint: disable=import-error no-name-in-module
+from serving.admission import AdmissionController, Overloaded, Ticket  # pylint: disable=import-error no-name-in-module
+from serving.encoder_backends import (  # pylint: disable=import-error no-name-in-module
+    BACKENDS,
+    ExportedEncoder,
+    encoder_dir,
+    load_encoder,
+    parse_backends,
+)
+from serving.dynamic_quantization import (  # pylint: disable=import-error no-name-in-module
+    is_selected,
+    parse_models,
+    quantize_dynamic_int8,
+    quantized_encoder_dir,
+)
+from serving.thread_plan import admission_limits, apply_torch_threads  # pylint: disable=import-error no-name-in-module
+from serving.warmup import WarmUp, parse_targets  # pylint: disable=import-error no-name-in-module
+from serving.memory_manager import MemoryManager, collect_garbage  # pylint: disable=import-error no-name-in-module
+from serving.metrics import (  # pylint: disable=import-error no-name-in-module
+    observe_model_load,
+    observe_stage,
+    render_metrics,
+    stage_timer,
+    update_admission_metrics,
+    update_batcher_metrics,
+    update_cache_metrics,
+    update_index_metrics,
+    update_memory_metrics,
+    update_registry_metrics,
+)
+from serving.response_encoding import (  # pylint: disable=import-error no-name-in-module
+    FastJSONProvider,
+    compress,
+    compress_stream,
+    dumps,
+    negotiate_encoding,
+)
+from serving.filters import (  # pylint: disable=import-error no-name-in-module
+    FilterIndex,
+    MetadataFilter,
+    parse_filters,
+)
+from serving.pagination import (  # pylint: disable=import-error no-name-in-module
+    RankedResults,
+    decode_cursor,
+    encode_cursor,
+    normalize_description,
+    query_key,
+)
 
 # Determine the device to use based on the environment variable
 device = (
@@ -48,6 +145,11 @@ device = (
     else "cpu"
 )
 
+# Torch thread pools sized by run_server.py for the share of the cores of every
+# worker (TORCH_NUM_THREADS and TORCH_INTEROP_THREADS); the workers forked from the
+# master inherit them
+apply_torch_threads()
+
 # Disable oneDNN for TensorFlow
 os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
 
@@ -93,91 +195,26 @@ logging.basicConfig(
 )
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(
     app,
     resources={
         r"/*": {"origins": ["https://anisearch.alpha49.com", "http://localhost:3000"]}
     },
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Variable to track the last request time
-last_request_time = time.time()
-last_request_time_lock = threading.Lock()
-
-
-def update_last_request_time() -> None:
-    """
-    Updates the last request time to the current time in a thread-safe manner.
-
-    This function is used to track when the last API request was made, which helps
-    with memory management and cleanup of unused resources.
-    """
-    with last_request_time_lock:
-        global last_request_time
-        last_request_time = time.time()
-
-
-def clear_memory() -> None:
-    """
-    Frees up system memory and GPU cache.
-
-    This function performs two cleanup operations:
-
-    1. Empties the GPU cache if CUDA is being used
-
-    2. Runs Python's garbage collector to free memory
-    """
-    torch.cuda.empty_cache()
-    gc.collect()
-
-
-def periodic_memory_clear() -> None:
-    """
-    Runs a background thread that periodically cleans up memory.
-
-    The thread monitors the time since the last API request. If no requests have been
-    made for over 300 seconds (5 minutes), it triggers memory cleanup to free resources.
-
-    The function runs indefinitely until the application is shut down.
-    """
-    logging.info("Starting the periodic memory clear thread.")
-    while True:
-        with last_request_time_lock:
-            current_time = time.time()
-            if current_time - last_request_time > 300:
-                logging.debug("Clearing memory due to inactivity.")
-                clear_memory()
-        time.sleep(300)
-
-
-threading.Thread(target=periodic_memory_clear, daemon=True).start()
-
-# Initialize the limiter
+# Initialize the limiter (RATELIMIT_ENABLED=0 disables it, e.g. for load tests)
+app.config["RATELIMIT_ENABLED"] = os.getenv("RATELIMIT_ENABLED", "1").strip() != "0"
 limiter = Limiter(get_remote_address, app=app, default_limits=["1 per second"])
 
 # Load the merged datasets
-anime_df = pd.read_csv("model/merged_anime_dataset.csv")
-manga_df = pd.read_csv("model/merged_manga_dataset.csv")
+anime_df = read_dataset("model/merged_anime_dataset.csv")
+manga_df = read_dataset("model/merged_manga_dataset.csv")
 
 # List of synopsis columns to consider for anime and manga
-anime_synopsis_columns = [
-    "synopsis",
-    "Synopsis anime_dataset_2023",
-    "Synopsis animes dataset",
-    "Synopsis anime_270 Dataset",
-    "Synopsis Anime-2022 Dataset",
-    "Synopsis anime4500 Dataset",
-    "Synopsis wykonos Dataset",
-    "Synopsis Anime_data Dataset",
-    "Synopsis anime2 Dataset",
-    "Synopsis mal_anime Dataset",
-]
-
-manga_synopsis_columns = [
-    "synopsis",
-    "Synopsis jikan Dataset",
-    "Synopsis data Dataset",
-]
+anime_synopsis_columns = SYNOPSIS_COLUMNS["anime"]
+manga_synopsis_columns = SYNOPSIS_COLUMNS["manga"]
 
 allowed_models = [
     "sentence-transformers/all-distilroberta-v1",
@@ -207,6 +244,322 @@ allowed_models = [
 ]
 
 
+def env_int(name: str) -> Optional[int]:
+    """
+    Reads an optional integer setting from the environment.
+
+    Args:
+        name: Name of the environment variable
+
+    Returns:
+        The integer value, or None if the variable is unset or empty
+    """
+    value = os.getenv(name, "").strip()
+    return int(value) if value else None
+
+
+def resolve_model_path(model_name: str) -> str:
+    """
+    Maps an allowed model name to the name or path SentenceTransformer should load.
+
+    Fine-tuned models live under the local model directory; every other model is
+    loaded by its Hugging Face name.
+
+    Args:
+        model_name: Name of the model as sent by the client
+
+    Returns:
+        Name or local path of the model to load
+    """
+    if model_name in ("fine_tuned_sbert_anime_model", "fine_tuned_sbert_model_anime"):
+        return f"model/{model_name}"
+    return model_name
+
+
+# Queries are encoded with the ENCODER_BACKEND of every model ('torch', 'torchscript'
+# or 'onnx'), overridden per model by ENCODER_BACKENDS ('<model name>=<backend>,...').
+# Exported backends need an export made with python -m src.serving.encoder_backends
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "").strip() or "torch"
+if ENCODER_BACKEND not in BACKENDS:
+    raise ValueError(f"Invalid ENCODER_BACKEND '{ENCODER_BACKEND}'")
+encoder_backends = parse_backends(os.getenv("ENCODER_BACKENDS"))
+# On CPU, the Linear layers of the models in ENCODER_INT8_MODELS (comma-separated,
+# or '*' for all models) are quantized to int8. The export made with
+# python -m src.misc.int8_drift is used if present, otherwise models are quantized
+# when they are loaded
+encoder_int8_models = parse_models(os.getenv("ENCODER_INT8_MODELS"))
+
+
+def load_model(model_name: str) -> Union[SentenceTransformer, ExportedEncoder]:
+    """
+    Loads the query encoder of an allowed model name with its configured backend.
+
+    Models without an exported graph for their backend (or without the runtime it
+    needs) are loaded as eager SentenceTransformer models instead. On CPU, models
+    selected by ENCODER_INT8_MODELS are served with int8 Linear layers instead of
+    their backend.
+
+    Args:
+        model_name: Name of the model to load
+
+    Returns:
+        The loaded SentenceTransformer model or exported encoder on the configured
+        device; both encode with encode(sentences, batch_size=...)
+
+    Raises:
+        ValueError: If the model cannot be loaded
+    """
+    load_model_name = resolve_model_path(model_name)
+    backend = encoder_backends.get(model_name, ENCODER_BACKEND)
+    int8 = device == "cpu" and is_selected(encoder_int8_models, model_name)
+    start = time.perf_counter()
+    if int8:
+        try:
+            encoder = load_encoder(
+                quantized_encoder_dir("model", model_name), "torchscript", device
+            )
+        except FileNotFoundError:
+            logging.info(
+                "No int8 encoder exported for model '%s', quantizing it.", model_name
+            )
+        else:
+            observe_model_load(model_name, time.perf_counter() - start)
+            logging.info("Loaded the int8 encoder of model '%s'.", model_name)
+            return encoder
+    elif backend != "torch":
+        try:
+            encoder = load_encoder(encoder_dir("model", model_name), backend, device)
+        except (FileNotFoundError, ImportError) as e:
+            logging.warning(
+                "Cannot load the %s encoder of model '%s', using PyTorch: %s",
+                backend,
+                model_name,
+                e,
+            )
+        else:
+            observe_model_load(model_name, time.perf_counter() - start)
+            logging.info("Loaded the %s encoder of model '%s'.", backend, model_name)
+            return encoder
+    try:
+        model = SentenceTransformer(load_model_name, device=device)
+    except Exception as e:
+        raise ValueError(f"Failed to load model '{load_model_name}': {e}") from e
+    if int8:
+        quantize_dynamic_int8(model)
+    observe_model_load(model_name, time.perf_counter() - start)
+    return model
+
+
+def release_evicted_model(model_name: str) -> None:
+    """
+    Releases the memory of a model evicted from the registry.
+
+    Args:
+        model_name: Name of the evicted model
+    """
+    logging.debug("Releasing memory of evicted model '%s'.", model_name)
+    collect_garbage()
+
+
+# Result payloads of every dataset row, serialized once (or memory-mapped if built
+# ahead of time with python -m src.serving.payload_store)
+payload_stores = {
+    "anime": load_or_build_payload_store(
+        "model", "anime", anime_df, anime_synopsis_columns
+    ),
+    "manga": load_or_build_payload_store(
+        "model", "manga", manga_df, manga_synopsis_columns
+    ),
+}
+
+# Corpus embeddings are memory-mapped once per worker
+embedding_store = EmbeddingStore(root="model", device=device)
+
+# Integer title id of every dataset row, used to deduplicate results
+title_ids = {
+    "anime": group_ids_for(anime_df["title"]),
+    "manga": group_ids_for(manga_df["title"]),
+}
+
+# Genre, theme and type bitmaps and start years and scores of every dataset row,
+# used to resolve request filters to row masks
+filter_indexes = {
+    "anime": FilterIndex.from_dataframe(anime_df),
+    "manga": FilterIndex.from_dataframe(manga_df),
+}
+
+# Fused search indexes keyed by (dataset type, model name); indexes with an IVF
+# index and at least ANN_MIN_VECTORS vectors are searched approximately
+ANN_MIN_VECTORS = env_int("ANN_MIN_VECTORS")
+search_indexes: Dict[Tuple[str, str], SearchIndex] = {}
+search_indexes_lock = threading.Lock()
+
+# Indexes built in memory are published once to this directory (created by
+# run_server.py) and memory-mapped by every worker
+SHARED_SEGMENTS_DIR = os.getenv("SHARED_SEGMENTS_DIR", "").strip() or None
+
+# Loaded models stay resident between requests; budgets are configured in MB
+_max_cache_mb = env_int("MODEL_CACHE_MAX_MB")
+_max_rss_mb = env_int("MODEL_CACHE_MAX_RSS_MB")
+model_registry = ModelRegistry(
+    load_model,
+    max_bytes=_max_cache_mb * 2**20 if _max_cache_mb is not None else None,
+    max_models=env_int("MODEL_CACHE_MAX_MODELS"),
+    max_rss_bytes=_max_rss_mb * 2**20 if _max_rss_mb is not None else None,
+    on_evict=release_evicted_model,
+)
+
+# Garbage is collected by a background thread of every worker when its private
+# memory crosses MEMORY_SOFT_LIMIT_MB or MEMORY_HARD_LIMIT_MB (which also evicts a
+# model per check), or once it has been idle for MEMORY_IDLE_SECONDS, instead of on
+# every request
+_memory_soft_mb = env_int("MEMORY_SOFT_LIMIT_MB")
+_memory_hard_mb = env_int("MEMORY_HARD_LIMIT_MB")
+_memory_idle_seconds = env_int("MEMORY_IDLE_SECONDS")
+if _memory_idle_seconds is None:
+    _memory_idle_seconds = 300
+memory_manager = MemoryManager(
+    soft_limit_bytes=_memory_soft_mb * 2**20 if _memory_soft_mb is not None else None,
+    hard_limit_bytes=_memory_hard_mb * 2**20 if _memory_hard_mb is not None else None,
+    idle_seconds=_memory_idle_seconds or None,
+    interval=env_int("MEMORY_CHECK_INTERVAL") or 5,
+    evict=model_registry.evict_lru,
+)
+
+# Threads don't survive fork, so the manager thread is started again in every worker
+# forked from a preloading gunicorn master
+memory_manager.start()
+os.register_at_fork(after_in_child=memory_manager.start)
+
+# Ranked result lists of recent queries, sliced to serve later pages
+RESULT_CACHE_DEPTH = env_int("RESULT_CACHE_DEPTH") or 1000
+_result_cache_ttl = env_int("RESULT_CACHE_TTL")
+ranked_results_cache = TTLCache(
+    max_entries=env_int("RESULT_CACHE_MAX_ENTRIES") or 1024,
+    ttl=_result_cache_ttl if _result_cache_ttl is not None else 600,
+)
+
+# Query embeddings keyed by (model name, normalized description), shared by both
+# endpoints; the byte budget is configured in MB
+_query_cache_mb = env_int("QUERY_CACHE_MAX_MB")
+_query_cache_ttl = env_int("QUERY_CACHE_TTL")
+query_embedding_cache = TTLCache(
+    max_entries=env_int("QUERY_CACHE_MAX_ENTRIES") or 4096,
+    max_bytes=(_query_cache_mb if _query_cache_mb is not None else 64) * 2**20,
+    ttl=_query_cache_ttl if _query_cache_ttl is not None else 3600,
+)
+
+
+def encode_batch(model_name: str, descriptions: List[str]) -> np.ndarray:
+    """
+    Encodes a batch of descriptions with a resident model.
+
+    Args:
+        model_name: Name of the model to use
+        descriptions: Descriptions to encode
+
+    Returns:
+        Embeddings of shape (len(descriptions), dimension)
+    """
+    # Fetch the resident model, loading it on first use
+    model = model_registry.get(model_name)
+    return model.encode(descriptions, batch_size=len(descriptions))
+
+
+# Concurrent encodes of the same model are grouped into one forward pass
+_encode_window_ms = env_int("ENCODE_BATCH_WINDOW_MS")
+encode_scheduler = EncodeScheduler(
+    encode_batch,
+    window=(_encode_window_ms if _encode_window_ms is not None else 5) / 1000,
+    max_batch_size=env_int("ENCODE_MAX_BATCH_SIZE") or 32,
+)
+
+# Batch endpoints accept up to BATCH_SEARCH_MAX_SIZE descriptions per call and
+# encode and score them BATCH_SEARCH_CHUNK_SIZE at a time
+BATCH_SEARCH_MAX_SIZE = env_int("BATCH_SEARCH_MAX_SIZE") or 256
+BATCH_SEARCH_CHUNK_SIZE = env_int("BATCH_SEARCH_CHUNK_SIZE") or 64
+
+# JSON responses of at least COMPRESSION_MIN_SIZE bytes (and all streamed ones) are
+# compressed when the client accepts brotli or gzip; a negative value disables it
+_compression_min_size = env_int("COMPRESSION_MIN_SIZE")
+COMPRESSION_MIN_SIZE = (
+    _compression_min_size if _compression_min_size is not None else 1024
+)
+
+# Every worker runs at most ADMISSION_MAX_CONCURRENT searches at once and queues up
+# to ADMISSION_MAX_QUEUE more; requests that would wait longer than
+# ADMISSION_DEADLINE_SECONDS are answered with 503 right away. A concurrency of 0
+# disables admission control, a deadline of 0 lets queued requests wait indefinitely.
+# run_server.py sizes the request threads of every worker to these limits
+_admission_max_concurrent, _admission_max_queue = admission_limits()
+_admission_deadline = env_int("ADMISSION_DEADLINE_SECONDS")
+if _admission_deadline is None:
+    _admission_deadline = 10
+admission_controller = (
+    AdmissionController(
+        max_concurrent=_admission_max_concurrent,
+        max_queue=_admission_max_queue,
+        deadline=_admission_deadline or None,
+    )
+    if _admission_max_concurrent > 0
+    else None
+)
+
+
+def release_when_sent(chunks: Iterator[bytes], ticket: Ticket) -> Iterator[bytes]:
+    """
+    Yields the chunks of a streamed body and gives back its admission slot after.
+
+    Args:
+        chunks: Chunks of the response body
+        ticket: Admission of the request
+
+    Yields:
+        The chunks, unchanged
+    """
+    try:
+        yield from chunks
+    finally:
+        admission_controller.release(ticket)
+
+
+def admission_controlled(view: Callable[..., Response]) -> Callable[..., Response]:
+    """
+    Runs a view only once the admission controller grants it a slot.
+
+    The slot is given back by release_admission when the request is torn down. The
+    request is torn down before a streamed body is sent, so streamed responses keep
+    their slot until the body is exhausted or closed instead.
+
+    Args:
+        view: Flask view function
+
+    Returns:
+        The view, answering 503 with a Retry-After header when the request is shed
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args: Any, **kwargs: Any) -> Response:
+        if admission_controller is not None:
+            try:
+                g.admission_ticket = admission_controller.acquire()
+            except Overloaded as e:
+                logging.warning("Shedding %s request: %s", request.path, e)
+                response = make_response(
+                    jsonify({"error": "Server is overloaded, retry later"}), 503
+                )
+                response.headers["Retry-After"] = str(e.retry_after)
+                return response
+        response = view(*args, **kwargs)
+        if response.is_streamed and "admission_ticket" in g:
+            ticket = g.pop("admission_ticket")
+            response.response = release_when_sent(response.response, ticket)
+            response.call_on_close(lambda: admission_controller.release(ticket))
+        return response
+
+    return wrapper
+
+
 def validate_input(data: Dict[str, Any]) -> None:
     """
     Validates the input data for API requests.
@@ -219,6 +572,10 @@ def validate_input(data: Dict[str, Any]) -> None:
 
     3. The specified model is in the list of allowed models
 
+    4. The optional nprobe is a positive integer
+
+    5. The optional filters are valid
+
     Args:
         data: Dictionary containing the request data with 'model' and 'description' keys
 
@@ -240,108 +597,460 @@ def validate_input(data: Dict[str, Any]) -> None:
         logging.error("Invalid model name.")
         abort(400, description="Invalid model name")
 
+    validate_positive_int(data, "nprobe")
+    validate_filters(data)
+
 
-def load_embeddings(model_name: str, col: str, dataset_type: str) -> np.ndarray:
+def validate_positive_int(data: Dict[str, Any], field: str) -> None:
     """
-    Loads pre-computed embeddings for a specific model and dataset column.
+    Validates that an optional field of the request data is a positive integer.
 
     Args:
-        model_name: Name of the model used to generate the embeddings
-        col: Name of the synopsis column
-        dataset_type: Type of dataset ('anime' or 'manga')
+        data: Dictionary containing the request data
+        field: Name of the optional field
 
-    Returns:
-        NumPy array containing the pre-computed embeddings
+    Raises:
+        HTTPException: If the field is set to anything but a positive integer
+    """
+    value = data.get(field)
+    if value is not None and (
+        not isinstance(value, int) or isinstance(value, bool) or value < 1
+    ):
+        logging.error("Invalid %s.", field)
+        abort(400, description=f"{field} must be a positive integer")
+
+
+def validate_filters(data: Dict[str, Any]) -> None:
+    """
+    Validates the optional metadata filters of the request data.
+
+    Args:
+        data: Dictionary containing the request data
 
     Raises:
-        FileNotFoundError: If the embeddings file doesn't exist
+        HTTPException: If the filters are malformed, with the reason as description
     """
-    embeddings_file = (
-        f"model/{dataset_type}/{model_name}/embeddings_{col.replace(' ', '_')}.npy"
-    )
-    return np.load(embeddings_file)
+    try:
+        parse_filters(data.get("filters"))
+    except ValueError as e:
+        logging.error("Invalid filters: %s", e)
+        abort(400, description=str(e))
 
 
-def calculate_cosine_similarities(
-    model: SentenceTransformer | CustomT5EncoderModel,
-    model_name: str,
-    new_embedding: np.ndarray,
-    col: str,
-    dataset_type: str,
-) -> np.ndarray:
+def validate_batch_input(data: Dict[str, Any]) -> None:
     """
-    Calculates cosine similarities between a new embedding and existing embeddings.
+    Validates the input data for batch API requests.
 
-    This function:
+    This function checks that:
+
+    1. The model name is provided and allowed
+
+    2. The descriptions are a non-empty list of at most BATCH_SEARCH_MAX_SIZE
+       non-empty strings, each within the length limit
+
+    3. The optional resultsPerPage and nprobe are positive integers
+
+    4. The optional filters are valid
+
+    Args:
+        data: Dictionary containing the request data with 'model' and 'descriptions' keys
+
+    Raises:
+        HTTPException: If any validation check fails, with appropriate error message and status code
+    """
+    model_name = data.get("model")
+    descriptions = data.get("descriptions")
+
+    if not model_name or not isinstance(descriptions, list) or not descriptions:
+        logging.error("Model name or descriptions missing in the batch request.")
+        abort(400, description="Model name and a list of descriptions are required")
+
+    if len(descriptions) > BATCH_SEARCH_MAX_SIZE:
+        logging.error("Too many descriptions.")
+        abort(
+            400,
+            description=f"At most {BATCH_SEARCH_MAX_SIZE} descriptions are allowed",
+        )
+
+    for description in descriptions:
+        if not isinstance(description, str) or not description:
+            logging.error("Invalid description in the batch request.")
+            abort(400, description="Descriptions must be non-empty strings")
+        if len(description) > 2000:
+            logging.error("Description too long.")
+            abort(400, description="Description is too long")
+
+    if model_name not in allowed_models:
+        logging.error("Invalid model name.")
+        abort(400, description="Invalid model name")
 
-    1. Loads pre-computed embeddings for the specified column
+    validate_positive_int(data, "resultsPerPage")
+    validate_positive_int(data, "nprobe")
+    validate_filters(data)
 
-    2. Verifies embedding dimensions match
 
-    3. Computes cosine similarity scores using GPU if available
+def get_search_index(
+    dimension: int,
+    model_name: str,
+    dataset_type: str,
+) -> SearchIndex:
+    """
+    Returns the fused search index for a model and dataset, loading it on first use.
+
+    A persisted index is memory-mapped, together with its IVF index if one was
+    built; otherwise the index is built once from the memory-mapped per-column
+    embeddings, keeping only non-empty synopses.
 
     Args:
-        model: The transformer model used for encoding
+        dimension: Embedding dimension of the model
         model_name: Name of the model
-        new_embedding: Embedding vector of the input description
-        col: Name of the synopsis column
         dataset_type: Type of dataset ('anime' or 'manga')
 
     Returns:
-        Array of cosine similarity scores between the new embedding and all existing embeddings
+        The fused search index
 
     Raises:
+        FileNotFoundError: If an embeddings file doesn't exist
         ValueError: If embedding dimensions don't match
     """
-    model_name = model_name.replace("sentence-transformers/", "")
-    model_name = model_name.replace("toobi/", "")
-    existing_embeddings = load_embeddings(model_name, col, dataset_type)
-    if existing_embeddings.shape[1] != model.get_sentence_embedding_dimension():
-        raise ValueError(f"Incompatible dimension for embeddings in {col}")
-    new_embedding_tensor = torch.tensor(new_embedding).to(device)
-    existing_embeddings_tensor = torch.tensor(existing_embeddings).to(device)
-    return (
-        util.pytorch_cos_sim(new_embedding_tensor, existing_embeddings_tensor)
-        .flatten()
-        .cpu()
-        .numpy()
+    key = (dataset_type, model_name)
+    with search_indexes_lock:
+        if key not in search_indexes:
+            if dataset_type == "anime":
+                df, synopsis_columns = anime_df, anime_synopsis_columns
+            else:
+                df, synopsis_columns = manga_df, manga_synopsis_columns
+            index = load_or_build_search_index(
+                embedding_store,
+                df,
+                dataset_type,
+                model_name,
+                synopsis_columns,
+                dimension,
+            )
+            # Results are deduplicated by title
+            index.set_row_groups(title_ids[dataset_type])
+            if ANN_MIN_VECTORS is not None:
+                index.exact_threshold = ANN_MIN_VECTORS
+            if SHARED_SEGMENTS_DIR is not None:
+                index = share_search_index(
+                    index,
+                    SHARED_SEGMENTS_DIR,
+                    segment_name(dataset_type, model_name),
+                )
+            search_indexes[key] = index
+        return search_indexes[key]
+
+
+def preload_search_indexes(model_names: List[str]) -> None:
+    """
+    Loads the search indexes of models for both datasets ahead of the first request.
+
+    Run while src.api is imported, so that with gunicorn --preload the indexes are
+    loaded (and published to the shared segments) once by the master before the
+    workers are forked. The embedding dimension is read from the stored embeddings,
+    so no model is loaded.
+
+    Args:
+        model_names: Names of the models whose indexes are loaded
+    """
+    for model_name in model_names:
+        for dataset_type in ("anime", "manga"):
+            columns = (
+                anime_synopsis_columns
+                if dataset_type == "anime"
+                else manga_synopsis_columns
+            )
+            paths = [
+                embeddings_path(embedding_store.root, dataset_type, model_name, col)
+                for col in columns
+            ]
+            path = next((path for path in paths if os.path.exists(path)), None)
+            if path is None:
+                logging.warning(
+                    "No %s embeddings to preload for model '%s'.",
+                    dataset_type,
+                    model_name,
+                )
+                continue
+            dimension = np.load(path, mmap_mode="r").shape[1]
+            index = get_search_index(dimension, model_name, dataset_type)
+            logging.info(
+                "Preloaded %s search index of model '%s' (%d vectors).",
+                dataset_type,
+                model_name,
+                index.size,
+            )
+
+
+# Descriptions of the synthetic warm-up requests, of a short and a typical length
+WARMUP_DESCRIPTIONS = [
+    "A young hero sets out on a journey.",
+    "After the fall of the kingdom, a young swordsman travels across a war-torn "
+    "continent with a mysterious girl who remembers nothing of her past, hunting "
+    "the demons that destroyed his village while a secret order pursues them both.",
+]
+
+
+def warm_up(model_name: str, dataset_type: str) -> None:
+    """
+    Runs synthetic requests through the search path of a model and dataset.
+
+    Loads the model and the search index, encodes single and batched descriptions
+    (which starts the encode scheduler and sets up the tokenizer, torch kernels and
+    BLAS buffers), searches the index and materializes a page of results. Nothing is
+    added to the result or query embedding caches.
+
+    Args:
+        model_name: Name of the model
+        dataset_type: Type of dataset ('anime' or 'manga')
+
+    Raises:
+        ValueError: If the model name is not allowed or the model cannot be loaded
+    """
+    if model_name not in allowed_models:
+        raise ValueError(f"Invalid model name '{model_name}'")
+    embeddings = np.asarray(
+        encode_batch(model_name, WARMUP_DESCRIPTIONS), dtype=np.float32
+    )
+    encode_scheduler.encode_one(model_name, WARMUP_DESCRIPTIONS[0])
+    index = get_search_index(embeddings.shape[-1], model_name, dataset_type)
+    scores, rows, columns = index.search(
+        embeddings[:1], top_k=RESULT_CACHE_DEPTH, unique=True
     )
+    index.search_batch(embeddings, top_k=10, unique=True)
+    format_results(dataset_type, index.columns, scores[:10], rows[:10], columns[:10])
 
 
-def find_top_similarities(
-    cosine_similarities_dict: Dict[str, np.ndarray], num_similarities: int = 10
-) -> List[Tuple[int, str]]:
+def encode_query(model_name: str, description: str) -> np.ndarray:
     """
-    Finds the top N most similar descriptions across all synopsis columns.
+    Returns the embedding of a description, encoding it only on a cache miss.
 
-    This function:
+    The cache is keyed on the model name and the whitespace-normalized description
+    and is shared by the anime and manga endpoints. A hit skips both the registry
+    lookup and the transformer forward pass; a miss is encoded together with other
+    concurrent requests for the same model.
+
+    Args:
+        model_name: Name of the model to use
+        description: Input description to encode
+
+    Returns:
+        Read-only embedding of shape (1, dimension)
+    """
+    processed_description = normalize_description(description)
+    key = (model_name, processed_description)
+    embedding = query_embedding_cache.get(key)
+    if embedding is not None:
+        logging.debug(
+            "Query embedding cache hit (hit rate: %.2f).",
+            query_embedding_cache.stats()["hit_rate"],
+        )
+        return embedding
+
+    # Batched with concurrent requests for the same model
+    embedding = np.array(
+        encode_scheduler.encode_one(model_name, processed_description)[None, :],
+        dtype=np.float32,
+    )
+    embedding.setflags(write=False)
+    query_embedding_cache.put(key, embedding)
+    return embedding
+
+
+def encode_queries(model_name: str, descriptions: List[str]) -> np.ndarray:
+    """
+    Returns the embeddings of several descriptions, encoding only the cache misses.
+
+    The misses are deduplicated and encoded in one forward pass, and their
+    embeddings are added to the query cache shared with the single-query endpoints.
+
+    Args:
+        model_name: Name of the model to use
+        descriptions: Input descriptions to encode
+
+    Returns:
+        Embeddings of shape (len(descriptions), dimension)
+    """
+    processed = [normalize_description(description) for description in descriptions]
+    embeddings: Dict[str, np.ndarray] = {}
+    for text in processed:
+        embedding = query_embedding_cache.get((model_name, text))
+        if embedding is not None:
+            embeddings[text] = embedding
+
+    missing = [text for text in dict.fromkeys(processed) if text not in embeddings]
+    if missing:
+        encoded = np.asarray(encode_batch(model_name, missing), dtype=np.float32)
+        for text, row in zip(missing, encoded):
+            embedding = np.array(row[None, :], dtype=np.float32)
+            embedding.setflags(write=False)
+            query_embedding_cache.put((model_name, text), embedding)
+            embeddings[text] = embedding
+    return np.concatenate([embeddings[text] for text in processed])
+
+
+def filter_key(filters: Optional[MetadataFilter]) -> Optional[str]:
+    """
+    Returns the canonical key of a filter for cache keys and cursors.
+
+    Args:
+        filters: Metadata filter of a query, if any
+
+    Returns:
+        The key of the filter, or None without a filter
+    """
+    return None if filters is None else filters.key()
+
+
+def row_mask_for(
+    dataset_type: str, filters: Optional[MetadataFilter]
+) -> Optional[np.ndarray]:
+    """
+    Resolves a filter to a mask over the rows of a dataset.
+
+    Args:
+        dataset_type: Type of dataset ('anime' or 'manga')
+        filters: Metadata filter of a query, if any
+
+    Returns:
+        Boolean mask of the selected rows, or None without a filter
+    """
+    if filters is None:
+        return None
+    return filter_indexes[dataset_type].row_mask(filters)
+
+
+def get_ranked_results(
+    model_name: str,
+    description: str,
+    dataset_type: str,
+    end: int,
+    nprobe: Optional[int] = None,
+    filters: Optional[MetadataFilter] = None,
+) -> RankedResults:
+    """
+    Returns the ranked, title-deduplicated matches of a query up to at least end.
 
-    1. Processes similarity scores from all columns
+    A cached list is reused when it covers the requested positions. Otherwise the
+    description is encoded (or its embedding taken from the query cache), scored
+    against the fused index and ranked up to RESULT_CACHE_DEPTH (or end, if larger),
+    and the list is cached for later pages. Filters restrict the ranking to the rows
+    selected by their bitmaps, so every filter has its own cached list.
 
-    2. Sorts them in descending order
+    Args:
+        model_name: Name of the model to use
+        description: Input description to find similarities for
+        dataset_type: Type of dataset ('anime' or 'manga')
+        end: Exclusive end position of the results that are needed
+        nprobe: Number of IVF lists to probe when the index searches approximately
+        filters: Metadata filter the results must match
+
+    Returns:
+        The ranked results of the query
+    """
+    key = query_key(model_name, dataset_type, description, nprobe, filter_key(filters))
+    ranked = ranked_results_cache.get(key)
+    if ranked is not None and ranked.covers(end):
+        return ranked
+
+    with stage_timer("encode", model_name, dataset_type):
+        new_pooled_embedding = encode_query(model_name, description)
+
+    # Score every non-empty synopsis of every column in one pass, keeping only the
+    # best match of every title
+    index = get_search_index(new_pooled_embedding.shape[-1], model_name, dataset_type)
+    depth = max(RESULT_CACHE_DEPTH, end)
+    timings: Dict[str, float] = {}
+    top_scores, top_rows, top_columns = index.search(
+        new_pooled_embedding,
+        top_k=depth,
+        unique=True,
+        nprobe=nprobe,
+        timings=timings,
+        row_mask=row_mask_for(dataset_type, filters),
+    )
+    for stage, seconds in timings.items():
+        observe_stage(stage, model_name, dataset_type, seconds)
+    ranked = RankedResults(
+        top_scores, top_rows, top_columns, complete=len(top_scores) < depth
+    )
+    ranked_results_cache.put(key, ranked)
+    del new_pooled_embedding
+    return ranked
+
+
+def next_cursor(
+    model_name: str,
+    description: str,
+    dataset_type: str,
+    end: int,
+    nprobe: Optional[int] = None,
+    filters: Optional[MetadataFilter] = None,
+) -> Optional[str]:
+    """
+    Returns the cursor of the page that starts at end, if there can be one.
+
+    Args:
+        model_name: Name of the model used for the query
+        description: Input description of the query
+        dataset_type: Type of dataset ('anime' or 'manga')
+        end: Position after the last returned result
+        nprobe: Number of IVF lists probed by the query, if set by the client
+        filters: Metadata filter of the query, if set by the client
+
+    Returns:
+        An opaque cursor, or None if the cached results show nothing follows end
+    """
+    key = query_key(model_name, dataset_type, description, nprobe, filter_key(filters))
+    ranked = ranked_results_cache.peek(key)
+    if ranked is not None and ranked.complete and len(ranked) <= end:
+        return None
+    return encode_cursor(key, end)
 
-    3. Returns indices and column names for the top matches
+
+def resolve_offset(
+    data: Dict[str, Any],
+    model_name: str,
+    dataset_type: str,
+    page: int,
+    results_per_page: int,
+) -> int:
+    """
+    Returns the position of the first result to return for a request.
+
+    A cursor from a previous response takes precedence over the page number.
 
     Args:
-        cosine_similarities_dict: Dictionary mapping column names to arrays of similarity scores
-        num_similarities: Number of top similarities to return (default: 10)
+        data: Request payload
+        model_name: Name of the model used for the query
+        dataset_type: Type of dataset ('anime' or 'manga')
+        page: Page number from the payload
+        results_per_page: Number of results per page
 
     Returns:
-        List of tuples containing (index, column_name) for the top similar descriptions,
-        sorted by similarity score in descending order
-    """
-    all_top_indices = []
-    for col, cosine_similarities in cosine_similarities_dict.items():
-        top_indices_unsorted = np.argsort(cosine_similarities)[-num_similarities:]
-        top_indices = top_indices_unsorted[
-            np.argsort(cosine_similarities[top_indices_unsorted])[::-1]
-        ]
-        all_top_indices.extend([(idx, col) for idx in top_indices])
-    all_top_indices.sort(
-        key=lambda x: cosine_similarities_dict[x[1]][x[0]],  # type: ignore
-        reverse=True,
-    )  # type: ignore
-    return all_top_indices
+        Position of the first result
+
+    Raises:
+        HTTPException: If the cursor is invalid or was issued for another query
+    """
+    cursor = data.get("cursor")
+    if cursor is None:
+        return (page - 1) * results_per_page
+    try:
+        return decode_cursor(
+            str(cursor),
+            query_key(
+                model_name,
+                dataset_type,
+                data["description"],
+                data.get("nprobe"),
+                filter_key(parse_filters(data.get("filters"))),
+            ),
+        )
+    except ValueError:
+        logging.error("Invalid cursor.")
+        abort(400, description="Invalid cursor")
 
 
 def get_similarities(
@@ -350,19 +1059,21 @@ def get_similarities(
     dataset_type: str,
     page: int = 1,
     results_per_page: int = 10,
-) -> List[Dict[str, Any]]:
+    offset: Optional[int] = None,
+    nprobe: Optional[int] = None,
+    filters: Optional[MetadataFilter] = None,
+) -> List[bytes]:
     """
     Finds the most similar descriptions in the specified dataset.
 
     This function:
 
-    1. Loads and validates the appropriate model
+    1. Fetches the ranked matches of the query from the result cache, or computes
+       them with the resident model and the fused index on a cache miss
 
-    2. Encodes the input description
+    2. Slices the requested page out of the ranked list
 
-    3. Calculates similarities with all stored descriptions
-
-    4. Returns paginated results with metadata
+    3. Returns paginated results with metadata
 
     Args:
         model_name: Name of the model to use
@@ -370,99 +1081,255 @@ def get_similarities(
         dataset_type: Type of dataset ('anime' or 'manga')
         page: Page number for pagination (default: 1)
         results_per_page: Number of results per page (default: 10)
+        offset: Position of the first result; overrides page when given
+        nprobe: Number of IVF lists to probe when the index searches approximately
+        filters: Metadata filter the results must match
 
     Returns:
-        List of dictionaries containing similar items with metadata and similarity scores
+        List of JSON objects of similar items with metadata and similarity scores
 
     Raises:
         ValueError: If model name is invalid or model loading fails
     """
-    update_last_request_time()
+    memory_manager.note_activity()
 
     # Validate model name
     if model_name not in allowed_models:
         raise ValueError("Invalid model name")
 
-    # Select the appropriate dataset and synopsis columns
-    if dataset_type == "anime":
-        df = anime_df
-        synopsis_columns = anime_synopsis_columns
-    else:
-        df = manga_df
-        synopsis_columns = manga_synopsis_columns
+    start_index = (page - 1) * results_per_page if offset is None else offset
+    end_index = start_index + results_per_page
+    ranked = get_ranked_results(
+        model_name, description, dataset_type, end_index, nprobe, filters
+    )
 
-    if (
-        model_name == "fine_tuned_sbert_anime_model"
-        or model_name == "fine_tuned_sbert_model_anime"
-    ):
-        load_model_name = f"model/{model_name}"
-    else:
-        load_model_name = model_name
+    # Only the rows of the requested page are materialized
+    index = search_indexes[(dataset_type, model_name)]
+    with stage_timer("materialize", model_name, dataset_type):
+        results = format_results(
+            dataset_type,
+            index.columns,
+            ranked.scores[start_index:end_index],
+            ranked.rows[start_index:end_index],
+            ranked.columns[start_index:end_index],
+            first_rank=start_index + 1,
+        )
 
-    # Load the complete SentenceTransformer model
-    try:
-        model = SentenceTransformer(load_model_name, device=device)
-    except Exception as e:
-        raise ValueError(f"Failed to load model '{load_model_name}': {e}") from e
+    return results
 
-    processed_description = description.strip()
-    new_pooled_embedding = model.encode([processed_description])
 
-    cosine_similarities_dict = {
-        col: calculate_cosine_similarities(
-            model, model_name, new_pooled_embedding, col, dataset_type
-        )
-        for col in synopsis_columns
-    }
+def format_results(
+    dataset_type: str,
+    index_columns: List[str],
+    scores: np.ndarray,
+    rows: np.ndarray,
+    column_ids: np.ndarray,
+    first_rank: int = 1,
+) -> List[bytes]:
+    """
+    Converts ranked matches into JSON result objects.
+
+    Each result holds the dataset row without the synopsis columns other than the
+    matching one, together with its rank, similarity and matching synopsis. The row
+    and synopsis are spliced from the pre-serialized payload store, so no row is
+    converted to a dict.
+
+    Args:
+        dataset_type: Type of dataset ('anime' or 'manga')
+        index_columns: Synopsis columns of the search index the matches come from
+        scores: Similarity of every match
+        rows: Dataset row of every match
+        column_ids: Index into index_columns of every match
+        first_rank: Rank of the first match
+
+    Returns:
+        List of JSON objects of the matched items with metadata and similarity scores
+    """
+    payloads = payload_stores[dataset_type]
+    results: List[bytes] = []
+    for position, (score, row, column_id) in enumerate(zip(scores, rows, column_ids)):
+        col = index_columns[column_id]
+        results.append(payloads.result(int(row), col, first_rank + position, score))
+    return results
 
-    all_top_indices = find_top_similarities(
-        cosine_similarities_dict, num_similarities=page * results_per_page
-    )
 
-    seen_names = set()
-    results: List[Dict[str, Any]] = []
-
-    for idx, col in all_top_indices:
-        name = df.iloc[idx]["title"]
-        relevant_synopsis = df.iloc[idx][col]
-
-        # Check if the relevant synopsis is valid
-        if pd.isna(relevant_synopsis) or relevant_synopsis.strip() == "":
-            continue
-
-        if name not in seen_names:
-            row_data = df.iloc[idx].to_dict()  # Convert the entire row to a dictionary
-            # Keep only the relevant synopsis column
-            row_data = {
-                k: v
-                for k, v in row_data.items()
-                if k not in synopsis_columns or k == col
-            }
-            row_data.update(
-                {
-                    "rank": len(results) + 1,
-                    "similarity": float(cosine_similarities_dict[col][idx]),
-                    "synopsis": relevant_synopsis,  # Ensure the correct synopsis is included
-                }
+def encode_result(result: Any) -> bytes:
+    """
+    Returns the JSON of a result.
+
+    Args:
+        result: Pre-serialized JSON object, or a JSON-serializable value
+
+    Returns:
+        The JSON encoding of the result
+    """
+    if isinstance(result, bytes):
+        return result
+    return dumps(result)
+
+
+def json_array(results: List[Any]) -> bytes:
+    """
+    Joins results into a JSON array.
+
+    Args:
+        results: Pre-serialized JSON objects or JSON-serializable values
+
+    Returns:
+        The JSON array
+    """
+    return b"[" + b",".join(encode_result(result) for result in results) + b"]"
+
+
+def batch_item(position: int, results: List[Any]) -> bytes:
+    """
+    Returns the JSON object of the results of one description of a batch.
+
+    Args:
+        position: Position of the description in the batch
+        results: Results of the description
+
+    Returns:
+        JSON object with the position as "index" and the results as "results"
+    """
+    return b'{"index":%d,"results":%s}' % (position, json_array(results))
+
+
+def iter_batch_similarities(
+    model_name: str,
+    descriptions: List[str],
+    dataset_type: str,
+    results_per_page: int = 10,
+    nprobe: Optional[int] = None,
+    filters: Optional[MetadataFilter] = None,
+) -> Iterator[Tuple[int, List[bytes]]]:
+    """
+    Finds the most similar items for every description of a batch.
+
+    The descriptions are processed BATCH_SEARCH_CHUNK_SIZE at a time: the cache
+    misses of a chunk are encoded in one forward pass, the chunk is scored against
+    the fused index with one matrix-matrix product, and the top results of all its
+    queries are selected together. Results are yielded as soon as their chunk is
+    done, so they can be streamed.
+
+    Args:
+        model_name: Name of the model to use
+        descriptions: Input descriptions to find similarities for
+        dataset_type: Type of dataset ('anime' or 'manga')
+        results_per_page: Number of results per description (default: 10)
+        nprobe: Number of IVF lists to probe when the index searches approximately
+        filters: Metadata filter the results of every description must match
+
+    Yields:
+        Position of a description in the batch and its results, in batch order
+
+    Raises:
+        ValueError: If model name is invalid or model loading fails
+    """
+    memory_manager.note_activity()
+
+    if model_name not in allowed_models:
+        raise ValueError("Invalid model name")
+
+    row_mask = row_mask_for(dataset_type, filters)
+    for start in range(0, len(descriptions), BATCH_SEARCH_CHUNK_SIZE):
+        with stage_timer("encode", model_name, dataset_type):
+            embeddings = encode_queries(
+                model_name, descriptions[start : start + BATCH_SEARCH_CHUNK_SIZE]
             )
-            results.append(row_data)
-            seen_names.add(name)
-            if len(results) >= page * results_per_page:
-                break
+        index = get_search_index(embeddings.shape[-1], model_name, dataset_type)
+        timings: Dict[str, float] = {}
+        matches = index.search_batch(
+            embeddings,
+            top_k=results_per_page,
+            unique=True,
+            nprobe=nprobe,
+            timings=timings,
+            row_mask=row_mask,
+        )
+        for stage, seconds in timings.items():
+            observe_stage(stage, model_name, dataset_type, seconds)
+        for position, (scores, rows, column_ids) in enumerate(matches, start):
+            with stage_timer("materialize", model_name, dataset_type):
+                results = format_results(
+                    dataset_type, index.columns, scores, rows, column_ids
+                )
+            yield position, results
 
-    # Clear memory
-    del model, new_pooled_embedding, cosine_similarities_dict
-    clear_memory()
 
-    # Calculate start and end indices for pagination
-    start_index = (page - 1) * results_per_page
-    end_index = start_index + results_per_page
+def batch_similarities_response(dataset_type: str) -> Response:
+    """
+    Handles a batch request of the anime or manga batch endpoint.
 
-    return results[start_index:end_index]
+    Args:
+        dataset_type: Type of dataset ('anime' or 'manga')
+
+    Returns:
+        JSON list of {"index", "results"} objects, or the same objects as
+        newline-delimited JSON if the payload sets "stream"
+    """
+    try:
+        data = request.json
+        if data is None:
+            raise ValueError("Request payload is missing or not in JSON format")
+        validate_batch_input(data)
+        model_name = data.get("model")
+        if model_name == "sentence-transformers/fine_tuned_sbert_anime_model":
+            model_name = "fine_tuned_sbert_model_anime"
+        descriptions = data["descriptions"]
+        results_per_page = data.get("resultsPerPage", 10)
+        nprobe = data.get("nprobe")
+        filters = parse_filters(data.get("filters"))
+
+        # Get the client's IP address
+        client_ip = request.headers.get("X-Forwarded-For", request.remote_addr)
+        logging.info(
+            "Received %s batch request from IP: %s with model: %s, "
+            "descriptions: %d, resultsPerPage: %d",
+            dataset_type,
+            client_ip,
+            model_name,
+            len(descriptions),
+            results_per_page,
+        )
+
+        matches = iter_batch_similarities(
+            model_name, descriptions, dataset_type, results_per_page, nprobe, filters
+        )
+        if data.get("stream"):
+
+            def generate() -> Iterator[bytes]:
+                try:
+                    for position, results in matches:
+                        yield batch_item(position, results) + b"\n"
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    # The status line is already sent, so report the error in-band
+                    logging.error("Internal server error while streaming: %s", e)
+                    yield b'{"error":"Internal server error"}\n'
+
+            return Response(
+                stream_with_context(generate()), mimetype="application/x-ndjson"
+            )
+
+        body = b",".join(batch_item(position, results) for position, results in matches)
+        response = Response(b"[" + body + b"]", mimetype="application/json")
+        logging.info("Returning %s batch results", dataset_type)
+        return response
+
+    except HTTPException as e:
+        logging.error("HTTP error: %s", e)
+        return make_response(jsonify({"error": e.description}), e.code)
+    except ValueError as e:
+        logging.error("Validation error: %s", e)
+        return make_response(jsonify({"error": "Bad Request"}), 400)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logging.error("Internal server error: %s", e)
+        return make_response(jsonify({"error": "Internal server error"}), 500)
 
 
 @app.route("/anisearchmodel/anime", methods=["POST"])
 @limiter.limit("1 per second")
+@admission_controlled
 def get_anime_similarities() -> Response:
     """
     API endpoint for finding similar anime based on a description.
@@ -481,7 +1348,11 @@ def get_anime_similarities() -> Response:
         "model": str,          # Name of the model to use
         "description": str,    # Input description to find similarities for
         "page": int,           # Optional: Page number (default: 1)
-        "resultsPerPage": int  # Optional: Results per page (default: 10)
+        "resultsPerPage": int, # Optional: Results per page (default: 10)
+        "cursor": str,         # Optional: X-Next-Cursor of a previous response
+        "nprobe": int,         # Optional: IVF lists to probe (approximate search)
+        "filters": dict        # Optional: {"genres", "themes", "type", "minYear",
+                               #   "maxYear", "minScore", "maxScore"}
     }
     ```
 
@@ -489,14 +1360,15 @@ def get_anime_similarities() -> Response:
         JSON response containing:
         - List of similar anime with metadata
         - Similarity scores
-        - Pagination information
+        - Pagination information, with the cursor of the next page in the
+          X-Next-Cursor header
 
     Raises:
         400: If request validation fails
         500: If internal processing error occurs
+        503: If the worker is overloaded (see the Retry-After header)
     """
     try:
-        clear_memory()
         data = request.json
         if data is None:
             raise ValueError("Request payload is missing or not in JSON format")
@@ -520,13 +1392,39 @@ def get_anime_similarities() -> Response:
             results_per_page,
         )
 
+        nprobe = data.get("nprobe")
+        filters = parse_filters(data.get("filters"))
+        offset = resolve_offset(data, model_name, "anime", page, results_per_page)
         results = get_similarities(
-            model_name, description, "anime", page, results_per_page
+            model_name,
+            description,
+            "anime",
+            page,
+            results_per_page,
+            offset,
+            nprobe,
+            filters,
         )
         logging.info("Returning %d anime results", len(results))
-        clear_memory()
-        return jsonify(results)
+        with stage_timer("serialize", model_name, "anime"):
+            body = json_array(results)
+        response = Response(body, mimetype="application/json")
+        if len(results) == results_per_page:
+            cursor = next_cursor(
+                model_name,
+                description,
+                "anime",
+                offset + len(results),
+                nprobe,
+                filters,
+            )
+            if cursor is not None:
+                response.headers["X-Next-Cursor"] = cursor
+        return response
 
+    except HTTPException as e:
+        logging.error("HTTP error: %s", e)
+        return make_response(jsonify({"error": e.description}), e.code)
     except ValueError as e:
         logging.error("Validation error: %s", e)
         return make_response(jsonify({"error": "Bad Request"}), 400)
@@ -537,6 +1435,7 @@ def get_anime_similarities() -> Response:
 
 @app.route("/anisearchmodel/manga", methods=["POST"])  # type: ignore
 @limiter.limit("1 per second")
+@admission_controlled
 def get_manga_similarities() -> Response:
     """
     API endpoint for finding similar manga based on a description.
@@ -555,7 +1454,11 @@ def get_manga_similarities() -> Response:
         "model": str,          # Name of the model to use
         "description": str,    # Input description to find similarities for
         "page": int,           # Optional: Page number (default: 1)
-        "resultsPerPage": int  # Optional: Results per page (default: 10)
+        "resultsPerPage": int, # Optional: Results per page (default: 10)
+        "cursor": str,         # Optional: X-Next-Cursor of a previous response
+        "nprobe": int,         # Optional: IVF lists to probe (approximate search)
+        "filters": dict        # Optional: {"genres", "themes", "type", "minYear",
+                               #   "maxYear", "minScore", "maxScore"}
     }
     ```
 
@@ -563,14 +1466,15 @@ def get_manga_similarities() -> Response:
         JSON response containing:
         - List of similar manga with metadata
         - Similarity scores
-        - Pagination information
+        - Pagination information, with the cursor of the next page in the
+          X-Next-Cursor header
 
     Raises:
         400: If request validation fails
         500: If internal processing error occurs
+        503: If the worker is overloaded (see the Retry-After header)
     """
     try:
-        clear_memory()
         data = request.json
         if data is None:
             raise ValueError("Request payload is missing or not in JSON format")
@@ -595,12 +1499,35 @@ def get_manga_similarities() -> Response:
             results_per_page,
         )
 
+        nprobe = data.get("nprobe")
+        filters = parse_filters(data.get("filters"))
+        offset = resolve_offset(data, model_name, "manga", page, results_per_page)
         results = get_similarities(
-            model_name, description, "manga", page, results_per_page
+            model_name,
+            description,
+            "manga",
+            page,
+            results_per_page,
+            offset,
+            nprobe,
+            filters,
         )
         logging.info("Returning %d manga results", len(results))
-        clear_memory()
-        return jsonify(results)
+        with stage_timer("serialize", model_name, "manga"):
+            body = json_array(results)
+        response = Response(body, mimetype="application/json")
+        if len(results) == results_per_page:
+            cursor = next_cursor(
+                model_name,
+                description,
+                "manga",
+                offset + len(results),
+                nprobe,
+                filters,
+            )
+            if cursor is not None:
+                response.headers["X-Next-Cursor"] = cursor
+        return response
 
     except HTTPException as e:
         logging.error("HTTP error: %s", e)
@@ -610,6 +1537,205 @@ def get_manga_similarities() -> Response:
         return make_response(jsonify({"error": "Internal server error"}), 500)
 
 
+@app.route("/anisearchmodel/anime/batch", methods=["POST"])
+@limiter.limit("1 per second")
+@admission_controlled
+def get_anime_batch_similarities() -> Response:
+    """
+    API endpoint for finding similar anime for many descriptions in one call.
+
+    Expected JSON payload:
+    ```
+    {
+        "model": str,              # Name of the model to use
+        "descriptions": List[str], # Up to BATCH_SEARCH_MAX_SIZE descriptions
+        "resultsPerPage": int,     # Optional: Results per description (default: 10)
+        "nprobe": int,             # Optional: IVF lists to probe (approximate search)
+        "filters": dict,           # Optional: Metadata filters for every description
+        "stream": bool             # Optional: Stream results as NDJSON
+    }
+    ```
+
+    Returns:
+        JSON list with one {"index": int, "results": [...]} object per description,
+        in the order of the descriptions. With "stream", the same objects are sent
+        as application/x-ndjson lines as soon as they are computed.
+
+    Raises:
+        400: If request validation fails
+        500: If internal processing error occurs
+        503: If the worker is overloaded (see the Retry-After header)
+    """
+    return batch_similarities_response("anime")
+
+
+@app.route("/anisearchmodel/manga/batch", methods=["POST"])  # type: ignore
+@limiter.limit("1 per second")
+@admission_controlled
+def get_manga_batch_similarities() -> Response:
+    """
+    API endpoint for finding similar manga for many descriptions in one call.
+
+    Expected JSON payload:
+    ```
+    {
+        "model": str,              # Name of the model to use
+        "descriptions": List[str], # Up to BATCH_SEARCH_MAX_SIZE descriptions
+        "resultsPerPage": int,     # Optional: Results per description (default: 10)
+        "nprobe": int,             # Optional: IVF lists to probe (approximate search)
+        "filters": dict,           # Optional: Metadata filters for every description
+        "stream": bool             # Optional: Stream results as NDJSON
+    }
+    ```
+
+    Returns:
+        JSON list with one {"index": int, "results": [...]} object per description,
+        in the order of the descriptions. With "stream", the same objects are sent
+        as application/x-ndjson lines as soon as they are computed.
+
+    Raises:
+        400: If request validation fails
+        500: If internal processing error occurs
+        503: If the worker is overloaded (see the Retry-After header)
+    """
+    return batch_similarities_response("manga")
+
+
+@app.after_request
+def record_process_metrics(response: Response) -> Response:
+    """
+    Publishes the cache, model, batcher and index gauges of this worker process.
+
+    Args:
+        response: Response of the request
+
+    Returns:
+        The response, unchanged
+    """
+    update_cache_metrics("results", ranked_results_cache.stats())
+    update_cache_metrics("query_embeddings", query_embedding_cache.stats())
+    update_registry_metrics(model_registry.stats())
+    update_memory_metrics(memory_manager.stats())
+    if admission_controller is not None:
+        update_admission_metrics(admission_controller.stats())
+    update_batcher_metrics(encode_scheduler.stats())
+    update_index_metrics(search_indexes)
+    return response
+
+
+@app.teardown_request
+def release_admission(_exception: Optional[BaseException]) -> None:
+    """
+    Gives back the admission slot of the request, if it holds one.
+
+    Args:
+        _exception: Exception that ended the request, if any
+    """
+    ticket = g.pop("admission_ticket", None)
+    if ticket is not None and admission_controller is not None:
+        admission_controller.release(ticket)
+
+
+@app.route("/metrics", methods=["GET"])
+@limiter.exempt
+def get_metrics() -> Response:
+    """
+    API endpoint exposing the metrics of all worker processes.
+
+    Returns:
+        Metrics in the Prometheus text exposition format, including the latency
+        histogram of every request stage per model and dataset, cache hit ratios,
+        resident model counts and search index sizes
+    """
+    record_process_metrics(Response())
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
+@app.route("/ready", methods=["GET"])
+@limiter.exempt
+def get_ready() -> Response:
+    """
+    API endpoint reporting whether this worker has finished warming up.
+
+    Returns:
+        JSON response with the readiness, the PID of the worker and the status,
+        duration and error of every warm-up target, with status 200 once every
+        target is warm and 503 before or while a target failed (unless
+        WARMUP_REQUIRE_ALL is 0, which only waits for warm-up to finish)
+    """
+    stats = {**warmup.stats(), "pid": os.getpid()}
+    return make_response(jsonify(stats), 200 if stats["ready"] else 503)
+
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """
+    Compresses JSON responses with the content encoding the client prefers.
+
+    Buffered bodies smaller than COMPRESSION_MIN_SIZE are sent as they are. Streamed
+    bodies are compressed chunk by chunk and flushed after every chunk.
+
+    Args:
+        response: Response of the request
+
+    Returns:
+        The response, compressed if the client accepts brotli or gzip
+    """
+    if (
+        COMPRESSION_MIN_SIZE < 0
+        or response.mimetype not in ("application/json", "application/x-ndjson")
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESSION_MIN_SIZE:
+            return response
+        response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+# Search indexes listed in PRELOAD_INDEXES (comma-separated model names) are loaded
+# at import time, i.e. once in the gunicorn master when it runs with --preload
+preload_search_indexes(
+    [
+        name.strip()
+        for name in os.getenv("PRELOAD_INDEXES", "").split(",")
+        if name.strip()
+    ]
+)
+
+# Models listed in WARMUP_MODELS (comma-separated model names, optionally suffixed
+# with :anime or :manga) are warmed up by every worker in the background, and /ready
+# answers 200 once they are. A failed target keeps the worker not ready unless
+# WARMUP_REQUIRE_ALL is 0. Under gunicorn the workers start it after they are
+# forked (see the post_worker_init hook in gunicorn_config.py), so the master never
+# runs the models
+warmup = WarmUp(
+    parse_targets(os.getenv("WARMUP_MODELS")),
+    warm_up,
+    require_all=os.getenv("WARMUP_REQUIRE_ALL", "1").strip() != "0",
+)
+app.extensions["warmup"] = warmup
+if "gunicorn" not in sys.modules:
+    warmup.start()
+
+# Keep the garbage collector from writing to the objects created so far (datasets,
+# indexes), so that their pages stay shared with forked workers
+gc.freeze()
+
+
 if __name__ == "__main__":
     debug_mode = os.getenv("FLASK_DEBUG", "False").lower() in ["true", "1"]
     app.run(debug=debug_mode, threaded=True, port=21493)
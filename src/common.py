@@ -3,7 +3,7 @@ This module provides utility functions for loading datasets, preprocessing text,
 and saving evaluation data for machine learning models.
 
 Functions:
-    load_dataset: Load and preprocess a dataset from a CSV file.
+    load_dataset: Load and preprocess a merged dataset (Arrow IPC or CSV).
     preprocess_text: Clean and normalize text data for ML processing.
     save_evaluation_data: Save model evaluation results to JSON.
 """
@@ -13,12 +13,13 @@ import os
 import re
 import json
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
 import pandas as pd
 import contractions
 from unidecode import unidecode
+from src.dataset_io import read_dataset
 
 # Initialize stopwords and lemmatizer
 stop_words = set(stopwords.words("english"))
@@ -26,17 +27,21 @@ lemmatizer = WordNetLemmatizer()
 
 
 # Load the dataset
-def load_dataset(file_path: str) -> pd.DataFrame:
+def load_dataset(file_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
     """
     Load dataset from a CSV file and fill missing values in the 'Synopsis' column.
 
+    The Arrow IPC copy of the dataset is read instead of the CSV when it exists.
+
     Args:
         file_path (str): Path to the CSV file containing the dataset.
+        columns (Optional[List[str]]): Columns to load, must include 'synopsis'.
+            Defaults to all columns.
 
     Returns:
         pd.DataFrame: Loaded dataset with filled 'Synopsis' column.
     """
-    df = pd.read_csv(file_path)
+    df = read_dataset(file_path, columns=columns)
     df["synopsis"] = df["synopsis"].fillna("")
     return df
 
@@ -0,0 +1,182 @@
+"""
+This module reads and writes the merged datasets in a columnar format.
+
+The merged datasets are written as CSV for inspection and sharing, and next to it as
+an uncompressed Arrow IPC file (model/merged_[type]_dataset.arrow) with the column
+types that pandas infers from the CSV. Loaders memory-map the Arrow file and only
+materialize the columns they ask for, instead of parsing the whole CSV in every
+process. The CSV is still read when no (or an outdated) Arrow file exists or pyarrow
+is not installed.
+
+Convert existing merged datasets with:
+
+```
+python -m src.dataset_io --type <dataset_type>
+```
+
+Functions:
+    arrow_path: Return the Arrow IPC path that belongs to a CSV dataset.
+    write_arrow_dataset: Write a DataFrame to an Arrow IPC file.
+    convert_dataset: Write the Arrow IPC copy of a CSV dataset.
+    read_dataset: Load a dataset, preferring its Arrow IPC copy.
+"""
+
+# pylint: disable=E0401, E0611
+import argparse
+import os
+from typing import Callable, List, Optional, Union
+
+import pandas as pd
+
+try:
+    import pyarrow as pa  # type: ignore
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+# Record batches of at most this many rows, so readers can slice without copying
+ARROW_CHUNK_SIZE = 65536
+
+
+def arrow_path(csv_path: str) -> str:
+    """
+    Return the Arrow IPC path that belongs to a CSV dataset.
+
+    Args:
+        csv_path (str): Path of the CSV dataset.
+
+    Returns:
+        str: The path with its .csv extension replaced by .arrow.
+    """
+    root, _ = os.path.splitext(csv_path)
+    return f"{root}.arrow"
+
+
+def write_arrow_dataset(df: pd.DataFrame, path: str) -> None:
+    """
+    Write a DataFrame to an uncompressed Arrow IPC file.
+
+    The file is written next to its target and renamed into place, so readers never
+    see a partial file.
+
+    Args:
+        df (pd.DataFrame): Dataset to write.
+        path (str): Path of the Arrow IPC file.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to write Arrow datasets")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    temporary_path = f"{path}.tmp"
+    with pa.OSFile(temporary_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=ARROW_CHUNK_SIZE)
+    os.replace(temporary_path, path)
+
+
+def convert_dataset(csv_path: str) -> str:
+    """
+    Write the Arrow IPC copy of a CSV dataset.
+
+    The CSV is read back rather than converting an in-memory DataFrame, so both
+    formats load with exactly the same column types.
+
+    Args:
+        csv_path (str): Path of the CSV dataset.
+
+    Returns:
+        str: Path of the Arrow IPC file.
+    """
+    path = arrow_path(csv_path)
+    write_arrow_dataset(pd.read_csv(csv_path), path)
+    return path
+
+
+def has_current_arrow(csv_path: str) -> bool:
+    """
+    Check whether a CSV dataset has an Arrow IPC copy that can be read instead.
+
+    Args:
+        csv_path (str): Path of the CSV dataset.
+
+    Returns:
+        bool: True if pyarrow is installed and the Arrow file is not older than the
+        CSV (or the CSV does not exist).
+    """
+    path = arrow_path(csv_path)
+    if pa is None or not os.path.exists(path):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(path) >= os.path.getmtime(csv_path)
+
+
+def read_dataset(
+    csv_path: str,
+    columns: Optional[Union[List[str], Callable[[str], bool]]] = None,
+) -> pd.DataFrame:
+    """
+    Load a merged dataset, preferring its memory-mapped Arrow IPC copy.
+
+    Args:
+        csv_path (str): Path of the CSV dataset.
+        columns (Optional[Union[List[str], Callable[[str], bool]]]): Columns to
+            load, either as names or as a predicate on the column name like the
+            usecols argument of pd.read_csv. Columns are returned in dataset order
+            and names that the dataset does not have are skipped. Defaults to all
+            columns.
+
+    Returns:
+        pd.DataFrame: The dataset.
+    """
+    if columns is None:
+        usecols = None
+    elif callable(columns):
+        usecols = columns
+    else:
+        wanted = set(columns)
+        usecols = wanted.__contains__
+
+    if not has_current_arrow(csv_path):
+        return pd.read_csv(csv_path, usecols=usecols)
+
+    with pa.memory_map(arrow_path(csv_path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    if usecols is not None:
+        table = table.select([col for col in table.column_names if usecols(col)])
+    return table.to_pandas()
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command-line arguments for converting a merged dataset.
+
+    Returns:
+        argparse.Namespace: Parsed arguments containing:
+            type (str): Dataset type ('anime' or 'manga')
+    """
+    parser = argparse.ArgumentParser(
+        description="Write the Arrow IPC copy of a merged CSV dataset."
+    )
+    parser.add_argument(
+        "--type",
+        type=str,
+        choices=["anime", "manga"],
+        required=True,
+        help="Type of dataset to convert: 'anime' or 'manga'.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Convert the merged CSV dataset of the given type to Arrow IPC.
+    """
+    args = parse_args()
+    path = convert_dataset(f"model/merged_{args.type}_dataset.csv")
+    print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Gunicorn server hooks, loaded by run_server.py with the -c option.
+
+Workers record their metrics in files under PROMETHEUS_MULTIPROC_DIR. Gauges of
+workers that exited (e.g. after a crash or a restart) must no longer count towards
+the live aggregates, so every worker is marked dead when the master reaps it.
+
+Every worker warms up the models configured in WARMUP_MODELS on its own once it has
+loaded the application, so that the master (which imports the application with
+--preload) never runs a model before forking.
+
+Functions:
+    post_worker_init: Start the warm-up of a new worker.
+    child_exit: Mark the metric files of an exited worker as dead.
+"""
+
+# pylint: disable=E0401, E0611
+from typing import Any
+
+from prometheus_client import multiprocess
+
+
+def post_worker_init(worker: Any) -> None:
+    """
+    Start the warm-up of a new worker.
+
+    Args:
+        worker (Any): The worker that loaded the application.
+    """
+    warmup = worker.wsgi.extensions.get("warmup")
+    if warmup is not None:
+        warmup.start()
+
+
+def child_exit(server: Any, worker: Any) -> None:  # pylint: disable=unused-argument
+    """
+    Mark the metric files of an exited worker as dead.
+
+    Args:
+        server (Any): The gunicorn arbiter.
+        worker (Any): The worker that exited.
+    """
+    multiprocess.mark_process_dead(worker.pid)
@@ -12,6 +12,7 @@ Key features:
     - Consolidates information from multiple sources while preserving data quality
     - Removes inappropriate content based on genres/demographics
     - Saves the final merged dataset with progress tracking
+    - Writes a memory-mappable Arrow IPC copy of the merged dataset for the loaders
 
 The script can be run from the command line with a required --type argument
 specifying either 'anime' or 'manga'.
@@ -21,7 +22,8 @@ Example:
 python merge_datasets.py --type anime
 ```
 
-The merged dataset will be saved to model/merged_[type]_dataset.csv
+The merged dataset will be saved to model/merged_[type]_dataset.csv and
+model/merged_[type]_dataset.arrow
 """
 
 import ast
@@ -40,6 +42,7 @@ from datasets import load_dataset
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from src import common  # pylint: disable=wrong-import-position
+from src.dataset_io import convert_dataset  # pylint: disable=wrong-import-position
 
 FILE_LOGGING_LEVEL = logging.DEBUG
 CONSOLE_LOGGING_LEVEL = logging.INFO
@@ -349,6 +352,22 @@ def remove_duplicate_infos(df: pd.DataFrame, info_cols: list[str]) -> pd.DataFra
     return df
 
 
+def save_arrow_copy(csv_path: str) -> None:
+    """
+    Write the Arrow IPC copy of a merged dataset that the loaders prefer over the CSV.
+
+    Args:
+        csv_path (str): Path of the merged CSV dataset.
+    """
+    try:
+        path = convert_dataset(csv_path)
+        logging.info("Saved the Arrow copy of the merged dataset to '%s'.", path)
+    except ImportError:
+        logging.warning(
+            "pyarrow is not installed, loaders will parse '%s' instead.", csv_path
+        )
+
+
 # Function to merge anime datasets
 def merge_anime_datasets() -> pd.DataFrame:
     """
@@ -678,6 +697,7 @@ def merge_anime_datasets() -> pd.DataFrame:
                 end: int = start + chunk_size
                 final_merged_df.iloc[start:end].to_csv(f, header=False, index=False)
 
+        save_arrow_copy("model/merged_anime_dataset.csv")
         logging.info(
             "Anime datasets merged and saved to 'model/merged_anime_dataset.csv'."
         )
@@ -867,6 +887,7 @@ def merge_manga_datasets() -> pd.DataFrame:
                 end: int = start + chunk_size
                 merged_df.iloc[start:end].to_csv(f, header=False, index=False)
 
+        save_arrow_copy("model/merged_manga_dataset.csv")
         logging.info(
             "Manga datasets merged and saved to 'model/merged_manga_dataset.csv'."
         )
@@ -0,0 +1,158 @@
+"""
+Verify dynamic int8 quantization of a query encoder and save the quantized encoder.
+
+The script encodes a random sample of the synopses of the merged dataset with the
+float32 model and with the same model after dynamic int8 quantization of its Linear
+layers, and prints:
+
+    - the mean, minimum and 1st percentile cosine similarity between the float32
+      and int8 embedding of every synopsis,
+    - the mean overlap of the top-10 neighbours of every synopsis within the sample,
+      ranked with float32 and with int8 embeddings, and
+    - the time taken to encode the sample with both models.
+
+The quantized model is then exported to model/encoders/<model>/int8/, where the API
+loads it for the models listed in ENCODER_INT8_MODELS.
+
+Usage:
+```
+python -m src.misc.int8_drift --model <model_name> --type <dataset_type>
+```
+"""
+
+# pylint: disable=E0401, E0611
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.dataset_io import read_dataset  # pylint: disable=wrong-import-position  # noqa: E402
+from src.serving.dynamic_quantization import (  # pylint: disable=wrong-import-position  # noqa: E402
+    drift_report,
+    export_quantized_encoder,
+    quantize_dynamic_int8,
+    quantized_encoder_dir,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command-line arguments for the drift report.
+
+    Returns:
+        argparse.Namespace: Parsed arguments containing:
+            model (str): Name of the model to quantize
+            type (str): Dataset type ('anime' or 'manga')
+            sample (int): Number of synopses encoded
+            k (int): Number of neighbours compared per synopsis
+            batch_size (int): Encode batch size
+            seed (int): Seed used to sample the synopses
+            root (str): Directory that contains the models and datasets
+    """
+    parser = argparse.ArgumentParser(
+        description="Compare int8 quantized with float32 embeddings of a model."
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        required=True,
+        help="Name of the model. Fine-tunes are loaded from model/<name>.",
+    )
+    parser.add_argument(
+        "--type",
+        type=str,
+        choices=["anime", "manga"],
+        required=True,
+        help="Type of dataset: 'anime' or 'manga'.",
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=1000,
+        help="Number of synopses encoded (default: 1000).",
+    )
+    parser.add_argument(
+        "--k", type=int, default=10, help="Neighbours compared (default: 10)."
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=32, help="Encode batch size (default: 32)."
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the sample (default: 0)."
+    )
+    parser.add_argument(
+        "--root",
+        type=str,
+        default="model",
+        help="Directory that contains the models and datasets (default: model).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Print the drift of the int8 quantized model and export it.
+    """
+    # pylint: disable=import-outside-toplevel
+    from sentence_transformers import SentenceTransformer
+
+    # Registers the custom module type used by the fine-tuned T5 models
+    from custom_transformer import CustomT5EncoderModel  # noqa: F401  # pylint: disable=unused-import
+
+    args = parse_args()
+    df = read_dataset(
+        os.path.join(args.root, f"merged_{args.type}_dataset.csv"),
+        columns=["synopsis"],
+    )
+    synopses = df["synopsis"].dropna().astype(str)
+    synopses = synopses[synopses.str.strip() != ""]
+    sentences = synopses.sample(
+        n=min(args.sample, len(synopses)), random_state=args.seed
+    ).tolist()
+
+    local_path = os.path.join(args.root, args.model)
+    model = SentenceTransformer(
+        local_path if os.path.isdir(local_path) else args.model, device="cpu"
+    )
+    start = time.perf_counter()
+    reference = model.encode(sentences, batch_size=args.batch_size)
+    fp32_seconds = time.perf_counter() - start
+
+    quantize_dynamic_int8(model)
+    start = time.perf_counter()
+    quantized = model.encode(sentences, batch_size=args.batch_size)
+    int8_seconds = time.perf_counter() - start
+
+    report = drift_report(
+        np.asarray(reference, dtype=np.float32),
+        np.asarray(quantized, dtype=np.float32),
+        k=args.k,
+    )
+    print(f"Synopses: {len(sentences)}, dimension: {reference.shape[1]}")
+    print(
+        f"cosine: mean {report['mean_cosine']:.4f}, "
+        f"min {report['min_cosine']:.4f}, p1 {report['p1_cosine']:.4f}"
+    )
+    print(f"top-{args.k} overlap: {report['top_k_overlap']:.4f}")
+    print(f"encode: fp32 {fp32_seconds:.2f}s, int8 {int8_seconds:.2f}s")
+
+    directory = quantized_encoder_dir(args.root, args.model)
+    config = export_quantized_encoder(
+        model,
+        directory,
+        model_name=args.model,
+        drift={**report, "k": args.k, "sample": len(sentences)},
+    )
+    print(
+        f"Exported the int8 encoder of {args.model} to {directory} "
+        f"(max abs deviation from eager {config['max_abs_error']['torchscript']:.2e})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,9 @@ lengths when training or using these models.
 """
 
 from typing import List, Dict
-import pandas as pd
 from tqdm import tqdm
 from transformers import AutoTokenizer
+from src.dataset_io import read_dataset
 
 
 def calculate_max_tokens(
@@ -24,7 +24,8 @@ def calculate_max_tokens(
     Calculate the maximum token count for each model across specified synopsis columns in a dataset.
 
     Args:
-        dataset_path (str): Path to the CSV dataset file.
+        dataset_path (str): Path to the CSV dataset file (its Arrow IPC copy is read
+            instead when it exists).
         synopsis_columns (list): List of column names containing synopsis text to analyze.
         model_names (list): List of model names/paths to test for tokenization.
         batch_size (int, optional): Batch size for processing. Defaults to 64.
@@ -34,7 +35,7 @@ def calculate_max_tokens(
             Example: {'model-name': max_token_count}
     """
     # Load the dataset
-    df = pd.read_csv(dataset_path)
+    df = read_dataset(dataset_path, columns=synopsis_columns)
 
     # Dictionary to store the highest token count for each model
     model_max_token_counts = {}
@@ -0,0 +1,206 @@
+"""
+Report the recall of quantized search against exact float search.
+
+The script loads the fused search index of a model (persisted or built from the
+embeddings) and uses randomly chosen vectors of the index as queries. For every
+prefilter attached to the index (int8 codes and/or binary sign bits) it compares the
+top-k of exact float32 search with:
+
+    - the top-k by the prefilter alone, and
+    - the top-k after rescoring the prefilter's shortlist in float32,
+
+and prints the mean recall@k of both together with the size of the prefilter and
+the mean query latency.
+
+Usage:
+```
+python -m src.misc.quantization_recall --model <model_name> --type <dataset_type>
+```
+
+The embeddings must have been generated with `sbert.py --quantize int8`, or the
+search index saved with `--binary`.
+"""
+
+# pylint: disable=E0401, E0611
+import argparse
+import os
+import sys
+import time
+from typing import Callable, Dict
+
+import numpy as np
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.dataset_io import read_dataset  # pylint: disable=wrong-import-position  # noqa: E402
+from src.serving.embedding_store import EmbeddingStore, embeddings_path  # pylint: disable=wrong-import-position  # noqa: E402
+from src.serving.precision import to_float32  # pylint: disable=wrong-import-position  # noqa: E402
+from src.serving.search_index import (  # pylint: disable=wrong-import-position  # noqa: E402
+    SYNOPSIS_COLUMNS,
+    SearchIndex,
+    load_or_build_search_index,
+)
+from src.serving.topk import top_k_indices  # pylint: disable=wrong-import-position  # noqa: E402
+
+
+def prefilters(index: SearchIndex) -> Dict[str, Dict]:
+    """
+    Describe the prefilters attached to an index.
+
+    Args:
+        index (SearchIndex): Fused search index.
+
+    Returns:
+        Dict[str, Dict]: For every prefilter ('int8', 'binary'), a function scoring all
+        vectors for a query (higher is better), its rescore factor and its size.
+    """
+    found: Dict[str, Dict] = {}
+    if index.quantizer is not None and index.codes is not None:
+        quantizer, codes = index.quantizer, index.codes
+        found["int8"] = {
+            "scores": lambda query: quantizer.scores(codes, query),
+            "rescore_factor": index.rescore_factor,
+            "nbytes": codes.nbytes,
+        }
+    if index.binary is not None:
+        binary = index.binary
+        found["binary"] = {
+            "scores": lambda query: -binary.distances(query),
+            "rescore_factor": index.binary_rescore_factor,
+            "nbytes": binary.nbytes,
+        }
+    return found
+
+
+def recall_report(
+    index: SearchIndex, num_queries: int = 200, k: int = 10, seed: int = 0
+) -> Dict[str, Dict[str, float]]:
+    """
+    Measure the recall of every prefilter of an index against exact search.
+
+    Args:
+        index (SearchIndex): Index with int8 codes and/or a binary index attached.
+        num_queries (int): Number of index vectors used as queries.
+        k (int): Number of results compared per query.
+        seed (int): Seed used to pick the queries.
+
+    Returns:
+        Dict[str, Dict[str, float]]: For 'exact' and every prefilter, the mean latency
+        in milliseconds and the matrix size in MB; for the prefilters also the
+        recall@k of the prefilter ranking and of the rescored ranking.
+
+    Raises:
+        ValueError: If the index has no prefilter.
+    """
+    stages = prefilters(index)
+    if not stages:
+        raise ValueError("The search index has no int8 codes or binary index")
+    rng = np.random.default_rng(seed)
+    query_ids = rng.choice(index.size, size=min(num_queries, index.size), replace=False)
+
+    report: Dict[str, Dict[str, float]] = {
+        "exact": {"ms": 0.0, "mb": index.embeddings.nbytes / 2**20}
+    }
+    for name, stage in stages.items():
+        report[name] = {
+            "recall": 0.0,
+            "recall_rescored": 0.0,
+            "ms": 0.0,
+            "mb": stage["nbytes"] / 2**20,
+        }
+
+    for query_id in query_ids:
+        query = to_float32(index.embeddings[query_id], index.precision)
+        start = time.perf_counter()
+        exact = set(top_k_indices(index.scores(query), k).tolist())
+        report["exact"]["ms"] += time.perf_counter() - start
+
+        for name, stage in stages.items():
+            score: Callable[[np.ndarray], np.ndarray] = stage["scores"]
+            start = time.perf_counter()
+            approx = score(query)
+            shortlist = np.sort(top_k_indices(approx, k * stage["rescore_factor"]))
+            rescored = to_float32(index.embeddings[shortlist], index.precision) @ query
+            top = shortlist[top_k_indices(rescored, k)]
+            report[name]["ms"] += time.perf_counter() - start
+            report[name]["recall"] += len(
+                exact & set(top_k_indices(approx, k).tolist())
+            )
+            report[name]["recall_rescored"] += len(exact & set(top.tolist()))
+
+    for name, values in report.items():
+        values["ms"] = 1000 * values["ms"] / len(query_ids)
+        if name != "exact":
+            values["recall"] /= len(query_ids) * k
+            values["recall_rescored"] /= len(query_ids) * k
+    return report
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command-line arguments for the recall report.
+
+    Returns:
+        argparse.Namespace: Parsed arguments containing:
+            model (str): Name of the model whose embeddings are evaluated
+            type (str): Dataset type ('anime' or 'manga')
+            queries (int): Number of queries
+            k (int): Number of results compared per query
+    """
+    parser = argparse.ArgumentParser(
+        description="Compare quantized search with exact search."
+    )
+    parser.add_argument("--model", type=str, required=True, help="Model name.")
+    parser.add_argument(
+        "--type",
+        type=str,
+        choices=["anime", "manga"],
+        required=True,
+        help="Type of dataset: 'anime' or 'manga'.",
+    )
+    parser.add_argument(
+        "--queries", type=int, default=200, help="Number of queries (default: 200)."
+    )
+    parser.add_argument(
+        "--k", type=int, default=10, help="Results compared per query (default: 10)."
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Print the recall report for a model's quantized search index.
+    """
+    args = parse_args()
+    synopsis_columns = SYNOPSIS_COLUMNS[args.type]
+    df = read_dataset(f"model/merged_{args.type}_dataset.csv", columns=synopsis_columns)
+    store = EmbeddingStore(root="model")
+    dimension = next(
+        np.load(path, mmap_mode="r").shape[1]
+        for path in (
+            embeddings_path(store.root, args.type, args.model, col)
+            for col in synopsis_columns
+        )
+        if os.path.exists(path)
+    )
+    index = load_or_build_search_index(
+        store, df, args.type, args.model, synopsis_columns, dimension
+    )
+    report = recall_report(index, num_queries=args.queries, k=args.k)
+    print(f"Vectors: {index.size}, dimension: {index.dimension}")
+    print(
+        f"exact:  {report['exact']['ms']:.2f} ms/query, {report['exact']['mb']:.1f} MB"
+    )
+    for name, values in report.items():
+        if name == "exact":
+            continue
+        print(
+            f"{name}: recall@{args.k} {values['recall']:.4f}, "
+            f"rescored {values['recall_rescored']:.4f}, "
+            f"{values['ms']:.2f} ms/query, {values['mb']:.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
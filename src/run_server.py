@@ -3,20 +3,360 @@ Starts the Flask application using an appropriate server based on the operating
 
 The module accepts optional command line arguments:
     - First argument: Device type ('cuda' or 'cpu', defaults to 'cpu')
-    - Second argument: Number of workers/threads (positive integer, defaults to 4)
+    - Second argument: Number of workers/threads (positive integer, or 'auto' to
+      compute it from the cores, memory and model sizes; defaults to 'auto')
+    - --benchmark: Compare worker and thread plans on a query replay instead of
+      serving (Linux only)
 
 Server selection:
-    - Linux: Uses Gunicorn with specified number of worker processes
-    - Windows: Uses Waitress with specified number of threads
+    - Linux: Uses Gunicorn with specified number of worker processes, preloading the
+      application in the master and sharing search indexes between the workers. The
+      usable cores are divided between the workers (see serving.thread_plan), so
+      that their torch, OpenMP, MKL and BLAS thread pools do not oversubscribe the
+      machine
+    - Windows: Uses Waitress with specified number of threads, by default enough
+      for the searches admission control runs and queues
     - Other OS: Uses Flask's built-in development server
 
 The server runs on port 21493 and binds to all network interfaces (0.0.0.0).
 """
 
+# pylint: disable=E0401, E0611
+import argparse
+import contextlib
+import json
+import os
 import platform
+import shutil
 import subprocess
 import sys
-import os
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from serving.thread_plan import (  # pylint: disable=wrong-import-position  # noqa: E402
+    DEFAULT_MODEL_BYTES,
+    ThreadPlan,
+    admission_limits,
+    available_memory_bytes,
+    candidate_plans,
+    model_bytes,
+    plan_threads,
+    recommend,
+    replay,
+    request_threads,
+    usable_cores,
+    wait_until_ready,
+)
+from serving.warmup import parse_targets  # pylint: disable=wrong-import-position  # noqa: E402
+
+BENCHMARK_PORT = 21494
+BENCHMARK_LOG = "./logs/gunicorn_benchmark.log"
+
+
+def workers_argument(value: str) -> Optional[int]:
+    """
+    Parse the workers argument.
+
+    Args:
+        value (str): A positive integer or 'auto'.
+
+    Returns:
+        Optional[int]: The number of workers, or None for 'auto'.
+
+    Raises:
+        argparse.ArgumentTypeError: If the value is neither.
+    """
+    if value == "auto":
+        return None
+    try:
+        workers = int(value)
+        if workers < 1:
+            raise ValueError
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(
+            "Invalid threads argument. Use a positive integer or 'auto'."
+        ) from e
+    return workers
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command-line arguments for starting or benchmarking the server.
+
+    Returns:
+        argparse.Namespace: Parsed arguments containing:
+            device (str): Device type ('cuda' or 'cpu')
+            workers (Optional[int]): Number of workers/threads, None to compute it
+            benchmark (bool): Whether to benchmark plans instead of serving
+            replay (Optional[str]): JSON lines file with the queries to replay
+            model (Optional[str]): Model whose queries are sampled from the datasets
+            concurrency (Optional[int]): Number of concurrent benchmark clients
+            duration (float): Seconds every plan is measured for
+    """
+    parser = argparse.ArgumentParser(description="Start the AniSearch API server.")
+    parser.add_argument(
+        "device",
+        nargs="?",
+        type=str.lower,
+        choices=["cuda", "cpu"],
+        default="cpu",
+        help="Device to run the models on (default: cpu).",
+    )
+    parser.add_argument(
+        "workers",
+        nargs="?",
+        type=workers_argument,
+        default=None,
+        help=(
+            "Number of Gunicorn workers (Waitress threads on Windows), or 'auto' "
+            "(default) to compute it from the cores, memory and model sizes."
+        ),
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help=(
+            "Start the server with every candidate worker and thread plan, replay "
+            "queries against it and recommend the best plan."
+        ),
+    )
+    parser.add_argument(
+        "--replay",
+        type=str,
+        default=None,
+        help=(
+            "JSON lines file of queries to replay, each with 'type' ('anime' or "
+            "'manga'), 'model' and 'description'."
+        ),
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        default=None,
+        help="Without --replay, replay synopses of both datasets with this model.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help=(
+            "Concurrent benchmark clients (default: twice the usable cores, at "
+            "least the largest admission concurrency of the candidates)."
+        ),
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=30.0,
+        help="Seconds every plan is measured for (default: 30).",
+    )
+    return parser.parse_args()
+
+
+def make_plan(
+    device: str, workers: Optional[int], models: List[str]
+) -> Tuple[ThreadPlan, int, Optional[int]]:
+    """
+    Compute the worker and thread plan for this machine.
+
+    Args:
+        device (str): 'cpu' or 'cuda'.
+        workers (Optional[int]): Requested number of workers, None to compute it.
+        models (List[str]): Models every worker keeps loaded.
+
+    Returns:
+        Tuple[ThreadPlan, int, Optional[int]]: The plan, the usable cores and the
+        total size of the models of a worker (None if no models are configured).
+    """
+    total = None
+    if models:
+        total = sum(model_bytes(name) or DEFAULT_MODEL_BYTES for name in models)
+    cores = usable_cores()
+    plan = plan_threads(cores, total, available_memory_bytes(), device, workers)
+    return plan, cores, total
+
+
+@contextlib.contextmanager
+def shared_directories() -> Iterator[Dict[str, str]]:
+    """
+    Create the shared directories of a Gunicorn server and remove them afterwards.
+
+    Yields:
+        Dict[str, str]: SHARED_SEGMENTS_DIR, the directory in which search indexes
+        built in memory are published once and mapped by every worker, and
+        PROMETHEUS_MULTIPROC_DIR, in which every worker writes its metric values so
+        that a scrape of any worker aggregates them.
+    """
+    shm = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    segments_dir = tempfile.mkdtemp(prefix="anisearch-", dir=shm)
+    metrics_dir = tempfile.mkdtemp(prefix="anisearch-metrics-", dir=shm)
+    try:
+        yield {
+            "SHARED_SEGMENTS_DIR": segments_dir,
+            "PROMETHEUS_MULTIPROC_DIR": metrics_dir,
+        }
+    finally:
+        shutil.rmtree(segments_dir, ignore_errors=True)
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def gunicorn_command(
+    plan: ThreadPlan, bind: str, access_log: Optional[str], error_log: str
+) -> List[str]:
+    """
+    Build the Gunicorn command line of a plan.
+
+    Args:
+        plan (ThreadPlan): Worker and thread plan.
+        bind (str): Address to bind to.
+        access_log (Optional[str]): Access log file, None for no access log.
+        error_log (str): Error log file.
+
+    Returns:
+        List[str]: The command.
+    """
+    command = [
+        "gunicorn",
+        "-c",
+        os.path.join(os.path.dirname(__file__), "gunicorn_config.py"),
+        *plan.gunicorn_args(),
+        "-b",
+        bind,
+        "--preload",
+    ]
+    if access_log is not None:
+        command += ["--access-logfile", access_log]
+    return command + ["--error-logfile", error_log, "src.api:app"]
+
+
+def load_queries(replay_path: Optional[str], model: Optional[str]) -> List[Dict]:
+    """
+    Load the queries of a benchmark.
+
+    Args:
+        replay_path (Optional[str]): JSON lines file of queries.
+        model (Optional[str]): Model whose queries are sampled from the synopses of
+            the merged datasets when no file is given.
+
+    Returns:
+        List[Dict]: Queries with 'type', 'model' and 'description'.
+
+    Raises:
+        ValueError: If neither is given, the file has no queries or a query is
+            incomplete.
+    """
+    if replay_path is not None:
+        with open(replay_path, "r", encoding="utf-8") as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+    elif model is not None:
+        # Imported here so that serving does not load the datasets twice
+        from dataset_io import read_dataset  # pylint: disable=import-outside-toplevel
+
+        queries = []
+        for dataset_type in ("anime", "manga"):
+            df = read_dataset(
+                f"model/merged_{dataset_type}_dataset.csv", columns=["synopsis"]
+            )
+            synopses = df["synopsis"].dropna().astype(str)
+            for synopsis in synopses.sample(n=min(200, len(synopses)), random_state=0):
+                queries.append(
+                    {"type": dataset_type, "model": model, "description": synopsis}
+                )
+    else:
+        raise ValueError("The benchmark needs --replay or --model")
+    if not queries:
+        raise ValueError("No queries to replay")
+    for query in queries:
+        if query.get("type") not in ("anime", "manga") or not (
+            query.get("model") and query.get("description")
+        ):
+            raise ValueError(f"Invalid query to replay: {query}")
+    return queries
+
+
+def benchmark(args: argparse.Namespace) -> None:
+    """
+    Measure every candidate plan on a query replay and print the recommended one.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line arguments.
+    """
+    queries = load_queries(args.replay, args.model)
+    models = sorted({query["model"] for query in queries})
+    # Every worker warms up the replayed models before it reports ready
+    warmup_models = ",".join(
+        sorted({f"{query['model']}:{query['type']}" for query in queries})
+    )
+    plan, cores, total = make_plan(args.device, None, models)
+    plans = candidate_plans(cores, total, available_memory_bytes(), args.device)
+    # Enough clients for the largest admission concurrency to form full batches
+    concurrency = args.concurrency or max(
+        2 * cores, max(candidate.max_concurrent for candidate in plans)
+    )
+    base_url = f"http://127.0.0.1:{BENCHMARK_PORT}"
+    print(
+        f"Benchmarking {len(plans)} plans on {cores} cores with {len(queries)} "
+        f"queries, {concurrency} clients, {args.duration:.0f}s each "
+        f"(computed plan: {plan})."
+    )
+
+    results: List[Dict[str, Any]] = []
+    for candidate in plans:
+        with shared_directories() as directories:
+            env = {
+                **os.environ,
+                **directories,
+                **candidate.env(),
+                "DEVICE": args.device,
+                "WARMUP_MODELS": warmup_models,
+                # Every client has the same address
+                "RATELIMIT_ENABLED": "0",
+            }
+            command = gunicorn_command(
+                candidate, f"127.0.0.1:{BENCHMARK_PORT}", None, BENCHMARK_LOG
+            )
+            with open(BENCHMARK_LOG, "a", encoding="utf-8") as log:
+                server = subprocess.Popen(  # pylint: disable=consider-using-with
+                    command, env=env, stdout=log, stderr=subprocess.STDOUT
+                )
+                try:
+                    wait_until_ready(base_url, candidate.workers, server.poll)
+                    result = replay(base_url, queries, concurrency, args.duration)
+                except RuntimeError as e:
+                    # A plan that does not start (e.g. out of memory) is skipped,
+                    # the sweep goes on with the next one
+                    print(f"{candidate}: failed to start: {e}")
+                    results.append(
+                        {
+                            "ok": 0,
+                            "shed": 0,
+                            "errors": 0,
+                            "throughput": 0.0,
+                            "p50_ms": None,
+                            "p99_ms": None,
+                        }
+                    )
+                    continue
+                finally:
+                    server.terminate()
+                    server.wait(timeout=60)
+        results.append(result)
+        p99 = "-" if result["p99_ms"] is None else f"{result['p99_ms']:.1f}"
+        p50 = "-" if result["p50_ms"] is None else f"{result['p50_ms']:.1f}"
+        print(
+            f"{candidate}: {result['throughput']:.1f} req/s, p50 {p50} ms, "
+            f"p99 {p99} ms, shed {result['shed']}, errors {result['errors']}"
+        )
+
+    best = plans[recommend(results)]
+    print(f"Recommended: {best}")
+    print(
+        f"Start it with: ADMISSION_MAX_CONCURRENT={best.max_concurrent} "
+        f"python src/run_server.py {args.device} {best.workers}"
+    )
 
 
 def run_server() -> None:
@@ -25,9 +365,12 @@ def run_server() -> None:
 
     Command line arguments:
 
-        argv[1]: Device type ('cuda' or 'cpu', defaults to 'cpu')
+        device: Device type ('cuda' or 'cpu', defaults to 'cpu')
+
+        workers: Number of workers/threads (positive integer or 'auto', the default)
 
-        argv[2]: Number of workers/threads (positive integer, defaults to 4)
+        --benchmark: Compare worker and thread plans instead of serving (see
+        benchmark)
 
     Environment variables set:
 
@@ -36,62 +379,66 @@ def run_server() -> None:
     Server configuration:
 
     Linux: Gunicorn
-        - Workers: Specified by argv[2]
+        - Workers: Specified by the workers argument, or computed from the usable
+          cores, the available memory and the size of the models in WARMUP_MODELS
+        - Threads: The cores are divided between the workers; TORCH_NUM_THREADS,
+          TORCH_INTEROP_THREADS, OMP_NUM_THREADS, MKL_NUM_THREADS and the other
+          thread limits are set accordingly, and every worker runs a gthread
+          request thread for every search admission control runs or queues (plus
+          spare ones), whose queries are micro-batched together
+        - Preload: src.api is imported once by the master and the workers are forked
+          from it, sharing its memory copy-on-write
+        - Shared segments: a fresh directory under /dev/shm, passed as
+          SHARED_SEGMENTS_DIR and removed when the server exits
+        - Metrics: a fresh directory under /dev/shm, passed as
+          PROMETHEUS_MULTIPROC_DIR so /metrics aggregates all workers, with the
+          hooks of src/gunicorn_config.py; removed when the server exits
         - Logs: ./logs/gunicorn_access.log and gunicorn_error.log
         - Binds to: 0.0.0.0:21493
 
     Windows: Waitress
-        - Threads: Specified by argv[2]
+        - Threads: Specified by the workers argument, by default
+          ADMISSION_MAX_CONCURRENT + ADMISSION_MAX_QUEUE plus spare threads
         - Port: 21493
 
         Other OS: Flask development server
     """
     os_type: str = platform.system()
-
-    # Check for device argument
-    if len(sys.argv) > 1:
-        device = sys.argv[1].lower()
-        if device not in ["cuda", "cpu"]:
-            print("Invalid device argument. Use 'cuda' or 'cpu'.")
-            sys.exit(1)
-    else:
-        device = "cpu"  # Default to CPU if no argument is provided
-
-    # Check for threads argument
-    if len(sys.argv) > 2:
-        try:
-            threads = int(sys.argv[2])
-            if threads < 1:
-                raise ValueError
-        except ValueError:
-            print("Invalid threads argument. Use a positive integer.")
-            sys.exit(1)
-    else:
-        threads = 4  # Default to 4 threads if no argument is provided
+    args = parse_args()
 
     # Set the device as an environment variable
-    os.environ["DEVICE"] = device
+    os.environ["DEVICE"] = args.device
 
-    if os_type == "Linux":
+    if args.benchmark:
+        if os_type != "Linux":
+            print("The benchmark needs Gunicorn and only runs on Linux.")
+            sys.exit(1)
+        benchmark(args)
+    elif os_type == "Linux":
         # Use Gunicorn on Linux
-        print(f"Running on Linux. Starting Gunicorn server with {threads} workers.")
-        subprocess.run(
-            [
-                "gunicorn",
-                "-w",
-                str(threads),
-                "-b",
-                "0.0.0.0:21493",
-                "--access-logfile",
-                "./logs/gunicorn_access.log",
-                "--error-logfile",
-                "./logs/gunicorn_error.log",
-                "src.api:app",
-            ],
-            check=True,
+        models = list(
+            dict.fromkeys(name for name, _ in parse_targets(os.getenv("WARMUP_MODELS")))
+        )
+        plan, cores, _ = make_plan(args.device, args.workers, models)
+        print(
+            f"Running on Linux. Starting Gunicorn server with {plan} on {cores} cores."
         )
+        os.environ.update(plan.env())
+        with shared_directories() as directories:
+            os.environ.update(directories)
+            subprocess.run(
+                gunicorn_command(
+                    plan,
+                    "0.0.0.0:21493",
+                    "./logs/gunicorn_access.log",
+                    "./logs/gunicorn_error.log",
+                ),
+                check=True,
+            )
     elif os_type == "Windows":
         # Use Waitress on Windows
+        # Enough threads for the searches admission control runs and queues
+        threads = args.workers or request_threads(*admission_limits())
         print(f"Running on Windows. Starting Waitress server with {threads} threads.")
         subprocess.run(
             ["waitress-serve", "--port=21493", f"--threads={threads}", "src.api:app"],
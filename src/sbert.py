@@ -10,10 +10,16 @@ Key Features:
     - Automatic device selection (CPU/CUDA) with optimized batch sizes
     - Preprocessing of text data before embedding generation
     - Batched processing for memory efficiency
+    - Optional L2-normalization of the stored embeddings
+    - Optional int8 scalar-quantized copies with per-dimension calibration ranges,
+      saved together with a persisted fused search index
+    - Optional float16 or bfloat16 storage of the embeddings
+    - Optional dynamic int8 quantization of the model's Linear layers on the CPU
     - Comprehensive evaluation data recording
     - Support for both pre-trained and fine-tuned models
 
-The embeddings are saved in separate directories based on the dataset type and model used.
+The embeddings are saved in separate directories based on the dataset type and model used,
+together with a manifest.json describing how they were stored.
 Performance metrics and model information are also recorded for evaluation purposes.
 """
 
@@ -37,6 +43,23 @@ os.environ["CUDA_LAUNCH_BLOCKING"] = "1"
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from src import common  # pylint: disable=wrong-import-position
+from src.serving.manifest import write_manifest  # pylint: disable=wrong-import-position
+from src.serving.precision import (  # pylint: disable=wrong-import-position
+    PRECISIONS,
+    float32_rows,
+    to_storage,
+)
+from src.serving.quantization import (  # pylint: disable=wrong-import-position
+    Int8Quantizer,
+    quantized_embeddings_path,
+)
+from src.serving.dynamic_quantization import (  # pylint: disable=wrong-import-position
+    quantize_dynamic_int8,
+)
+from src.serving.search_index import (  # pylint: disable=wrong-import-position
+    SYNOPSIS_COLUMNS,
+    save_search_index,
+)
 
 
 # Suppress specific warnings
@@ -74,6 +97,10 @@ def parse_args() -> argparse.Namespace:
         argparse.Namespace: Parsed arguments containing:
             model (str): Name or path of SBERT model to use
             type (str): Dataset type ('anime' or 'manga')
+            normalize (bool): Whether to L2-normalize the stored embeddings
+            quantize (Optional[str]): Quantized format to emit next to the embeddings
+            precision (str): Storage precision of the embeddings ('fp32', 'fp16' or 'bf16')
+            int8 (bool): Whether to encode with int8 quantized Linear layers on the CPU
     """
     parser = argparse.ArgumentParser(
         description="Generate SBERT embeddings for anime or manga dataset."
@@ -91,6 +118,40 @@ def parse_args() -> argparse.Namespace:
         required=True,
         help="Type of dataset to generate embeddings for: 'anime' or 'manga'.",
     )
+    parser.add_argument(
+        "--normalize",
+        action="store_true",
+        help="L2-normalize the embeddings so the API can score them with a dot product.",
+    )
+    parser.add_argument(
+        "--quantize",
+        type=str,
+        choices=["int8"],
+        default=None,
+        help=(
+            "Also save int8 scalar-quantized copies of the (L2-normalized) embeddings "
+            "with per-dimension calibration ranges, searched by the API before "
+            "rescoring against the float embeddings."
+        ),
+    )
+    parser.add_argument(
+        "--precision",
+        type=str,
+        choices=PRECISIONS,
+        default="fp32",
+        help=(
+            "Storage precision of the embeddings. fp16 and bf16 halve the size of the "
+            "files; bf16 is stored as the upper 16 bits of float32 in uint16 arrays."
+        ),
+    )
+    parser.add_argument(
+        "--int8",
+        action="store_true",
+        help=(
+            "Quantize the Linear layers of the model to int8 (dynamic quantization) "
+            "and encode on the CPU."
+        ),
+    )
     return parser.parse_args()
 
 
@@ -102,6 +163,8 @@ def get_sbert_embeddings(
     column_name: str,
     model_name: str,
     device: str,
+    normalize: bool = False,
+    precision: str = "fp32",
 ) -> np.ndarray:
     """
     Generate SBERT embeddings for text data using batched processing.
@@ -116,9 +179,12 @@ def get_sbert_embeddings(
         column_name: Name of column containing text data
         model_name: Name/identifier of the SBERT model
         device: Computation device ('cpu' or 'cuda')
+        normalize: Whether to L2-normalize each embedding
+        precision: Storage precision each batch is converted to ('fp32', 'fp16' or 'bf16')
 
     Returns:
-        numpy.ndarray: Matrix of embeddings where each row corresponds to a text input
+        numpy.ndarray: Matrix of embeddings where each row corresponds to a text input,
+        in the storage dtype of the precision
     """
     embeddings_list = []
     for i in tqdm(
@@ -135,15 +201,21 @@ def get_sbert_embeddings(
                 with torch.no_grad():
                     with torch.amp.autocast("cuda"):  # type: ignore
                         batch_embeddings = sbert_model.encode(
-                            batch_texts, convert_to_numpy=True, show_progress_bar=False
+                            batch_texts,
+                            convert_to_numpy=True,
+                            show_progress_bar=False,
+                            normalize_embeddings=normalize,
                         )
             else:
                 # Standard encoding for other models
                 with torch.no_grad():
                     batch_embeddings = sbert_model.encode(
-                        batch_texts, convert_to_numpy=True, show_progress_bar=False
+                        batch_texts,
+                        convert_to_numpy=True,
+                        show_progress_bar=False,
+                        normalize_embeddings=normalize,
                     )
-            embeddings_list.append(batch_embeddings)
+            embeddings_list.append(to_storage(batch_embeddings, precision))
     torch.cuda.empty_cache()
     if embeddings_list:
         return np.vstack(embeddings_list)
@@ -165,15 +237,15 @@ def main() -> None:
 
     4. Generate embeddings for each text column in batches
 
-    5. Save embeddings and evaluation data to disk
+    5. Save embeddings, their manifest and evaluation data to disk
 
     The function handles device selection, batch size optimization, and memory management
     based on the model and available hardware.
     """
     args = parse_args()
 
-    # Determine device
-    device = "cuda" if torch.cuda.is_available() else "cpu"
+    # Determine device (quantized int8 kernels only run on the CPU)
+    device = "cuda" if torch.cuda.is_available() and not args.int8 else "cpu"
     print(f"Device: {device}")
 
     # Parameters
@@ -183,32 +255,17 @@ def main() -> None:
     # Load the merged dataset based on type
     if dataset_type == "anime":
         dataset_path = "model/merged_anime_dataset.csv"
-        synopsis_columns = [
-            "synopsis",
-            "Synopsis anime_dataset_2023",
-            "Synopsis animes dataset",
-            "Synopsis anime_270 Dataset",
-            "Synopsis Anime-2022 Dataset",
-            "Synopsis anime4500 Dataset",
-            "Synopsis wykonos Dataset",
-            "Synopsis Anime_data Dataset",
-            "Synopsis anime2 Dataset",
-            "Synopsis mal_anime Dataset",
-        ]
+        synopsis_columns = SYNOPSIS_COLUMNS["anime"]
         embeddings_save_dir = f"model/anime/{model_name.split('/')[-1]}"
     elif dataset_type == "manga":
         dataset_path = "model/merged_manga_dataset.csv"
-        synopsis_columns = [
-            "synopsis",
-            "Synopsis jikan Dataset",
-            "Synopsis data Dataset",
-        ]
+        synopsis_columns = SYNOPSIS_COLUMNS["manga"]
         embeddings_save_dir = f"model/manga/{model_name.split('/')[-1]}"
     else:
         raise ValueError("Invalid dataset type specified. Use 'anime' or 'manga'.")
 
     # Load the merged dataset
-    df = common.load_dataset(dataset_path)
+    df = common.load_dataset(dataset_path, columns=synopsis_columns)
 
     # Preprocess each synopsis or description column
     for col in synopsis_columns:
@@ -328,15 +385,26 @@ def main() -> None:
         1
     ].word_embedding_dimension = word_embedding_model.get_word_embedding_dimension()  # type: ignore
 
+    if args.int8:
+        quantize_dynamic_int8(model)
+
     print(model)
 
     # Measure the time taken to generate embeddings for each column
     start_time = time.time()
     total_num_embeddings = 0
+    saved_paths = []
     for col in synopsis_columns:
         processed_col = f"Processed_{col}"
         embeddings = get_sbert_embeddings(
-            df, model, batch_size, processed_col, model_name, device
+            df,
+            model,
+            batch_size,
+            processed_col,
+            model_name,
+            device,
+            args.normalize,
+            args.precision,
         )
 
         # Save the embeddings for the current column
@@ -345,6 +413,7 @@ def main() -> None:
                 embeddings_save_dir, f"embeddings_{col.replace(' ', '_')}.npy"
             )
             np.save(save_path, embeddings)
+            saved_paths.append(save_path)
             total_num_embeddings += embeddings.shape[0]
 
             # Clear memory
@@ -358,6 +427,42 @@ def main() -> None:
     end_time = time.time()
     embedding_generation_time = end_time - start_time
 
+    # Quantize every column with ranges calibrated over all columns, so that the
+    # codes of all columns can be searched together
+    if args.quantize == "int8" and saved_paths:
+        quantizer = Int8Quantizer.calibrate(
+            float32_rows(np.load(path, mmap_mode="r"), args.precision)
+            for path in saved_paths
+        )
+        quantizer.save(embeddings_save_dir)
+        for path in saved_paths:
+            np.save(
+                quantized_embeddings_path(path),
+                quantizer.encode(
+                    float32_rows(np.load(path, mmap_mode="r"), args.precision)
+                ),
+            )
+
+    # Describe how the embeddings were stored so the API can skip redundant work
+    write_manifest(
+        embeddings_save_dir,
+        {
+            "model_name": model_name,
+            "dataset_type": dataset_type,
+            "dimension": model.get_sentence_embedding_dimension(),
+            "columns": synopsis_columns,
+            "normalized": args.normalize,
+            "quantization": args.quantize,
+            "precision": args.precision,
+            "encoder_quantization": "int8" if args.int8 else None,
+        },
+    )
+
+    # Persist the fused index with the int8 codes, so that the API memory-maps the
+    # float32 matrix for rescoring instead of concatenating it in memory
+    if args.quantize == "int8" and saved_paths:
+        save_search_index("model", dataset_type, args.model, df, synopsis_columns)
+
     # Prepare evaluation data
     additional_info: Dict[str, Any] = {
         "dataset_info": {
@@ -377,6 +482,9 @@ def main() -> None:
         "timing": {"embedding_generation_time": embedding_generation_time},
         "type": dataset_type,
         "device": device,
+        "normalized": args.normalize,
+        "quantization": args.quantize,
+        "precision": args.precision,
     }
 
     # Save evaluation data
@@ -0,0 +1,227 @@
+"""
+Admission control that bounds the searches a worker runs and queues at once.
+
+Without it, every request accepted by a worker starts right away, so a burst (or
+a multi-second model load) makes all of them slow, and those that arrive late wait
+until they time out. The AdmissionController lets at most max_concurrent searches
+run at the same time and queues up to max_queue more in arrival order. A request is
+shed immediately, with an estimate of when to retry, when:
+
+    - The queue is full
+    - Its predicted wait exceeds the deadline. The wait is predicted from its queue
+      position and a moving average of the service time of finished searches
+    - It is still queued when the deadline has passed
+
+Key Features:
+    - Concurrency limit with a bounded first-in, first-out queue
+    - Deadline-based load shedding with a Retry-After estimate
+    - Queue depth, in-flight count, admitted and shed counts per reason, and a
+      histogram of the time spent queued
+"""
+
+# pylint: disable=E0401, E0611
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from serving.batcher import Histogram  # pylint: disable=wrong-import-position  # noqa: E402
+
+QUEUE_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request is shed instead of admitted.
+
+    Attributes:
+        reason (str): 'queue_full', 'deadline' or 'timeout'.
+        retry_after (int): Seconds after which the client should retry.
+    """
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Request shed ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """
+    Admission of a single request, released exactly once.
+
+    Attributes:
+        admitted_at (float): Monotonic time at which the request started running.
+        released (bool): Whether the slot of the request was given back.
+    """
+
+    def __init__(self, admitted_at: float):
+        self.admitted_at = admitted_at
+        self.released = False
+
+
+class AdmissionController:
+    """
+    Bounds concurrent requests, queues a limited number and sheds the rest.
+
+    Attributes:
+        max_concurrent (int): Maximum number of requests running at the same time.
+        max_queue (int): Maximum number of requests waiting for a slot.
+        deadline (Optional[float]): Maximum seconds a request may wait for a slot,
+            or None to wait for as long as the queue takes.
+        smoothing (float): Weight of the latest service time in its moving average.
+        service_time (Optional[float]): Moving average of the seconds a request
+            holds its slot, or None before the first request finished.
+        queue_wait (Histogram): Seconds spent queued by admitted requests.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        max_queue: int = 16,
+        deadline: Optional[float] = 10.0,
+        initial_service_time: Optional[float] = None,
+        smoothing: float = 0.2,
+    ):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max(max_queue, 0)
+        self.deadline = deadline
+        self.smoothing = smoothing
+        self.service_time = initial_service_time
+        self.queue_wait = Histogram(QUEUE_WAIT_BUCKETS)
+        self._condition = threading.Condition()
+        self._waiting: Deque[object] = deque()
+        self._in_flight = 0
+        self.admitted = 0
+        self.shed: Dict[str, int] = {}
+
+    def predicted_wait(self, position: int) -> float:
+        """
+        Predict the seconds a request waits at a queue position.
+
+        Args:
+            position (int): Number of queued requests up to and including it.
+
+        Returns:
+            float: Predicted wait, or 0.0 before any service time was measured.
+        """
+        if self.service_time is None:
+            return 0.0
+        return math.ceil(position / self.max_concurrent) * self.service_time
+
+    def acquire(self) -> Ticket:
+        """
+        Wait for a slot, or shed the request.
+
+        Returns:
+            Ticket: Admission to hand to release once the request has finished.
+
+        Raises:
+            Overloaded: If the queue is full, the predicted wait exceeds the
+                deadline or the deadline passed while queued.
+        """
+        with self._condition:
+            start = time.monotonic()
+            if self._in_flight < self.max_concurrent and not self._waiting:
+                return self._admit(start)
+
+            position = len(self._waiting) + 1
+            if position > self.max_queue:
+                raise self._shed("queue_full", position)
+            if (
+                self.deadline is not None
+                and self.predicted_wait(position) > self.deadline
+            ):
+                raise self._shed("deadline", position)
+
+            marker = object()
+            self._waiting.append(marker)
+            try:
+                while not (
+                    self._waiting[0] is marker and self._in_flight < self.max_concurrent
+                ):
+                    remaining = (
+                        None
+                        if self.deadline is None
+                        else start + self.deadline - time.monotonic()
+                    )
+                    if remaining is not None and remaining <= 0:
+                        raise self._shed("timeout", self._waiting.index(marker) + 1)
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting.remove(marker)
+                # The next request in line may be able to run now
+                self._condition.notify_all()
+            return self._admit(start)
+
+    def release(self, ticket: Ticket) -> None:
+        """
+        Give back the slot of a request and update the service time estimate.
+
+        Args:
+            ticket (Ticket): Admission returned by acquire. Releasing it again has
+                no effect.
+        """
+        with self._condition:
+            if ticket.released:
+                return
+            ticket.released = True
+            self._in_flight -= 1
+            elapsed = time.monotonic() - ticket.admitted_at
+            self.service_time = (
+                elapsed
+                if self.service_time is None
+                else self.smoothing * elapsed + (1 - self.smoothing) * self.service_time
+            )
+            self._condition.notify_all()
+
+    def queue_depth(self) -> int:
+        """
+        Return the number of requests waiting for a slot.
+
+        Returns:
+            int: Queued requests.
+        """
+        with self._condition:
+            return len(self._waiting)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the configuration and counters of the controller.
+
+        Returns:
+            Dict[str, Any]: Limits, requests in flight and queued, admitted and shed
+            counts (per reason), the service time estimate and the queue-wait
+            histogram.
+        """
+        with self._condition:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "deadline": self.deadline,
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._waiting),
+                "admitted": self.admitted,
+                "shed": dict(self.shed),
+                "service_time": self.service_time,
+                "queue_wait": self.queue_wait.snapshot(),
+            }
+
+    def _admit(self, start: float) -> Ticket:
+        now = time.monotonic()
+        self._in_flight += 1
+        self.admitted += 1
+        self.queue_wait.observe(now - start)
+        return Ticket(now)
+
+    def _shed(self, reason: str, position: int) -> Overloaded:
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        retry_after = max(1, math.ceil(self.predicted_wait(position)))
+        return Overloaded(reason, retry_after)
@@ -0,0 +1,255 @@
+"""
+Inverted-file (IVF) approximate nearest-neighbour index for the fused search index.
+
+Exact search scores every vector of the fused index, so its cost grows linearly with
+the catalogue. The IVF index partitions the L2-normalized vectors into lists with a
+spherical k-means coarse quantizer. A query is compared with the list centroids
+first, and only the vectors of the nprobe closest lists are scored exactly.
+
+Key Features:
+    - Pure NumPy spherical k-means, trained on a sample and assigned in blocks
+    - Lists stored as one permutation array plus offsets, memory-mapped at load time
+    - Per-query nprobe, with a default stored alongside the index
+    - Persisted next to the fused index it was built from, see search_index.py
+
+The index only produces candidate vector ids; scoring, deduplication and the
+fallback to exact search for small corpora are handled by SearchIndex.
+"""
+
+import json
+import math
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+# Indexes with fewer vectors than this are searched exactly even if an IVF index exists
+EXACT_SEARCH_THRESHOLD = 50_000
+
+_ASSIGN_BLOCK_SIZE = 65_536
+
+
+def default_num_lists(num_vectors: int) -> int:
+    """
+    Return the default number of IVF lists for an index size (about 4 * sqrt(N)).
+
+    Args:
+        num_vectors (int): Number of vectors in the index.
+
+    Returns:
+        int: Number of lists, at least 1 and at most num_vectors.
+    """
+    return max(1, min(num_vectors, int(4 * math.sqrt(num_vectors))))
+
+
+def default_nprobe(num_lists: int) -> int:
+    """
+    Return the default number of lists probed per query.
+
+    Args:
+        num_lists (int): Number of lists in the index.
+
+    Returns:
+        int: Number of lists to probe.
+    """
+    return min(num_lists, max(8, num_lists // 32))
+
+
+def assign_to_centroids(embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Assign every vector to the centroid with the highest dot product.
+
+    The vectors are processed in blocks so that memory-mapped matrices are never
+    copied into memory as a whole.
+
+    Args:
+        embeddings (np.ndarray): Matrix of shape (vectors, dimension).
+        centroids (np.ndarray): Matrix of shape (lists, dimension).
+
+    Returns:
+        np.ndarray: int32 list id of every vector.
+    """
+    assignments = np.empty(embeddings.shape[0], dtype=np.int32)
+    for start in range(0, embeddings.shape[0], _ASSIGN_BLOCK_SIZE):
+        block = np.asarray(
+            embeddings[start : start + _ASSIGN_BLOCK_SIZE], dtype=np.float32
+        )
+        assignments[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(
+    embeddings: np.ndarray,
+    num_lists: int,
+    iterations: int = 10,
+    sample_size: Optional[int] = None,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Train unit-length centroids for L2-normalized vectors.
+
+    Args:
+        embeddings (np.ndarray): L2-normalized matrix of shape (vectors, dimension).
+        num_lists (int): Number of centroids.
+        iterations (int): Number of k-means iterations.
+        sample_size (Optional[int]): Number of vectors to train on (default: 256 per
+            list). All vectors are used if the index is smaller.
+        seed (int): Seed of the random sample and initialization.
+
+    Returns:
+        np.ndarray: float32 centroids of shape (num_lists, dimension).
+    """
+    rng = np.random.default_rng(seed)
+    n = embeddings.shape[0]
+    sample_size = min(n, sample_size or 256 * num_lists)
+    sample_ids = np.sort(rng.choice(n, size=sample_size, replace=False))
+    sample = np.asarray(embeddings[sample_ids], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, size=num_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = assign_to_centroids(sample, centroids)
+        counts = np.bincount(assignments, minlength=num_lists)
+        empty = counts == 0
+        # Sum the members of every list with one reduceat over the sorted sample
+        starts = (np.cumsum(counts) - counts)[~empty]
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(
+            sample[np.argsort(assignments, kind="stable")], starts, axis=0
+        )
+        if empty.any():
+            # Restart empty lists from random sample vectors
+            sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Coarse quantizer mapping a query to candidate vectors of the fused index.
+
+    Attributes:
+        centroids (np.ndarray): Unit-length list centroids of shape (lists, dimension).
+        order (np.ndarray): Vector ids grouped by list (int32).
+        offsets (np.ndarray): Start of every list in order, plus the total (int64).
+        nprobe (int): Default number of lists probed per query.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        order: np.ndarray,
+        offsets: np.ndarray,
+        nprobe: Optional[int] = None,
+    ):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe or default_nprobe(self.num_lists)
+
+    @property
+    def num_lists(self) -> int:
+        """int: Number of lists in the index."""
+        return int(self.centroids.shape[0])
+
+    @property
+    def size(self) -> int:
+        """int: Number of vectors covered by the index."""
+        return int(self.order.shape[0])
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        num_lists: Optional[int] = None,
+        iterations: int = 10,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """
+        Train the coarse quantizer and assign every vector to a list.
+
+        Args:
+            embeddings (np.ndarray): L2-normalized matrix of shape (vectors, dimension).
+            num_lists (Optional[int]): Number of lists (default: about 4 * sqrt(N)).
+            iterations (int): Number of k-means iterations.
+            seed (int): Seed of the k-means sample and initialization.
+
+        Returns:
+            IVFIndex: The built index.
+        """
+        num_lists = min(
+            embeddings.shape[0], num_lists or default_num_lists(embeddings.shape[0])
+        )
+        centroids = spherical_kmeans(embeddings, num_lists, iterations, seed=seed)
+        assignments = assign_to_centroids(embeddings, centroids)
+        order = np.argsort(assignments, kind="stable").astype(np.int32)
+        offsets = np.zeros(num_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=num_lists), out=offsets[1:])
+        return cls(centroids, order, offsets)
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """
+        Return the ids of the vectors in the lists closest to a query.
+
+        Args:
+            query (np.ndarray): L2-normalized query vector of shape (dimension,).
+            nprobe (Optional[int]): Number of lists to probe (default: self.nprobe).
+
+        Returns:
+            np.ndarray: Sorted vector ids of the probed lists.
+        """
+        nprobe = min(self.num_lists, nprobe or self.nprobe)
+        centroid_scores = self.centroids @ query
+        if nprobe < self.num_lists:
+            lists = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            lists = np.arange(self.num_lists)
+        ids = [self.order[self.offsets[i] : self.offsets[i + 1]] for i in lists]
+        # Sorted ids give sequential reads of memory-mapped embeddings
+        return np.sort(np.concatenate(ids))
+
+    def save(self, directory: str) -> None:
+        """
+        Persist the index next to the fused search index it was built from.
+
+        Args:
+            directory (str): Directory of the fused search index.
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "ivf_centroids.npy"), self.centroids)
+        np.save(os.path.join(directory, "ivf_order.npy"), self.order)
+        np.save(os.path.join(directory, "ivf_offsets.npy"), self.offsets)
+        with open(os.path.join(directory, "ivf.json"), "w", encoding="utf-8") as f:
+            json.dump(self.metadata(), f, indent=4)
+
+    def metadata(self) -> Dict[str, int]:
+        """
+        Return the settings stored with the index.
+
+        Returns:
+            Dict[str, int]: Number of lists, default nprobe and number of vectors.
+        """
+        return {"lists": self.num_lists, "nprobe": self.nprobe, "vectors": self.size}
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["IVFIndex"]:
+        """
+        Memory-map a persisted index.
+
+        Args:
+            directory (str): Directory of the fused search index.
+
+        Returns:
+            Optional[IVFIndex]: The loaded index, or None if none was persisted.
+        """
+        metadata_path = os.path.join(directory, "ivf.json")
+        if not os.path.exists(metadata_path):
+            return None
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        return cls(
+            np.load(os.path.join(directory, "ivf_centroids.npy")),
+            np.load(os.path.join(directory, "ivf_order.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "ivf_offsets.npy")),
+            nprobe=metadata.get("nprobe"),
+        )
@@ -0,0 +1,264 @@
+"""
+Micro-batching scheduler that groups concurrent query encodes into one forward pass.
+
+Every request thread used to call model.encode with a single description, which
+leaves most of the matrix multiplication throughput of the CPU unused. The
+EncodeScheduler queues descriptions per model, and a dispatcher thread of that model
+waits for a short window after the first queued description, then encodes up to
+max_batch_size descriptions in one call and hands every caller its own row of the
+result. Since every model has its own dispatcher, a model that is still being loaded
+(which can take tens of seconds for the large T5 models) only holds up its own
+queue, never the encodes of models that are already resident.
+
+Key Features:
+    - Per-model queues and dispatcher threads so that only descriptions of the same
+      model share a batch and a cold model load does not block other models
+    - Configurable batching window and maximum batch size
+    - Identical descriptions within a batch are encoded once
+    - Errors of a batched call are propagated to every waiting caller
+    - Queue-depth and batch-size histograms for tuning the window and batch size
+"""
+
+import bisect
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class Histogram:
+    """
+    Thread-safe histogram with fixed upper bucket bounds.
+
+    Attributes:
+        buckets (Tuple[float, ...]): Inclusive upper bounds of the buckets. Values above
+            the last bound are counted in an overflow bucket.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """
+        Record a value.
+
+        Args:
+            value (float): Observed value.
+        """
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the current state of the histogram.
+
+        Returns:
+            Dict[str, Any]: Count per bucket keyed by its upper bound (with "+Inf" for
+            the overflow bucket), total count, sum and mean of the observed values.
+        """
+        with self._lock:
+            counts = {str(bound): n for bound, n in zip(self.buckets, self._counts)}
+            counts["+Inf"] = self._counts[-1]
+            return {
+                "buckets": counts,
+                "count": self._count,
+                "sum": self._sum,
+                "mean": self._sum / self._count if self._count else 0.0,
+            }
+
+
+class EncodeScheduler:
+    """
+    Collects concurrent encode requests per model and runs them as batches.
+
+    Attributes:
+        encode (Callable[[str, List[str]], np.ndarray]): Function that encodes a list of
+            descriptions with the named model and returns one row per description.
+        window (float): Seconds to wait after the first queued description of a model
+            for more descriptions to arrive.
+        max_batch_size (int): Maximum number of descriptions encoded in one call.
+        queue_depth (Histogram): Number of descriptions already queued for the same
+            model at each submit.
+        batch_size (Histogram): Number of descriptions in each encoded batch.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[str, List[str]], np.ndarray],
+        window: float = 0.005,
+        max_batch_size: int = 32,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.encode = encode
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.queue_depth = Histogram()
+        self.batch_size = Histogram()
+        # model name -> (time the oldest item was queued, queued items)
+        self._queues: Dict[str, Tuple[float, List[Tuple[str, Future]]]] = {}
+        self._pending = 0
+        # One condition per model, all sharing this lock
+        self._lock = threading.Lock()
+        self._conditions: Dict[str, threading.Condition] = {}
+        self._threads: Dict[str, threading.Thread] = {}
+        self._closed = False
+
+    def submit(self, model_name: str, text: str) -> Future:
+        """
+        Queue a description for encoding.
+
+        Args:
+            model_name (str): Name of the model to encode with.
+            text (str): Description to encode.
+
+        Returns:
+            Future: Resolves to the embedding of the description (1-D array).
+
+        Raises:
+            RuntimeError: If the scheduler has been closed.
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("EncodeScheduler is closed")
+            condition = self._ensure_started(model_name)
+            if model_name not in self._queues:
+                self._queues[model_name] = (time.monotonic(), [])
+            items = self._queues[model_name][1]
+            # Only descriptions of the same model can join the batch
+            self.queue_depth.observe(len(items))
+            items.append((text, future))
+            self._pending += 1
+            condition.notify()
+        return future
+
+    def encode_one(
+        self, model_name: str, text: str, timeout: Optional[float] = None
+    ) -> np.ndarray:
+        """
+        Encode a description, waiting for the batch it is part of.
+
+        Args:
+            model_name (str): Name of the model to encode with.
+            text (str): Description to encode.
+            timeout (Optional[float]): Maximum number of seconds to wait.
+
+        Returns:
+            np.ndarray: Embedding of the description (1-D array).
+        """
+        return self.submit(model_name, text).result(timeout=timeout)
+
+    def pending(self) -> int:
+        """
+        Return the number of queued descriptions.
+
+        Returns:
+            int: Descriptions waiting to be encoded.
+        """
+        with self._lock:
+            return self._pending
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the scheduler configuration and histograms.
+
+        Returns:
+            Dict[str, Any]: Window, maximum batch size, pending descriptions and the
+            queue-depth and batch-size histograms.
+        """
+        return {
+            "window": self.window,
+            "max_batch_size": self.max_batch_size,
+            "pending": self.pending(),
+            "queue_depth": self.queue_depth.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+        }
+
+    def close(self) -> None:
+        """Stop the dispatcher threads after the queued descriptions are encoded."""
+        with self._lock:
+            self._closed = True
+            for condition in self._conditions.values():
+                condition.notify_all()
+            threads = list(self._threads.values())
+        for thread in threads:
+            thread.join()
+
+    def _ensure_started(self, model_name: str) -> threading.Condition:
+        # Called with the lock held. Dispatchers are started lazily so that forked
+        # server workers each get their own threads
+        condition = self._conditions.get(model_name)
+        if condition is None:
+            condition = self._conditions[model_name] = threading.Condition(self._lock)
+        thread = self._threads.get(model_name)
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(
+                target=self._run,
+                args=(model_name, condition),
+                name=f"encode-scheduler-{model_name}",
+                daemon=True,
+            )
+            self._threads[model_name] = thread
+            thread.start()
+        return condition
+
+    def _next_batch(
+        self, model_name: str, condition: threading.Condition
+    ) -> Optional[List[Tuple[str, Future]]]:
+        with condition:
+            while True:
+                if model_name not in self._queues:
+                    if self._closed:
+                        return None
+                    condition.wait()
+                    continue
+                queued_at, items = self._queues[model_name]
+                remaining = queued_at + self.window - time.monotonic()
+                if (
+                    len(items) < self.max_batch_size
+                    and remaining > 0
+                    and not self._closed
+                ):
+                    condition.wait(remaining)
+                    continue
+                batch = items[: self.max_batch_size]
+                rest = items[self.max_batch_size :]
+                if rest:
+                    # Leftovers start a new window right away
+                    self._queues[model_name] = (queued_at, rest)
+                else:
+                    del self._queues[model_name]
+                self._pending -= len(batch)
+                return batch
+
+    def _run(self, model_name: str, condition: threading.Condition) -> None:
+        while True:
+            batch = self._next_batch(model_name, condition)
+            if batch is None:
+                return
+            self.batch_size.observe(len(batch))
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                embeddings = np.asarray(self.encode(model_name, texts))
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logging.error(
+                    "Batched encode with model '%s' failed: %s", model_name, e
+                )
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            rows = {text: embeddings[i] for i, text in enumerate(texts)}
+            for text, future in batch:
+                future.set_result(rows[text])
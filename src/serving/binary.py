@@ -0,0 +1,156 @@
+"""
+Binary (1-bit) prefilter for the fused search index.
+
+Every embedding is reduced to the signs of its dimensions, packed eight to a byte
+with np.packbits. For unit-length vectors the Hamming distance between sign bits
+approximates the angle between the vectors, so the vectors with the smallest
+distance to the query's sign bits form a shortlist that is then rescored against
+the float embeddings. The packed matrix is 32 times smaller than float32, which lets
+the first stage of retrieval for many models stay resident in a single worker.
+
+Key Features:
+    - Built from the vectors of an existing fused index in blocks
+    - Hamming distances by XOR and popcount over 64-bit words when the row width
+      allows it, with np.bitwise_count on NumPy 2 and a lookup table otherwise
+    - Stored in its own artifact file next to the fused index and memory-mapped
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+
+BINARY_CODES_FILE = "binary_codes.npy"
+
+# Candidates rescored in float per requested result
+BINARY_RESCORE_FACTOR = 10
+
+_BLOCK_SIZE = 65_536
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def pack_signs(embeddings: np.ndarray) -> np.ndarray:
+    """
+    Pack the sign bits of every row into bytes.
+
+    Args:
+        embeddings (np.ndarray): Matrix of shape (vectors, dimension), or any object
+            whose row slices index as arrays (e.g. a precision.Float32View).
+
+    Returns:
+        np.ndarray: uint8 matrix of shape (vectors, ceil(dimension / 8)).
+    """
+    if embeddings.ndim == 1:
+        return np.packbits(np.asarray(embeddings) > 0)
+    packed = np.empty(
+        (embeddings.shape[0], (embeddings.shape[1] + 7) // 8), dtype=np.uint8
+    )
+    for start in range(0, embeddings.shape[0], _BLOCK_SIZE):
+        block = np.asarray(embeddings[start : start + _BLOCK_SIZE])
+        packed[start : start + len(block)] = np.packbits(block > 0, axis=1)
+    return packed
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    """
+    Count the set bits of every element.
+
+    Args:
+        values (np.ndarray): Unsigned integer array.
+
+    Returns:
+        np.ndarray: Number of set bits of every element.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    # NumPy < 2.0: look up the count of every byte
+    as_bytes = values.view(np.uint8).reshape(values.shape + (values.itemsize,))
+    return _POPCOUNT_TABLE[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+class BinaryIndex:
+    """
+    Packed sign bits of every vector of a fused search index.
+
+    Attributes:
+        codes (np.ndarray): uint8 matrix of shape (vectors, bytes per vector).
+    """
+
+    def __init__(self, codes: np.ndarray):
+        self.codes = codes
+
+    @property
+    def size(self) -> int:
+        """int: Number of vectors in the index."""
+        return int(self.codes.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        """int: Bytes held by the packed codes."""
+        return int(self.codes.nbytes)
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray) -> "BinaryIndex":
+        """
+        Pack the sign bits of an embedding matrix.
+
+        Args:
+            embeddings (np.ndarray): Matrix of shape (vectors, dimension).
+
+        Returns:
+            BinaryIndex: The binary index.
+        """
+        return cls(pack_signs(embeddings))
+
+    def distances(self, query: np.ndarray) -> np.ndarray:
+        """
+        Compute the Hamming distance between the sign bits of a query and every vector.
+
+        Args:
+            query (np.ndarray): Query vector of shape (dimension,).
+
+        Returns:
+            np.ndarray: int32 Hamming distance of every vector.
+        """
+        query_bits = pack_signs(np.asarray(query).reshape(-1))
+        word = np.uint64 if self.codes.shape[1] % 8 == 0 else np.uint8
+        query_words = query_bits.view(word)
+        distances = np.empty(self.size, dtype=np.int32)
+        for start in range(0, self.size, _BLOCK_SIZE):
+            block = np.ascontiguousarray(self.codes[start : start + _BLOCK_SIZE])
+            distances[start : start + len(block)] = popcount(
+                block.view(word) ^ query_words
+            ).sum(axis=1, dtype=np.int32)
+        return distances
+
+    def save(self, directory: str) -> str:
+        """
+        Save the packed codes to their artifact file.
+
+        Args:
+            directory (str): Directory of the fused search index.
+
+        Returns:
+            str: Path of the written file.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, BINARY_CODES_FILE)
+        np.save(path, self.codes)
+        return path
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BinaryIndex"]:
+        """
+        Memory-map the packed codes saved in a directory.
+
+        Args:
+            directory (str): Directory of the fused search index.
+
+        Returns:
+            Optional[BinaryIndex]: The binary index, or None if none was saved.
+        """
+        path = os.path.join(directory, BINARY_CODES_FILE)
+        if not os.path.exists(path):
+            return None
+        return cls(np.load(path, mmap_mode="r"))
@@ -0,0 +1,173 @@
+"""
+Bounded, thread-safe LRU cache with optional time-to-live and byte accounting.
+
+The cache is used by the API for values that are expensive to recompute but cheap to
+keep for a while, such as the ranked result list of a query. Entries are evicted in
+least recently used order once either the entry or the byte limit is exceeded, and
+entries older than the time-to-live are treated as missing.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def default_size_of(value: Any) -> int:
+    """
+    Estimate the size of a cached value in bytes.
+
+    NumPy arrays and tensors report their buffer size; tuples and lists sum their
+    items. Other values count as zero bytes.
+
+    Args:
+        value (Any): Cached value.
+
+    Returns:
+        int: Estimated size in bytes.
+    """
+    if isinstance(value, (tuple, list)):
+        return sum(default_size_of(item) for item in value)
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    return 0
+
+
+class TTLCache:
+    """
+    LRU cache with entry, byte and age limits.
+
+    Attributes:
+        max_entries (Optional[int]): Maximum number of entries.
+        max_bytes (Optional[int]): Maximum total size of the cached values.
+        ttl (Optional[float]): Seconds after which an entry expires.
+        size_of (Callable[[Any], int]): Function estimating the size of a value.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = 1024,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        size_of: Callable[[Any], int] = default_size_of,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_of = size_of
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the value cached under key.
+
+        Args:
+            key (Hashable): Cache key.
+
+        Returns:
+            Optional[Any]: The cached value, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, _, created = entry
+            if self.ttl is not None and time.monotonic() - created > self.ttl:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the value cached under key without updating recency or counters.
+
+        Args:
+            key (Hashable): Cache key.
+
+        Returns:
+            Optional[Any]: The cached value, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, _, created = entry
+            if self.ttl is not None and time.monotonic() - created > self.ttl:
+                return None
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Cache a value, evicting least recently used entries if limits are exceeded.
+
+        Values larger than max_bytes are not cached.
+
+        Args:
+            key (Hashable): Cache key.
+            value (Any): Value to cache.
+        """
+        size = self.size_of(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while (
+                self.max_entries is not None and len(self._entries) > self.max_entries
+            ) or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        """int: Total estimated size of the cached values."""
+        with self._lock:
+            return self._bytes
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return counters describing cache activity.
+
+        Returns:
+            Dict[str, Any]: Entry count, bytes, hits, misses, evictions, expirations
+            and the hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
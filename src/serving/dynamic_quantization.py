@@ -0,0 +1,185 @@
+"""
+Dynamic int8 quantization of the Linear layers of query encoders for CPU serving.
+
+Almost all of the time a transformer spends encoding a query goes to the matrix
+multiplications of its Linear layers. Dynamic quantization stores their weights as
+int8 with one scale per layer and quantizes the activations on the fly, so that the
+products run on int8 kernels. This roughly halves CPU encode latency and shrinks
+the Linear weights four times, at the cost of a small drift of the embeddings. The
+embeddings of the corpus stay float32; only the queries are encoded by the
+quantized model.
+
+A quantized model can be exported as a reusable artifact to
+model/encoders/<model>/int8/, a frozen TorchScript graph in the layout of
+serving.encoder_backends whose encoder.json additionally records the measured
+drift. Artifacts are created and checked with:
+
+    python -m src.misc.int8_drift --model <model_name> --type <dataset_type>
+
+Key Features:
+    - Quantization of every torch.nn.Linear of a loaded Sentence Transformer
+    - Selection of the quantized models by name, or of all models with '*'
+    - Cosine drift and top-k neighbour overlap of quantized against float embeddings
+    - Export of the quantized model as a TorchScript encoder
+"""
+
+# pylint: disable=E0401, E0611
+import json
+import os
+import sys
+from typing import Any, Dict, FrozenSet, Optional
+
+import numpy as np
+import torch
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from serving.encoder_backends import CONFIG_FILE, encoder_dir, export_encoder  # pylint: disable=wrong-import-position  # noqa: E402
+from serving.topk import top_k_indices  # pylint: disable=wrong-import-position  # noqa: E402
+
+INT8_DIR = "int8"
+ALL_MODELS = "*"
+
+
+def quantized_encoder_dir(root: str, model_name: str) -> str:
+    """
+    Return the directory in which the quantized encoder of a model is stored.
+
+    Args:
+        root (str): Directory that contains the models and datasets.
+        model_name (str): Model name as used by the API.
+
+    Returns:
+        str: Path of the quantized encoder directory.
+    """
+    return os.path.join(encoder_dir(root, model_name), INT8_DIR)
+
+
+def parse_models(value: Optional[str]) -> FrozenSet[str]:
+    """
+    Parse the names of the models to quantize.
+
+    Args:
+        value (Optional[str]): Comma-separated model names, or '*' for all models.
+
+    Returns:
+        FrozenSet[str]: The model names, containing '*' if all models are selected.
+    """
+    return frozenset(name.strip() for name in (value or "").split(",") if name.strip())
+
+
+def is_selected(models: FrozenSet[str], model_name: str) -> bool:
+    """
+    Return whether a model is selected for quantization.
+
+    Args:
+        models (FrozenSet[str]): Result of parse_models.
+        model_name (str): Model name as used by the API.
+
+    Returns:
+        bool: True if the model is listed or all models are selected.
+    """
+    return ALL_MODELS in models or model_name in models
+
+
+def quantize_dynamic_int8(model: Any) -> Any:
+    """
+    Quantize the Linear layers of a model to int8 in place.
+
+    Quantized kernels only run on the CPU, so the model is moved there first.
+
+    Args:
+        model (Any): Loaded SentenceTransformer (or any torch.nn.Module).
+
+    Returns:
+        Any: The same model with dynamically quantized Linear layers.
+    """
+    model = model.to("cpu").eval()
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+
+def drift_report(
+    reference: np.ndarray, quantized: np.ndarray, k: int = 10
+) -> Dict[str, float]:
+    """
+    Compare the embeddings of a quantized model with those of the float model.
+
+    The top-k overlap ranks the other sentences of the sample as neighbours of every
+    sentence twice: with float queries against the float embeddings, and with
+    quantized queries against the float embeddings. This mirrors serving, where
+    queries are encoded by the quantized model but the corpus embeddings were
+    computed by the float model, so a drift that preserves the neighbourhoods
+    among quantized embeddings still counts.
+
+    Args:
+        reference (np.ndarray): Float embeddings of the sample, one row per sentence.
+        quantized (np.ndarray): Quantized embeddings of the same sentences.
+        k (int): Number of neighbours compared per sentence.
+
+    Returns:
+        Dict[str, float]: Mean, minimum and 1st percentile of the cosine similarity
+        between the paired embeddings, and the mean fraction of the top-k neighbours
+        that both rankings share.
+
+    Raises:
+        ValueError: If the embeddings do not have the same shape or the sample has
+            fewer than k + 1 sentences.
+    """
+    if reference.shape != quantized.shape:
+        raise ValueError(
+            f"Shapes {reference.shape} and {quantized.shape} of the embeddings differ"
+        )
+    if len(reference) <= k:
+        raise ValueError(f"Need more than {k} sentences to compare top-{k} neighbours")
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    quantized = quantized / np.linalg.norm(quantized, axis=1, keepdims=True)
+    cosine = np.sum(reference * quantized, axis=1)
+
+    reference_scores = reference @ reference.T
+    quantized_scores = quantized @ reference.T
+    # A sentence is not its own neighbour
+    np.fill_diagonal(reference_scores, -np.inf)
+    np.fill_diagonal(quantized_scores, -np.inf)
+    overlap = 0
+    for row, quantized_row in zip(reference_scores, quantized_scores):
+        overlap += len(
+            set(top_k_indices(row, k).tolist())
+            & set(top_k_indices(quantized_row, k).tolist())
+        )
+    return {
+        "mean_cosine": float(cosine.mean()),
+        "min_cosine": float(cosine.min()),
+        "p1_cosine": float(np.percentile(cosine, 1)),
+        "top_k_overlap": overlap / (len(reference) * k),
+    }
+
+
+def export_quantized_encoder(
+    model: Any,
+    directory: str,
+    model_name: Optional[str] = None,
+    drift: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Export a quantized model as a frozen TorchScript encoder.
+
+    The encoder is loaded like any other export, with
+    serving.encoder_backends.load_encoder(directory, 'torchscript').
+
+    Args:
+        model (Any): SentenceTransformer quantized with quantize_dynamic_int8.
+        directory (str): Encoder directory to write to.
+        model_name (Optional[str]): Model name recorded in the configuration.
+        drift (Optional[Dict[str, Any]]): Drift report recorded in the configuration.
+
+    Returns:
+        Dict[str, Any]: The written configuration.
+    """
+    config = export_encoder(model, directory, ["torchscript"], model_name=model_name)
+    config["quantization"] = {"dtype": "qint8", "layers": "Linear", "drift": drift}
+    with open(os.path.join(directory, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return config
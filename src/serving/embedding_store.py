@@ -0,0 +1,170 @@
+"""
+Load-once store for the pre-computed synopsis embeddings used by the API.
+
+Each embeddings file (model/{type}/{model}/embeddings_{column}.npy) is opened a single
+time with np.load(mmap_mode="r"), validated against the model's embedding dimension,
+and wrapped as a tensor without copying. Because the matrices are memory-mapped, the
+pages are shared through the OS page cache between all gunicorn workers and repeated
+requests perform no file I/O or allocation for the corpus embeddings.
+
+Key Features:
+    - Thread-safe, process-wide cache of memory-mapped embedding matrices
+    - Shape validation performed once at load instead of on every request
+    - Zero-copy torch.from_numpy wrapping on CPU (one device copy on CUDA), including
+      float16 and bfloat16 matrices
+    - Counters for loaded matrices and mapped bytes
+"""
+
+# pylint: disable=E0401, E0611
+import os
+import sys
+import threading
+import warnings
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import torch
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from serving.precision import to_tensor  # pylint: disable=wrong-import-position  # noqa: E402
+
+
+def embedding_model_dir(model_name: str) -> str:
+    """
+    Return the directory name under which embeddings for a model are stored.
+
+    Args:
+        model_name (str): Model name as used by the API (e.g. 'sentence-transformers/x').
+
+    Returns:
+        str: Directory name with organisation prefixes removed.
+    """
+    model_name = model_name.replace("sentence-transformers/", "")
+    return model_name.replace("toobi/", "")
+
+
+def embeddings_path(root: str, dataset_type: str, model_name: str, col: str) -> str:
+    """
+    Build the path of the embeddings file for a model and synopsis column.
+
+    Args:
+        root (str): Directory that contains the per-dataset embedding folders.
+        dataset_type (str): Type of dataset ('anime' or 'manga').
+        model_name (str): Model name as used by the API.
+        col (str): Name of the synopsis column.
+
+    Returns:
+        str: Path to the .npy file.
+    """
+    return os.path.join(
+        root,
+        dataset_type,
+        embedding_model_dir(model_name),
+        f"embeddings_{col.replace(' ', '_')}.npy",
+    )
+
+
+class EmbeddingStore:
+    """
+    Process-wide cache of memory-mapped embedding matrices.
+
+    Attributes:
+        root (str): Directory that contains the per-dataset embedding folders.
+        device (str): Device the tensors are served on ('cpu' or 'cuda').
+    """
+
+    def __init__(self, root: str = "model", device: str = "cpu"):
+        self.root = root
+        self.device = device
+        self._arrays: Dict[Tuple[str, str, str], np.ndarray] = {}
+        self._tensors: Dict[Tuple[str, str, str], torch.Tensor] = {}
+        self._lock = threading.Lock()
+
+    def get_array(
+        self, dataset_type: str, model_name: str, col: str, dimension: int
+    ) -> np.ndarray:
+        """
+        Return the memory-mapped embedding matrix for a model and column.
+
+        The file is opened and validated on first access only.
+
+        Args:
+            dataset_type (str): Type of dataset ('anime' or 'manga').
+            model_name (str): Model name as used by the API.
+            col (str): Name of the synopsis column.
+            dimension (int): Expected embedding dimension of the model.
+
+        Returns:
+            np.ndarray: Read-only memory-mapped array of shape (rows, dimension).
+
+        Raises:
+            FileNotFoundError: If the embeddings file doesn't exist.
+            ValueError: If the stored embeddings don't match the model dimension.
+        """
+        key = (dataset_type, embedding_model_dir(model_name), col)
+        with self._lock:
+            array = self._arrays.get(key)
+            if array is not None:
+                return array
+            path = embeddings_path(self.root, dataset_type, model_name, col)
+            array = np.load(path, mmap_mode="r")
+            if array.ndim != 2 or array.shape[1] != dimension:
+                raise ValueError(f"Incompatible dimension for embeddings in {col}")
+            self._arrays[key] = array
+            return array
+
+    def get_tensor(
+        self,
+        dataset_type: str,
+        model_name: str,
+        col: str,
+        dimension: int,
+        precision: str = "fp32",
+    ) -> torch.Tensor:
+        """
+        Return the embedding matrix for a model and column as a tensor.
+
+        On CPU the tensor shares memory with the memory-mapped file. On CUDA the matrix
+        is copied to the device once and the device tensor is cached.
+
+        Args:
+            dataset_type (str): Type of dataset ('anime' or 'manga').
+            model_name (str): Model name as used by the API.
+            col (str): Name of the synopsis column.
+            dimension (int): Expected embedding dimension of the model.
+            precision (str): Storage precision recorded in the manifest of the
+                embeddings ('fp32', 'fp16' or 'bf16').
+
+        Returns:
+            torch.Tensor: Tensor of shape (rows, dimension) on the store's device, in
+            the dtype of the storage precision.
+        """
+        key = (dataset_type, embedding_model_dir(model_name), col)
+        tensor = self._tensors.get(key)
+        if tensor is not None:
+            return tensor
+        array = self.get_array(dataset_type, model_name, col, dimension)
+        with warnings.catch_warnings():
+            # The mapping is read-only and the tensor is never written to
+            warnings.filterwarnings("ignore", message=".*non-writable.*")
+            tensor = to_tensor(array, precision)
+        if self.device != "cpu":
+            tensor = tensor.to(self.device)
+        with self._lock:
+            self._tensors.setdefault(key, tensor)
+            return self._tensors[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the number of loaded matrices and the bytes they map.
+
+        Returns:
+            Dict[str, Any]: Count of loaded matrices and total mapped bytes.
+        """
+        with self._lock:
+            return {
+                "loaded_matrices": len(self._arrays),
+                "mapped_bytes": sum(array.nbytes for array in self._arrays.values()),
+            }
@@ -0,0 +1,513 @@
+"""
+Query encoder backends: eager PyTorch, TorchScript and ONNX Runtime.
+
+The API encodes queries with SentenceTransformer.encode, which runs the transformer,
+pooling, dense and normalize modules eagerly in Python. This module exports the
+whole pipeline of a model as a single graph that maps token ids to the final
+sentence embedding, either traced and frozen as TorchScript or as an ONNX model, and
+loads exported graphs behind the same encode(sentences, batch_size=...) interface.
+On CPU, ONNX Runtime is usually the fastest backend for small batches.
+
+Exported encoders are stored in model/encoders/<model>/:
+
+    - encoder.json: Input names, maximum sequence length, lower-casing, embedding
+      dimension and the maximum deviation of every backend from eager PyTorch
+    - encoder.pt: Frozen TorchScript graph
+    - encoder.onnx: ONNX graph with dynamic batch and sequence axes
+    - The tokenizer files of the model
+
+Exports are created with:
+
+    python -m src.serving.encoder_backends --model <model_name> [--backend onnx]
+
+Key Features:
+    - Pooling, dense and normalize layers folded into the exported graph
+    - Works for every Sentence Transformer, including CustomT5EncoderModel fine-tunes
+    - Exported graphs are checked against eager PyTorch on held-out sentences
+    - Per-model backend selection with fallback to eager PyTorch
+    - ONNX export and inference only need onnx and onnxruntime when they are used
+"""
+
+# pylint: disable=E0401, E0611
+import abc
+import argparse
+import importlib.util
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+
+try:
+    import onnxruntime  # type: ignore
+except ImportError:  # pragma: no cover - onnxruntime is optional
+    onnxruntime = None
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from serving.embedding_store import embedding_model_dir  # pylint: disable=wrong-import-position  # noqa: E402
+
+BACKENDS = ("torch", "torchscript", "onnx")
+EXPORTED_BACKENDS = ("torchscript", "onnx")
+CONFIG_FILE = "encoder.json"
+BACKEND_FILES = {"torchscript": "encoder.pt", "onnx": "encoder.onnx"}
+ONNX_OPSET = 17
+
+# Sentences the graphs are traced with (of different lengths, so that padding is
+# part of the trace) and checked against eager PyTorch afterwards
+EXAMPLE_SENTENCES = [
+    "A young hero sets out on a journey.",
+    "Two friends start a band in high school and play their first concert.",
+]
+CHECK_SENTENCES = [
+    "Detectives",
+    "After the fall of the kingdom, a young swordsman travels across a war-torn "
+    "continent with a mysterious girl who remembers nothing of her past.",
+    "A cat runs a small cafe in the mountains.",
+]
+
+
+def encoder_dir(root: str, model_name: str) -> str:
+    """
+    Return the directory in which the exported encoder of a model is stored.
+
+    Args:
+        root (str): Directory that contains the models and datasets.
+        model_name (str): Model name as used by the API.
+
+    Returns:
+        str: Path of the encoder directory.
+    """
+    return os.path.join(root, "encoders", embedding_model_dir(model_name))
+
+
+def parse_backends(value: Optional[str]) -> Dict[str, str]:
+    """
+    Parse per-model backend overrides.
+
+    Args:
+        value (Optional[str]): Comma-separated '<model name>=<backend>' entries.
+
+    Returns:
+        Dict[str, str]: Backend per model name.
+
+    Raises:
+        ValueError: If an entry is malformed or names an unknown backend.
+    """
+    backends = {}
+    for entry in (value or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        model_name, separator, backend = entry.rpartition("=")
+        if not separator or not model_name or backend not in BACKENDS:
+            raise ValueError(f"Invalid encoder backend entry '{entry}'")
+        backends[model_name.strip()] = backend
+    return backends
+
+
+class SentenceEmbeddingModule(torch.nn.Module):
+    """
+    Full Sentence Transformer pipeline as a function of the tokenizer outputs.
+
+    Attributes:
+        model (torch.nn.Module): SentenceTransformer whose modules are run in order.
+        input_names (List[str]): Names of the tokenizer outputs, in argument order.
+    """
+
+    def __init__(self, model: torch.nn.Module, input_names: Sequence[str]):
+        super().__init__()
+        self.model = model
+        self.input_names = list(input_names)
+
+    def forward(self, *inputs: torch.Tensor) -> torch.Tensor:
+        """
+        Compute sentence embeddings.
+
+        Args:
+            *inputs (torch.Tensor): Tokenizer outputs in the order of input_names.
+
+        Returns:
+            torch.Tensor: Sentence embeddings of shape (batch, dimension).
+        """
+        features = dict(zip(self.input_names, inputs))
+        return self.model(features)["sentence_embedding"]
+
+
+class ExportedEncoder(abc.ABC):
+    """
+    Base class of encoders that run an exported graph on tokenized sentences.
+
+    Subclasses implement run for their runtime.
+
+    Tokenization follows the Sentence Transformer: sentences are stripped,
+    optionally lower-cased, padded to the longest sentence of a batch and truncated
+    to max_seq_length.
+
+    Attributes:
+        tokenizer (Any): Hugging Face tokenizer of the model.
+        input_names (List[str]): Names of the tokenizer outputs fed to the graph.
+        max_seq_length (int): Maximum number of tokens per sentence.
+        do_lower_case (bool): Whether sentences are lower-cased before tokenization.
+        dimension (int): Dimension of the sentence embeddings.
+        nbytes (int): Size of the exported graph, used as its memory estimate.
+    """
+
+    backend = ""
+
+    def __init__(self, tokenizer: Any, config: Dict[str, Any], nbytes: int = 0):
+        self.tokenizer = tokenizer
+        self.input_names = list(config["input_names"])
+        self.max_seq_length = int(config["max_seq_length"])
+        self.do_lower_case = bool(config.get("do_lower_case", False))
+        self.dimension = int(config["dimension"])
+        self.nbytes = nbytes
+
+    def tokenize(self, sentences: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Tokenize sentences into the inputs of the graph.
+
+        Args:
+            sentences (Sequence[str]): Sentences to tokenize.
+
+        Returns:
+            Dict[str, np.ndarray]: int64 arrays of shape (batch, sequence) per input.
+        """
+        texts = [str(sentence).strip() for sentence in sentences]
+        if self.do_lower_case:
+            texts = [text.lower() for text in texts]
+        features = self.tokenizer(
+            texts,
+            padding=True,
+            truncation="longest_first",
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        return {
+            name: np.asarray(features[name], dtype=np.int64)
+            for name in self.input_names
+        }
+
+    @abc.abstractmethod
+    def run(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Run the graph on tokenized sentences.
+
+        Args:
+            features (Dict[str, np.ndarray]): Inputs as returned by tokenize.
+
+        Returns:
+            np.ndarray: float32 sentence embeddings of shape (batch, dimension).
+        """
+
+    def encode(
+        self, sentences: Sequence[str], batch_size: int = 32, **_kwargs: Any
+    ) -> np.ndarray:
+        """
+        Encode sentences, like SentenceTransformer.encode with default arguments.
+
+        Args:
+            sentences (Sequence[str]): Sentences to encode.
+            batch_size (int): Number of sentences run through the graph at once.
+
+        Returns:
+            np.ndarray: float32 embeddings of shape (len(sentences), dimension).
+        """
+        if not sentences:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        batch_size = max(batch_size, 1)
+        # Sentences of similar length share a batch to minimize padding
+        order = np.argsort([-len(str(sentence)) for sentence in sentences])
+        embeddings = np.empty((len(sentences), self.dimension), dtype=np.float32)
+        for start in range(0, len(sentences), batch_size):
+            positions = order[start : start + batch_size]
+            batch = [sentences[position] for position in positions]
+            embeddings[positions] = self.run(self.tokenize(batch))
+        return embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """
+        Return the dimension of the sentence embeddings.
+
+        Returns:
+            int: Embedding dimension.
+        """
+        return self.dimension
+
+
+class TorchScriptEncoder(ExportedEncoder):
+    """
+    Encoder running a frozen TorchScript graph.
+
+    Attributes:
+        module (torch.jit.ScriptModule): The loaded graph.
+        device (str): Device the graph and its inputs are placed on.
+    """
+
+    backend = "torchscript"
+
+    def __init__(
+        self,
+        module: torch.jit.ScriptModule,
+        tokenizer: Any,
+        config: Dict[str, Any],
+        device: str = "cpu",
+        nbytes: int = 0,
+    ):
+        super().__init__(tokenizer, config, nbytes)
+        self.module = module
+        self.device = device
+
+    def run(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        inputs = [
+            torch.from_numpy(features[name]).to(self.device)
+            for name in self.input_names
+        ]
+        with torch.inference_mode():
+            embeddings = self.module(*inputs)
+        return embeddings.float().cpu().numpy()
+
+
+class OnnxEncoder(ExportedEncoder):
+    """
+    Encoder running an ONNX graph with ONNX Runtime.
+
+    Attributes:
+        session (Any): ONNX Runtime inference session of the graph.
+    """
+
+    backend = "onnx"
+
+    def __init__(
+        self, session: Any, tokenizer: Any, config: Dict[str, Any], nbytes: int = 0
+    ):
+        super().__init__(tokenizer, config, nbytes)
+        self.session = session
+
+    def run(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        outputs = self.session.run(["sentence_embedding"], features)
+        return np.asarray(outputs[0], dtype=np.float32)
+
+
+def _graph_path(directory: str, backend: str) -> str:
+    return os.path.join(directory, BACKEND_FILES[backend])
+
+
+def read_encoder_config(directory: str) -> Dict[str, Any]:
+    """
+    Read the configuration of an exported encoder.
+
+    Args:
+        directory (str): Encoder directory.
+
+    Returns:
+        Dict[str, Any]: The contents of encoder.json.
+
+    Raises:
+        FileNotFoundError: If no encoder was exported to the directory.
+    """
+    with open(os.path.join(directory, CONFIG_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_encoder(directory: str, backend: str, device: str = "cpu") -> ExportedEncoder:
+    """
+    Load an exported encoder.
+
+    Args:
+        directory (str): Encoder directory.
+        backend (str): 'torchscript' or 'onnx'.
+        device (str): Device to run on ('cpu' or 'cuda').
+
+    Returns:
+        ExportedEncoder: The encoder.
+
+    Raises:
+        FileNotFoundError: If the graph of the backend was not exported.
+        ImportError: If onnxruntime is needed but not installed.
+        ValueError: If the backend is not an exported backend.
+    """
+    if backend not in EXPORTED_BACKENDS:
+        raise ValueError(f"Unknown exported encoder backend '{backend}'")
+    # Imported here so that the torch backend does not pay for it
+    from transformers import AutoTokenizer  # pylint: disable=import-outside-toplevel
+
+    config = read_encoder_config(directory)
+    path = _graph_path(directory, backend)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No {backend} graph found at {path}")
+    nbytes = sum(
+        os.path.getsize(os.path.join(directory, name))
+        for name in os.listdir(directory)
+        if name.startswith(BACKEND_FILES[backend])
+    )
+    tokenizer = AutoTokenizer.from_pretrained(directory)
+
+    if backend == "torchscript":
+        module = torch.jit.load(path, map_location=device)
+        return TorchScriptEncoder(module, tokenizer, config, device, nbytes)
+
+    if onnxruntime is None:
+        raise ImportError("onnxruntime is required for the onnx encoder backend")
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    providers = ["CPUExecutionProvider"]
+    if device == "cuda" and "CUDAExecutionProvider" in (
+        onnxruntime.get_available_providers()
+    ):
+        providers.insert(0, "CUDAExecutionProvider")
+    session = onnxruntime.InferenceSession(path, options, providers=providers)
+    return OnnxEncoder(session, tokenizer, config, nbytes)
+
+
+def export_encoder(
+    model: Any,
+    directory: str,
+    backends: Sequence[str] = EXPORTED_BACKENDS,
+    model_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Export the full pipeline of a Sentence Transformer and check it against eager.
+
+    Args:
+        model (Any): Loaded SentenceTransformer. It is moved to the CPU.
+        directory (str): Encoder directory to write to.
+        backends (Sequence[str]): Exported backends to create.
+        model_name (Optional[str]): Model name recorded in the configuration.
+
+    Returns:
+        Dict[str, Any]: The written configuration, including the maximum absolute
+        deviation of every backend from eager PyTorch on held-out sentences.
+
+    Raises:
+        ImportError: If an ONNX export is requested but onnx is not installed.
+    """
+    if "onnx" in backends and importlib.util.find_spec("onnx") is None:
+        raise ImportError("onnx is required to export the onnx encoder backend")
+    os.makedirs(directory, exist_ok=True)
+    model = model.to("cpu").eval()
+    tokenizer = model.tokenizer
+    transformer = model[0]
+    config: Dict[str, Any] = {
+        "model": model_name,
+        "max_seq_length": int(model.max_seq_length),
+        "do_lower_case": bool(getattr(transformer, "do_lower_case", False)),
+        "dimension": int(model.get_sentence_embedding_dimension()),
+    }
+    sample = tokenizer(
+        EXAMPLE_SENTENCES,
+        padding=True,
+        truncation="longest_first",
+        max_length=config["max_seq_length"],
+        return_tensors="pt",
+    )
+    config["input_names"] = list(sample.keys())
+    config["backends"] = list(backends)
+    module = SentenceEmbeddingModule(model, config["input_names"]).eval()
+    inputs = tuple(sample[name] for name in config["input_names"])
+
+    if "torchscript" in backends:
+        with torch.no_grad():
+            traced = torch.jit.trace(module, inputs, strict=False, check_trace=False)
+        torch.jit.freeze(traced.eval()).save(_graph_path(directory, "torchscript"))
+    if "onnx" in backends:
+        dynamic_axes = {
+            name: {0: "batch", 1: "sequence"} for name in config["input_names"]
+        }
+        dynamic_axes["sentence_embedding"] = {0: "batch"}
+        with torch.no_grad():
+            torch.onnx.export(
+                module,
+                inputs,
+                _graph_path(directory, "onnx"),
+                dynamo=False,
+                input_names=config["input_names"],
+                output_names=["sentence_embedding"],
+                dynamic_axes=dynamic_axes,
+                opset_version=ONNX_OPSET,
+            )
+    tokenizer.save_pretrained(directory)
+    with open(os.path.join(directory, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    reference = np.asarray(model.encode(CHECK_SENTENCES), dtype=np.float32)
+    config["max_abs_error"] = {}
+    for backend in backends:
+        try:
+            encoder = load_encoder(directory, backend)
+        except ImportError:
+            # The graph is exported, but cannot be run here
+            continue
+        deviation = np.abs(encoder.encode(CHECK_SENTENCES) - reference).max()
+        config["max_abs_error"][backend] = float(deviation)
+    with open(os.path.join(directory, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return config
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command-line arguments for exporting an encoder.
+
+    Returns:
+        argparse.Namespace: Parsed arguments containing:
+            model (str): Name of the model to export
+            backend (List[str]): Backends to export
+            root (str): Directory that contains the models
+    """
+    parser = argparse.ArgumentParser(
+        description="Export the query encoder of a model to TorchScript and ONNX."
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        required=True,
+        help="Name of the model to export. Fine-tunes are loaded from model/<name>.",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        nargs="+",
+        choices=EXPORTED_BACKENDS,
+        default=list(EXPORTED_BACKENDS),
+        help="Backends to export (default: all).",
+    )
+    parser.add_argument(
+        "--root",
+        type=str,
+        default="model",
+        help="Directory that contains the models (default: model).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Export the query encoder of a model and report its deviation from eager PyTorch.
+    """
+    # pylint: disable=import-outside-toplevel
+    from sentence_transformers import SentenceTransformer
+
+    # Registers the custom module type used by the fine-tuned T5 models
+    from custom_transformer import CustomT5EncoderModel  # noqa: F401  # pylint: disable=unused-import
+
+    args = parse_args()
+    local_path = os.path.join(args.root, args.model)
+    model = SentenceTransformer(
+        local_path if os.path.isdir(local_path) else args.model, device="cpu"
+    )
+    directory = encoder_dir(args.root, args.model)
+    config = export_encoder(model, directory, args.backend, model_name=args.model)
+    print(f"Exported {', '.join(args.backend)} encoder of {args.model} to {directory}")
+    for backend, deviation in config["max_abs_error"].items():
+        print(f"{backend}: max abs deviation from eager PyTorch {deviation:.2e}")
+    missing: List[str] = [b for b in args.backend if b not in config["max_abs_error"]]
+    if missing:
+        print(f"Not checked (runtime not installed): {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Read and write the manifest that describes a directory of generated embeddings.
+
+sbert.py writes a manifest.json next to the embeddings_*.npy files it produces. The
+serving code reads it to learn how the embeddings were stored, for example whether
+they are already L2-normalized, so that work can be skipped at load time, and in
+which precision. Embedding directories produced before manifests existed have no
+manifest; they are described by DEFAULT_MANIFEST.
+"""
+
+import json
+import os
+from typing import Any, Dict
+
+MANIFEST_FILE = "manifest.json"
+
+DEFAULT_MANIFEST: Dict[str, Any] = {
+    "normalized": False,
+    "precision": "fp32",
+}
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    """
+    Read the manifest of an embeddings directory.
+
+    Args:
+        directory (str): Directory containing the embeddings.
+
+    Returns:
+        Dict[str, Any]: The manifest, with defaults filled in for missing keys.
+    """
+    manifest = dict(DEFAULT_MANIFEST)
+    path = os.path.join(directory, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            manifest.update(json.load(f))
+    return manifest
+
+
+def write_manifest(directory: str, manifest: Dict[str, Any]) -> str:
+    """
+    Write the manifest of an embeddings directory.
+
+    Args:
+        directory (str): Directory containing the embeddings.
+        manifest (Dict[str, Any]): Manifest contents.
+
+    Returns:
+        str: Path of the written manifest file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, MANIFEST_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    return path
@@ -0,0 +1,258 @@
+"""
+Memory-pressure manager that frees memory only when it is needed.
+
+A full garbage collection and a CUDA cache flush take tens of milliseconds, so they
+are no longer run on every request. Instead, a background thread of every process
+samples its memory at a fixed interval and acts only when:
+
+    - Memory is above the hard limit: garbage is collected and, if that was not
+      enough, the least recently used model is evicted, at most once per cooldown
+    - Memory is above the soft limit: garbage is collected, at most once per cooldown
+    - The process has been idle for idle_seconds: garbage is collected once per
+      idle period
+
+The memory sampled is the private memory (USS) of the process rather than its RSS:
+RSS includes memory-mapped embeddings and shared segments, which neither a
+collection nor an eviction gives back, and acting on it would evict every model
+every few seconds. Even so, a single check evicts at most one model and the next
+check measures again.
+
+Every action is logged and recorded together with the memory before and after it,
+so the amount of memory it freed can be inspected.
+
+Key Features:
+    - Private memory sampling through psutil or /proc (see
+      model_registry.current_private_bytes)
+    - Soft and hard thresholds, with the eviction of one model per check as the
+      last resort
+    - Idle-time collection replacing the periodic memory clear
+    - Bounded history of actions and totals of collections, evictions and freed bytes
+"""
+
+# pylint: disable=E0401, E0611
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import torch
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from serving.model_registry import current_private_bytes  # pylint: disable=wrong-import-position  # noqa: E402
+
+
+def collect_garbage() -> int:
+    """
+    Run a full garbage collection and release cached CUDA memory.
+
+    Returns:
+        int: Number of unreachable objects found by the collector.
+    """
+    collected = gc.collect()
+    torch.cuda.empty_cache()
+    return collected
+
+
+class MemoryManager:
+    """
+    Samples the memory of the process and frees memory when thresholds are crossed.
+
+    Attributes:
+        soft_limit_bytes (Optional[int]): Memory above which garbage is collected.
+        hard_limit_bytes (Optional[int]): Memory above which a model is evicted.
+        idle_seconds (Optional[float]): Inactivity after which garbage is collected.
+        interval (float): Seconds between two samples of the background thread.
+        cooldown (float): Minimum seconds between two soft- or hard-limit actions.
+        collect (Callable[[], int]): Frees garbage and returns the collected count.
+        evict (Optional[Callable[[], Optional[str]]]): Evicts one model and returns
+            its name, or None if nothing could be evicted.
+        rss_reader (Callable[[], Optional[int]]): Returns the current memory of the
+            process in bytes, by default its private memory.
+        events (Deque[Dict[str, Any]]): Most recent actions, oldest first.
+    """
+
+    def __init__(
+        self,
+        soft_limit_bytes: Optional[int] = None,
+        hard_limit_bytes: Optional[int] = None,
+        idle_seconds: Optional[float] = 300.0,
+        interval: float = 5.0,
+        cooldown: float = 60.0,
+        collect: Callable[[], int] = collect_garbage,
+        evict: Optional[Callable[[], Optional[str]]] = None,
+        rss_reader: Callable[[], Optional[int]] = current_private_bytes,
+        history: int = 100,
+    ):
+        self.soft_limit_bytes = soft_limit_bytes
+        self.hard_limit_bytes = hard_limit_bytes
+        self.idle_seconds = idle_seconds
+        self.interval = interval
+        self.cooldown = cooldown
+        self.collect = collect
+        self.evict = evict
+        self.rss_reader = rss_reader
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._last_activity = time.monotonic()
+        self._last_collection = float("-inf")
+        self._idle_collected = False
+        self.rss_bytes: Optional[int] = None
+        self.checks = 0
+        self.collections: Dict[str, int] = {}
+        self.evicted_models = 0
+        self.freed_bytes = 0
+
+    def note_activity(self) -> None:
+        """Record that the process is serving a request."""
+        with self._lock:
+            self._last_activity = time.monotonic()
+            self._idle_collected = False
+
+    def idle_for(self) -> float:
+        """
+        Return the time since the last request.
+
+        Returns:
+            float: Seconds since note_activity was last called.
+        """
+        with self._lock:
+            return time.monotonic() - self._last_activity
+
+    def check(self) -> Optional[Dict[str, Any]]:
+        """
+        Sample memory once and free memory if a threshold is crossed.
+
+        Returns:
+            Optional[Dict[str, Any]]: The recorded action, or None if nothing was
+            done.
+        """
+        rss = self.rss_reader()
+        now = time.monotonic()
+        with self._lock:
+            self.checks += 1
+            self.rss_bytes = rss
+            idle = now - self._last_activity
+            idle_collected = self._idle_collected
+            last_collection = self._last_collection
+
+        cooled_down = now - last_collection >= self.cooldown
+        if (
+            rss is not None
+            and self.hard_limit_bytes is not None
+            and rss > self.hard_limit_bytes
+            and cooled_down
+        ):
+            return self._free("hard_limit", rss, evict=True)
+        if (
+            rss is not None
+            and self.soft_limit_bytes is not None
+            and rss > self.soft_limit_bytes
+            and cooled_down
+        ):
+            return self._free("soft_limit", rss)
+        if (
+            self.idle_seconds is not None
+            and idle >= self.idle_seconds
+            and not idle_collected
+        ):
+            with self._lock:
+                self._idle_collected = True
+            return self._free("idle", rss)
+        return None
+
+    def _free(
+        self, reason: str, rss_before: Optional[int], evict: bool = False
+    ) -> Dict[str, Any]:
+        start = time.perf_counter()
+        collected = self.collect()
+        rss = self.rss_reader()
+        evicted: List[str] = []
+        # One model per check; the next check measures again
+        if (
+            evict
+            and self.evict is not None
+            and rss is not None
+            and self.hard_limit_bytes is not None
+            and rss > self.hard_limit_bytes
+        ):
+            name = self.evict()
+            if name is not None:
+                evicted.append(name)
+                rss = self.rss_reader()
+
+        freed = (
+            max(rss_before - rss, 0)
+            if rss_before is not None and rss is not None
+            else 0
+        )
+        event = {
+            "time": time.time(),
+            "reason": reason,
+            "rss_before": rss_before,
+            "rss_after": rss,
+            "freed_bytes": freed,
+            "collected_objects": collected,
+            "evicted_models": evicted,
+            "seconds": time.perf_counter() - start,
+        }
+        with self._lock:
+            self._last_collection = time.monotonic()
+            self.rss_bytes = rss
+            self.collections[reason] = self.collections.get(reason, 0) + 1
+            self.evicted_models += len(evicted)
+            self.freed_bytes += freed
+            self.events.append(event)
+        logging.info(
+            "Freed memory (%s): %.1f MB released, %d objects collected, "
+            "evicted models: %s.",
+            reason,
+            freed / 2**20,
+            collected,
+            evicted or "none",
+        )
+        return event
+
+    def run(self) -> None:
+        """Sample and act every interval seconds, forever."""
+        logging.info("Starting the memory manager thread.")
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logging.error("Memory manager check failed: %s", e)
+
+    def start(self) -> None:
+        """
+        Start the background thread of the current process.
+
+        Threads don't survive fork, so this is called again in every forked worker.
+        """
+        # A lock held by another thread at fork time would never be released in the
+        # child, where this thread is the only one
+        self._lock = threading.Lock()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return counters describing the actions taken so far.
+
+        Returns:
+            Dict[str, Any]: Last sampled RSS, number of checks, collections per
+            reason, evicted models, total freed bytes and the most recent actions.
+        """
+        with self._lock:
+            return {
+                "rss_bytes": self.rss_bytes,
+                "checks": self.checks,
+                "collections": dict(self.collections),
+                "evicted_models": self.evicted_models,
+                "freed_bytes": self.freed_bytes,
+                "events": list(self.events),
+            }
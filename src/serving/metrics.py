@@ -0,0 +1,404 @@
+"""
+Prometheus metrics of the search API.
+
+Request stages are timed into one histogram labelled by stage, model and dataset,
+so the time of a search can be broken down into encoding, similarity scoring, top-k
+selection, row materialization and serialization. Resident models, search index
+sizes and cache activity are published by every process after each of its requests:
+levels (resident models, cache entries, queued searches) as gauges, and cumulative
+counts (cache hits, admitted searches, collections) as counters, incremented by what
+happened since the process last published them.
+
+Under gunicorn every worker is a separate process. When PROMETHEUS_MULTIPROC_DIR is
+set (run_server.py creates a fresh directory for every server run), prometheus_client
+keeps the values of every process in memory-mapped files in that directory and a
+scrape of any worker aggregates all of them: histograms and counters are summed
+over every process that ever ran, so they never go down when a worker restarts, and
+per-process gauges are summed (or maximized for shared index sizes) over the live
+workers. Workers that exit are marked dead by the gunicorn child_exit hook in
+src/gunicorn_config.py.
+
+Key Features:
+    - Stage latency histograms per model and dataset, and model load durations
+    - Cache hits, misses, entries and bytes per cache, with the hit ratio derived
+      from the aggregated counts at scrape time
+    - Resident model count and bytes, search index bytes per model and dataset
+    - Process RSS and the collections, evictions and freed bytes of the memory
+      managers
+    - Searches in flight, queued, admitted and shed by the admission controllers
+    - Queue-depth and batch-size histograms of the encode micro-batchers
+    - Monotonic counters for cumulative counts, so rate() and increase() see no
+      false resets
+    - Correct aggregation across gunicorn workers through the multiprocess collector
+"""
+
+# pylint: disable=E0401, E0611
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+STAGE_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+MODEL_LOAD_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+STAGE_SECONDS = Histogram(
+    "anisearch_stage_duration_seconds",
+    "Duration of a stage of a search request.",
+    ["stage", "model", "dataset"],
+    buckets=STAGE_BUCKETS,
+)
+MODEL_LOAD_SECONDS = Histogram(
+    "anisearch_model_load_duration_seconds",
+    "Duration of loading a model into the registry.",
+    ["model"],
+    buckets=MODEL_LOAD_BUCKETS,
+)
+CACHE_HITS = Counter(
+    "anisearch_cache_hits_total",
+    "Cache hits.",
+    ["cache"],
+)
+CACHE_MISSES = Counter(
+    "anisearch_cache_misses_total",
+    "Cache misses.",
+    ["cache"],
+)
+CACHE_ENTRIES = Gauge(
+    "anisearch_cache_entries",
+    "Entries held by a cache, summed over the workers.",
+    ["cache"],
+    multiprocess_mode="livesum",
+)
+CACHE_BYTES = Gauge(
+    "anisearch_cache_bytes",
+    "Bytes held by a cache, summed over the workers.",
+    ["cache"],
+    multiprocess_mode="livesum",
+)
+LOADED_MODELS = Gauge(
+    "anisearch_loaded_models",
+    "Models resident in the registries, summed over the workers.",
+    multiprocess_mode="livesum",
+)
+MODEL_BYTES = Gauge(
+    "anisearch_model_bytes",
+    "Estimated bytes of the resident models, summed over the workers.",
+    multiprocess_mode="livesum",
+)
+PROCESS_RSS_BYTES = Gauge(
+    "anisearch_process_rss_bytes",
+    "Private memory last sampled by the memory managers, summed over the workers.",
+    multiprocess_mode="livesum",
+)
+MEMORY_COLLECTIONS = Counter(
+    "anisearch_memory_collections_total",
+    "Garbage collections run by the memory managers, by reason.",
+    ["reason"],
+)
+MEMORY_FREED_BYTES = Counter(
+    "anisearch_memory_freed_bytes_total",
+    "Private memory released by the actions of the memory managers.",
+)
+MEMORY_EVICTED_MODELS = Counter(
+    "anisearch_memory_evicted_models_total",
+    "Models evicted by the memory managers under memory pressure.",
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "anisearch_admission_in_flight",
+    "Searches running, summed over the workers.",
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "anisearch_admission_queue_depth",
+    "Searches waiting for a slot, summed over the workers.",
+    multiprocess_mode="livesum",
+)
+ADMISSION_ADMITTED = Counter(
+    "anisearch_admission_admitted_total",
+    "Searches admitted.",
+)
+ADMISSION_SHED = Counter(
+    "anisearch_admission_shed_total",
+    "Searches rejected with 503, by reason.",
+    ["reason"],
+)
+ENCODE_PENDING = Gauge(
+    "anisearch_encode_pending",
+    "Descriptions waiting in the encode batchers, summed over the workers.",
+    multiprocess_mode="livesum",
+)
+ENCODE_QUEUE_DEPTHS = Counter(
+    "anisearch_encode_queue_depths_total",
+    "Encodes submitted while at most le descriptions of the same model were already "
+    "queued (cumulative).",
+    ["le"],
+)
+ENCODE_QUEUED_AHEAD = Counter(
+    "anisearch_encode_queued_ahead_total",
+    "Sum of the descriptions of the same model already queued at every submitted "
+    "encode.",
+)
+ENCODE_BATCH_SIZES = Counter(
+    "anisearch_encode_batch_sizes_total",
+    "Encoded batches of at most le descriptions (cumulative).",
+    ["le"],
+)
+ENCODE_BATCHED_DESCRIPTIONS = Counter(
+    "anisearch_encode_batched_descriptions_total",
+    "Descriptions encoded in all batches.",
+)
+INDEX_BYTES = Gauge(
+    "anisearch_search_index_bytes",
+    "Bytes of a loaded search index (shared between the workers).",
+    ["model", "dataset"],
+    multiprocess_mode="livemax",
+)
+
+# Cumulative statistics last published by this process, per counter and labels, so
+# that counters are incremented by what happened since
+_published: Dict[Tuple[int, Tuple[str, ...]], float] = {}
+_published_lock = threading.Lock()
+
+
+def _advance(counter: Counter, value: float, *labels: str) -> None:
+    # Increments a counter of this process up to a cumulative statistic. A
+    # statistic that went down was reset (e.g. a cleared cache) and counts anew
+    with _published_lock:
+        key = (id(counter), labels)
+        delta = value - _published.get(key, 0.0)
+        if delta < 0:
+            delta = value
+        _published[key] = value
+    if delta > 0:
+        (counter.labels(*labels) if labels else counter).inc(delta)
+
+
+def observe_stage(stage: str, model: str, dataset: str, seconds: float) -> None:
+    """
+    Record the duration of a request stage.
+
+    Args:
+        stage (str): Name of the stage.
+        model (str): Model name of the request.
+        dataset (str): Type of dataset ('anime' or 'manga').
+        seconds (float): Duration of the stage.
+    """
+    STAGE_SECONDS.labels(stage, model, dataset).observe(seconds)
+
+
+def observe_model_load(model: str, seconds: float) -> None:
+    """
+    Record the duration of a model load.
+
+    Args:
+        model (str): Model name.
+        seconds (float): Duration of the load.
+    """
+    MODEL_LOAD_SECONDS.labels(model).observe(seconds)
+
+
+@contextmanager
+def stage_timer(stage: str, model: str, dataset: str) -> Iterator[None]:
+    """
+    Time the enclosed block as a request stage.
+
+    Args:
+        stage (str): Name of the stage.
+        model (str): Model name of the request.
+        dataset (str): Type of dataset ('anime' or 'manga').
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, model, dataset, time.perf_counter() - start)
+
+
+def update_cache_metrics(name: str, stats: Dict[str, Any]) -> None:
+    """
+    Publish the counters of a cache of this process.
+
+    Args:
+        name (str): Name of the cache.
+        stats (Dict[str, Any]): Statistics as returned by TTLCache.stats.
+    """
+    _advance(CACHE_HITS, stats["hits"], name)
+    _advance(CACHE_MISSES, stats["misses"], name)
+    CACHE_ENTRIES.labels(name).set(stats["entries"])
+    CACHE_BYTES.labels(name).set(stats["bytes"])
+
+
+def update_registry_metrics(stats: Dict[str, Any]) -> None:
+    """
+    Publish the resident models of this process.
+
+    Args:
+        stats (Dict[str, Any]): Statistics as returned by ModelRegistry.stats.
+    """
+    LOADED_MODELS.set(len(stats["loaded_models"]))
+    MODEL_BYTES.set(stats["resident_bytes"])
+
+
+def update_memory_metrics(stats: Dict[str, Any]) -> None:
+    """
+    Publish the memory manager state of this process.
+
+    Args:
+        stats (Dict[str, Any]): Statistics as returned by MemoryManager.stats.
+    """
+    if stats["rss_bytes"] is not None:
+        PROCESS_RSS_BYTES.set(stats["rss_bytes"])
+    for reason, count in stats["collections"].items():
+        _advance(MEMORY_COLLECTIONS, count, reason)
+    _advance(MEMORY_FREED_BYTES, stats["freed_bytes"])
+    _advance(MEMORY_EVICTED_MODELS, stats["evicted_models"])
+
+
+def update_admission_metrics(stats: Dict[str, Any]) -> None:
+    """
+    Publish the admission controller state of this process.
+
+    Args:
+        stats (Dict[str, Any]): Statistics as returned by AdmissionController.stats.
+    """
+    ADMISSION_IN_FLIGHT.set(stats["in_flight"])
+    ADMISSION_QUEUE_DEPTH.set(stats["queue_depth"])
+    _advance(ADMISSION_ADMITTED, stats["admitted"])
+    for reason, count in stats["shed"].items():
+        _advance(ADMISSION_SHED, count, reason)
+
+
+def _advance_cumulative(counter: Counter, buckets: Dict[str, int]) -> None:
+    # Publishes per-bucket counts as cumulative counts, like Prometheus histograms
+    total = 0
+    for bound, count in buckets.items():
+        total += count
+        _advance(counter, total, bound)
+
+
+def update_batcher_metrics(stats: Dict[str, Any]) -> None:
+    """
+    Publish the encode batcher histograms of this process.
+
+    The histograms are kept by the batcher and exported as counters with an "le"
+    label holding cumulative counts, so that the buckets, counts (le="+Inf") and
+    sums of all workers add up like those of a Prometheus histogram.
+
+    Args:
+        stats (Dict[str, Any]): Statistics as returned by EncodeScheduler.stats.
+    """
+    ENCODE_PENDING.set(stats["pending"])
+    _advance_cumulative(ENCODE_QUEUE_DEPTHS, stats["queue_depth"]["buckets"])
+    _advance(ENCODE_QUEUED_AHEAD, stats["queue_depth"]["sum"])
+    _advance_cumulative(ENCODE_BATCH_SIZES, stats["batch_size"]["buckets"])
+    _advance(ENCODE_BATCHED_DESCRIPTIONS, stats["batch_size"]["sum"])
+
+
+def update_index_metrics(indexes: Dict[Tuple[str, str], Any]) -> None:
+    """
+    Publish the sizes of the search indexes loaded by this process.
+
+    Args:
+        indexes (Dict[Tuple[str, str], Any]): Search indexes keyed by (dataset type,
+            model name).
+    """
+    for (dataset_type, model_name), index in list(indexes.items()):
+        INDEX_BYTES.labels(model_name, dataset_type).set(index.nbytes)
+
+
+class CacheHitRatioCollector:
+    """
+    Collector that forwards the metrics of a registry and derives cache hit ratios.
+
+    The ratio is computed from the hit and miss counts after they were aggregated
+    over all workers, which per-worker ratios could not be.
+
+    Attributes:
+        source (Any): Registry (or collector) whose metrics are forwarded.
+    """
+
+    def __init__(self, source: Any):
+        self.source = source
+
+    def collect(self) -> Iterator[Any]:
+        """
+        Yield the metrics of the source followed by the cache hit ratios.
+
+        Yields:
+            Any: Metric families.
+        """
+        counts: Dict[str, Dict[str, float]] = {}
+        for family in self.source.collect():
+            if family.name in ("anisearch_cache_hits", "anisearch_cache_misses"):
+                for sample in family.samples:
+                    if not sample.name.endswith("_total"):
+                        continue
+                    cache = counts.setdefault(sample.labels["cache"], {})
+                    cache[family.name] = cache.get(family.name, 0.0) + sample.value
+            yield family
+        ratio = GaugeMetricFamily(
+            "anisearch_cache_hit_ratio",
+            "Share of cache lookups that were hits, over all workers.",
+            labels=["cache"],
+        )
+        for cache, values in sorted(counts.items()):
+            hits = values.get("anisearch_cache_hits", 0.0)
+            lookups = hits + values.get("anisearch_cache_misses", 0.0)
+            ratio.add_metric([cache], hits / lookups if lookups else 0.0)
+        yield ratio
+
+
+def multiprocess_dir() -> Optional[str]:
+    """
+    Return the directory shared by the processes for their metric values.
+
+    Returns:
+        Optional[str]: PROMETHEUS_MULTIPROC_DIR, or None in single-process mode.
+    """
+    return os.getenv("PROMETHEUS_MULTIPROC_DIR") or None
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Render the metrics of all processes in the Prometheus text format.
+
+    Returns:
+        Tuple[bytes, str]: Exposition body and its content type.
+    """
+    if multiprocess_dir() is not None:
+        source = CollectorRegistry()
+        multiprocess.MultiProcessCollector(source)
+    else:
+        source = REGISTRY
+    registry = CollectorRegistry()
+    registry.register(CacheHitRatioCollector(source))
+    return generate_latest(registry), CONTENT_TYPE_LATEST
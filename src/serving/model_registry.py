@@ -0,0 +1,312 @@
+"""
+Process-wide registry that keeps loaded Sentence Transformer models resident.
+
+Loading a model (especially the larger T5 variants) takes seconds to minutes, so the
+API keeps every model it has loaded in memory and hands the same instance to later
+requests. When the configured model count or byte budget is exceeded the least
+recently used models are evicted until the registry fits again. The process memory
+budget is only checked once per load and evicts at most one model, because most of
+the memory of a worker (memory-mapped embeddings, shared segments, datasets) is not
+given back by evicting models.
+
+Key Features:
+    - LRU ordering of loaded models with thread-safe access
+    - Byte budget based on the estimated parameter/buffer size of each model
+    - Optional budget on the private memory (USS) of the process, sampled once
+      after every load
+    - Single load per model even when several threads request it at once
+    - Hit, miss, load and eviction counters for monitoring
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import torch
+
+try:
+    import psutil  # type: ignore
+except ImportError:  # pragma: no cover - psutil is optional
+    psutil = None
+
+
+def current_rss_bytes() -> Optional[int]:
+    """
+    Return the resident set size of the current process in bytes.
+
+    Uses psutil when it is installed and falls back to /proc/self/statm on Linux.
+
+    Returns:
+        Optional[int]: Resident memory in bytes, or None if it cannot be determined.
+    """
+    if psutil is not None:
+        return int(psutil.Process().memory_info().rss)
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def current_private_bytes() -> Optional[int]:
+    """
+    Return the private memory (unique set size) of the current process in bytes.
+
+    Unlike RSS, this excludes pages shared with other processes, such as the
+    memory-mapped embeddings and search index segments of the workers. Uses psutil
+    when it is installed and falls back to /proc/self/smaps_rollup on Linux.
+
+    Returns:
+        Optional[int]: Private memory in bytes, or None if it cannot be determined.
+    """
+    if psutil is not None:
+        try:
+            return int(psutil.Process().memory_full_info().uss)
+        except (psutil.Error, AttributeError):
+            pass
+    try:
+        total = 0
+        with open("/proc/self/smaps_rollup", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                    total += int(line.split()[1]) * 1024
+        return total
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """
+    Estimate the memory held by a model from its parameters, buffers and packed
+    int8 weights.
+
+    Args:
+        model (Any): Model instance. Models that are not torch modules count with their
+            nbytes attribute (e.g. exported encoders), or as 0 bytes without one.
+
+    Returns:
+        int: Estimated number of bytes held by the model's tensors.
+    """
+    if not isinstance(model, torch.nn.Module):
+        return int(getattr(model, "nbytes", 0))
+    total = 0
+    tensors = list(model.parameters()) + list(model.buffers())
+    for module in model.modules():
+        # Dynamically quantized Linear layers keep their weights in packed params
+        if isinstance(module, torch.ao.nn.quantized.modules.linear.LinearPackedParams):
+            weight, bias = module._weight_bias()  # pylint: disable=protected-access
+            tensors.extend(t for t in (weight, bias) if t is not None)
+    for tensor in tensors:
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    """
+    Thread-safe LRU cache of loaded models with a memory budget.
+
+    Attributes:
+        loader (Callable[[str], Any]): Function that loads a model given its name.
+        max_bytes (Optional[int]): Maximum total estimated size of resident models.
+        max_models (Optional[int]): Maximum number of resident models.
+        max_rss_bytes (Optional[int]): Private memory of the process above which one
+            model is evicted after a load.
+        size_of (Callable[[Any], int]): Function estimating the size of a model in bytes.
+        on_evict (Optional[Callable[[str], None]]): Called with the model name after a
+            model has been evicted and the registry no longer references it.
+        memory_reader (Callable[[], Optional[int]]): Returns the private memory of the
+            process in bytes, compared with max_rss_bytes.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Any],
+        max_bytes: Optional[int] = None,
+        max_models: Optional[int] = None,
+        max_rss_bytes: Optional[int] = None,
+        size_of: Callable[[Any], int] = estimate_model_bytes,
+        on_evict: Optional[Callable[[str], None]] = None,
+        memory_reader: Callable[[], Optional[int]] = current_private_bytes,
+    ):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.max_models = max_models
+        self.max_rss_bytes = max_rss_bytes
+        self.size_of = size_of
+        self.on_evict = on_evict
+        self.memory_reader = memory_reader
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Per-model load locks, dropped once no thread is loading or waiting
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._load_waiters: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def get(self, name: str) -> Any:
+        """
+        Return the model registered under name, loading it on first use.
+
+        Args:
+            name (str): Model name passed to the loader.
+
+        Returns:
+            Any: The resident model instance.
+
+        Raises:
+            Exception: Any exception raised by the loader is propagated unchanged.
+        """
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                self.hits += 1
+                return self._models[name]
+            self.misses += 1
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+            self._load_waiters[name] = self._load_waiters.get(name, 0) + 1
+
+        try:
+            with load_lock:
+                return self._load(name)
+        finally:
+            with self._lock:
+                self._load_waiters[name] -= 1
+                if not self._load_waiters[name]:
+                    del self._load_waiters[name]
+                    del self._load_locks[name]
+
+    def evict(self, name: str) -> bool:
+        """
+        Remove a model from the registry.
+
+        Args:
+            name (str): Name of the model to evict.
+
+        Returns:
+            bool: True if the model was resident and has been removed.
+        """
+        with self._lock:
+            model = self._models.pop(name, None)
+            if model is None:
+                return False
+            self._sizes.pop(name, None)
+            self.evictions += 1
+        del model
+        logging.info("Evicted model '%s' from the registry.", name)
+        if self.on_evict is not None:
+            self.on_evict(name)
+        return True
+
+    def evict_lru(self, keep: Optional[str] = None) -> Optional[str]:
+        """
+        Evict the least recently used model.
+
+        Args:
+            keep (Optional[str]): Model name that must not be evicted.
+
+        Returns:
+            Optional[str]: Name of the evicted model, or None if nothing was evicted.
+        """
+        with self._lock:
+            candidates = [name for name in self._models if name != keep]
+        if not candidates:
+            return None
+        return candidates[0] if self.evict(candidates[0]) else None
+
+    def clear(self) -> None:
+        """Evict every resident model."""
+        for name in self.loaded_models():
+            self.evict(name)
+
+    def loaded_models(self) -> list:
+        """
+        Return the names of resident models from least to most recently used.
+
+        Returns:
+            list: Names of the resident models.
+        """
+        with self._lock:
+            return list(self._models)
+
+    def resident_bytes(self) -> int:
+        """
+        Return the estimated total size of resident models.
+
+        Returns:
+            int: Sum of the estimated sizes in bytes.
+        """
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return counters describing registry activity.
+
+        Returns:
+            Dict[str, Any]: Hit, miss, load and eviction counts along with the
+            resident model names and their estimated total size.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "load_seconds": self.load_seconds,
+                "loaded_models": list(self._models),
+                "resident_bytes": sum(self._sizes.values()),
+            }
+
+    def _load(self, name: str) -> Any:
+        # Called with the load lock of the model held
+        with self._lock:
+            # Another thread may have finished loading while we waited
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name]
+
+        start_time = time.time()
+        model = self.loader(name)
+        elapsed = time.time() - start_time
+        size = self.size_of(model)
+        logging.info(
+            "Loaded model '%s' in %.2fs (%.1f MB).", name, elapsed, size / 2**20
+        )
+
+        with self._lock:
+            self._models[name] = model
+            self._sizes[name] = size
+            self.loads += 1
+            self.load_seconds += elapsed
+        self._enforce_budget(keep=name)
+        return model
+
+    def _over_budget(self) -> bool:
+        with self._lock:
+            if self.max_models is not None and len(self._models) > self.max_models:
+                return True
+            return (
+                self.max_bytes is not None
+                and sum(self._sizes.values()) > self.max_bytes
+            )
+
+    def _enforce_budget(self, keep: str) -> None:
+        # The model count and estimated sizes are exact, so models are evicted
+        # until they fit
+        while self._over_budget():
+            if self.evict_lru(keep=keep) is None:
+                return
+        # Most of the process memory is not freed by evicting models, so a load
+        # evicts at most one model for it and the next load measures again
+        if self.max_rss_bytes is not None:
+            private = self.memory_reader()
+            if private is not None and private > self.max_rss_bytes:
+                self.evict_lru(keep=keep)
@@ -0,0 +1,142 @@
+"""
+Cursor-based pagination over cached, ranked search results.
+
+The first request for a query computes a ranked, deduplicated list of matches up to a
+configurable depth and caches it under a key built from the model, the dataset and
+the normalized description. Responses carry an opaque cursor pointing at the next
+unread position in that list, so later pages are served by slicing the cached list
+without encoding the description or scoring the corpus again.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import re
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class RankedResults(NamedTuple):
+    """
+    Ranked, deduplicated matches of a query.
+
+    Attributes:
+        scores (np.ndarray): Similarity score of every match, in descending order.
+        rows (np.ndarray): Dataset row of every match.
+        columns (np.ndarray): Synopsis column id of every match.
+        complete (bool): Whether the list holds every match of the query, i.e. it was
+            not cut off at the requested depth.
+    """
+
+    scores: np.ndarray
+    rows: np.ndarray
+    columns: np.ndarray
+    complete: bool
+
+    def __len__(self) -> int:  # type: ignore[override]
+        return int(self.scores.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        """int: Bytes held by the result arrays."""
+        return int(self.scores.nbytes + self.rows.nbytes + self.columns.nbytes)
+
+    def covers(self, end: int) -> bool:
+        """
+        Check whether the list can serve every position before end.
+
+        Args:
+            end (int): Exclusive end position of the requested slice.
+
+        Returns:
+            bool: True if the slice can be served from this list.
+        """
+        return self.complete or len(self) >= end
+
+
+def normalize_description(description: str) -> str:
+    """
+    Canonicalize a description so whitespace variants share cache entries.
+
+    Args:
+        description (str): Description as sent by the client.
+
+    Returns:
+        str: Description with surrounding whitespace removed and inner runs of
+        whitespace collapsed to single spaces.
+    """
+    return re.sub(r"\s+", " ", description).strip()
+
+
+def query_key(
+    model_name: str,
+    dataset_type: str,
+    description: str,
+    nprobe: Optional[int] = None,
+    filters: Optional[str] = None,
+) -> Tuple[str, ...]:
+    """
+    Build the cache key of a query.
+
+    Args:
+        model_name (str): Name of the model.
+        dataset_type (str): Type of dataset ('anime' or 'manga').
+        description (str): Description as sent by the client.
+        nprobe (Optional[int]): Number of IVF lists probed, if set by the client.
+        filters (Optional[str]): Canonical key of the metadata filter of the query,
+            if any (see MetadataFilter.key in filters.py).
+
+    Returns:
+        Tuple[str, ...]: Key identifying the query.
+    """
+    key = (model_name, dataset_type, normalize_description(description))
+    if nprobe is not None:
+        key += (f"nprobe={nprobe}",)
+    if filters is not None:
+        key += (f"filters={filters}",)
+    return key
+
+
+def _key_digest(key: Tuple[str, ...]) -> str:
+    return hashlib.sha256("\x00".join(key).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(key: Tuple[str, ...], offset: int) -> str:
+    """
+    Encode an opaque cursor for a position in a query's ranked results.
+
+    Args:
+        key (Tuple[str, ...]): Key of the query, see query_key.
+        offset (int): Position of the next result to return.
+
+    Returns:
+        str: URL-safe cursor string.
+    """
+    payload = json.dumps({"q": _key_digest(key), "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, key: Tuple[str, ...]) -> int:
+    """
+    Decode a cursor and check that it belongs to the given query.
+
+    Args:
+        cursor (str): Cursor returned by a previous response.
+        key (Tuple[str, ...]): Key of the query the cursor is used with.
+
+    Returns:
+        int: Position of the next result to return.
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for a different query.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        digest, offset = payload["q"], payload["o"]
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if digest != _key_digest(key) or not isinstance(offset, int) or offset < 0:
+        raise ValueError("Invalid cursor")
+    return offset
@@ -0,0 +1,386 @@
+"""
+Pre-serialized response payloads of the dataset rows.
+
+Every search result is a dataset row without the synopsis variants that did not
+match, plus the matching synopsis, its rank and its similarity. Instead of converting
+the wide merged row to a dict and filtering it on every hit, the JSON of every row's
+fixed fields and of every synopsis variant is serialized once. The fragments are kept
+in flat byte buffers with offset arrays, so a result is two slices and a splice of
+rank, similarity and synopsis, and a response is a join of the results.
+
+The store is built from the merged dataset when the API starts, or ahead of time
+and memory-mapped:
+
+```
+python -m src.serving.payload_store --type <dataset_type>
+```
+
+The store is saved to model/payloads/[type]/.
+
+Key Features:
+    - One uint8 buffer plus int64 offsets for the row fields and for every synopsis
+      column, i.e. no Python objects per row
+    - Missing values serialized as null rather than NaN, so responses are valid JSON
+    - Persisted next to the embeddings and memory-mapped at load time, and rebuilt
+      when the merged CSV changed since the store was saved
+"""
+
+# pylint: disable=E0401, E0611
+import argparse
+import json
+import math
+import os
+import sys
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dataset_io import read_dataset  # pylint: disable=wrong-import-position  # noqa: E402
+from serving.response_encoding import dumps  # pylint: disable=wrong-import-position  # noqa: E402
+from serving.search_index import SYNOPSIS_COLUMNS  # pylint: disable=wrong-import-position  # noqa: E402
+
+
+def json_value(value: Any) -> Any:
+    """
+    Convert a dataset value to a JSON-serializable value.
+
+    Args:
+        value (Any): Value of a dataset cell.
+
+    Returns:
+        Any: The value as a Python scalar, with missing values mapped to None.
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return value
+
+
+def pack_fragments(fragments: Iterable[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Concatenate byte strings into one buffer with offsets.
+
+    Args:
+        fragments (Iterable[bytes]): Byte strings to concatenate.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: uint8 buffer and int64 offsets (one more than
+        the number of fragments), fragment i spanning offsets[i]:offsets[i + 1].
+    """
+    fragments = list(fragments)
+    offsets = np.zeros(len(fragments) + 1, dtype=np.int64)
+    np.cumsum([len(fragment) for fragment in fragments], out=offsets[1:])
+    data = np.frombuffer(b"".join(fragments), dtype=np.uint8)
+    return data, offsets
+
+
+class PayloadStore:
+    """
+    JSON fragments of the row fields and synopsis variants of a dataset.
+
+    Attributes:
+        columns (List[str]): Synopsis columns with stored fragments.
+        row_data (np.ndarray): uint8 buffer of the row fields of every row, each
+            serialized as the members of a JSON object without braces.
+        row_offsets (np.ndarray): int64 offsets of every row into row_data.
+        synopsis_data (List[np.ndarray]): uint8 buffer of the JSON strings of every
+            synopsis column (null for missing synopses).
+        synopsis_offsets (List[np.ndarray]): int64 offsets into synopsis_data.
+        source_mtime (Optional[float]): Modification time of the merged CSV the
+            store was built from, if known.
+    """
+
+    def __init__(
+        self,
+        columns: List[str],
+        row_data: np.ndarray,
+        row_offsets: np.ndarray,
+        synopsis_data: List[np.ndarray],
+        synopsis_offsets: List[np.ndarray],
+        source_mtime: Optional[float] = None,
+    ):
+        self.columns = columns
+        self.source_mtime = source_mtime
+        self.row_data = row_data
+        self.row_offsets = row_offsets
+        self.synopsis_data = synopsis_data
+        self.synopsis_offsets = synopsis_offsets
+        self._positions = {col: i for i, col in enumerate(columns)}
+        # The matching variant is returned under its own key unless it is "synopsis"
+        self._keys = [
+            dumps(col) + b":" if col != "synopsis" else b"" for col in columns
+        ]
+
+    @property
+    def size(self) -> int:
+        """int: Number of rows in the store."""
+        return int(self.row_offsets.shape[0] - 1)
+
+    @property
+    def nbytes(self) -> int:
+        """int: Bytes held by the buffers and offsets."""
+        return int(
+            self.row_data.nbytes
+            + self.row_offsets.nbytes
+            + sum(data.nbytes for data in self.synopsis_data)
+            + sum(offsets.nbytes for offsets in self.synopsis_offsets)
+        )
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, synopsis_columns: List[str]) -> "PayloadStore":
+        """
+        Serialize the fields and synopsis variants of every row of a dataset.
+
+        Args:
+            df (pd.DataFrame): Merged dataset.
+            synopsis_columns (List[str]): Synopsis columns of the dataset.
+
+        Returns:
+            PayloadStore: The store.
+        """
+        columns = [col for col in synopsis_columns if col in df.columns]
+        fields = [col for col in df.columns if col not in synopsis_columns]
+        keys = [dumps(field) + b":" for field in fields]
+        # Whole columns are converted to Python objects at once, which is much faster
+        # than iterating over rows
+        records = (
+            zip(*(df[field].tolist() for field in fields)) if fields else [()] * len(df)
+        )
+        row_data, row_offsets = pack_fragments(
+            b",".join(key + dumps(json_value(v)) for key, v in zip(keys, values))
+            for values in records
+        )
+        synopsis_data: List[np.ndarray] = []
+        synopsis_offsets: List[np.ndarray] = []
+        for col in columns:
+            data, offsets = pack_fragments(
+                dumps(json_value(v)) for v in df[col].tolist()
+            )
+            synopsis_data.append(data)
+            synopsis_offsets.append(offsets)
+        return cls(columns, row_data, row_offsets, synopsis_data, synopsis_offsets)
+
+    def row(self, row: int) -> bytes:
+        """
+        Return the serialized fields of a row.
+
+        Args:
+            row (int): Dataset row.
+
+        Returns:
+            bytes: Comma-separated JSON object members, without braces.
+        """
+        return self.row_data[
+            self.row_offsets[row] : self.row_offsets[row + 1]
+        ].tobytes()
+
+    def synopsis(self, row: int, column: str) -> bytes:
+        """
+        Return the serialized synopsis of a row in a column.
+
+        Args:
+            row (int): Dataset row.
+            column (str): Synopsis column.
+
+        Returns:
+            bytes: JSON string, or null if the synopsis is missing.
+        """
+        position = self._positions[column]
+        offsets = self.synopsis_offsets[position]
+        return self.synopsis_data[position][offsets[row] : offsets[row + 1]].tobytes()
+
+    def result(self, row: int, column: str, rank: int, similarity: float) -> bytes:
+        """
+        Assemble the JSON object of a search result.
+
+        Args:
+            row (int): Dataset row of the result.
+            column (str): Synopsis column that matched.
+            rank (int): Rank of the result.
+            similarity (float): Similarity of the result.
+
+        Returns:
+            bytes: JSON object with the row fields, the matching synopsis under its
+            own key and as "synopsis", and the rank and similarity.
+        """
+        synopsis = self.synopsis(row, column)
+        members = (
+            [self.row(row)] if self.row_offsets[row + 1] > self.row_offsets[row] else []
+        )
+        key = self._keys[self._positions[column]]
+        if key:
+            members.append(key + synopsis)
+        members.append(
+            b'"rank":%d,"similarity":%s,"synopsis":%s'
+            % (rank, repr(float(similarity)).encode(), synopsis)
+        )
+        return b"{" + b",".join(members) + b"}"
+
+    def save(self, directory: str) -> None:
+        """
+        Persist the store so it can later be memory-mapped.
+
+        Args:
+            directory (str): Directory to write the store files to.
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "rows.npy"), self.row_data)
+        np.save(os.path.join(directory, "row_offsets.npy"), self.row_offsets)
+        for i, (data, offsets) in enumerate(
+            zip(self.synopsis_data, self.synopsis_offsets)
+        ):
+            np.save(os.path.join(directory, f"synopsis_{i}.npy"), data)
+            np.save(os.path.join(directory, f"synopsis_{i}_offsets.npy"), offsets)
+        with open(os.path.join(directory, "payloads.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "columns": self.columns,
+                    "rows": self.size,
+                    "source_mtime": self.source_mtime,
+                },
+                f,
+                indent=4,
+            )
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["PayloadStore"]:
+        """
+        Memory-map a persisted store.
+
+        Args:
+            directory (str): Directory the store was saved to.
+
+        Returns:
+            Optional[PayloadStore]: The store, or None if none was saved.
+        """
+        metadata_path = os.path.join(directory, "payloads.json")
+        if not os.path.exists(metadata_path):
+            return None
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+        def load_array(name: str) -> np.ndarray:
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        columns = metadata["columns"]
+        return cls(
+            columns,
+            load_array("rows.npy"),
+            load_array("row_offsets.npy"),
+            [load_array(f"synopsis_{i}.npy") for i in range(len(columns))],
+            [load_array(f"synopsis_{i}_offsets.npy") for i in range(len(columns))],
+            metadata.get("source_mtime"),
+        )
+
+
+def payload_store_dir(root: str, dataset_type: str) -> str:
+    """
+    Return the directory in which the payload store of a dataset is persisted.
+
+    Args:
+        root (str): Directory that contains the merged datasets.
+        dataset_type (str): Type of dataset ('anime' or 'manga').
+
+    Returns:
+        str: Path of the payload store directory.
+    """
+    return os.path.join(root, "payloads", dataset_type)
+
+
+def dataset_csv_path(root: str, dataset_type: str) -> str:
+    """
+    Return the path of the merged CSV dataset a payload store is built from.
+
+    Args:
+        root (str): Directory that contains the merged datasets.
+        dataset_type (str): Type of dataset ('anime' or 'manga').
+
+    Returns:
+        str: Path of the merged CSV dataset.
+    """
+    return os.path.join(root, f"merged_{dataset_type}_dataset.csv")
+
+
+def load_or_build_payload_store(
+    root: str, dataset_type: str, df: pd.DataFrame, synopsis_columns: List[str]
+) -> PayloadStore:
+    """
+    Memory-map the persisted payload store of a dataset, or build it from the dataset.
+
+    A persisted store is only used if it matches the rows and synopsis columns of
+    the dataset and was built from the current merged CSV, i.e. it recorded the
+    modification time the CSV still has (or the CSV does not exist). A re-merge
+    that keeps the row count therefore still rebuilds the store.
+
+    Args:
+        root (str): Directory that contains the merged datasets.
+        dataset_type (str): Type of dataset ('anime' or 'manga').
+        df (pd.DataFrame): Merged dataset.
+        synopsis_columns (List[str]): Synopsis columns of the dataset.
+
+    Returns:
+        PayloadStore: The store.
+    """
+    store = PayloadStore.load(payload_store_dir(root, dataset_type))
+    columns = [col for col in synopsis_columns if col in df.columns]
+    csv_path = dataset_csv_path(root, dataset_type)
+    source_mtime = os.path.getmtime(csv_path) if os.path.exists(csv_path) else None
+    if (
+        store is not None
+        and store.size == len(df)
+        and store.columns == columns
+        and (source_mtime is None or store.source_mtime == source_mtime)
+    ):
+        return store
+    store = PayloadStore.build(df, synopsis_columns)
+    store.source_mtime = source_mtime
+    return store
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command-line arguments for building a payload store.
+
+    Returns:
+        argparse.Namespace: Parsed arguments containing:
+            type (str): Dataset type ('anime' or 'manga')
+    """
+    parser = argparse.ArgumentParser(
+        description="Pre-serialize the response payloads of a merged dataset."
+    )
+    parser.add_argument(
+        "--type",
+        type=str,
+        choices=["anime", "manga"],
+        required=True,
+        help="Type of dataset to build the payload store for: 'anime' or 'manga'.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Build the payload store of a merged dataset and save it under model/payloads/.
+    """
+    args = parse_args()
+    csv_path = dataset_csv_path("model", args.type)
+    df = read_dataset(csv_path)
+    store = PayloadStore.build(df, SYNOPSIS_COLUMNS[args.type])
+    store.source_mtime = os.path.getmtime(csv_path)
+    directory = payload_store_dir("model", args.type)
+    store.save(directory)
+    print(
+        f"Saved payloads of {store.size} rows ({store.nbytes / 2**20:.1f} MB) "
+        f"to {directory}"
+    )
+
+
+if __name__ == "__main__":
+    main()
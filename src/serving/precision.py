@@ -0,0 +1,152 @@
+"""
+Storage precisions of embedding artifacts.
+
+Embeddings can be stored as float32, float16 or bfloat16. NumPy has no bfloat16
+type, so bfloat16 values are stored as the upper 16 bits of their float32 pattern in
+uint16 arrays and the precision is recorded in the manifest (and the index metadata)
+next to them. Reduced-precision matrices are kept as they are stored and converted
+to float32 only for the rows or blocks that are being computed on.
+
+Key Features:
+    - Conversion from float32 to every storage precision, with round-to-nearest-even
+      for bfloat16
+    - Conversion of any stored block back to float32
+    - Zero-copy torch views of stored matrices, including torch.bfloat16
+    - A float32 view that converts rows on indexing, for code that expects float rows
+"""
+
+from typing import Any, Tuple
+
+import numpy as np
+import torch
+
+PRECISIONS = ("fp32", "fp16", "bf16")
+
+STORAGE_DTYPES = {
+    "fp32": np.float32,
+    "fp16": np.float16,
+    "bf16": np.uint16,
+}
+
+
+def check_precision(precision: str) -> str:
+    """
+    Validate a storage precision name.
+
+    Args:
+        precision (str): Name of the precision.
+
+    Returns:
+        str: The precision.
+
+    Raises:
+        ValueError: If the precision is not supported.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(
+            f"Unsupported precision '{precision}', expected one of {PRECISIONS}"
+        )
+    return precision
+
+
+def to_storage(embeddings: np.ndarray, precision: str) -> np.ndarray:
+    """
+    Convert float embeddings to a storage precision.
+
+    Args:
+        embeddings (np.ndarray): Float array.
+        precision (str): Target precision ('fp32', 'fp16' or 'bf16').
+
+    Returns:
+        np.ndarray: Array in the storage dtype of the precision.
+    """
+    check_precision(precision)
+    if precision != "bf16":
+        return np.asarray(embeddings, dtype=STORAGE_DTYPES[precision])
+    bits = np.ascontiguousarray(embeddings, dtype=np.float32).view(np.uint32)
+    # Round to nearest, ties to even, on the 16 bits that are dropped
+    rounding = np.uint32(0x7FFF) + ((bits >> np.uint32(16)) & np.uint32(1))
+    return ((bits + rounding) >> np.uint32(16)).astype(np.uint16)
+
+
+def to_float32(stored: np.ndarray, precision: str) -> np.ndarray:
+    """
+    Convert stored embeddings back to float32.
+
+    Args:
+        stored (np.ndarray): Array in the storage dtype of the precision.
+        precision (str): Precision of the array.
+
+    Returns:
+        np.ndarray: float32 array.
+    """
+    if precision != "bf16":
+        return np.asarray(stored, dtype=np.float32)
+    return (np.asarray(stored, dtype=np.uint16).astype(np.uint32) << 16).view(
+        np.float32
+    )
+
+
+def to_tensor(stored: np.ndarray, precision: str) -> torch.Tensor:
+    """
+    Wrap a stored matrix as a tensor of the matching dtype without copying.
+
+    Args:
+        stored (np.ndarray): Array in the storage dtype of the precision.
+        precision (str): Precision of the array.
+
+    Returns:
+        torch.Tensor: float32, float16 or bfloat16 tensor sharing memory with stored.
+    """
+    tensor = torch.from_numpy(np.asarray(stored))
+    if precision == "bf16":
+        return tensor.view(torch.int16).view(torch.bfloat16)
+    return tensor
+
+
+class Float32View:
+    """
+    Read-only float32 view of a matrix stored in reduced precision.
+
+    Indexing the view converts only the selected rows, so code written for float32
+    matrices (e.g. building IVF or binary indexes) works on stored matrices without a
+    full float32 copy.
+
+    Attributes:
+        stored (np.ndarray): Matrix in the storage dtype of the precision.
+        precision (str): Precision of the matrix.
+    """
+
+    def __init__(self, stored: np.ndarray, precision: str):
+        self.stored = stored
+        self.precision = check_precision(precision)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """Tuple[int, ...]: Shape of the matrix."""
+        return tuple(self.stored.shape)
+
+    @property
+    def ndim(self) -> int:
+        """int: Number of dimensions of the matrix."""
+        return int(self.stored.ndim)
+
+    def __len__(self) -> int:
+        return len(self.stored)
+
+    def __getitem__(self, key: Any) -> np.ndarray:
+        return to_float32(self.stored[key], self.precision)
+
+
+def float32_rows(stored: np.ndarray, precision: str) -> Any:
+    """
+    Return the matrix itself for float32 storage and a Float32View otherwise.
+
+    Args:
+        stored (np.ndarray): Array in the storage dtype of the precision.
+        precision (str): Precision of the array.
+
+    Returns:
+        Any: Object whose rows index as float32 arrays.
+    """
+    return stored if precision == "fp32" else Float32View(stored, precision)
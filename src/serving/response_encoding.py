@@ -0,0 +1,189 @@
+"""
+JSON serialization and content-encoding negotiation of API responses.
+
+The API serializes everything it returns through orjson when it is installed, which
+encodes numpy scalars and arrays natively and writes NaN as null. Without orjson the
+standard library encoder is used with the same compact separators. Large responses
+are compressed with brotli or gzip, whichever the client prefers and is available.
+
+Key Features:
+    - A Flask JSON provider that serializes and parses with orjson, so jsonify and
+      request.json use it too
+    - Compact UTF-8 JSON bytes for pre-serialized payloads and response envelopes
+    - Accept-Encoding negotiation honouring q-values, preferring brotli over gzip
+    - One-shot compression of buffered bodies and flushed compression of streamed
+      bodies, so every NDJSON line reaches the client as soon as it is produced
+"""
+
+# pylint: disable=E0401, E0611
+import gzip
+import json
+import zlib
+from typing import Any, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import parse_accept_header
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    """
+    Convert values the serializer has no native encoding for.
+
+    Args:
+        value (Any): Value to convert.
+
+    Returns:
+        Any: A JSON-serializable equivalent.
+
+    Raises:
+        TypeError: If the value cannot be serialized.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if value is pd.NA or value is pd.NaT:
+        return None
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_default)
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Serialize a value to compact UTF-8 JSON.
+
+    Args:
+        value (Any): Value to serialize, may contain numpy scalars and arrays.
+
+    Returns:
+        bytes: The JSON encoding.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+    return _ENCODER.encode(value).encode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    """
+    Parse JSON.
+
+    Args:
+        data (Any): JSON document as str or bytes.
+
+    Returns:
+        Any: The parsed value.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by dumps and loads.
+
+    Installed as app.json, it makes jsonify, error responses and request.json use the
+    same serializer as the pre-serialized result payloads.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj).decode("utf-8")
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Any:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj) + b"\n", mimetype=self.mimetype)
+
+
+def available_encodings() -> List[str]:
+    """
+    Return the content encodings this server can produce, most preferred first.
+
+    Returns:
+        List[str]: 'br' if brotli is installed, and 'gzip'.
+    """
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Choose the content encoding of a response from an Accept-Encoding header.
+
+    Args:
+        accept_encoding (Optional[str]): Value of the Accept-Encoding header.
+
+    Returns:
+        Optional[str]: 'br' or 'gzip', or None if the client accepts neither.
+    """
+    if not accept_encoding:
+        return None
+    accepted = parse_accept_header(accept_encoding)
+    best_quality = 0.0
+    best = None
+    for encoding in available_encodings():
+        quality = accepted[encoding]
+        if quality > best_quality:
+            best_quality, best = quality, encoding
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    Compress a complete body.
+
+    Args:
+        data (bytes): Body to compress.
+        encoding (str): 'br' or 'gzip'.
+
+    Returns:
+        bytes: The compressed body.
+    """
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """
+    Compress a streamed body, flushing after every chunk.
+
+    Args:
+        chunks (Iterable[bytes]): Chunks of the body.
+        encoding (str): 'br' or 'gzip'.
+
+    Yields:
+        bytes: Compressed data that decodes to everything produced so far.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+        return
+    # wbits 31 selects the gzip container
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,972 @@
+"""
+Fused search index over all synopsis columns of a dataset.
+
+Instead of scoring every synopsis column separately, the index concatenates only the
+non-empty (row, column) embeddings of all columns into one contiguous matrix, together
+with parallel int32 arrays holding the dataset row and synopsis column of each vector.
+A query is then answered with a single matrix-vector product and a single top-k,
+optionally keeping only the best vector of every title.
+
+The vectors in the index are L2-normalized, so cosine similarity is a plain dot
+product. Embeddings written pre-normalized by sbert.py (as recorded in their
+manifest) are used as-is; legacy embeddings are normalized once while the index is
+built or loaded rather than on every query.
+
+The index can be built ahead of time and persisted next to the embeddings, in which
+case it is memory-mapped at load time:
+
+```
+python -m src.serving.search_index --model <model_name> --type <dataset_type>
+```
+
+The index is saved to model/[type]/[model]/search_index/. Adding --ivf also builds an
+inverted-file index (see ann.py) over the vectors, which is then used for approximate
+search of large indexes:
+
+```
+python -m src.serving.search_index --model <model_name> --type <dataset_type> --ivf
+```
+
+If sbert.py was run with --quantize int8, the index also holds int8 codes of every
+vector (see quantization.py). Searches then rank all vectors by integer dot products
+and only rescore a shortlist against the memory-mapped float32 matrix. sbert.py saves
+the index itself in that case, so that the API memory-maps the float32 matrix instead
+of concatenating it in memory next to the codes. Adding --binary saves the sign bits
+of every vector (see binary.py), and searches then shortlist candidates by Hamming
+distance instead.
+
+Embeddings generated with sbert.py --precision fp16 or bf16 are indexed in the same
+precision. Exact search then converts the matrix to float32 in blocks while scoring
+it, and rescoring converts only the shortlisted rows, so no full float32 copy of the
+matrix is ever held in memory.
+"""
+
+# pylint: disable=E0401, E0611
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dataset_io import read_dataset  # pylint: disable=wrong-import-position  # noqa: E402
+from serving.ann import EXACT_SEARCH_THRESHOLD, IVFIndex  # pylint: disable=wrong-import-position  # noqa: E402
+from serving.binary import (  # pylint: disable=wrong-import-position  # noqa: E402
+    BINARY_CODES_FILE,
+    BINARY_RESCORE_FACTOR,
+    BinaryIndex,
+)
+from serving.embedding_store import (  # pylint: disable=wrong-import-position  # noqa: E402
+    EmbeddingStore,
+    embedding_model_dir,
+    embeddings_path,
+)
+from serving.manifest import read_manifest  # pylint: disable=wrong-import-position  # noqa: E402
+from serving.precision import (  # pylint: disable=wrong-import-position  # noqa: E402
+    check_precision,
+    float32_rows,
+    to_float32,
+    to_storage,
+    to_tensor,
+)
+from serving.quantization import (  # pylint: disable=wrong-import-position  # noqa: E402
+    RESCORE_FACTOR,
+    Int8Quantizer,
+    quantized_embeddings_path,
+)
+from serving.topk import batched_rank_candidates, rank_candidates  # pylint: disable=wrong-import-position  # noqa: E402
+
+SYNOPSIS_COLUMNS = {
+    "anime": [
+        "synopsis",
+        "Synopsis anime_dataset_2023",
+        "Synopsis animes dataset",
+        "Synopsis anime_270 Dataset",
+        "Synopsis Anime-2022 Dataset",
+        "Synopsis anime4500 Dataset",
+        "Synopsis wykonos Dataset",
+        "Synopsis Anime_data Dataset",
+        "Synopsis anime2 Dataset",
+        "Synopsis mal_anime Dataset",
+    ],
+    "manga": [
+        "synopsis",
+        "Synopsis jikan Dataset",
+        "Synopsis data Dataset",
+    ],
+}
+
+# Rows converted to float32 at a time when scoring reduced-precision matrices
+_SCORE_BLOCK_SIZE = 8192
+
+# Queries scored together by search_batch, bounding the (queries, vectors) matrix
+_QUERY_BLOCK_SIZE = 64
+
+# Filtered exact searches read only the selected vectors when they make up less than
+# this fraction of the index, and score the whole matrix otherwise
+FILTERED_RESCORE_FRACTION = 0.25
+
+
+def non_empty_synopsis_mask(series: pd.Series) -> np.ndarray:
+    """
+    Return a boolean mask of the rows whose synopsis is present and not blank.
+
+    Args:
+        series (pd.Series): Synopsis column of the merged dataset.
+
+    Returns:
+        np.ndarray: Boolean array with one entry per row.
+    """
+    return (series.fillna("").astype(str).str.strip() != "").to_numpy()
+
+
+def l2_normalize(embeddings: np.ndarray) -> np.ndarray:
+    """
+    Return a float32 copy of a matrix with every row scaled to unit length.
+
+    Rows with a zero norm are left as zeros.
+
+    Args:
+        embeddings (np.ndarray): Matrix of shape (vectors, dimension).
+
+    Returns:
+        np.ndarray: Normalized float32 matrix.
+    """
+    embeddings = np.array(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings /= np.maximum(norms, 1e-12)
+    return embeddings
+
+
+def _add_timing(timings: Optional[Dict[str, float]], stage: str, start: float) -> float:
+    # Accumulates the time since start under stage and returns the current time
+    now = time.perf_counter()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + now - start
+    return now
+
+
+def _unit_query(query_embedding: np.ndarray) -> np.ndarray:
+    query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+    return query / max(float(np.linalg.norm(query)), 1e-12)
+
+
+def search_index_dir(root: str, dataset_type: str, model_name: str) -> str:
+    """
+    Return the directory in which the fused index for a model is persisted.
+
+    Args:
+        root (str): Directory that contains the per-dataset embedding folders.
+        dataset_type (str): Type of dataset ('anime' or 'manga').
+        model_name (str): Model name as used by the API.
+
+    Returns:
+        str: Path of the search index directory.
+    """
+    return os.path.join(
+        root, dataset_type, embedding_model_dir(model_name), "search_index"
+    )
+
+
+class SearchIndex:
+    """
+    Contiguous matrix of all non-empty synopsis embeddings of a dataset.
+
+    Attributes:
+        embeddings (np.ndarray): Matrix of shape (vectors, dimension), in the storage
+            dtype of precision.
+        row_ids (np.ndarray): Dataset row of each vector (int32).
+        column_ids (np.ndarray): Index into columns of each vector (int32).
+        columns (List[str]): Names of the synopsis columns.
+        device (str): Device on which similarities are computed.
+        normalized (bool): Whether the rows of the matrix have unit length. If not,
+            they are normalized on every query.
+        precision (str): Storage precision of the matrix ('fp32', 'fp16' or 'bf16').
+        group_ids (Optional[np.ndarray]): Group id of every vector used to deduplicate
+            results, assigned with set_row_groups.
+        ann (Optional[IVFIndex]): Inverted-file index used for approximate search.
+        exact_threshold (int): Indexes with fewer vectors are always searched exactly.
+        quantizer (Optional[Int8Quantizer]): Calibration of the int8 codes.
+        codes (Optional[np.ndarray]): int8 code of every vector, used to shortlist
+            candidates for float rescoring.
+        rescore_factor (int): Candidates rescored in float per requested result.
+        binary (Optional[BinaryIndex]): Sign bits of every vector, used to shortlist
+            candidates by Hamming distance.
+        binary_rescore_factor (int): Candidates of the binary shortlist rescored in
+            float per requested result.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        row_ids: np.ndarray,
+        column_ids: np.ndarray,
+        columns: List[str],
+        device: str = "cpu",
+        normalized: bool = True,
+        precision: str = "fp32",
+    ):
+        self.embeddings = embeddings
+        self.row_ids = row_ids
+        self.column_ids = column_ids
+        self.columns = columns
+        self.device = device
+        self.normalized = normalized
+        self.precision = check_precision(precision)
+        self.group_ids: Optional[np.ndarray] = None
+        self.ann: Optional[IVFIndex] = None
+        self.exact_threshold = EXACT_SEARCH_THRESHOLD
+        self.quantizer: Optional[Int8Quantizer] = None
+        self.codes: Optional[np.ndarray] = None
+        self.rescore_factor = RESCORE_FACTOR
+        self.binary: Optional[BinaryIndex] = None
+        self.binary_rescore_factor = BINARY_RESCORE_FACTOR
+        self._tensor: Optional[torch.Tensor] = None
+
+    @property
+    def size(self) -> int:
+        """int: Number of vectors in the index."""
+        return int(self.embeddings.shape[0])
+
+    @property
+    def dimension(self) -> int:
+        """int: Embedding dimension of the index."""
+        return int(self.embeddings.shape[1])
+
+    @property
+    def nbytes(self) -> int:
+        """int: Bytes held by the embedding matrix and id arrays."""
+        return int(
+            self.embeddings.nbytes + self.row_ids.nbytes + self.column_ids.nbytes
+        )
+
+    def set_quantization(self, quantizer: Int8Quantizer, codes: np.ndarray) -> None:
+        """
+        Attach int8 codes so that searches shortlist candidates with them.
+
+        Args:
+            quantizer (Int8Quantizer): Calibration the codes were produced with.
+            codes (np.ndarray): int8 code of every vector of the index.
+
+        Raises:
+            ValueError: If the codes don't match the shape of the index.
+        """
+        if codes.shape != self.embeddings.shape:
+            raise ValueError("int8 codes don't match the shape of the search index")
+        self.quantizer = quantizer
+        self.codes = codes
+
+    def tensor(self) -> torch.Tensor:
+        """
+        Return the embedding matrix as a tensor on the index's device.
+
+        Returns:
+            torch.Tensor: Tensor sharing memory with the matrix on CPU, in the dtype of
+            the storage precision.
+        """
+        if self._tensor is None:
+            with warnings.catch_warnings():
+                # Persisted indexes are read-only mappings that are never written to
+                warnings.filterwarnings("ignore", message=".*non-writable.*")
+                tensor = to_tensor(self.embeddings, self.precision)
+            self._tensor = tensor.to(self.device) if self.device != "cpu" else tensor
+        return self._tensor
+
+    def scores(self, query_embedding: np.ndarray) -> np.ndarray:
+        """
+        Compute the cosine similarity between a query and every vector in the index.
+
+        Reduced-precision matrices are converted to float32 one block of rows at a
+        time, which keeps float32 accumulation without a full float32 copy.
+
+        Args:
+            query_embedding (np.ndarray): Query vector of shape (dimension,) or
+                (1, dimension).
+
+        Returns:
+            np.ndarray: Similarity score of every vector in the index.
+        """
+        query = torch.as_tensor(
+            np.array(query_embedding, dtype=np.float32).reshape(-1),
+            device=self.device,
+        )
+        with torch.no_grad():
+            query = torch.nn.functional.normalize(query, dim=0)
+            matrix = self.tensor()
+            if self.precision == "fp32":
+                if not self.normalized:
+                    matrix = torch.nn.functional.normalize(matrix, dim=1)
+                return torch.mv(matrix, query).cpu().numpy()
+            similarities = torch.empty(self.size, device=self.device)
+            for start in range(0, self.size, _SCORE_BLOCK_SIZE):
+                block = matrix[start : start + _SCORE_BLOCK_SIZE].float()
+                if not self.normalized:
+                    block = torch.nn.functional.normalize(block, dim=1)
+                torch.mv(block, query, out=similarities[start : start + len(block)])
+        return similarities.cpu().numpy()
+
+    def batch_scores(self, query_embeddings: np.ndarray) -> np.ndarray:
+        """
+        Compute the cosine similarity between several queries and every vector.
+
+        All queries are scored with one matrix-matrix product, converting
+        reduced-precision matrices to float32 one block of rows at a time.
+
+        Args:
+            query_embeddings (np.ndarray): Query vectors of shape (queries, dimension).
+
+        Returns:
+            np.ndarray: float32 similarity matrix of shape (queries, vectors).
+        """
+        queries = torch.as_tensor(
+            np.array(query_embeddings, dtype=np.float32).reshape(-1, self.dimension),
+            device=self.device,
+        )
+        with torch.no_grad():
+            queries = torch.nn.functional.normalize(queries, dim=1)
+            matrix = self.tensor()
+            if self.precision == "fp32" and self.normalized:
+                return torch.mm(queries, matrix.T).cpu().numpy()
+            similarities = torch.empty(len(queries), self.size, device=self.device)
+            for start in range(0, self.size, _SCORE_BLOCK_SIZE):
+                block = matrix[start : start + _SCORE_BLOCK_SIZE].float()
+                if not self.normalized:
+                    block = torch.nn.functional.normalize(block, dim=1)
+                similarities[:, start : start + len(block)] = torch.mm(queries, block.T)
+        return similarities.cpu().numpy()
+
+    def set_row_groups(self, row_group_ids: np.ndarray) -> None:
+        """
+        Assign a group id (e.g. a title id) to every dataset row.
+
+        The ids are mapped onto the vectors of the index once so that searches can
+        keep a single vector per group.
+
+        Args:
+            row_group_ids (np.ndarray): Integer group id of every dataset row.
+        """
+        self.group_ids = np.asarray(row_group_ids, dtype=np.int32)[self.row_ids]
+
+    def uses_ann(self) -> bool:
+        """
+        Check whether searches go through the approximate index.
+
+        Returns:
+            bool: True if an IVF index is attached and the index is large enough.
+        """
+        return self.ann is not None and self.size >= self.exact_threshold
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        unique: bool = False,
+        nprobe: Optional[int] = None,
+        timings: Optional[Dict[str, float]] = None,
+        row_mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the vectors most similar to a query.
+
+        Large indexes with an attached IVF index only score the vectors of the nprobe
+        closest lists. If those lists hold fewer than top_k results, nprobe is doubled
+        until enough results are found or every list has been probed. Otherwise, an
+        index with sign bits shortlists the binary_rescore_factor * top_k vectors
+        closest in Hamming distance, and an index with int8 codes the best
+        rescore_factor * top_k vectors by their codes, and rescores them in float.
+
+        A row mask (see filters.py) restricts every path to the vectors of the
+        selected rows before the top vectors are chosen, so filtered searches still
+        return top_k results when enough rows match. Exact searches only read the
+        selected vectors when they are a small part of the index.
+
+        Args:
+            query_embedding (np.ndarray): Query vector.
+            top_k (int): Number of vectors to return.
+            unique (bool): Keep only the best vector of every group assigned with
+                set_row_groups.
+            nprobe (Optional[int]): Number of IVF lists to probe (default: the value
+                stored with the IVF index). Ignored for exact search.
+            timings (Optional[Dict[str, float]]): If given, the seconds spent scoring
+                (including candidate selection and rescoring) and ranking are added
+                to its "similarity" and "topk" entries.
+            row_mask (Optional[np.ndarray]): Boolean mask over the dataset rows; only
+                vectors of selected rows are returned.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Scores, dataset rows and
+            column ids of the top vectors, sorted by descending similarity.
+
+        Raises:
+            ValueError: If unique results are requested before groups were assigned.
+        """
+        if unique and self.group_ids is None:
+            raise ValueError("Row groups must be set before searching for unique rows")
+        start = time.perf_counter()
+        if self.uses_ann():
+            vector_ids, scores = self._ann_candidates(
+                query_embedding, top_k, unique, nprobe, row_mask
+            )
+        elif self.binary is not None:
+            vector_ids, scores = self._binary_candidates(
+                query_embedding, top_k, unique, row_mask
+            )
+        elif self.codes is not None:
+            vector_ids, scores = self._int8_candidates(
+                query_embedding, top_k, unique, row_mask
+            )
+        elif row_mask is not None:
+            vector_ids = self.selected_vectors(row_mask)
+            if len(vector_ids) < self.size * FILTERED_RESCORE_FRACTION:
+                scores = self._rescore(vector_ids, _unit_query(query_embedding))
+            else:
+                scores = self.scores(query_embedding)[vector_ids]
+        else:
+            vector_ids, scores = None, self.scores(query_embedding)
+        start = _add_timing(timings, "similarity", start)
+        group_ids = self.group_ids if unique else None
+        if vector_ids is not None and group_ids is not None:
+            group_ids = group_ids[vector_ids]
+        indices = rank_candidates(scores, top_k, group_ids)
+        top_scores = scores[indices]
+        if vector_ids is not None:
+            indices = vector_ids[indices]
+        _add_timing(timings, "topk", start)
+        return top_scores, self.row_ids[indices], self.column_ids[indices]
+
+    def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int,
+        unique: bool = False,
+        nprobe: Optional[int] = None,
+        timings: Optional[Dict[str, float]] = None,
+        row_mask: Optional[np.ndarray] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Find the vectors most similar to each of several queries.
+
+        Exact searches score up to 64 queries at a time with one matrix-matrix
+        product and select the top vectors of all of them together. Indexes that
+        search through an IVF index or a prefilter answer every query with search,
+        since their candidates differ per query.
+
+        Args:
+            query_embeddings (np.ndarray): Query vectors of shape (queries, dimension).
+            top_k (int): Number of vectors to return per query.
+            unique (bool): Keep only the best vector of every group assigned with
+                set_row_groups.
+            nprobe (Optional[int]): Number of IVF lists to probe (default: the value
+                stored with the IVF index). Ignored for exact search.
+            timings (Optional[Dict[str, float]]): If given, the seconds spent scoring
+                and ranking all queries are added to it as by search.
+            row_mask (Optional[np.ndarray]): Boolean mask over the dataset rows; only
+                vectors of selected rows are returned.
+
+        Returns:
+            List[Tuple[np.ndarray, np.ndarray, np.ndarray]]: Scores, dataset rows and
+            column ids of the top vectors of every query, as returned by search.
+
+        Raises:
+            ValueError: If unique results are requested before groups were assigned.
+        """
+        if unique and self.group_ids is None:
+            raise ValueError("Row groups must be set before searching for unique rows")
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(
+            -1, self.dimension
+        )
+        if self.uses_ann() or self.binary is not None or self.codes is not None:
+            return [
+                self.search(query, top_k, unique, nprobe, timings, row_mask)
+                for query in queries
+            ]
+        results: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        group_ids = self.group_ids if unique else None
+        vector_ids = None if row_mask is None else self.selected_vectors(row_mask)
+        if vector_ids is not None and group_ids is not None:
+            group_ids = group_ids[vector_ids]
+        for block in range(0, len(queries), _QUERY_BLOCK_SIZE):
+            start = time.perf_counter()
+            scores = self.batch_scores(queries[block : block + _QUERY_BLOCK_SIZE])
+            if vector_ids is not None:
+                scores = scores[:, vector_ids]
+            start = _add_timing(timings, "similarity", start)
+            ranked = batched_rank_candidates(scores, top_k, group_ids)
+            for row_scores, indices in zip(scores, ranked):
+                top_scores = row_scores[indices]
+                if vector_ids is not None:
+                    indices = vector_ids[indices]
+                results.append(
+                    (
+                        top_scores,
+                        self.row_ids[indices],
+                        self.column_ids[indices],
+                    )
+                )
+            _add_timing(timings, "topk", start)
+        return results
+
+    def selected_vectors(self, row_mask: np.ndarray) -> np.ndarray:
+        """
+        Return the vectors that belong to the rows selected by a mask.
+
+        Args:
+            row_mask (np.ndarray): Boolean mask over the dataset rows.
+
+        Returns:
+            np.ndarray: Sorted ids of the selected vectors.
+        """
+        return np.flatnonzero(np.asarray(row_mask, dtype=bool)[self.row_ids])
+
+    def _shortlist(
+        self,
+        scores: np.ndarray,
+        count: int,
+        unique: bool,
+        row_mask: Optional[np.ndarray],
+    ) -> np.ndarray:
+        # Ranks the prefilter scores of the selected vectors only
+        group_ids = self.group_ids if unique else None
+        if row_mask is None:
+            return np.sort(rank_candidates(scores, count, group_ids))
+        vector_ids = self.selected_vectors(row_mask)
+        if group_ids is not None:
+            group_ids = group_ids[vector_ids]
+        return np.sort(
+            vector_ids[rank_candidates(scores[vector_ids], count, group_ids)]
+        )
+
+    def _rescore(self, vector_ids: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # Only the rows of the candidates are read from the (memory-mapped) matrix
+        vectors = to_float32(self.embeddings[vector_ids], self.precision)
+        if not self.normalized:
+            vectors = l2_normalize(vectors)
+        return vectors @ query
+
+    def _ann_candidates(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        unique: bool,
+        nprobe: Optional[int],
+        row_mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        assert self.ann is not None
+        query = _unit_query(query_embedding)
+        nprobe = min(self.ann.num_lists, nprobe or self.ann.nprobe)
+        while True:
+            vector_ids = self.ann.candidates(query, nprobe)
+            if row_mask is not None:
+                # Only selected vectors count towards top_k, so selective filters
+                # probe more lists
+                vector_ids = vector_ids[row_mask[self.row_ids[vector_ids]]]
+            found = (
+                len(np.unique(self.group_ids[vector_ids]))
+                if unique and self.group_ids is not None
+                else len(vector_ids)
+            )
+            if found >= top_k or nprobe >= self.ann.num_lists:
+                return vector_ids, self._rescore(vector_ids, query)
+            nprobe = min(self.ann.num_lists, nprobe * 2)
+
+    def _binary_candidates(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        unique: bool,
+        row_mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        assert self.binary is not None
+        query = _unit_query(query_embedding)
+        # Fewer differing sign bits rank higher
+        vector_ids = self._shortlist(
+            -self.binary.distances(query),
+            top_k * self.binary_rescore_factor,
+            unique,
+            row_mask,
+        )
+        return vector_ids, self._rescore(vector_ids, query)
+
+    def _int8_candidates(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        unique: bool,
+        row_mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        assert self.quantizer is not None and self.codes is not None
+        query = _unit_query(query_embedding)
+        vector_ids = self._shortlist(
+            self.quantizer.scores(self.codes, query),
+            top_k * self.rescore_factor,
+            unique,
+            row_mask,
+        )
+        return vector_ids, self._rescore(vector_ids, query)
+
+    def save(self, directory: str) -> None:
+        """
+        Persist the index so it can later be memory-mapped.
+
+        Args:
+            directory (str): Directory to write the index files to.
+        """
+        os.makedirs(directory, exist_ok=True)
+        # IVF and binary indexes built for the previous contents no longer match
+        for stale in ("ivf.json", BINARY_CODES_FILE):
+            if os.path.exists(os.path.join(directory, stale)):
+                os.remove(os.path.join(directory, stale))
+        np.save(os.path.join(directory, "embeddings.npy"), self.embeddings)
+        np.save(os.path.join(directory, "row_ids.npy"), self.row_ids)
+        np.save(os.path.join(directory, "column_ids.npy"), self.column_ids)
+        if self.quantizer is not None and self.codes is not None:
+            np.save(os.path.join(directory, "int8_codes.npy"), self.codes)
+            self.quantizer.save(directory)
+        with open(os.path.join(directory, "index.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "columns": self.columns,
+                    "normalized": self.normalized,
+                    "quantization": "int8" if self.codes is not None else None,
+                    "precision": self.precision,
+                },
+                f,
+                indent=4,
+            )
+
+    @classmethod
+    def load(cls, directory: str, device: str = "cpu") -> "SearchIndex":
+        """
+        Memory-map a persisted index.
+
+        An index that was saved without normalized rows is normalized once here and kept
+        in memory (in its storage precision) instead of being mapped. Persisted IVF and
+        binary indexes are attached if they cover the same vectors, and int8 codes are
+        attached if the index was saved with them.
+
+        Args:
+            directory (str): Directory the index was saved to.
+            device (str): Device on which similarities are computed.
+
+        Returns:
+            SearchIndex: The loaded index.
+        """
+        with open(os.path.join(directory, "index.json"), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        precision = metadata.get("precision", "fp32")
+        embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+        if not metadata.get("normalized", False):
+            embeddings = to_storage(
+                l2_normalize(to_float32(embeddings, precision)), precision
+            )
+        index = cls(
+            embeddings,
+            np.load(os.path.join(directory, "row_ids.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "column_ids.npy"), mmap_mode="r"),
+            metadata["columns"],
+            device=device,
+            precision=precision,
+        )
+        ann = IVFIndex.load(directory)
+        if ann is not None and ann.size == index.size:
+            index.ann = ann
+        binary = BinaryIndex.load(directory)
+        if binary is not None and binary.size == index.size:
+            index.binary = binary
+        quantizer = Int8Quantizer.load(directory)
+        if metadata.get("quantization") == "int8" and quantizer is not None:
+            index.set_quantization(
+                quantizer,
+                np.load(os.path.join(directory, "int8_codes.npy"), mmap_mode="r"),
+            )
+        return index
+
+
+def build_search_index(
+    df: pd.DataFrame,
+    synopsis_columns: List[str],
+    load_column: Callable[[str], Optional[np.ndarray]],
+    device: str = "cpu",
+    normalized: bool = False,
+    quantizer: Optional[Int8Quantizer] = None,
+    load_codes: Optional[Callable[[str], Optional[np.ndarray]]] = None,
+    precision: str = "fp32",
+) -> SearchIndex:
+    """
+    Concatenate the non-empty embeddings of every synopsis column into one index.
+
+    The vectors are L2-normalized while they are copied into the index unless the
+    source embeddings are already normalized. With a quantizer, the int8 codes of the
+    same vectors are gathered as well, from the per-column code files where they
+    exist and by quantizing the vectors otherwise. The vectors are normalized in
+    float32 one column at a time and kept in the precision they were stored in.
+
+    Args:
+        df (pd.DataFrame): Merged dataset the embeddings were generated from.
+        synopsis_columns (List[str]): Synopsis columns to include.
+        load_column (Callable[[str], Optional[np.ndarray]]): Returns the embeddings of a
+            column, or None if the column has no embeddings.
+        device (str): Device on which similarities are computed.
+        normalized (bool): Whether the source embeddings are already L2-normalized.
+        quantizer (Optional[Int8Quantizer]): Calibration of the int8 codes.
+        load_codes (Optional[Callable[[str], Optional[np.ndarray]]]): Returns the int8
+            codes of a column, or None if the column has no code file.
+        precision (str): Storage precision of the source embeddings, which is also
+            the precision of the index.
+
+    Returns:
+        SearchIndex: Index containing one vector per non-empty (row, column) pair.
+
+    Raises:
+        ValueError: If no embeddings could be loaded for any column.
+    """
+    blocks: List[np.ndarray] = []
+    row_blocks: List[np.ndarray] = []
+    column_blocks: List[np.ndarray] = []
+    code_blocks: List[np.ndarray] = []
+    columns: List[str] = []
+    for col in synopsis_columns:
+        embeddings = load_column(col)
+        if embeddings is None:
+            continue
+        mask = non_empty_synopsis_mask(df[col])[: embeddings.shape[0]]
+        rows = np.flatnonzero(mask).astype(np.int32)
+        stored = np.asarray(embeddings[rows])
+        block = to_float32(stored, precision)
+        if not normalized:
+            block = l2_normalize(block)
+            stored = to_storage(block, precision)
+        blocks.append(stored)
+        if quantizer is not None:
+            codes = load_codes(col) if load_codes is not None else None
+            code_blocks.append(
+                np.asarray(codes[rows])
+                if codes is not None
+                else quantizer.encode(block, normalize=False)
+            )
+        row_blocks.append(rows)
+        column_blocks.append(np.full(len(rows), len(columns), dtype=np.int32))
+        columns.append(col)
+
+    if not blocks:
+        raise ValueError(
+            "No valid embeddings were loaded. Please check your embeddings directory and files."
+        )
+
+    index = SearchIndex(
+        np.ascontiguousarray(np.concatenate(blocks)),
+        np.concatenate(row_blocks),
+        np.concatenate(column_blocks),
+        columns,
+        device=device,
+        precision=precision,
+    )
+    if quantizer is not None:
+        index.set_quantization(quantizer, np.concatenate(code_blocks))
+    return index
+
+
+def _load_quantization(
+    embeddings_dir: str, manifest: Dict[str, Any]
+) -> Optional[Int8Quantizer]:
+    if manifest.get("quantization") != "int8":
+        return None
+    return Int8Quantizer.load(embeddings_dir)
+
+
+def _load_codes(path: str) -> Optional[np.ndarray]:
+    codes_path = quantized_embeddings_path(path)
+    if not os.path.exists(codes_path):
+        return None
+    return np.load(codes_path, mmap_mode="r")
+
+
+def load_or_build_search_index(
+    store: EmbeddingStore,
+    df: pd.DataFrame,
+    dataset_type: str,
+    model_name: str,
+    synopsis_columns: List[str],
+    dimension: int,
+) -> SearchIndex:
+    """
+    Memory-map the persisted index for a model, or build it from the embedding store.
+
+    Args:
+        store (EmbeddingStore): Store providing the per-column embeddings.
+        df (pd.DataFrame): Merged dataset the embeddings were generated from.
+        dataset_type (str): Type of dataset ('anime' or 'manga').
+        model_name (str): Model name as used by the API.
+        synopsis_columns (List[str]): Synopsis columns to include.
+        dimension (int): Embedding dimension of the model.
+
+    Returns:
+        SearchIndex: The fused index.
+
+    Raises:
+        ValueError: If a persisted index doesn't match the model dimension.
+    """
+    directory = search_index_dir(store.root, dataset_type, model_name)
+    if os.path.exists(os.path.join(directory, "index.json")):
+        index = SearchIndex.load(directory, device=store.device)
+        if index.dimension != dimension:
+            raise ValueError(f"Incompatible dimension for search index in {directory}")
+        return index
+    manifest = read_manifest(os.path.dirname(directory))
+    return build_search_index(
+        df,
+        synopsis_columns,
+        lambda col: store.get_array(dataset_type, model_name, col, dimension),
+        device=store.device,
+        normalized=manifest["normalized"],
+        quantizer=_load_quantization(os.path.dirname(directory), manifest),
+        load_codes=lambda col: _load_codes(
+            embeddings_path(store.root, dataset_type, model_name, col)
+        ),
+        precision=manifest["precision"],
+    )
+
+
+def save_search_index(
+    root: str,
+    dataset_type: str,
+    model_name: str,
+    df: pd.DataFrame,
+    synopsis_columns: List[str],
+) -> SearchIndex:
+    """
+    Build the fused index from the embedding files of a model and persist it.
+
+    The per-column embeddings (and int8 codes, if sbert.py wrote them) are
+    memory-mapped while the index is built.
+
+    Args:
+        root (str): Directory that contains the per-dataset embedding folders.
+        dataset_type (str): Type of dataset ('anime' or 'manga').
+        model_name (str): Model name as used by the API.
+        df (pd.DataFrame): Merged dataset the embeddings were generated from.
+        synopsis_columns (List[str]): Synopsis columns to include.
+
+    Returns:
+        SearchIndex: The index, saved to search_index_dir(root, dataset_type,
+        model_name).
+    """
+
+    def load_column(col: str) -> Optional[np.ndarray]:
+        path = embeddings_path(root, dataset_type, model_name, col)
+        if not os.path.exists(path):
+            print(f"Embeddings file not found for column '{col}': {path}")
+            return None
+        return np.load(path, mmap_mode="r")
+
+    directory = search_index_dir(root, dataset_type, model_name)
+    manifest = read_manifest(os.path.dirname(directory))
+    index = build_search_index(
+        df,
+        synopsis_columns,
+        load_column,
+        normalized=manifest["normalized"],
+        quantizer=_load_quantization(os.path.dirname(directory), manifest),
+        load_codes=lambda col: _load_codes(
+            embeddings_path(root, dataset_type, model_name, col)
+        ),
+        precision=manifest["precision"],
+    )
+    index.save(directory)
+    print(
+        f"Saved search index with {index.size} vectors "
+        f"({index.nbytes / 2**20:.1f} MB) to {directory}"
+    )
+    return index
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command-line arguments for building a search index.
+
+    Returns:
+        argparse.Namespace: Parsed arguments containing:
+            model (str): Name of the model whose embeddings are indexed
+            type (str): Dataset type ('anime' or 'manga')
+            ivf (bool): Whether to build an IVF index
+            ivf_lists (Optional[int]): Number of IVF lists
+            ivf_nprobe (Optional[int]): Default number of IVF lists probed per query
+            binary (bool): Whether to save a binary index
+    """
+    parser = argparse.ArgumentParser(
+        description="Build the fused search index for a model's embeddings."
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        required=True,
+        help="The model name whose embeddings should be indexed.",
+    )
+    parser.add_argument(
+        "--type",
+        type=str,
+        choices=["anime", "manga"],
+        required=True,
+        help="Type of dataset to build the index for: 'anime' or 'manga'.",
+    )
+    parser.add_argument(
+        "--ivf",
+        action="store_true",
+        help="Also build an IVF index for approximate search.",
+    )
+    parser.add_argument(
+        "--ivf-lists",
+        type=int,
+        default=None,
+        help="Number of IVF lists (default: about 4 * sqrt(number of vectors)).",
+    )
+    parser.add_argument(
+        "--ivf-nprobe",
+        type=int,
+        default=None,
+        help="Default number of IVF lists probed per query.",
+    )
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="Also save the sign bits of every vector for a binary prefilter.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Build the fused search index for a model and save it next to its embeddings,
+    optionally together with IVF and binary indexes.
+    """
+    args = parse_args()
+    synopsis_columns = SYNOPSIS_COLUMNS[args.type]
+    df = read_dataset(f"model/merged_{args.type}_dataset.csv", columns=synopsis_columns)
+    index = save_search_index("model", args.type, args.model, df, synopsis_columns)
+    directory = search_index_dir("model", args.type, args.model)
+    vectors = float32_rows(index.embeddings, index.precision)
+    if args.ivf:
+        ann = IVFIndex.build(vectors, num_lists=args.ivf_lists)
+        if args.ivf_nprobe:
+            ann.nprobe = args.ivf_nprobe
+        ann.save(directory)
+        print(
+            f"Saved IVF index with {ann.num_lists} lists "
+            f"(nprobe {ann.nprobe}) to {directory}"
+        )
+    if args.binary:
+        binary = BinaryIndex.build(vectors)
+        binary.save(directory)
+        print(f"Saved binary index ({binary.nbytes / 2**20:.1f} MB) to {directory}")
+
+
+if __name__ == "__main__":
+    main()
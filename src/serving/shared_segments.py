@@ -0,0 +1,118 @@
+"""
+Search index segments shared read-only by all worker processes of a server.
+
+Persisted search indexes are memory-mapped from disk, so their pages are already
+shared through the OS page cache. Indexes built at load time from the per-column
+embeddings (or normalized in memory) are private to the process that built them,
+which makes their memory grow linearly with the number of gunicorn workers. Here
+such an index is written once to a segment directory on a tmpfs (by default under
+/dev/shm) and every process memory-maps the same files read-only instead.
+
+A segment is written to a temporary directory and published with an atomic rename.
+When several workers build the same index at the same time the first rename wins and
+the others map the published segment. With gunicorn --preload, indexes loaded while
+src.api is imported are published by the master before the workers are forked.
+
+Key Features:
+    - One copy of every fused index, row/column id array and title id array per
+      server instead of one per worker
+    - Race-free publishing through rename of complete segment directories
+    - Segment root created (under /dev/shm) and removed by run_server.py for every
+      server run and passed to the workers in SHARED_SEGMENTS_DIR
+"""
+
+# pylint: disable=E0401, E0611
+import os
+import shutil
+import sys
+import tempfile
+from typing import Callable
+
+import numpy as np
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from serving.search_index import SearchIndex  # pylint: disable=wrong-import-position  # noqa: E402
+
+GROUP_IDS_FILE = "group_ids.npy"
+
+
+def segment_name(dataset_type: str, model_name: str) -> str:
+    """
+    Return the file-system safe segment name of a dataset and model.
+
+    Args:
+        dataset_type (str): Type of dataset ('anime' or 'manga').
+        model_name (str): Model name as used by the API.
+
+    Returns:
+        str: Segment directory name.
+    """
+    return f"{dataset_type}--{model_name.replace('/', '--')}"
+
+
+def publish_segment(root: str, name: str, write: Callable[[str], None]) -> str:
+    """
+    Write a segment directory unless it has already been published.
+
+    Args:
+        root (str): Segment root of the server.
+        name (str): Name of the segment.
+        write (Callable[[str], None]): Writes the segment files into the directory it
+            is given.
+
+    Returns:
+        str: Path of the published segment.
+    """
+    target = os.path.join(root, name)
+    if os.path.isdir(target):
+        return target
+    staging = tempfile.mkdtemp(prefix=f".{name}-", dir=root)
+    try:
+        write(staging)
+        os.rename(staging, target)
+    except OSError:
+        # Another process published the segment first
+        if not os.path.isdir(target):
+            raise
+    finally:
+        if os.path.isdir(staging):
+            shutil.rmtree(staging, ignore_errors=True)
+    return target
+
+
+def share_search_index(index: SearchIndex, root: str, name: str) -> SearchIndex:
+    """
+    Return a copy of an index whose arrays are mapped from a shared segment.
+
+    Indexes whose matrix is already memory-mapped are returned unchanged.
+
+    Args:
+        index (SearchIndex): Index built or normalized in process memory.
+        root (str): Segment root of the server.
+        name (str): Name of the segment, see segment_name.
+
+    Returns:
+        SearchIndex: Index backed by the shared segment, with the same settings and
+        row groups as the original.
+    """
+    if isinstance(index.embeddings, np.memmap):
+        return index
+
+    def write(directory: str) -> None:
+        index.save(directory)
+        if index.group_ids is not None:
+            np.save(os.path.join(directory, GROUP_IDS_FILE), index.group_ids)
+
+    directory = publish_segment(root, name, write)
+    shared = SearchIndex.load(directory, device=index.device)
+    shared.exact_threshold = index.exact_threshold
+    shared.rescore_factor = index.rescore_factor
+    shared.binary_rescore_factor = index.binary_rescore_factor
+    group_ids_path = os.path.join(directory, GROUP_IDS_FILE)
+    if index.group_ids is not None and os.path.exists(group_ids_path):
+        shared.group_ids = np.load(group_ids_path, mmap_mode="r")
+    elif index.group_ids is not None:
+        shared.group_ids = index.group_ids
+    return shared
@@ -0,0 +1,636 @@
+"""
+Worker and thread topology of the server on CPU.
+
+Every Gunicorn worker is a separate process, and torch, OpenMP, MKL and OpenBLAS
+each size their thread pools to all cores of the machine by default. With N workers
+the machine then runs N times as many compute threads as it has cores, and the
+threads of different workers preempt each other in the middle of every matrix
+multiplication, which ruins tail latency. A ThreadPlan divides the usable cores
+between the workers instead: every worker gets an equal share of intra-op threads,
+one inter-op thread, and the thread limits of the native libraries are set to the
+same share through the environment before the workers are started.
+
+The number of intra-op threads per worker grows with the size of the models,
+because a larger model has more work per query to split between threads, and the
+number of workers is bounded by the memory each worker needs for its own copy of
+the models. Workers use the gthread worker class, so that a worker can accept many
+requests at once: their queries are then encoded together by the EncodeScheduler.
+Admission control only sees the requests that hold a request thread, so every
+worker gets a thread for each search it admits and queues, plus spare threads that
+answer /metrics, /ready and the requests that are shed. The admission limits are
+part of the plan and passed to the workers through the environment.
+
+Key Features:
+    - Usable cores from the CPU affinity mask and the cgroup CPU quota
+    - Available memory from psutil, the cgroup memory limit or /proc/meminfo
+    - Model sizes from the weight files of local and cached Hugging Face models
+    - Thread environment, admission limits and Gunicorn options of a plan
+    - Request threads sized to the admitted and queued searches of a worker
+    - Candidate plans for a benchmark sweep over worker splits and admission
+      concurrency, a readiness wait that hears from every worker, a query replay
+      client and the choice of the recommended plan
+"""
+
+# pylint: disable=E0401, E0611
+import json
+import logging
+import math
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+try:
+    import psutil  # type: ignore
+except ImportError:  # pragma: no cover - psutil is optional
+    psutil = None
+
+# Environment variables limiting the thread pools of the native libraries
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+# Read by apply_torch_threads in every worker
+TORCH_THREADS_ENV = "TORCH_NUM_THREADS"
+TORCH_INTEROP_THREADS_ENV = "TORCH_INTEROP_THREADS"
+
+# Intra-op threads per worker by total model size: (upper bound in bytes, threads)
+INTRA_OP_THREADS = (
+    (200 * 2**20, 1),
+    (800 * 2**20, 2),
+    (3 * 2**30, 4),
+)
+MAX_INTRA_OP_THREADS = 8
+# Size assumed for the models of a worker when none are known
+DEFAULT_MODEL_BYTES = 500 * 2**20
+# Memory of a worker besides its models (interpreter, torch runtime, caches)
+WORKER_OVERHEAD_BYTES = 512 * 2**20
+# Share of the available memory the workers may use
+MEMORY_FRACTION = 0.75
+# Admission limits of every worker when ADMISSION_MAX_CONCURRENT and
+# ADMISSION_MAX_QUEUE are not set (see AdmissionController)
+ADMISSION_MAX_CONCURRENT_ENV = "ADMISSION_MAX_CONCURRENT"
+ADMISSION_MAX_QUEUE_ENV = "ADMISSION_MAX_QUEUE"
+ADMISSION_MAX_CONCURRENT = 4
+ADMISSION_MAX_QUEUE = 16
+# Request threads of a gthread worker beyond its admitted and queued searches
+SPARE_REQUEST_THREADS = 2
+# Largest encode batch of the EncodeScheduler when ENCODE_MAX_BATCH_SIZE is not set
+ENCODE_MAX_BATCH_SIZE_ENV = "ENCODE_MAX_BATCH_SIZE"
+ENCODE_MAX_BATCH_SIZE = 32
+WEIGHT_SUFFIXES = (".safetensors", ".bin", ".pt", ".onnx")
+
+
+def usable_cores() -> int:
+    """
+    Return the number of cores the process may run on.
+
+    Returns:
+        int: The size of the CPU affinity mask, reduced to the cgroup CPU quota when
+        one is set (e.g. in a container), and at least 1.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cores = len(os.sched_getaffinity(0))
+    else:  # pragma: no cover - not available on macOS and Windows
+        cores = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max", "r", encoding="utf-8") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cores = min(cores, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cores)
+
+
+def available_memory_bytes() -> Optional[int]:
+    """
+    Return the memory available to new processes.
+
+    Returns:
+        Optional[int]: Available memory in bytes, reduced to the free part of the
+        cgroup memory limit when one is set, or None if it cannot be determined.
+    """
+    available = None
+    if psutil is not None:
+        available = int(psutil.virtual_memory().available)
+    else:
+        try:
+            with open("/proc/meminfo", "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("MemAvailable:"):
+                        available = int(line.split()[1]) * 1024
+                        break
+        except (OSError, ValueError, IndexError):
+            pass
+    try:
+        with open("/sys/fs/cgroup/memory.max", "r", encoding="utf-8") as f:
+            limit = f.read().strip()
+        with open("/sys/fs/cgroup/memory.current", "r", encoding="utf-8") as f:
+            current = int(f.read().strip())
+        if limit != "max":
+            free = max(0, int(limit) - current)
+            available = free if available is None else min(available, free)
+    except (OSError, ValueError):
+        pass
+    return available
+
+
+def _weight_bytes(directory: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(directory, followlinks=True):
+        for name in filenames:
+            if name.endswith(WEIGHT_SUFFIXES):
+                total += os.path.getsize(os.path.join(dirpath, name))
+    return total
+
+
+def model_bytes(model_name: str, root: str = "model") -> Optional[int]:
+    """
+    Estimate the memory a model needs from the size of its weight files.
+
+    Args:
+        model_name (str): Model name as used by the API.
+        root (str): Directory that contains the fine-tuned models.
+
+    Returns:
+        Optional[int]: Size of the weight files of the local model directory or of
+        the largest snapshot in the Hugging Face cache, or None if the model was not
+        found.
+    """
+    local_path = os.path.join(root, model_name)
+    if os.path.isdir(local_path):
+        return _weight_bytes(local_path)
+    cache = os.getenv("HF_HUB_CACHE") or os.path.join(
+        os.getenv("HF_HOME") or os.path.join("~", ".cache", "huggingface"), "hub"
+    )
+    snapshots = os.path.join(
+        os.path.expanduser(cache),
+        "models--" + model_name.replace("/", "--"),
+        "snapshots",
+    )
+    if not os.path.isdir(snapshots):
+        return None
+    sizes = [
+        _weight_bytes(os.path.join(snapshots, name)) for name in os.listdir(snapshots)
+    ]
+    return max(sizes, default=0) or None
+
+
+def intra_op_threads_for(total_model_bytes: int) -> int:
+    """
+    Return the intra-op threads a worker should use for models of a given size.
+
+    Args:
+        total_model_bytes (int): Total size of the models of a worker.
+
+    Returns:
+        int: Number of intra-op threads.
+    """
+    for bound, threads in INTRA_OP_THREADS:
+        if total_model_bytes <= bound:
+            return threads
+    return MAX_INTRA_OP_THREADS
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name, "").strip()
+    return int(value) if value else None
+
+
+def admission_limits() -> Tuple[int, int]:
+    """
+    Return the admission limits of a worker from the environment.
+
+    Returns:
+        Tuple[int, int]: ADMISSION_MAX_CONCURRENT (0 disables admission control)
+        and ADMISSION_MAX_QUEUE, or their defaults when they are not set.
+    """
+    max_concurrent = _env_int(ADMISSION_MAX_CONCURRENT_ENV)
+    max_queue = _env_int(ADMISSION_MAX_QUEUE_ENV)
+    return (
+        ADMISSION_MAX_CONCURRENT if max_concurrent is None else max_concurrent,
+        ADMISSION_MAX_QUEUE if max_queue is None else max_queue,
+    )
+
+
+def request_threads(max_concurrent: int, max_queue: int) -> int:
+    """
+    Return the request threads a worker needs for its admission limits.
+
+    Every admitted and every queued search holds a request thread, so with fewer
+    threads the queue never fills and excess requests wait in the socket backlog
+    instead of being shed. The spare threads answer /metrics, /ready and the
+    requests that are shed while the queue is full.
+
+    Args:
+        max_concurrent (int): Searches a worker runs at once, 0 if admission control
+            is disabled (the default concurrency then bounds the threads instead).
+        max_queue (int): Searches a worker queues beyond that.
+
+    Returns:
+        int: Number of request threads.
+    """
+    if max_concurrent < 1:
+        return ADMISSION_MAX_CONCURRENT + SPARE_REQUEST_THREADS
+    return max_concurrent + max(max_queue, 0) + SPARE_REQUEST_THREADS
+
+
+class ThreadPlan:
+    """
+    Number of workers and the threads of every worker.
+
+    Attributes:
+        workers (int): Number of Gunicorn worker processes.
+        torch_threads (int): Torch intra-op threads (and native library threads) per
+            worker.
+        interop_threads (int): Torch inter-op threads per worker.
+        worker_class (str): Gunicorn worker class ('gthread' or 'sync').
+        max_concurrent (int): Searches a worker admits at once (0 disables
+            admission control).
+        max_queue (int): Searches a worker queues beyond that.
+        threads (int): Request threads per worker, by default enough for the
+            admitted and queued searches (see request_threads).
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        torch_threads: int,
+        interop_threads: int = 1,
+        worker_class: str = "gthread",
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        threads: Optional[int] = None,
+    ):
+        self.workers = workers
+        self.torch_threads = torch_threads
+        self.interop_threads = interop_threads
+        self.worker_class = worker_class
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.threads = (
+            request_threads(max_concurrent, max_queue) if threads is None else threads
+        )
+
+    def env(self) -> Dict[str, str]:
+        """
+        Return the environment variables that apply the plan in the workers.
+
+        Returns:
+            Dict[str, str]: Thread limits of the native libraries and of torch, and
+            the admission limits.
+        """
+        env = dict.fromkeys(THREAD_ENV_VARS, str(self.torch_threads))
+        env[TORCH_THREADS_ENV] = str(self.torch_threads)
+        env[TORCH_INTEROP_THREADS_ENV] = str(self.interop_threads)
+        env[ADMISSION_MAX_CONCURRENT_ENV] = str(self.max_concurrent)
+        env[ADMISSION_MAX_QUEUE_ENV] = str(self.max_queue)
+        return env
+
+    def gunicorn_args(self) -> List[str]:
+        """
+        Return the Gunicorn options that apply the plan.
+
+        Returns:
+            List[str]: Worker count, worker class and request threads per worker.
+        """
+        args = ["-w", str(self.workers), "-k", self.worker_class]
+        if self.worker_class == "gthread":
+            args += ["--threads", str(self.threads)]
+        return args
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Return the plan as a dictionary.
+
+        Returns:
+            Dict[str, Any]: The attributes of the plan.
+        """
+        return {
+            "workers": self.workers,
+            "torch_threads": self.torch_threads,
+            "interop_threads": self.interop_threads,
+            "worker_class": self.worker_class,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "threads": self.threads,
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.workers} workers x {self.torch_threads} torch threads "
+            f"({self.worker_class}, {self.threads} request threads, "
+            f"{self.max_concurrent} concurrent searches)"
+        )
+
+
+def _max_workers(total_model_bytes: int, memory_bytes: Optional[int]) -> Optional[int]:
+    if memory_bytes is None:
+        return None
+    per_worker = total_model_bytes + WORKER_OVERHEAD_BYTES
+    return max(1, int(memory_bytes * MEMORY_FRACTION) // per_worker)
+
+
+def plan_threads(
+    cores: int,
+    total_model_bytes: Optional[int] = None,
+    memory_bytes: Optional[int] = None,
+    device: str = "cpu",
+    workers: Optional[int] = None,
+    max_concurrent: Optional[int] = None,
+    max_queue: Optional[int] = None,
+) -> ThreadPlan:
+    """
+    Compute the worker and thread plan for a machine and the models it serves.
+
+    Args:
+        cores (int): Usable cores.
+        total_model_bytes (Optional[int]): Total size of the models of a worker.
+            Defaults to DEFAULT_MODEL_BYTES.
+        memory_bytes (Optional[int]): Available memory. Unknown memory does not
+            bound the number of workers.
+        device (str): 'cpu' or 'cuda'. On CUDA, a single worker (holding a single
+            CUDA context and copy of the models) serves all requests.
+        workers (Optional[int]): Number of workers to use instead of the computed
+            one; the cores are then divided between them.
+        max_concurrent (Optional[int]): Searches a worker admits at once. Defaults
+            to the admission limits of the environment (see admission_limits).
+        max_queue (Optional[int]): Searches a worker queues beyond that. Defaults
+            to the admission limits of the environment.
+
+    Returns:
+        ThreadPlan: The plan.
+    """
+    if total_model_bytes is None:
+        total_model_bytes = DEFAULT_MODEL_BYTES
+    env_concurrent, env_queue = admission_limits()
+    limits = {
+        "max_concurrent": env_concurrent if max_concurrent is None else max_concurrent,
+        "max_queue": env_queue if max_queue is None else max_queue,
+    }
+    if workers is None and device == "cuda":
+        workers = 1
+    if workers is not None:
+        return ThreadPlan(workers, max(1, cores // workers), **limits)
+
+    workers = max(1, cores // min(cores, intra_op_threads_for(total_model_bytes)))
+    max_workers = _max_workers(total_model_bytes, memory_bytes)
+    if max_workers is not None:
+        workers = min(workers, max_workers)
+    return ThreadPlan(workers, max(1, cores // workers), **limits)
+
+
+def apply_torch_threads() -> None:
+    """
+    Set the torch thread pools of the current process from the environment.
+
+    Does nothing for variables that are not set. Inter-op threads can only be set
+    before torch runs any inter-op parallel work, so a failure to set them is logged
+    instead of raised.
+    """
+    torch_threads = os.getenv(TORCH_THREADS_ENV, "").strip()
+    interop_threads = os.getenv(TORCH_INTEROP_THREADS_ENV, "").strip()
+    if not torch_threads and not interop_threads:
+        return
+    # Imported here so that planning does not need torch
+    import torch  # pylint: disable=import-outside-toplevel
+
+    if torch_threads:
+        torch.set_num_threads(int(torch_threads))
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(int(interop_threads))
+        except RuntimeError as e:
+            logging.warning("Cannot set torch inter-op threads: %s", e)
+
+
+def candidate_plans(
+    cores: int,
+    total_model_bytes: Optional[int] = None,
+    memory_bytes: Optional[int] = None,
+    device: str = "cpu",
+    max_batch_size: Optional[int] = None,
+) -> List[ThreadPlan]:
+    """
+    Return the plans a benchmark compares.
+
+    The candidates divide the cores into workers of 1, 2, 4, ... intra-op threads,
+    bounded by memory like plan_threads, and include the computed plan. The
+    computed plan is also tried with 2, 4, ... times its admission concurrency (and
+    request threads), up to the largest encode batch: the micro-batcher can only
+    batch the searches a worker runs at once.
+
+    Args:
+        cores (int): Usable cores.
+        total_model_bytes (Optional[int]): Total size of the models of a worker.
+        memory_bytes (Optional[int]): Available memory.
+        device (str): 'cpu' or 'cuda'.
+        max_batch_size (Optional[int]): Largest encode batch, by default
+            ENCODE_MAX_BATCH_SIZE or its default.
+
+    Returns:
+        List[ThreadPlan]: Distinct plans, the computed plan first.
+    """
+    if max_batch_size is None:
+        max_batch_size = _env_int(ENCODE_MAX_BATCH_SIZE_ENV) or ENCODE_MAX_BATCH_SIZE
+    computed = plan_threads(cores, total_model_bytes, memory_bytes, device)
+    plans = [computed]
+    seen = {(computed.workers, computed.torch_threads, computed.max_concurrent)}
+
+    def add(workers: int, max_concurrent: int) -> None:
+        plan = ThreadPlan(
+            workers,
+            max(1, cores // workers),
+            max_concurrent=max_concurrent,
+            max_queue=computed.max_queue,
+        )
+        if (plan.workers, plan.torch_threads, plan.max_concurrent) not in seen:
+            seen.add((plan.workers, plan.torch_threads, plan.max_concurrent))
+            plans.append(plan)
+
+    if device != "cuda":
+        max_workers = _max_workers(
+            DEFAULT_MODEL_BYTES if total_model_bytes is None else total_model_bytes,
+            memory_bytes,
+        )
+        torch_threads = 1
+        while torch_threads <= cores:
+            workers = cores // torch_threads
+            if max_workers is not None:
+                workers = min(workers, max_workers)
+            add(workers, computed.max_concurrent)
+            torch_threads *= 2
+    max_concurrent = 2 * computed.max_concurrent
+    while 0 < max_concurrent <= max_batch_size:
+        add(computed.workers, max_concurrent)
+        max_concurrent *= 2
+    return plans
+
+
+def wait_until_ready(
+    base_url: str,
+    workers: int,
+    poll: Callable[[], Optional[int]],
+    timeout: float = 600.0,
+    interval: float = 0.5,
+) -> None:
+    """
+    Wait until every worker of a server reports ready.
+
+    /ready is answered by whichever worker accepts the connection, so a single 200
+    only says that one worker is warm. The endpoint is polled until as many
+    distinct worker PIDs as the server has workers answered 200. A worker that
+    answers 503 again is no longer counted.
+
+    Args:
+        base_url (str): URL of the server, e.g. 'http://127.0.0.1:21494'.
+        workers (int): Number of workers of the server.
+        poll (Callable[[], Optional[int]]): Exit code of the server process, or
+            None while it runs (e.g. subprocess.Popen.poll).
+        timeout (float): Maximum number of seconds to wait.
+        interval (float): Seconds between polls while no new worker is ready.
+
+    Raises:
+        RuntimeError: If the server exits or its workers are not ready in time.
+    """
+    ready: Set[int] = set()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if poll() is not None:
+            raise RuntimeError("The server exited during start-up")
+        pid = None
+        try:
+            with urllib.request.urlopen(f"{base_url}/ready", timeout=5) as response:
+                pid = json.loads(response.read()).get("pid")
+                ready.add(pid)
+        except urllib.error.HTTPError as e:
+            try:
+                ready.discard(json.loads(e.read()).get("pid"))
+            except ValueError:
+                pass
+        except (urllib.error.URLError, OSError, ValueError):
+            pass
+        if len(ready) >= workers:
+            return
+        # Poll again right away after a 200, the next connection may reach another
+        # worker
+        if pid is None:
+            time.sleep(interval)
+    raise RuntimeError(
+        f"{len(ready)} of {workers} workers became ready in {timeout:.0f}s"
+    )
+
+
+def replay(
+    base_url: str,
+    queries: Sequence[Dict[str, Any]],
+    concurrency: int,
+    duration: float,
+    timeout: float = 30.0,
+) -> Dict[str, Any]:
+    """
+    Send queries to a server from concurrent clients and measure their latency.
+
+    Every client sends the queries in turn, starting at a different offset, until
+    the duration has passed.
+
+    Args:
+        base_url (str): URL of the server, e.g. 'http://127.0.0.1:21494'.
+        queries (Sequence[Dict[str, Any]]): Queries with their dataset 'type'
+            ('anime' or 'manga'), 'model' and 'description'.
+        concurrency (int): Number of concurrent clients.
+        duration (float): Seconds to send queries for.
+        timeout (float): Timeout of a single request in seconds.
+
+    Returns:
+        Dict[str, Any]: Number of answered, shed (503) and failed requests, the
+        answered requests per second and the p50 and p99 latency in milliseconds.
+    """
+    latencies: List[float] = []
+    counts = {"ok": 0, "shed": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset: int) -> None:
+        position = offset
+        while time.perf_counter() < deadline:
+            query = queries[position % len(queries)]
+            position += 1
+            body = json.dumps(
+                {"model": query["model"], "description": query["description"]}
+            ).encode("utf-8")
+            request = urllib.request.Request(
+                f"{base_url}/anisearchmodel/{query['type']}",
+                data=body,
+                headers={"Content-Type": "application/json"},
+            )
+            start = time.perf_counter()
+            outcome = "ok"
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    response.read()
+            except urllib.error.HTTPError as e:
+                outcome = "shed" if e.code == 503 else "errors"
+            except (urllib.error.URLError, OSError):
+                outcome = "errors"
+            elapsed = time.perf_counter() - start
+            with lock:
+                counts[outcome] += 1
+                if outcome == "ok":
+                    latencies.append(elapsed)
+
+    clients = [
+        threading.Thread(target=client, args=(i * len(queries) // concurrency,))
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    milliseconds = 1000 * np.asarray(latencies)
+    return {
+        **counts,
+        "throughput": counts["ok"] / elapsed,
+        "p50_ms": float(np.percentile(milliseconds, 50)) if latencies else None,
+        "p99_ms": float(np.percentile(milliseconds, 99)) if latencies else None,
+    }
+
+
+def recommend(results: Sequence[Dict[str, Any]], tolerance: float = 0.9) -> int:
+    """
+    Choose the best plan of a benchmark.
+
+    Among the plans that answered every request and reached at least tolerance
+    times the highest throughput, the one with the lowest p99 latency is chosen.
+
+    Args:
+        results (Sequence[Dict[str, Any]]): Replay results of every plan.
+        tolerance (float): Share of the highest throughput a plan must reach.
+
+    Returns:
+        int: Index of the recommended plan.
+
+    Raises:
+        ValueError: If no plan answered every request.
+    """
+    clean = [
+        i
+        for i, result in enumerate(results)
+        if result["ok"] and not result["errors"] and not result["shed"]
+    ]
+    if not clean:
+        raise ValueError("No configuration answered every request")
+    best = max(results[i]["throughput"] for i in clean)
+    fast = [i for i in clean if results[i]["throughput"] >= tolerance * best]
+    return min(fast, key=lambda i: results[i]["p99_ms"])
@@ -0,0 +1,194 @@
+"""
+Top-k selection over similarity scores with per-title deduplication.
+
+A full np.argsort of every score vector costs O(N log N). Here np.argpartition selects
+the candidates in O(N) and only those k candidates are sorted. Deduplication works on
+a precomputed integer title id per vector: after sorting the candidates by score,
+np.unique keeps the first (best scoring) candidate of every title, which replaces a
+Python loop over DataFrame rows with a vectorized O(k log k) step.
+
+Because a title can appear once per synopsis column, more candidates than requested
+are selected (OVERSAMPLE_FACTOR times k). If deduplication still leaves fewer than k
+titles, the candidate count is doubled until enough survive or every vector has been
+considered.
+
+For a matrix holding the scores of several queries, batched_rank_candidates selects
+the candidates of every row with one np.argpartition along the rows and only
+deduplicates per query.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+OVERSAMPLE_FACTOR = 3
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Return the indices of the k highest scores, sorted by descending score.
+
+    Equal scores are ordered by index, so a smaller k always returns a prefix of the
+    result for a larger k.
+
+    Args:
+        scores (np.ndarray): One-dimensional array of scores.
+        k (int): Number of indices to return.
+
+    Returns:
+        np.ndarray: Indices into scores.
+    """
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        threshold = scores[np.argpartition(scores, n - k)[n - k]]
+        # Break ties at the threshold by index so that results are deterministic
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[: k - len(above)]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(n)
+    # Stable sort on the negated scores keeps ties in index order
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def unique_top_k_indices(
+    scores: np.ndarray,
+    group_ids: np.ndarray,
+    k: int,
+    oversample: int = OVERSAMPLE_FACTOR,
+) -> np.ndarray:
+    """
+    Return the indices of the k highest scores with at most one index per group.
+
+    Args:
+        scores (np.ndarray): One-dimensional array of scores.
+        group_ids (np.ndarray): Integer group (title) id of every score.
+        k (int): Number of indices to return.
+        oversample (int): Initial number of candidates per requested result.
+
+    Returns:
+        np.ndarray: Indices into scores, sorted by descending score.
+    """
+    n = scores.shape[0]
+    num_candidates = min(n, max(k, k * oversample))
+    while True:
+        candidates = top_k_indices(scores, num_candidates)
+        _, first = np.unique(group_ids[candidates], return_index=True)
+        unique = candidates[np.sort(first)]
+        if len(unique) >= k or num_candidates >= n:
+            return unique[:k]
+        num_candidates = min(n, num_candidates * 2)
+
+
+def group_ids_for(values: pd.Series) -> np.ndarray:
+    """
+    Map every value of a column to a dense integer id.
+
+    Equal values share an id. Missing values each get their own id so that they are
+    never merged with each other.
+
+    Args:
+        values (pd.Series): Column to encode, e.g. the dataset titles.
+
+    Returns:
+        np.ndarray: int32 id of every row.
+    """
+    codes, uniques = pd.factorize(values)
+    codes = codes.astype(np.int32)
+    missing = codes < 0
+    codes[missing] = len(uniques) + np.arange(int(missing.sum()), dtype=np.int32)
+    return codes
+
+
+def rank_candidates(
+    scores: np.ndarray, k: int, group_ids: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Select the top k indices, deduplicated by group when group ids are given.
+
+    Args:
+        scores (np.ndarray): One-dimensional array of scores.
+        k (int): Number of indices to return.
+        group_ids (Optional[np.ndarray]): Integer group id of every score.
+
+    Returns:
+        np.ndarray: Indices into scores, sorted by descending score.
+    """
+    if group_ids is None:
+        return top_k_indices(scores, k)
+    return unique_top_k_indices(scores, group_ids, k)
+
+
+def batched_top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Return the indices of the k highest scores of every row, sorted by descending score.
+
+    Every row is ranked exactly like top_k_indices ranks it, including the order of
+    ties.
+
+    Args:
+        scores (np.ndarray): Matrix of shape (queries, vectors).
+        k (int): Number of indices to return per row.
+
+    Returns:
+        np.ndarray: Indices of shape (queries, min(k, vectors)).
+    """
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < n:
+        candidates = np.sort(np.argpartition(-scores, k - 1, axis=1)[:, :k], axis=1)
+        # Rows with more scores tied at their k-th score than selected pick the
+        # lowest indices among the ties, as top_k_indices does
+        threshold = np.take_along_axis(scores, candidates, axis=1).min(axis=1)
+        tied = np.flatnonzero((scores >= threshold[:, None]).sum(axis=1) > k)
+        for row in tied:
+            candidates[row] = np.sort(top_k_indices(scores[row], k))
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+    # Candidates are in index order, so the stable sort keeps ties in index order
+    order = np.argsort(
+        -np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable"
+    )
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def batched_rank_candidates(
+    scores: np.ndarray,
+    k: int,
+    group_ids: Optional[np.ndarray] = None,
+    oversample: int = OVERSAMPLE_FACTOR,
+) -> List[np.ndarray]:
+    """
+    Select the top k indices of every row, deduplicated by group when group ids are given.
+
+    The candidates of all rows are selected together. Rows that keep fewer than k
+    groups among their oversampled candidates fall back to unique_top_k_indices.
+
+    Args:
+        scores (np.ndarray): Matrix of shape (queries, vectors).
+        k (int): Number of indices to return per row.
+        group_ids (Optional[np.ndarray]): Integer group id of every vector.
+        oversample (int): Number of candidates per requested result when
+            deduplicating.
+
+    Returns:
+        List[np.ndarray]: Indices of every row, sorted by descending score.
+    """
+    if group_ids is None:
+        return list(batched_top_k_indices(scores, k))
+    n = scores.shape[1]
+    candidates = batched_top_k_indices(scores, min(n, max(k, k * oversample)))
+    ranked: List[np.ndarray] = []
+    for row, row_candidates in enumerate(candidates):
+        _, first = np.unique(group_ids[row_candidates], return_index=True)
+        unique = row_candidates[np.sort(first)]
+        if len(unique) < k and candidates.shape[1] < n:
+            unique = unique_top_k_indices(scores[row], group_ids, k, oversample * 2)
+        ranked.append(unique[:k])
+    return ranked
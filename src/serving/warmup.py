@@ -0,0 +1,190 @@
+"""
+Startup warm-up of the configured models and datasets, and the readiness it gates.
+
+The first request for a model used to pay for loading it, for the lazy set-up of its
+tokenizer, torch kernels and BLAS buffers and for loading the search index. The
+WarmUp runs a synthetic request through every configured model and dataset in a
+background thread of each worker, and the worker only reports ready once all of them
+were warmed up. By default a target that fails keeps the worker not ready, so that
+a load balancer does not route searches to a worker that cannot serve them.
+
+Targets are configured as a comma-separated list of model names, each optionally
+restricted to one dataset with a ':anime' or ':manga' suffix, e.g.
+'sentence-transformers/all-mpnet-base-v2,fine_tuned_sbert_model_anime:anime'.
+
+Key Features:
+    - Parsing of the target list, expanding model names to every dataset
+    - Warm-up in a background thread, so readiness probes are answered meanwhile
+    - Status, duration and error of every target
+    - Readiness that requires every target to be warm, or only warm-up to finish
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+DATASET_TYPES = ("anime", "manga")
+
+
+def parse_targets(
+    value: Optional[str], dataset_types: Sequence[str] = DATASET_TYPES
+) -> List[Tuple[str, str]]:
+    """
+    Parse a warm-up target list into (model name, dataset type) pairs.
+
+    Args:
+        value (Optional[str]): Comma-separated model names with optional
+            ':<dataset type>' suffixes.
+        dataset_types (Sequence[str]): Dataset types a model name without suffix
+            expands to.
+
+    Returns:
+        List[Tuple[str, str]]: Targets in configuration order, without duplicates.
+
+    Raises:
+        ValueError: If a suffix is not one of dataset_types.
+    """
+    targets: Dict[Tuple[str, str], None] = {}
+    for entry in (value or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        model_name, _, dataset_type = entry.partition(":")
+        if not dataset_type:
+            targets.update(dict.fromkeys((model_name, d) for d in dataset_types))
+        elif dataset_type in dataset_types:
+            targets[(model_name, dataset_type)] = None
+        else:
+            raise ValueError(f"Unknown dataset type in warm-up target '{entry}'")
+    return list(targets)
+
+
+class WarmUp:
+    """
+    Warms up (model, dataset) targets once per process and tracks readiness.
+
+    Attributes:
+        targets (List[Tuple[str, str]]): Model names and dataset types to warm up.
+        warm_up (Callable[[str, str], None]): Runs a synthetic request for a model
+            name and dataset type.
+        results (Dict[Tuple[str, str], Dict[str, Any]]): Status ('pending', 'warm'
+            or 'failed'), seconds and error of every target.
+        require_all (bool): Whether the process is only ready if every target was
+            warmed up, rather than once warm-up has finished.
+    """
+
+    def __init__(
+        self,
+        targets: Sequence[Tuple[str, str]],
+        warm_up: Callable[[str, str], None],
+        require_all: bool = True,
+    ):
+        self.targets = list(targets)
+        self.warm_up = warm_up
+        self.require_all = require_all
+        self.results: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.results = {
+            target: {"status": "pending", "seconds": None, "error": None}
+            for target in self.targets
+        }
+        self._done.clear()
+
+    def run(self) -> None:
+        """Warm up every target in order, then mark warm-up as finished."""
+        for model_name, dataset_type in self.targets:
+            start = time.perf_counter()
+            try:
+                self.warm_up(model_name, dataset_type)
+                status, error = "warm", None
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logging.error(
+                    "Warm-up of model '%s' for %s failed: %s",
+                    model_name,
+                    dataset_type,
+                    e,
+                )
+                status, error = "failed", str(e)
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.results[(model_name, dataset_type)] = {
+                    "status": status,
+                    "seconds": seconds,
+                    "error": error,
+                }
+            logging.info(
+                "Warm-up of model '%s' for %s: %s in %.2fs.",
+                model_name,
+                dataset_type,
+                status,
+                seconds,
+            )
+        self._done.set()
+
+    def start(self) -> None:
+        """
+        Start warming up in a background thread of the current process.
+
+        Every worker warms up on its own, so this is called once per worker.
+        """
+        with self._lock:
+            self._reset()
+        threading.Thread(target=self.run, name="warm-up", daemon=True).start()
+
+    def is_finished(self) -> bool:
+        """
+        Return whether warm-up has finished.
+
+        Returns:
+            bool: True once every target was warmed up or failed.
+        """
+        return self._done.is_set()
+
+    def is_ready(self) -> bool:
+        """
+        Return whether the process is ready to serve searches.
+
+        Returns:
+            bool: True once warm-up has finished and, if require_all is set, no
+            target failed.
+        """
+        if not self.is_finished():
+            return False
+        if not self.require_all:
+            return True
+        with self._lock:
+            return all(result["status"] == "warm" for result in self.results.values())
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until warm-up has finished.
+
+        Args:
+            timeout (Optional[float]): Maximum number of seconds to wait.
+
+        Returns:
+            bool: Whether warm-up has finished.
+        """
+        return self._done.wait(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the readiness and the state of every target.
+
+        Returns:
+            Dict[str, Any]: Whether the process is ready, whether warm-up has
+            finished and, per target, its model name, dataset type, status, warm-up
+            seconds and error.
+        """
+        ready = self.is_ready()
+        with self._lock:
+            targets = [
+                {"model": model_name, "dataset": dataset_type, **result}
+                for (model_name, dataset_type), result in self.results.items()
+            ]
+        return {"ready": ready, "finished": self.is_finished(), "targets": targets}
@@ -7,7 +7,8 @@ anime and manga datasets and uses sentence transformers for embedding generation
 
 Key Features:
     - Model and embedding loading with automatic device selection
-    - Batched similarity calculation using cosine similarity
+    - Single fused cosine similarity pass over all synopsis columns, with the fused
+      index built once per model and dataset
     - Deduplication of results based on titles
     - Comprehensive evaluation result logging
     - Support for multiple synopsis/description columns
@@ -17,6 +18,7 @@ and uses efficient tensor operations for similarity calculations.
 
 Functions:
     load_model_and_embeddings: Loads model, dataset and embeddings for similarity search
+    get_search_index: Builds, or reuses, the fused search index of a model
     calculate_similarities: Computes semantic similarities between descriptions
     save_evaluation_results: Logs evaluation results with timestamps and metadata
 """
@@ -25,12 +27,13 @@ import os
 import warnings
 import json
 from datetime import datetime
-from typing import List, Tuple, Dict, Any
+from typing import List, Optional, Tuple, Dict, Any
 import numpy as np
 import pandas as pd
-import torch
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
 from src import common
+from src.serving.search_index import SYNOPSIS_COLUMNS, SearchIndex, build_search_index
+from src.serving.topk import group_ids_for
 
 # Disable oneDNN for TensorFlow
 os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
@@ -87,35 +90,65 @@ def load_model_and_embeddings(
 
     if dataset_type == "anime":
         dataset_path = "model/merged_anime_dataset.csv"
-        synopsis_columns = [
-            "synopsis",
-            "Synopsis anime_dataset_2023",
-            "Synopsis animes dataset",
-            "Synopsis anime_270 Dataset",
-            "Synopsis Anime-2022 Dataset",
-            "Synopsis anime4500 Dataset",
-            "Synopsis wykonos Dataset",
-            "Synopsis Anime_data Dataset",
-            "Synopsis anime2 Dataset",
-            "Synopsis mal_anime Dataset",
-        ]
+        synopsis_columns = SYNOPSIS_COLUMNS["anime"]
         embeddings_save_dir = f"model/anime/{model_name.split('/')[-1]}"
     elif dataset_type == "manga":
         dataset_path = "model/merged_manga_dataset.csv"
-        synopsis_columns = [
-            "synopsis",
-            "Synopsis jikan Dataset",
-            "Synopsis data Dataset",
-        ]
+        synopsis_columns = SYNOPSIS_COLUMNS["manga"]
         embeddings_save_dir = f"model/manga/{model_name.split('/')[-1]}"
     else:
         raise ValueError("Invalid dataset type specified. Use 'anime' or 'manga'.")
 
-    df = common.load_dataset(dataset_path)
+    df = common.load_dataset(dataset_path, columns=["title"] + synopsis_columns)
     model = SentenceTransformer(model_name, device="cpu")
     return model, df, synopsis_columns, embeddings_save_dir
 
 
+# Fused search index per embeddings directory and synopsis columns, so repeated
+# evaluations of a model and dataset do not rebuild it
+_search_indexes: Dict[Tuple[str, Tuple[str, ...]], SearchIndex] = {}
+
+
+def get_search_index(
+    df: pd.DataFrame, synopsis_columns: List[str], embeddings_save_dir: str
+) -> SearchIndex:
+    """
+    Return the fused search index of a model's pre-computed embeddings.
+
+    The index is built on first use and reused for later calls with the same
+    embeddings directory and synopsis columns.
+
+    Args:
+        df (pd.DataFrame): Dataset containing titles and synopses
+        synopsis_columns (List[str]): Columns containing synopsis text
+        embeddings_save_dir (str): Directory containing pre-computed embeddings
+
+    Returns:
+        SearchIndex: Index over all non-empty synopses, grouped by title.
+
+    Raises:
+        ValueError: If no valid embeddings are found in embeddings_save_dir
+    """
+    key = (embeddings_save_dir, tuple(synopsis_columns))
+    if key in _search_indexes:
+        return _search_indexes[key]
+
+    def load_column(col: str) -> Optional[np.ndarray]:
+        embeddings_file = os.path.join(
+            embeddings_save_dir, f"embeddings_{col.replace(' ', '_')}.npy"
+        )
+        if not os.path.exists(embeddings_file):
+            print(f"Embeddings file not found for column '{col}': {embeddings_file}")
+            return None
+        return np.load(embeddings_file, mmap_mode="r")
+
+    # One contiguous matrix of every non-empty synopsis across all columns
+    index = build_search_index(df, synopsis_columns, load_column)
+    index.set_row_groups(group_ids_for(df["title"]))
+    _search_indexes[key] = index
+    return index
+
+
 def calculate_similarities(
     model: SentenceTransformer,
     df: pd.DataFrame,
@@ -128,8 +161,10 @@ def calculate_similarities(
     Find semantically similar titles by comparing embeddings.
 
     Calculates cosine similarities between a new description's embedding and
-    pre-computed embeddings from the dataset. Returns the top-N most similar
-    titles, removing duplicates across different synopsis columns.
+    pre-computed embeddings from the dataset using a single fused index over all
+    non-empty synopses, built on the first call for the embeddings directory (see
+    get_search_index). Returns the top-N most similar titles, removing duplicates
+    across different synopsis columns.
 
     Args:
         model (SentenceTransformer): Model to encode the new description
@@ -152,68 +187,25 @@ def calculate_similarities(
     """
     processed_description = common.preprocess_text(new_description)
     new_pooled_embedding = model.encode(
-        [processed_description], convert_to_tensor=True, device="cpu"
+        [processed_description], convert_to_numpy=True, device="cpu"
     )
-
-    cosine_similarities_dict = {}
-    for col in synopsis_columns:
-        embeddings_file = os.path.join(
-            embeddings_save_dir, f"embeddings_{col.replace(' ', '_')}.npy"
-        )
-        if not os.path.exists(embeddings_file):
-            print(f"Embeddings file not found for column '{col}': {embeddings_file}")
-            continue
-
-        existing_embeddings = np.load(embeddings_file)
-        existing_embeddings_tensor = torch.tensor(existing_embeddings).to("cpu")
-
-        with torch.no_grad():
-            cosine_similarities = (
-                util.pytorch_cos_sim(new_pooled_embedding, existing_embeddings_tensor)
-                .squeeze(0)
-                .cpu()
-                .numpy()
-            )
-
-        cosine_similarities_dict[col] = cosine_similarities
-
-    if not cosine_similarities_dict:
-        raise ValueError(
-            "No valid embeddings were loaded. Please check your embeddings directory and files."
-        )
-
-    all_top_indices = []
-    for col, cosine_similarities in cosine_similarities_dict.items():
-        top_indices_unsorted = np.argsort(cosine_similarities)[-top_n:]
-        top_indices = top_indices_unsorted[
-            np.argsort(cosine_similarities[top_indices_unsorted])[::-1]
-        ]
-        all_top_indices.extend([(idx, col) for idx in top_indices])
-
-    all_top_indices.sort(
-        key=lambda x: cosine_similarities_dict[x[1]][x[0]], reverse=True
+    index = get_search_index(df, synopsis_columns, embeddings_save_dir)
+    top_scores, top_rows, top_columns = index.search(
+        new_pooled_embedding, top_k=top_n, unique=True
     )
 
-    seen_names = set()
     top_results: List[Dict[str, Any]] = []
-    for idx, col in all_top_indices:
-        if len(top_results) >= top_n:
-            break
-        name = df.iloc[idx]["title"]
-        if name in seen_names:
-            continue
-        synopsis = df.iloc[idx][col]
-        similarity = cosine_similarities_dict[col][idx]
+    for similarity, idx, column_id in zip(top_scores, top_rows, top_columns):
+        col = index.columns[column_id]
         top_results.append(
             {
                 "rank": len(top_results) + 1,
-                "title": name,
-                "synopsis": synopsis,
+                "title": df.iloc[idx]["title"],
+                "synopsis": df.iloc[idx][col],
                 "similarity": float(similarity),
                 "source_column": col,
             }
         )
-        seen_names.add(name)
 
     return top_results
 
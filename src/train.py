@@ -64,6 +64,7 @@ tf.get_logger().setLevel(logging.ERROR)
 
 from sentence_transformers import SentenceTransformer, InputExample  # pylint: disable=wrong-import-position # noqa: E402
 
+from dataset_io import read_dataset  # pylint: disable=wrong-import-position import-error no-name-in-module # noqa: E402
 from training.data.pair_generation import (  # pylint: disable=wrong-import-position import-error no-name-in-module # noqa: E402
     create_positive_pairs,
     create_partial_positive_pairs,
@@ -638,7 +639,11 @@ def main() -> None:
     if not os.path.exists(dataset_path):
         logger.error("Dataset file does not exist at path: %s", dataset_path)
         raise FileNotFoundError(f"Dataset file not found: {dataset_path}")
-    df: pd.DataFrame = pd.read_csv(dataset_path)
+    # Pair generation only uses the synopsis columns, genres and themes
+    df: pd.DataFrame = read_dataset(
+        dataset_path,
+        columns=lambda col: "synopsis" in col.lower() or col in ("genres", "themes"),
+    )
     logger.debug("Dataset loaded with %d records.", len(df))
 
     # Generate or load training pairs
@@ -7,11 +7,35 @@ for loading pre-trained sentence transformer models during testing.
 
 The default model is 'sentence-transformers/all-MiniLM-L6-v1', which provides a good
 balance between performance and resource usage for testing purposes.
+
+Tests of the query encoders use the tiny_model fixture instead, a small randomly
+initialized BERT model with mean pooling and a normalize layer, so that no model has
+to be downloaded.
 """
 
+from typing import Any, Dict
+
 import pytest
+import torch
 from _pytest.config.argparsing import Parser
 from _pytest.fixtures import FixtureRequest
+from sentence_transformers import SentenceTransformer, models
+from transformers import BertConfig, BertModel, BertTokenizerFast
+
+# Vocabulary of the tiny_model tokenizer
+TINY_VOCAB = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + [
+    "a",
+    "hero",
+    "slime",
+    "cat",
+    "cafe",
+    "in",
+    "the",
+    "mountains",
+    "journey",
+    "young",
+    ".",
+]
 
 
 def pytest_addoption(parser: Parser) -> None:
@@ -53,3 +77,45 @@ def model_name(request: FixtureRequest) -> str:
             The model name is typically in the format 'sentence-transformers/model-name'.
     """
     return str(request.config.getoption("--model"))
+
+
+@pytest.fixture
+def tiny_model(request: FixtureRequest, tmp_path) -> SentenceTransformer:
+    """
+    Create a small randomly initialized Sentence Transformer.
+
+    The model can be configured with indirect parametrization, e.g.
+    @pytest.mark.parametrize("tiny_model", [{"hidden_size": 64, "seed": 0}],
+    indirect=True).
+
+    Args:
+        request (FixtureRequest): The request object. Its optional param is a
+            dictionary with the hidden size (default 16) and the torch seed the
+            weights are initialized with (default: not seeded).
+        tmp_path: Temporary directory the transformer is saved to.
+
+    Returns:
+        SentenceTransformer: Model with a BERT encoder, mean pooling and normalization.
+    """
+    options: Dict[str, Any] = getattr(request, "param", None) or {}
+    hidden_size = int(options.get("hidden_size", 16))
+    if options.get("seed") is not None:
+        torch.manual_seed(options["seed"])
+    vocab_file = tmp_path / "vocab.txt"
+    vocab_file.write_text("\n".join(TINY_VOCAB), encoding="utf-8")
+    path = str(tmp_path / "bert")
+    BertTokenizerFast(vocab_file=str(vocab_file)).save_pretrained(path)
+    config = BertConfig(
+        vocab_size=len(TINY_VOCAB),
+        hidden_size=hidden_size,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=2 * hidden_size,
+        max_position_embeddings=64,
+    )
+    BertModel(config).save_pretrained(path)
+    transformer = models.Transformer(path, max_seq_length=32)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension())
+    return SentenceTransformer(
+        modules=[transformer, pooling, models.Normalize()], device="cpu"
+    )
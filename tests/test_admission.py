@@ -0,0 +1,207 @@
+"""
+This module contains unit tests for the admission controller in
+src.serving.admission.
+
+The tests verify:
+    - Requests beyond the concurrency limit are queued in arrival order and admitted
+      as slots are released
+    - Requests are shed when the queue is full, when their predicted wait exceeds
+      the deadline and when the deadline passes while they are queued
+    - A Gunicorn gthread worker with the request threads of a thread plan queues
+      and sheds a burst, while one with a thread per admitted search never does
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+import pytest
+from src.serving.admission import AdmissionController, Overloaded
+from src.serving.thread_plan import ThreadPlan
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.mark.order(66)
+def test_queued_requests_admitted_in_order() -> None:
+    """
+    Test that queued requests run in arrival order once slots are released.
+    """
+    controller = AdmissionController(max_concurrent=1, max_queue=2, deadline=None)
+    first = controller.acquire()
+    order = []
+
+    def run(name: str) -> None:
+        ticket = controller.acquire()
+        order.append(name)
+        controller.release(ticket)
+
+    threads = []
+    for name in ("second", "third"):
+        thread = threading.Thread(target=run, args=(name,))
+        thread.start()
+        threads.append(thread)
+        while controller.queue_depth() < len(threads):
+            time.sleep(0.001)
+
+    assert controller.stats()["in_flight"] == 1
+    controller.release(first)
+    # Releasing twice must not free a second slot
+    controller.release(first)
+    for thread in threads:
+        thread.join(timeout=10)
+    assert order == ["second", "third"]
+
+    stats = controller.stats()
+    assert (stats["in_flight"], stats["queue_depth"], stats["admitted"]) == (0, 0, 3)
+    assert stats["shed"] == {}
+    assert stats["queue_wait"]["count"] == 3
+    assert stats["service_time"] is not None
+
+
+@pytest.mark.order(67)
+def test_load_shedding() -> None:
+    """
+    Test shedding on a full queue, a predicted wait and an expired deadline.
+    """
+    controller = AdmissionController(max_concurrent=1, max_queue=0, deadline=5)
+    ticket = controller.acquire()
+    with pytest.raises(Overloaded) as excinfo:
+        controller.acquire()
+    assert excinfo.value.reason == "queue_full"
+    assert excinfo.value.retry_after >= 1
+    controller.release(ticket)
+
+    # One slot and 4 seconds per request: the second request in line would wait 8s
+    controller = AdmissionController(
+        max_concurrent=1, max_queue=4, deadline=5, initial_service_time=4.0
+    )
+    ticket = controller.acquire()
+    assert controller.predicted_wait(2) == 8.0
+    controller.deadline = 0.05
+    with pytest.raises(Overloaded) as excinfo:
+        controller.acquire()
+    assert excinfo.value.reason == "deadline"
+    assert excinfo.value.retry_after == 4
+
+    controller.service_time = 0.0
+    start = time.monotonic()
+    with pytest.raises(Overloaded) as excinfo:
+        controller.acquire()
+    assert excinfo.value.reason == "timeout"
+    assert time.monotonic() - start >= 0.05
+    assert controller.stats()["shed"] == {"deadline": 1, "timeout": 1}
+    assert controller.queue_depth() == 0
+    controller.release(ticket)
+    controller.release(controller.acquire())
+
+
+# WSGI application of a Gunicorn worker: every search holds an admission slot for
+# 0.2 seconds, and shed searches are answered with 503
+ADMISSION_APP = textwrap.dedent(
+    """
+    import os
+    import time
+
+    from src.serving.admission import AdmissionController, Overloaded
+
+    controller = AdmissionController(
+        max_concurrent=int(os.environ["ADMISSION_MAX_CONCURRENT"]),
+        max_queue=int(os.environ["ADMISSION_MAX_QUEUE"]),
+        deadline=None,
+    )
+
+
+    def app(environ, start_response):
+        try:
+            ticket = controller.acquire()
+        except Overloaded as e:
+            start_response("503 Service Unavailable", [("Retry-After", str(e.retry_after))])
+            return [b"shed"]
+        try:
+            time.sleep(0.2)
+        finally:
+            controller.release(ticket)
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"ok"]
+    """
+)
+
+
+def _burst(plan: ThreadPlan, app_dir: str, requests: int) -> Dict[int, int]:
+    # Serves the application with the Gunicorn options and admission limits of the
+    # plan and counts the status codes of a burst of concurrent requests
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = {**os.environ, **plan.env(), "PYTHONPATH": os.pathsep.join([app_dir, ROOT])}
+    server = subprocess.Popen(  # pylint: disable=consider-using-with
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            *plan.gunicorn_args(),
+            "-b",
+            f"127.0.0.1:{port}",
+            "admission_app:app",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    def get(_) -> int:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=30) as r:
+                return r.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError("Gunicorn did not start") from None
+                time.sleep(0.1)
+        with ThreadPoolExecutor(max_workers=requests) as pool:
+            statuses = list(pool.map(get, range(requests)))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return {status: statuses.count(status) for status in set(statuses)}
+
+
+@pytest.mark.order(83)
+def test_thread_plan_sheds_under_gunicorn(tmp_path) -> None:
+    """
+    Test that a gthread worker sized by the thread plan queues and sheds a burst.
+    """
+    pytest.importorskip("gunicorn")
+    if sys.platform == "win32":
+        pytest.skip("Gunicorn does not run on Windows")
+    (tmp_path / "admission_app.py").write_text(ADMISSION_APP, encoding="utf-8")
+
+    # 2 running and 3 queued searches; the spare threads shed the rest
+    plan = ThreadPlan(1, 1, max_concurrent=2, max_queue=3)
+    assert plan.threads == 7
+    statuses = _burst(plan, str(tmp_path), 16)
+    assert statuses.get(503, 0) > 0
+    assert statuses.get(200, 0) >= 5
+    assert set(statuses) <= {200, 503}
+
+    # With only a thread per admitted search, the queue never fills: the burst
+    # waits in the socket backlog and nothing is shed
+    plan = ThreadPlan(1, 1, max_concurrent=2, max_queue=3, threads=2)
+    assert _burst(plan, str(tmp_path), 8) == {200: 8}
@@ -0,0 +1,100 @@
+"""
+This module contains unit tests for the IVF approximate index in src.serving.ann and
+its use by src.serving.search_index.SearchIndex.
+
+The tests verify:
+    - Every vector is assigned to exactly one list
+    - Approximate search finds most of the exact top results on clustered data
+    - Probing every list returns exactly the exact search results
+    - A persisted IVF index is attached on load and small indexes are searched exactly
+"""
+
+import numpy as np
+import pytest
+from src.serving.ann import IVFIndex
+from src.serving.search_index import SearchIndex, l2_normalize
+
+
+@pytest.fixture
+def clustered_index() -> SearchIndex:
+    """
+    Create a search index over normalized vectors drawn around random centers.
+
+    Returns:
+        SearchIndex: Index of 4000 vectors in 40 clusters with an IVF index attached.
+    """
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(40, 32))
+    labels = rng.integers(0, 40, size=4000)
+    embeddings = l2_normalize(centers[labels] + 0.3 * rng.normal(size=(4000, 32)))
+    index = SearchIndex(
+        embeddings,
+        np.arange(4000, dtype=np.int32),
+        np.zeros(4000, dtype=np.int32),
+        ["synopsis"],
+    )
+    index.ann = IVFIndex.build(embeddings, num_lists=64)
+    index.exact_threshold = 0
+    return index
+
+
+@pytest.mark.order(41)
+def test_ivf_lists_partition_vectors(clustered_index: SearchIndex) -> None:  # pylint: disable=redefined-outer-name
+    """
+    Test that the lists hold every vector id exactly once.
+    """
+    ann = clustered_index.ann
+    assert ann is not None
+    assert ann.offsets[0] == 0
+    assert ann.offsets[-1] == clustered_index.size
+    np.testing.assert_array_equal(np.sort(ann.order), np.arange(clustered_index.size))
+    np.testing.assert_allclose(np.linalg.norm(ann.centroids, axis=1), 1.0, rtol=1e-5)
+
+
+@pytest.mark.order(42)
+def test_ivf_search_recall(clustered_index: SearchIndex) -> None:  # pylint: disable=redefined-outer-name
+    """
+    Test that approximate search recalls most exact results and equals exact search
+    when every list is probed.
+    """
+    ann = clustered_index.ann
+    assert ann is not None
+    rng = np.random.default_rng(1)
+    recalls = []
+    for query in rng.normal(size=(20, 32)):
+        exact_rows = clustered_index.row_ids[
+            np.argsort(-clustered_index.scores(query), kind="stable")[:10]
+        ]
+        _, approx_rows, _ = clustered_index.search(query, top_k=10, nprobe=8)
+        recalls.append(len(set(exact_rows) & set(approx_rows)) / 10)
+        _, all_rows, _ = clustered_index.search(query, top_k=10, nprobe=ann.num_lists)
+        np.testing.assert_array_equal(all_rows, exact_rows)
+    assert np.mean(recalls) >= 0.9
+
+
+@pytest.mark.order(43)
+def test_ivf_index_persisted_with_search_index(
+    clustered_index: SearchIndex,  # pylint: disable=redefined-outer-name
+    tmp_path,
+) -> None:
+    """
+    Test that a saved IVF index is attached on load and only used for large indexes.
+    """
+    ann = clustered_index.ann
+    assert ann is not None
+    clustered_index.save(str(tmp_path))
+    ann.nprobe = 4
+    ann.save(str(tmp_path))
+
+    loaded = SearchIndex.load(str(tmp_path))
+    assert loaded.ann is not None
+    assert loaded.ann.nprobe == 4
+    np.testing.assert_array_equal(loaded.ann.order, ann.order)
+    # The default threshold is far above 4000 vectors, so search stays exact
+    assert not loaded.uses_ann()
+    loaded.exact_threshold = 0
+    assert loaded.uses_ann()
+
+    # Saving the search index again drops the IVF index built for old contents
+    clustered_index.save(str(tmp_path))
+    assert SearchIndex.load(str(tmp_path)).ann is None
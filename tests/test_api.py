@@ -11,16 +11,19 @@ The test suite includes:
     - Testing error handling for invalid inputs (missing fields, invalid model names)
     - Testing internal server error handling
     - Parameterized tests for different invalid input scenarios
+    - Testing validation, JSON and NDJSON responses of the batch endpoint
+    - Testing that requests shed by admission control get 503 and Retry-After
 
 The tests use pytest fixtures for the Flask test client and model name configuration.
 """
 
+import json
 import time
 from unittest.mock import patch
 from typing import Generator
 import pytest
 from flask.testing import FlaskClient
-from src.api import app
+from src.api import Overloaded, admission_controller, app
 
 
 @pytest.fixture
@@ -157,3 +160,81 @@ def test_get_manga_similarities_internal_error(
         assert "error" in data
         assert data["error"] == "Internal server error"
     time.sleep(1)
+
+
+@pytest.mark.order(53)
+def test_get_manga_batch_similarities(client: FlaskClient, model_name: str) -> None:  # pylint: disable=W0621
+    """
+    Test the /anisearchmodel/manga/batch endpoint.
+
+    Verifies that invalid batches are rejected and that results are returned per
+    description, both as a JSON list and streamed as NDJSON.
+
+    Args:
+        client (FlaskClient): Flask test client fixture
+        model_name (str): Model name fixture from command line options
+    """
+    response = client.post(
+        "/anisearchmodel/manga/batch",
+        json={"model": model_name, "descriptions": ["A slime.", ""]},
+    )
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Descriptions must be non-empty strings"
+    time.sleep(1)
+
+    payload = {"model": model_name, "descriptions": ["A slime.", "A hero."]}
+    results = [
+        (0, [{"title": "slime", "rank": 1}]),
+        (1, [{"title": "hero", "rank": 1}]),
+    ]
+    with patch("src.api.iter_batch_similarities", return_value=iter(results)):
+        response = client.post("/anisearchmodel/manga/batch", json=payload)
+        assert response.status_code == 200
+        assert response.get_json() == [
+            {"index": 0, "results": [{"title": "slime", "rank": 1}]},
+            {"index": 1, "results": [{"title": "hero", "rank": 1}]},
+        ]
+    time.sleep(1)
+
+    with patch("src.api.iter_batch_similarities", return_value=iter(results)):
+        response = client.post(
+            "/anisearchmodel/manga/batch", json={**payload, "stream": True}
+        )
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        lines = [
+            json.loads(line) for line in response.get_data(as_text=True).splitlines()
+        ]
+        assert [line["index"] for line in lines] == [0, 1]
+        assert lines[1]["results"][0]["title"] == "hero"
+    time.sleep(1)
+
+
+@pytest.mark.order(68)
+def test_get_manga_similarities_overloaded(
+    client: FlaskClient,  # pylint: disable=W0621
+    model_name: str,
+) -> None:
+    """
+    Test that shed requests are answered with 503 and a Retry-After header.
+
+    Args:
+        client (FlaskClient): Flask test client fixture
+        model_name (str): Model name fixture from command line options
+    """
+    payload = {"model": model_name, "description": "A hero reincarnated as a slime."}
+    with patch(
+        "src.api.admission_controller.acquire",
+        side_effect=Overloaded("queue_full", 3),
+    ):
+        response = client.post("/anisearchmodel/manga", json=payload)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "3"
+        assert response.get_json()["error"] == "Server is overloaded, retry later"
+    time.sleep(1)
+
+    with patch("src.api.get_similarities", return_value=[]):
+        response = client.post("/anisearchmodel/manga", json=payload)
+        assert response.status_code == 200
+    assert admission_controller.stats()["in_flight"] == 0
+    time.sleep(1)
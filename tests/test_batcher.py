@@ -0,0 +1,149 @@
+"""
+This module contains unit tests for the micro-batching scheduler in
+src.serving.batcher.
+
+The tests verify:
+    - Concurrent submits for the same model are encoded in one batch
+    - Batches never exceed the maximum batch size and never mix models
+    - Errors of a batched encode reach every waiting caller
+    - Histograms record the queue depth of the model of every submit and batch sizes
+    - A model that is slow to load does not hold up the encodes of other models
+"""
+
+import threading
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+from src.serving.batcher import EncodeScheduler, Histogram
+
+
+class RecordingEncoder:
+    """
+    Encoder stub that records every batch and returns one row per description.
+    """
+
+    def __init__(self):
+        self.batches: List[Tuple[str, List[str]]] = []
+
+    def __call__(self, model_name: str, texts: List[str]) -> np.ndarray:
+        self.batches.append((model_name, list(texts)))
+        return np.array([[len(text), hash(model_name) % 7] for text in texts])
+
+
+@pytest.mark.order(37)
+def test_scheduler_batches_concurrent_requests() -> None:
+    """
+    Test that descriptions submitted within the window share one encode call.
+    """
+    encoder = RecordingEncoder()
+    scheduler = EncodeScheduler(encoder, window=0.2, max_batch_size=8)
+    futures = [scheduler.submit("m", "x" * n) for n in range(1, 5)]
+    futures.append(scheduler.submit("m", "x"))
+    results = [future.result(timeout=5) for future in futures]
+    scheduler.close()
+
+    assert len(encoder.batches) == 1
+    # Identical descriptions are encoded once
+    assert encoder.batches[0][1] == ["x", "xx", "xxx", "xxxx"]
+    assert [int(row[0]) for row in results] == [1, 2, 3, 4, 1]
+
+
+@pytest.mark.order(38)
+def test_scheduler_respects_max_batch_size_and_models() -> None:
+    """
+    Test that batches are split by size and only contain a single model.
+    """
+    encoder = RecordingEncoder()
+    scheduler = EncodeScheduler(encoder, window=0.2, max_batch_size=3)
+    futures = [scheduler.submit("a", f"text {i}") for i in range(5)]
+    futures.append(scheduler.submit("b", "other"))
+    for future in futures:
+        future.result(timeout=5)
+    scheduler.close()
+
+    assert all(len(texts) <= 3 for _, texts in encoder.batches)
+    assert sorted(len(texts) for _, texts in encoder.batches) == [1, 2, 3]
+    assert [name for name, _ in encoder.batches].count("b") == 1
+    stats = scheduler.stats()
+    assert stats["batch_size"]["count"] == 3
+    assert stats["queue_depth"]["count"] == 6
+    assert stats["pending"] == 0
+
+    # Queue depths are counted per model
+    scheduler = EncodeScheduler(RecordingEncoder(), window=0.2)
+    futures = [scheduler.submit(name, "text") for name in ("a", "a", "a", "b", "b")]
+    for future in futures:
+        future.result(timeout=5)
+    scheduler.close()
+    assert scheduler.stats()["queue_depth"]["sum"] == 0 + 1 + 2 + 0 + 1
+
+
+@pytest.mark.order(39)
+def test_scheduler_propagates_errors() -> None:
+    """
+    Test that every caller of a failed batch receives the exception.
+    """
+
+    def failing_encoder(model_name: str, texts: List[str]) -> np.ndarray:
+        raise RuntimeError(f"cannot encode {len(texts)} with {model_name}")
+
+    scheduler = EncodeScheduler(failing_encoder, window=0.1)
+    errors = []
+
+    def call() -> None:
+        try:
+            scheduler.encode_one("m", "text", timeout=5)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.close()
+
+    assert len(errors) == 3
+    with pytest.raises(RuntimeError, match="closed"):
+        scheduler.submit("m", "text")
+
+
+@pytest.mark.order(40)
+def test_histogram_buckets() -> None:
+    """
+    Test that values are counted in the first bucket whose bound they do not exceed.
+    """
+    histogram = Histogram(buckets=[1, 4])
+    for value in [0, 1, 2, 4, 5]:
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"1": 2, "4": 2, "+Inf": 1}
+    assert snapshot["count"] == 5
+    assert snapshot["mean"] == 2.4
+
+
+@pytest.mark.order(81)
+def test_slow_model_does_not_block_others() -> None:
+    """
+    Test that encodes of a resident model finish while another model is loading.
+    """
+    loading = threading.Event()
+    loaded = threading.Event()
+
+    def encoder(model_name: str, texts: List[str]) -> np.ndarray:
+        if model_name == "cold":
+            # Stands in for a model loaded on its first batch
+            loading.set()
+            loaded.wait(timeout=10)
+        return np.zeros((len(texts), 2))
+
+    scheduler = EncodeScheduler(encoder, window=0.01)
+    cold = scheduler.submit("cold", "a slime")
+    assert loading.wait(timeout=5)
+    warm = scheduler.encode_one("warm", "a hero", timeout=5)
+    assert warm.shape == (2,)
+    assert not cold.done()
+    loaded.set()
+    assert cold.result(timeout=5).shape == (2,)
+    scheduler.close()
@@ -0,0 +1,80 @@
+"""
+This module contains unit tests for the binary prefilter in src.serving.binary and
+its use by the fused search index.
+
+The tests verify:
+    - Hamming distances match a bit-by-bit reference for any dimension
+    - The lookup-table popcount agrees with np.bitwise_count
+    - Binary shortlisting with float rescoring recalls the exact top results
+    - The binary index is persisted in its own file and dropped when stale
+"""
+
+import os
+
+import numpy as np
+import pytest
+from src.serving import binary as binary_module
+from src.serving.binary import BINARY_CODES_FILE, BinaryIndex
+from src.serving.search_index import SearchIndex, l2_normalize
+
+
+@pytest.mark.order(48)
+@pytest.mark.parametrize("dimension", [64, 70])
+def test_binary_distances_match_reference(dimension: int) -> None:
+    """
+    Test Hamming distances over 64-bit words and over single bytes.
+    """
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(500, dimension))
+    query = rng.normal(size=dimension)
+    index = BinaryIndex.build(embeddings)
+    assert index.codes.shape == (500, (dimension + 7) // 8)
+    expected = ((embeddings > 0) != (query > 0)).sum(axis=1)
+    np.testing.assert_array_equal(index.distances(query), expected)
+
+
+@pytest.mark.order(49)
+def test_popcount_lookup_table_fallback(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test that the lookup table used before NumPy 2.0 counts the same bits.
+    """
+    values = np.random.default_rng(0).integers(0, 2**63, size=100, dtype=np.uint64)
+    expected = np.array([bin(int(v)).count("1") for v in values])
+    np.testing.assert_array_equal(binary_module.popcount(values), expected)
+    monkeypatch.delattr(np, "bitwise_count", raising=False)
+    np.testing.assert_array_equal(binary_module.popcount(values), expected)
+
+
+@pytest.mark.order(50)
+def test_binary_search_with_rescoring(tmp_path) -> None:
+    """
+    Test rescored binary search recall and persistence of the binary index.
+    """
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(50, 64))
+    embeddings = l2_normalize(
+        centers[rng.integers(0, 50, size=3000)] + 0.5 * rng.normal(size=(3000, 64))
+    )
+    index = SearchIndex(
+        embeddings,
+        np.arange(3000, dtype=np.int32),
+        np.zeros(3000, dtype=np.int32),
+        ["synopsis"],
+    )
+    index.save(str(tmp_path))
+    BinaryIndex.build(embeddings).save(str(tmp_path))
+    loaded = SearchIndex.load(str(tmp_path))
+    assert loaded.binary is not None
+    assert loaded.binary.nbytes * 32 == embeddings.nbytes
+
+    hits = 0
+    for query in centers[:20] + 0.5 * rng.normal(size=(20, 64)):
+        exact = np.argsort(-loaded.scores(query))[:10]
+        _, rows, _ = loaded.search(query, top_k=10)
+        hits += len(set(exact) & set(rows))
+    assert hits / 200 >= 0.9
+
+    # Saving the search index again removes the binary index of the old contents
+    index.save(str(tmp_path))
+    assert not os.path.exists(os.path.join(tmp_path, BINARY_CODES_FILE))
+    assert SearchIndex.load(str(tmp_path)).binary is None
@@ -0,0 +1,68 @@
+"""
+This module contains unit tests for the TTL/LRU cache in src.serving.cache.
+
+The tests verify:
+    - Least recently used entries are evicted once the entry limit is exceeded
+    - The byte budget is enforced and oversized values are not cached
+    - Entries expire after the time-to-live
+    - Hit, miss and hit rate counters are reported
+"""
+
+import time
+
+import numpy as np
+import pytest
+from src.serving.cache import TTLCache
+
+
+@pytest.mark.order(31)
+def test_cache_evicts_least_recently_used() -> None:
+    """
+    Test that reading an entry protects it from eviction.
+    """
+    cache = TTLCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.order(32)
+def test_cache_enforces_byte_budget() -> None:
+    """
+    Test that the cache stays within max_bytes and skips values larger than it.
+    """
+    cache = TTLCache(max_entries=None, max_bytes=1000)
+    cache.put("a", np.zeros(100, dtype=np.float32))
+    cache.put("b", np.zeros(100, dtype=np.float32))
+    assert cache.nbytes == 800
+    cache.put("c", np.zeros(100, dtype=np.float32))
+    assert cache.get("a") is None
+    assert cache.nbytes == 800
+    cache.put("big", np.zeros(1000, dtype=np.float32))
+    assert cache.get("big") is None
+    assert len(cache) == 2
+
+
+@pytest.mark.order(33)
+def test_cache_expires_entries_and_reports_hit_rate() -> None:
+    """
+    Test that expired entries are treated as misses and counted in the stats.
+    """
+    cache = TTLCache(ttl=0.05)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    assert cache.peek("a") == 1
+    time.sleep(0.1)
+    assert cache.peek("a") is None
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["expirations"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["entries"] == 0
@@ -0,0 +1,77 @@
+"""
+This module contains unit tests for the columnar dataset format in src.dataset_io.
+
+The tests verify:
+    - The Arrow IPC copy of a dataset loads exactly like its CSV
+    - Columns are projected by name or by predicate in both formats
+    - The CSV is read when the Arrow copy is missing or older than the CSV
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.dataset_io import arrow_path, convert_dataset, read_dataset
+
+
+def write_csv(directory: str) -> str:
+    """
+    Write a small merged dataset with mixed column types as CSV.
+
+    Args:
+        directory (str): Directory to write the dataset to.
+
+    Returns:
+        str: Path of the CSV dataset.
+    """
+    path = os.path.join(directory, "merged_anime_dataset.csv")
+    pd.DataFrame(
+        {
+            "anime_id": [1, 2, 3],
+            "title": ["Ünïcode", "Second", "Third"],
+            "score": [8.5, np.nan, 7.0],
+            "genres": ["['Action']", None, "['Drama', 'Comedy']"],
+            "synopsis": ["first", "second, with a comma", None],
+            "Synopsis other Dataset": ["other one", None, "other three"],
+        }
+    ).to_csv(path, index=False)
+    return path
+
+
+@pytest.mark.order(58)
+def test_arrow_copy_matches_csv(tmp_path) -> None:
+    """
+    Test that the Arrow copy loads, fully and projected, like the CSV.
+    """
+    csv_path = write_csv(str(tmp_path))
+    expected = pd.read_csv(csv_path)
+    assert convert_dataset(csv_path) == arrow_path(csv_path)
+    assert arrow_path(csv_path).endswith("merged_anime_dataset.arrow")
+
+    pd.testing.assert_frame_equal(read_dataset(csv_path), expected)
+    projected = read_dataset(csv_path, columns=["synopsis", "missing", "title"])
+    pd.testing.assert_frame_equal(projected, expected[["title", "synopsis"]])
+    by_predicate = read_dataset(csv_path, columns=lambda col: "synopsis" in col.lower())
+    pd.testing.assert_frame_equal(
+        by_predicate, expected[["synopsis", "Synopsis other Dataset"]]
+    )
+
+
+@pytest.mark.order(59)
+def test_outdated_arrow_copy_falls_back_to_csv(tmp_path) -> None:
+    """
+    Test that the CSV is read (and projected) if the Arrow copy is outdated.
+    """
+    csv_path = write_csv(str(tmp_path))
+    pd.testing.assert_frame_equal(
+        read_dataset(csv_path, columns=["title"]), pd.read_csv(csv_path)[["title"]]
+    )
+
+    convert_dataset(csv_path)
+    updated = pd.read_csv(csv_path).iloc[:2]
+    updated.to_csv(csv_path, index=False)
+    mtime = os.path.getmtime(arrow_path(csv_path))
+    os.utime(csv_path, (mtime + 10, mtime + 10))
+    pd.testing.assert_frame_equal(read_dataset(csv_path), pd.read_csv(csv_path))
+    assert len(read_dataset(csv_path)) == 2
@@ -0,0 +1,110 @@
+"""
+This module contains unit tests for the dynamic int8 quantization of query encoders
+in src.serving.dynamic_quantization.
+
+The tests use the tiny_model fixture of conftest.py with a wider, seeded BERT
+model, so that no model has to be downloaded.
+
+The tests verify:
+    - Model selection by name or with '*', and the drift report of identical,
+      perturbed and rotated embeddings, whose top-k overlap ranks quantized
+      queries against the float embeddings
+    - Quantization replaces every Linear layer, keeps the embeddings close to the
+      float embeddings and shrinks the estimated model size
+    - The exported int8 encoder reproduces the quantized model and records its drift
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+import torch
+from src.serving.dynamic_quantization import (
+    drift_report,
+    export_quantized_encoder,
+    is_selected,
+    parse_models,
+    quantize_dynamic_int8,
+    quantized_encoder_dir,
+)
+from src.serving.encoder_backends import CONFIG_FILE, TorchScriptEncoder, load_encoder
+from src.serving.model_registry import estimate_model_bytes
+
+SENTENCES = [
+    "a hero",
+    "a young slime in the mountains.",
+    "cat",
+    "the journey of a young hero in the cafe in the mountains.",
+]
+
+
+@pytest.mark.order(73)
+def test_selection_and_drift_report() -> None:
+    """
+    Test model selection and the drift report.
+    """
+    assert not parse_models(None)
+    selected = parse_models(" org/model-a, model-b ,")
+    assert selected == {"org/model-a", "model-b"}
+    assert is_selected(selected, "model-b")
+    assert not is_selected(selected, "model-c")
+    assert is_selected(parse_models("*"), "model-c")
+    assert quantized_encoder_dir("model", "sentence-transformers/all-MiniLM-L6-v2") == (
+        os.path.join("model", "encoders", "all-MiniLM-L6-v2", "int8")
+    )
+
+    rng = np.random.default_rng(0)
+    reference = rng.standard_normal((50, 8)).astype(np.float32)
+    report = drift_report(reference, 2 * reference, k=5)
+    assert report["mean_cosine"] == pytest.approx(1.0)
+    assert report["min_cosine"] == pytest.approx(1.0)
+    assert report["top_k_overlap"] == 1.0
+
+    noisy = reference + 0.5 * rng.standard_normal(reference.shape).astype(np.float32)
+    report = drift_report(reference, noisy, k=5)
+    assert report["min_cosine"] <= report["p1_cosine"] <= report["mean_cosine"] < 1
+    assert 0 < report["top_k_overlap"] < 1
+
+    # A rotation keeps the neighbours among the quantized embeddings, but quantized
+    # queries are compared with the float corpus
+    rotation, _ = np.linalg.qr(rng.standard_normal((8, 8)))
+    rotated = (reference @ rotation).astype(np.float32)
+    np.testing.assert_allclose(rotated @ rotated.T, reference @ reference.T, atol=1e-4)
+    report = drift_report(reference, rotated, k=5)
+    assert report["mean_cosine"] < 0.9
+    assert report["top_k_overlap"] < 0.5
+
+    with pytest.raises(ValueError):
+        drift_report(reference, reference[:, :4])
+    with pytest.raises(ValueError):
+        drift_report(reference[:5], reference[:5], k=5)
+
+
+@pytest.mark.order(74)
+@pytest.mark.parametrize("tiny_model", [{"hidden_size": 64, "seed": 0}], indirect=True)
+def test_quantized_model_and_export(tiny_model, tmp_path) -> None:
+    """
+    Test quantizing a model and exporting it as an int8 encoder.
+    """
+    reference = tiny_model.encode(SENTENCES)
+    fp32_bytes = estimate_model_bytes(tiny_model)
+
+    quantize_dynamic_int8(tiny_model)
+    assert not any(isinstance(m, torch.nn.Linear) for m in tiny_model.modules())
+    assert 0 < estimate_model_bytes(tiny_model) < fp32_bytes
+    quantized = tiny_model.encode(SENTENCES)
+    assert quantized.shape == reference.shape
+    np.testing.assert_array_less(0.99, np.sum(reference * quantized, axis=1))
+
+    directory = str(tmp_path / "int8")
+    drift = {"mean_cosine": 0.999}
+    config = export_quantized_encoder(tiny_model, directory, "tiny", drift=drift)
+    assert config["max_abs_error"]["torchscript"] < 1e-5
+    with open(os.path.join(directory, CONFIG_FILE), "r", encoding="utf-8") as f:
+        assert json.load(f)["quantization"]["drift"] == drift
+
+    encoder = load_encoder(directory, "torchscript")
+    assert isinstance(encoder, TorchScriptEncoder)
+    # Activations are quantized per batch, so both encode the same single batch
+    np.testing.assert_allclose(encoder.encode(SENTENCES), quantized, atol=1e-5)
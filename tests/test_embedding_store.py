@@ -0,0 +1,62 @@
+"""
+This module contains unit tests for the EmbeddingStore in src.serving.embedding_store.
+
+The tests verify:
+    - Embedding files are memory-mapped once and reused on later calls
+    - Tensors share memory with the memory-mapped array on CPU
+    - Embeddings with the wrong dimension are rejected at load time
+"""
+
+import os
+import numpy as np
+import pytest
+from src.serving.embedding_store import EmbeddingStore, embeddings_path
+
+
+def write_embeddings(root: str, col: str, embeddings: np.ndarray) -> None:
+    """
+    Save an embeddings matrix where the store expects to find it.
+
+    Args:
+        root (str): Root directory of the store.
+        col (str): Name of the synopsis column.
+        embeddings (np.ndarray): Embeddings to save.
+    """
+    path = embeddings_path(root, "anime", "sentence-transformers/test-model", col)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, embeddings)
+
+
+@pytest.mark.order(20)
+def test_embedding_store_maps_once(tmp_path) -> None:
+    """
+    Test that the embeddings are memory-mapped once and served zero-copy.
+    """
+    embeddings = np.random.rand(5, 4).astype(np.float32)
+    write_embeddings(str(tmp_path), "Synopsis test Dataset", embeddings)
+    store = EmbeddingStore(root=str(tmp_path))
+
+    array = store.get_array(
+        "anime", "sentence-transformers/test-model", "Synopsis test Dataset", 4
+    )
+    assert isinstance(array, np.memmap)
+    assert store.get_array("anime", "test-model", "Synopsis test Dataset", 4) is array
+
+    tensor = store.get_tensor(
+        "anime", "sentence-transformers/test-model", "Synopsis test Dataset", 4
+    )
+    assert tensor.data_ptr() == array.ctypes.data
+    np.testing.assert_allclose(tensor.numpy(), embeddings)
+    assert store.stats() == {"loaded_matrices": 1, "mapped_bytes": embeddings.nbytes}
+
+
+@pytest.mark.order(21)
+def test_embedding_store_rejects_wrong_dimension(tmp_path) -> None:
+    """
+    Test that embeddings whose dimension differs from the model's are rejected.
+    """
+    write_embeddings(str(tmp_path), "synopsis", np.zeros((3, 8), dtype=np.float32))
+    store = EmbeddingStore(root=str(tmp_path))
+
+    with pytest.raises(ValueError, match="Incompatible dimension"):
+        store.get_array("anime", "test-model", "synopsis", 4)
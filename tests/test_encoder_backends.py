@@ -0,0 +1,103 @@
+"""
+This module contains unit tests for the query encoder backends in
+src.serving.encoder_backends.
+
+The tests use the tiny_model fixture of conftest.py, a small randomly initialized
+BERT model, so that no model has to be downloaded.
+
+The tests verify:
+    - Backend overrides are parsed per model and invalid entries rejected
+    - An exported TorchScript encoder reproduces the eager embeddings, with pooling
+      and normalization folded in, for batches of sentences of different lengths
+    - An exported ONNX encoder reproduces them with ONNX Runtime (skipped when onnx
+      or onnxruntime is not installed)
+    - The encoder base class cannot be instantiated without a run method
+"""
+
+import os
+
+import numpy as np
+import pytest
+from src.serving.encoder_backends import (
+    ExportedEncoder,
+    OnnxEncoder,
+    TorchScriptEncoder,
+    encoder_dir,
+    export_encoder,
+    load_encoder,
+    parse_backends,
+)
+
+
+@pytest.mark.order(71)
+def test_parse_backends() -> None:
+    """
+    Test parsing of per-model encoder backends.
+    """
+    assert not parse_backends(None)
+    assert parse_backends("org/model-a=onnx, model-b=torchscript") == {
+        "org/model-a": "onnx",
+        "model-b": "torchscript",
+    }
+    for value in ("model-a", "model-a=tensorrt", "=onnx"):
+        with pytest.raises(ValueError):
+            parse_backends(value)
+    assert encoder_dir("model", "sentence-transformers/all-MiniLM-L6-v2") == (
+        os.path.join("model", "encoders", "all-MiniLM-L6-v2")
+    )
+
+
+@pytest.mark.order(72)
+def test_torchscript_export_matches_eager(tiny_model, tmp_path) -> None:
+    """
+    Test that the TorchScript encoder reproduces the eager embeddings.
+    """
+    directory = str(tmp_path / "encoder")
+    config = export_encoder(tiny_model, directory, ["torchscript"], model_name="tiny")
+    assert config["dimension"] == 16
+    assert config["max_abs_error"]["torchscript"] < 1e-5
+
+    encoder = load_encoder(directory, "torchscript")
+    assert isinstance(encoder, TorchScriptEncoder)
+    assert encoder.nbytes > 0
+    sentences = [
+        "a hero",
+        "a young slime in the mountains.",
+        "cat",
+        "the journey of a young hero in the cafe in the mountains.",
+    ]
+    expected = tiny_model.encode(sentences)
+    for batch_size in (1, 3):
+        actual = encoder.encode(sentences, batch_size=batch_size)
+        assert actual.shape == (4, 16)
+        np.testing.assert_allclose(actual, expected, atol=1e-5)
+    np.testing.assert_allclose(np.linalg.norm(actual, axis=1), 1.0, atol=1e-5)
+    assert encoder.encode([]).shape == (0, 16)
+
+    # Every encoder has to implement run
+    with pytest.raises(TypeError):
+        ExportedEncoder(encoder.tokenizer, config)  # pylint: disable=abstract-class-instantiated
+
+
+@pytest.mark.order(85)
+def test_onnx_export_matches_eager(tiny_model, tmp_path) -> None:
+    """
+    Test that the ONNX encoder round-trips through export and loading.
+    """
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    directory = str(tmp_path / "encoder")
+    config = export_encoder(tiny_model, directory, ["onnx"], model_name="tiny")
+    assert config["backends"] == ["onnx"]
+    assert config["max_abs_error"]["onnx"] < 1e-4
+
+    encoder = load_encoder(directory, "onnx")
+    assert isinstance(encoder, OnnxEncoder)
+    assert encoder.nbytes > 0
+    sentences = ["a hero", "a young slime in the mountains.", "cat"]
+    expected = tiny_model.encode(sentences)
+    for batch_size in (1, 2):
+        np.testing.assert_allclose(
+            encoder.encode(sentences, batch_size=batch_size), expected, atol=1e-4
+        )
+    assert encoder.encode([]).shape == (0, 16)
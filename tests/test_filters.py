@@ -0,0 +1,196 @@
+"""
+This module contains unit tests for the metadata filters in src.serving.filters and
+their use by src.serving.search_index.SearchIndex.
+
+The tests verify:
+    - Filters are validated into canonical keys, and the bitmaps of genres, themes
+      and types, the start years of year and date columns and the scores resolve
+      filters to the expected rows
+    - Every search path (exact, exact over few vectors, batched, int8, binary and
+      IVF) returns only vectors of selected rows, and filtered exact searches equal
+      a brute-force ranking of the selected rows
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.serving.ann import IVFIndex
+from src.serving.binary import BinaryIndex
+from src.serving.filters import FilterIndex, MetadataFilter, parse_filters
+from src.serving.pagination import query_key
+from src.serving.quantization import Int8Quantizer
+from src.serving.search_index import SearchIndex, l2_normalize
+
+
+@pytest.mark.order(77)
+def test_filter_bitmaps() -> None:
+    """
+    Test filter validation and the row masks of anime and manga datasets.
+    """
+    metadata_filter = parse_filters(
+        {"genres": ["Action", "fantasy "], "type": "TV", "minYear": 2015}
+    )
+    assert metadata_filter == MetadataFilter(
+        genres=("action", "fantasy"), types=("tv",), min_year=2015
+    )
+    assert (
+        metadata_filter.key()
+        == parse_filters(
+            {"type": ["tv"], "minYear": 2015, "genres": ["FANTASY", "Action"]}
+        ).key()
+    )
+    assert parse_filters(None) is None
+    assert parse_filters({}) is None
+    assert parse_filters({"minScore": 0}) == MetadataFilter(min_score=0)
+    for invalid in (
+        ["Action"],
+        {"genre": ["Action"]},
+        {"genres": "Action"},
+        {"genres": [""]},
+        {"minYear": "2015"},
+        {"minScore": True},
+        {"minYear": 2020, "maxYear": 2010},
+    ):
+        with pytest.raises(ValueError):
+            parse_filters(invalid)
+
+    anime = FilterIndex.from_dataframe(
+        pd.DataFrame(
+            {
+                "type": ["tv", "movie", "tv", "ova", None],
+                "score": [8.1, 7.0, None, 6.5, 9.0],
+                "genres": [
+                    "['Action', 'Fantasy']",
+                    "['Fantasy']",
+                    "['Action', 'Fantasy']",
+                    "[]",
+                    None,
+                ],
+                "themes": ["['Mecha']", "[]", "['Mecha', 'Space']", "['Space']", "[]"],
+                "start_year": [2016.0, 2018.0, 2010.0, None, 2020.0],
+            }
+        )
+    )
+
+    def rows(value):
+        return np.flatnonzero(anime.row_mask(parse_filters(value))).tolist()
+
+    assert anime.num_rows == 5 and anime.nbytes > 0
+    assert rows({"genres": ["Fantasy"]}) == [0, 1, 2]
+    assert rows({"genres": ["Action", "Fantasy"], "themes": ["Mecha"]}) == [0, 2]
+    assert rows({"genres": ["Romance"]}) == []
+    assert rows({"type": ["movie", "ova"]}) == [1, 3]
+    assert rows({"type": "tv", "minYear": 2015}) == [0]
+    assert rows({"maxYear": 2016}) == [0, 2]
+    assert rows({"minScore": 7, "maxScore": 9}) == [0, 1, 4]
+    assert rows({"themes": ["space"], "type": "special"}) == []
+
+    manga = FilterIndex.from_dataframe(
+        pd.DataFrame(
+            {
+                "type": ["manga", "light_novel", "manga"],
+                "score": [7.5, 8.0, 8.5],
+                "genres": ["['Drama']", "['Drama', 'Romance']", "['Comedy']"],
+                "themes": ["[]", "[]", "[]"],
+                "start_date": ["2001-04-01", None, "2019"],
+            }
+        )
+    )
+    np.testing.assert_array_equal(manga.years, [2001, np.nan, 2019])
+    assert np.flatnonzero(
+        manga.row_mask(parse_filters({"type": "Manga", "minYear": 2010}))
+    ).tolist() == [2]
+
+    # Filters get their own cache keys and cursors
+    assert query_key("m", "anime", "a hero") != query_key(
+        "m", "anime", "a hero", filters=metadata_filter.key()
+    )
+
+
+@pytest.mark.order(78)
+def test_filtered_search() -> None:
+    """
+    Test that every search path only returns vectors of the selected rows.
+    """
+    rng = np.random.default_rng(0)
+    num_rows = 1500
+    centers = rng.normal(size=(30, 32))
+    embeddings = l2_normalize(
+        centers[rng.integers(0, 30, size=2 * num_rows)]
+        + 0.4 * rng.normal(size=(2 * num_rows, 32))
+    ).astype(np.float32)
+    # Two synopsis columns per row
+    row_ids = np.repeat(np.arange(num_rows, dtype=np.int32), 2)
+    column_ids = np.tile(np.arange(2, dtype=np.int32), num_rows)
+
+    def make_index() -> SearchIndex:
+        index = SearchIndex(embeddings, row_ids, column_ids, ["a", "b"])
+        index.set_row_groups(np.arange(num_rows) // 3)
+        return index
+
+    queries = rng.normal(size=(5, 32)).astype(np.float32)
+    selective = rng.random(num_rows) < 0.1
+    broad = rng.random(num_rows) < 0.6
+
+    def brute_force(query: np.ndarray, row_mask: np.ndarray) -> np.ndarray:
+        scores = embeddings @ (query / np.linalg.norm(query))
+        scores[~row_mask[row_ids]] = -np.inf
+        return row_ids[np.argsort(-scores, kind="stable")[:10]]
+
+    exact = make_index()
+    for row_mask in (selective, broad):
+        for query in queries:
+            scores, rows, _ = exact.search(query, top_k=10, row_mask=row_mask)
+            np.testing.assert_array_equal(rows, brute_force(query, row_mask))
+            assert np.all(np.diff(scores) <= 0)
+            _, rows, _ = exact.search(query, top_k=10, unique=True, row_mask=row_mask)
+            assert len(rows) == 10 and row_mask[rows].all()
+            assert len(set(rows // 3)) == len(rows)
+        batched = exact.search_batch(queries, top_k=10, unique=True, row_mask=row_mask)
+        for query, (scores, rows, columns) in zip(queries, batched):
+            expected = exact.search(query, top_k=10, unique=True, row_mask=row_mask)
+            np.testing.assert_allclose(scores, expected[0], rtol=1e-5)
+            np.testing.assert_array_equal(rows, expected[1])
+            np.testing.assert_array_equal(columns, expected[2])
+
+    # Fewer selected rows than requested results
+    few = np.zeros(num_rows, dtype=bool)
+    few[[3, 700]] = True
+    assert sorted(exact.search(queries[0], top_k=10, row_mask=few)[1]) == [
+        3,
+        3,
+        700,
+        700,
+    ]
+    none = np.zeros(num_rows, dtype=bool)
+    assert len(exact.search(queries[0], top_k=10, row_mask=none)[0]) == 0
+
+    int8 = make_index()
+    quantizer = Int8Quantizer.calibrate([embeddings])
+    int8.set_quantization(quantizer, quantizer.encode(embeddings))
+    binary = make_index()
+    binary.binary = BinaryIndex.build(embeddings)
+    for index in (int8, binary):
+        hits = 0
+        for query in queries:
+            _, rows, _ = index.search(query, top_k=10, unique=True, row_mask=selective)
+            assert len(rows) == 10 and selective[rows].all()
+            expected = exact.search(query, top_k=10, unique=True, row_mask=selective)
+            hits += len(set(rows) & set(expected[1]))
+        assert hits / 50 >= 0.8
+
+    # Probing one list of the IVF index finds too few selected vectors, so more
+    # lists are probed; probing every list equals exact search
+    ivf = make_index()
+    ivf.ann = IVFIndex.build(embeddings, num_lists=32)
+    ivf.exact_threshold = 0
+    for query in queries:
+        _, rows, _ = ivf.search(
+            query, top_k=10, unique=True, nprobe=1, row_mask=selective
+        )
+        assert len(rows) == 10 and selective[rows].all()
+        _, rows, _ = ivf.search(
+            query, top_k=10, unique=True, nprobe=32, row_mask=selective
+        )
+        expected = exact.search(query, top_k=10, unique=True, row_mask=selective)
+        np.testing.assert_array_equal(rows, expected[1])
@@ -0,0 +1,121 @@
+"""
+This module contains unit tests for the memory-pressure manager in
+src.serving.memory_manager.
+
+The tests verify:
+    - Soft- and hard-limit actions respect the cooldown, and hard-limit pressure
+      evicts one model per check
+    - Idle processes are collected once per idle period and every action is
+      recorded with the memory it freed
+"""
+
+import pytest
+from src.serving.memory_manager import MemoryManager
+
+
+class FakeProcess:
+    """
+    Simulated process whose RSS shrinks when garbage is collected or models evicted.
+
+    Attributes:
+        rss (int): Current RSS in bytes.
+        models (list): Names of the resident models, least recently used first.
+        collections (int): Number of garbage collections run.
+    """
+
+    def __init__(self, rss: int, models: list):
+        self.rss = rss
+        self.models = list(models)
+        self.collections = 0
+
+    def collect(self) -> int:
+        """Collect garbage, releasing 10 bytes."""
+        self.collections += 1
+        self.rss -= 10
+        return 1
+
+    def evict(self):
+        """Evict the least recently used model, releasing 100 bytes."""
+        if not self.models:
+            return None
+        self.rss -= 100
+        return self.models.pop(0)
+
+    def read_rss(self) -> int:
+        """Return the current RSS."""
+        return self.rss
+
+
+@pytest.mark.order(64)
+def test_soft_and_hard_limits() -> None:
+    """
+    Test the cooldown of both limits and the eviction of one model per check.
+    """
+    process = FakeProcess(rss=500, models=["a", "b", "c", "d"])
+    manager = MemoryManager(
+        soft_limit_bytes=400,
+        hard_limit_bytes=1000,
+        idle_seconds=None,
+        cooldown=3600,
+        collect=process.collect,
+        evict=process.evict,
+        rss_reader=process.read_rss,
+    )
+    event = manager.check()
+    assert event["reason"] == "soft_limit"
+    assert (event["rss_before"], event["rss_after"], event["freed_bytes"]) == (
+        500,
+        490,
+        10,
+    )
+    assert event["evicted_models"] == []
+    # Still above the soft limit, but within the cooldown
+    assert manager.check() is None
+    assert process.collections == 1
+
+    # Above the hard limit, but within the cooldown
+    process.rss = 1200
+    assert manager.check() is None
+    assert process.models == ["a", "b", "c", "d"]
+
+    manager.cooldown = 0
+    event = manager.check()
+    assert event["reason"] == "hard_limit"
+    assert event["evicted_models"] == ["a"]
+    assert event["rss_after"] == 1090
+    event = manager.check()
+    assert event["evicted_models"] == ["b"]
+    assert event["rss_after"] == 980
+    assert process.models == ["c", "d"]
+
+    # Memory that no eviction gives back: one model per check, none once empty
+    process.rss = 5000
+    assert manager.check()["evicted_models"] == ["c"]
+    assert manager.check()["evicted_models"] == ["d"]
+    assert manager.check()["evicted_models"] == []
+    assert manager.stats()["evicted_models"] == 4
+
+
+@pytest.mark.order(65)
+def test_idle_collection_and_stats() -> None:
+    """
+    Test that an idle process is collected once until it serves a request again.
+    """
+    process = FakeProcess(rss=100, models=[])
+    manager = MemoryManager(
+        idle_seconds=0,
+        collect=process.collect,
+        rss_reader=process.read_rss,
+    )
+    assert manager.check()["reason"] == "idle"
+    assert manager.check() is None
+    manager.note_activity()
+    assert manager.check()["reason"] == "idle"
+    assert process.collections == 2
+
+    stats = manager.stats()
+    assert stats["checks"] == 3
+    assert stats["collections"] == {"idle": 2}
+    assert stats["freed_bytes"] == 20
+    assert stats["rss_bytes"] == 80
+    assert [event["rss_after"] for event in stats["events"]] == [90, 80]
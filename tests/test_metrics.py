@@ -0,0 +1,162 @@
+"""
+This module contains unit tests for the Prometheus metrics in src.serving.metrics and
+the stage timings of the fused search index.
+
+The tests verify:
+    - Searches report their similarity and top-k time and stages are observed per
+      model and dataset
+    - Metrics written by several processes are aggregated, with the cache hit ratio
+      derived from the summed hits and misses
+    - The queue-depth and batch-size histograms of the encode batcher are published
+      as cumulative bucket counts
+    - Cumulative statistics are exported as counters that only grow, also when a
+      statistic is published twice or reset by a cleared cache
+"""
+
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from prometheus_client import REGISTRY, CollectorRegistry, generate_latest, multiprocess
+from src.serving.batcher import EncodeScheduler
+from src.serving.metrics import (
+    CacheHitRatioCollector,
+    observe_stage,
+    stage_timer,
+    update_batcher_metrics,
+    update_cache_metrics,
+)
+from src.serving.search_index import build_search_index
+
+
+def record_in_child(hits: int, misses: int) -> None:
+    """
+    Record a stage and cache counts from a separate process.
+
+    Args:
+        hits (int): Cache hits to publish.
+        misses (int): Cache misses to publish.
+    """
+    observe_stage("encode", "org/model", "anime", 0.01)
+    update_cache_metrics(
+        "results", {"hits": hits, "misses": misses, "entries": 1, "bytes": 8}
+    )
+
+
+@pytest.mark.order(62)
+def test_search_stage_timings() -> None:
+    """
+    Test that searches split their time into similarity and top-k stages.
+    """
+    embeddings = np.random.default_rng(0).normal(size=(300, 8)).astype(np.float32)
+    df = pd.DataFrame({"synopsis": ["text"] * len(embeddings)})
+    index = build_search_index(df, ["synopsis"], lambda col: embeddings)
+    index.set_row_groups(np.arange(300) // 3)
+
+    timings = {}
+    expected = index.search(embeddings[0], top_k=5, unique=True)
+    actual = index.search(embeddings[0], top_k=5, unique=True, timings=timings)
+    for expected_part, actual_part in zip(expected, actual):
+        np.testing.assert_array_equal(expected_part, actual_part)
+    assert set(timings) == {"similarity", "topk"}
+    assert all(seconds >= 0 for seconds in timings.values())
+    batch_timings = {}
+    index.search_batch(embeddings[:3], top_k=5, unique=True, timings=batch_timings)
+    assert set(batch_timings) == {"similarity", "topk"}
+
+    labels = {"stage": "materialize", "model": "org/model-a", "dataset": "manga"}
+    with stage_timer(**labels):
+        pass
+    with stage_timer(**labels):
+        pass
+    assert (
+        REGISTRY.get_sample_value("anisearch_stage_duration_seconds_count", labels) == 2
+    )
+
+
+@pytest.mark.order(63)
+def test_multiprocess_aggregation(tmp_path, monkeypatch) -> None:
+    """
+    Test that the metrics of several processes are summed and hit ratios derived.
+    """
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    context = multiprocessing.get_context("spawn")
+    for hits, misses in ((3, 1), (1, 3)):
+        process = context.Process(target=record_in_child, args=(hits, misses))
+        process.start()
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    source = CollectorRegistry()
+    multiprocess.MultiProcessCollector(source, path=str(tmp_path))
+    registry = CollectorRegistry()
+    registry.register(CacheHitRatioCollector(source))
+    text = generate_latest(registry).decode()
+    assert (
+        'anisearch_stage_duration_seconds_count{dataset="anime",'
+        'model="org/model",stage="encode"} 2.0'
+    ) in text
+    assert 'anisearch_cache_hits_total{cache="results"} 4.0' in text
+    assert 'anisearch_cache_hit_ratio{cache="results"} 0.5' in text
+    assert len(os.listdir(tmp_path)) >= 2
+
+
+@pytest.mark.order(80)
+def test_batcher_metrics() -> None:
+    """
+    Test that the encode batcher histograms are published as cumulative counts.
+    """
+    scheduler = EncodeScheduler(
+        lambda model_name, texts: np.zeros((len(texts), 2)), window=0.2
+    )
+    futures = [scheduler.submit("m", f"text {i}") for i in range(3)]
+    for future in futures:
+        future.result(timeout=5)
+    scheduler.encode_one("m", "alone", timeout=5)
+    scheduler.close()
+
+    update_batcher_metrics(scheduler.stats())
+    assert REGISTRY.get_sample_value("anisearch_encode_pending") == 0
+    # Batches of 3 and 1 descriptions
+    assert (
+        REGISTRY.get_sample_value("anisearch_encode_batch_sizes_total", {"le": "1"})
+        == 1
+    )
+    assert (
+        REGISTRY.get_sample_value("anisearch_encode_batch_sizes_total", {"le": "4"})
+        == 2
+    )
+    assert (
+        REGISTRY.get_sample_value("anisearch_encode_batch_sizes_total", {"le": "+Inf"})
+        == 2
+    )
+    assert REGISTRY.get_sample_value("anisearch_encode_batched_descriptions_total") == 4
+    # The submits found 0, 1, 2 and 0 descriptions queued ahead of them
+    assert (
+        REGISTRY.get_sample_value("anisearch_encode_queue_depths_total", {"le": "2"})
+        == 4
+    )
+    assert REGISTRY.get_sample_value("anisearch_encode_queued_ahead_total") == 3
+
+
+@pytest.mark.order(87)
+def test_counters_only_grow() -> None:
+    """
+    Test that cumulative statistics are incremented by what happened since.
+    """
+    labels = {"cache": "counters"}
+
+    def stats(hits: int) -> dict:
+        return {"hits": hits, "misses": 0, "entries": 1, "bytes": 8}
+
+    update_cache_metrics("counters", stats(5))
+    update_cache_metrics("counters", stats(5))
+    assert REGISTRY.get_sample_value("anisearch_cache_hits_total", labels) == 5
+    update_cache_metrics("counters", stats(7))
+    assert REGISTRY.get_sample_value("anisearch_cache_hits_total", labels) == 7
+    # A cleared cache counts its hits anew
+    update_cache_metrics("counters", stats(2))
+    assert REGISTRY.get_sample_value("anisearch_cache_hits_total", labels) == 9
+    assert REGISTRY.get_sample_value("anisearch_cache_entries", labels) == 1
@@ -0,0 +1,164 @@
+"""
+This module contains unit tests for the ModelRegistry in src.serving.model_registry.
+
+The tests verify:
+    - Models are loaded once and served from the registry afterwards
+    - Least recently used models are evicted when the byte or count budget is exceeded
+    - Hit, miss, load and eviction counters are maintained
+    - The eviction callback is invoked for evicted models
+    - Concurrent requests load a model once and leave no per-model load lock behind
+    - A load over the process memory budget evicts at most one model
+"""
+
+import threading
+import time
+from typing import Dict, List
+import pytest
+from src.serving.model_registry import ModelRegistry, current_private_bytes
+
+
+def make_registry(sizes: Dict[str, int], **kwargs) -> ModelRegistry:
+    """
+    Create a registry whose loader returns the model name and whose sizes are fixed.
+
+    Args:
+        sizes (Dict[str, int]): Size in bytes reported for each model name.
+        **kwargs: Additional keyword arguments passed to ModelRegistry.
+
+    Returns:
+        ModelRegistry: Registry backed by a fake loader.
+    """
+    return ModelRegistry(
+        loader=lambda name: f"model:{name}",
+        size_of=lambda model: sizes[model.split(":", 1)[1]],
+        **kwargs,
+    )
+
+
+@pytest.mark.order(16)
+def test_registry_loads_once() -> None:
+    """
+    Test that a model is loaded on the first request and reused afterwards.
+    """
+    loaded: List[str] = []
+
+    def loader(name: str) -> str:
+        loaded.append(name)
+        return f"model:{name}"
+
+    registry = ModelRegistry(loader=loader, size_of=lambda model: 10)
+    assert registry.get("a") == "model:a"
+    assert registry.get("a") == "model:a"
+    assert loaded == ["a"]
+
+    stats = registry.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["loads"] == 1
+    assert stats["loaded_models"] == ["a"]
+    assert stats["resident_bytes"] == 10
+
+
+@pytest.mark.order(17)
+def test_registry_evicts_lru_over_byte_budget() -> None:
+    """
+    Test that the least recently used model is evicted when the byte budget is exceeded.
+    """
+    evicted: List[str] = []
+    registry = make_registry(
+        {"a": 40, "b": 40, "c": 40}, max_bytes=100, on_evict=evicted.append
+    )
+
+    registry.get("a")
+    registry.get("b")
+    registry.get("a")  # 'b' is now the least recently used model
+    registry.get("c")
+
+    assert registry.loaded_models() == ["a", "c"]
+    assert evicted == ["b"]
+    assert registry.stats()["evictions"] == 1
+    assert registry.resident_bytes() == 80
+
+
+@pytest.mark.order(18)
+def test_registry_keeps_model_larger_than_budget() -> None:
+    """
+    Test that a freshly loaded model is kept even if it alone exceeds the budget.
+    """
+    registry = make_registry({"small": 10, "huge": 500}, max_bytes=100)
+
+    registry.get("small")
+    assert registry.get("huge") == "model:huge"
+    assert registry.loaded_models() == ["huge"]
+
+
+@pytest.mark.order(19)
+def test_registry_max_models() -> None:
+    """
+    Test that the registry never keeps more than max_models models resident.
+    """
+    registry = make_registry({"a": 1, "b": 1, "c": 1}, max_models=2)
+    for name in ["a", "b", "c"]:
+        registry.get(name)
+
+    assert registry.loaded_models() == ["b", "c"]
+    registry.clear()
+    assert not registry.loaded_models()
+
+
+@pytest.mark.order(79)
+def test_registry_releases_load_locks() -> None:
+    """
+    Test that concurrent and failed loads load once and drop their load locks.
+    """
+    loaded: List[str] = []
+
+    def loader(name: str) -> str:
+        if name == "broken":
+            raise OSError("missing weights")
+        time.sleep(0.05)
+        loaded.append(name)
+        return f"model:{name}"
+
+    registry = ModelRegistry(loader=loader, size_of=lambda model: 1, max_models=1)
+    threads = [threading.Thread(target=registry.get, args=("a",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loaded == ["a"]
+
+    with pytest.raises(OSError):
+        registry.get("broken")
+    for name in ["b", "c", "a"]:
+        registry.get(name)
+    assert registry.loaded_models() == ["a"]
+    # pylint: disable=protected-access
+    assert not registry._load_locks and not registry._load_waiters
+
+
+@pytest.mark.order(86)
+def test_registry_memory_budget_evicts_one_model() -> None:
+    """
+    Test that a load over the memory budget evicts one model, not every model.
+    """
+    private_bytes = [50]
+    registry = make_registry(
+        {"a": 1, "b": 1, "c": 1, "d": 1, "e": 1},
+        max_rss_bytes=100,
+        memory_reader=lambda: private_bytes[0],
+    )
+    for name in ["a", "b", "c"]:
+        registry.get(name)
+    assert registry.loaded_models() == ["a", "b", "c"]
+
+    # Memory that evicting models never gives back, e.g. memory-mapped embeddings
+    private_bytes[0] = 1000
+    registry.get("d")
+    assert registry.loaded_models() == ["b", "c", "d"]
+    registry.get("e")
+    assert registry.loaded_models() == ["c", "d", "e"]
+    assert registry.evictions == 2
+
+    private = current_private_bytes()
+    assert private is None or private > 0
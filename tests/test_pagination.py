@@ -0,0 +1,61 @@
+"""
+This module contains unit tests for the cursor pagination helpers in
+src.serving.pagination.
+
+The tests verify:
+    - Descriptions differing only in whitespace share a query key
+    - Cursors round-trip their offset for the query they were issued for
+    - Cursors are rejected for other queries or when malformed
+    - Ranked results know which positions they can serve
+"""
+
+import numpy as np
+import pytest
+from src.serving.pagination import (
+    RankedResults,
+    decode_cursor,
+    encode_cursor,
+    query_key,
+)
+
+
+@pytest.mark.order(34)
+def test_query_key_normalizes_whitespace() -> None:
+    """
+    Test that surrounding and repeated whitespace does not change the key.
+    """
+    assert query_key("m", "anime", "  a  hero\n reborn ") == query_key(
+        "m", "anime", "a hero reborn"
+    )
+    assert query_key("m", "anime", "a") != query_key("m", "manga", "a")
+
+
+@pytest.mark.order(35)
+def test_cursor_round_trip_and_validation() -> None:
+    """
+    Test that a cursor decodes only for the query that issued it.
+    """
+    key = query_key("m", "anime", "a hero")
+    cursor = encode_cursor(key, 20)
+    assert decode_cursor(cursor, key) == 20
+    assert decode_cursor(cursor, query_key("m", "anime", " a  hero ")) == 20
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor, query_key("m", "manga", "a hero"))
+    for malformed in ["", "not a cursor", encode_cursor(key, 0)[:-4] + "!!!!"]:
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            decode_cursor(malformed, key)
+
+
+@pytest.mark.order(36)
+def test_ranked_results_cover() -> None:
+    """
+    Test that truncated lists only cover their length and complete lists cover all.
+    """
+    scores = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+    ids = np.arange(3, dtype=np.int32)
+    truncated = RankedResults(scores, ids, ids, complete=False)
+    assert len(truncated) == 3
+    assert truncated.nbytes == 36
+    assert truncated.covers(3)
+    assert not truncated.covers(4)
+    assert RankedResults(scores, ids, ids, complete=True).covers(100)
@@ -0,0 +1,126 @@
+"""
+This module contains unit tests for the pre-serialized response payloads in
+src.serving.payload_store.
+
+The tests verify:
+    - Result payloads parse to the row fields plus the matching synopsis, rank and
+      similarity, with missing values as null
+    - Persisted stores are memory-mapped and only used if they match the dataset
+      and the modification time of its merged CSV
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.serving.payload_store import (
+    PayloadStore,
+    dataset_csv_path,
+    load_or_build_payload_store,
+    payload_store_dir,
+)
+
+
+def build_dataset() -> pd.DataFrame:
+    """
+    Build a small dataset with two synopsis columns and missing values.
+
+    Returns:
+        pd.DataFrame: Dataset of three rows.
+    """
+    return pd.DataFrame(
+        {
+            "title": ["Ünïcode", "Second", "Third"],
+            "score": [8.5, np.nan, 7.0],
+            "members": np.array([10, 20, 30], dtype=np.int64),
+            "synopsis": ["first synopsis", 'second "quoted"', None],
+            "Synopsis other": ["other one", np.nan, "other three"],
+        }
+    )
+
+
+@pytest.mark.order(56)
+def test_result_payloads() -> None:
+    """
+    Test that result payloads parse to the expected result objects.
+    """
+    df = build_dataset()
+    store = PayloadStore.build(df, ["synopsis", "Synopsis other", "missing"])
+    assert store.size == 3
+    assert store.columns == ["synopsis", "Synopsis other"]
+
+    result = json.loads(store.result(1, "synopsis", 2, np.float32(0.5)))
+    assert result == {
+        "title": "Second",
+        "score": None,
+        "members": 20,
+        "rank": 2,
+        "similarity": 0.5,
+        "synopsis": 'second "quoted"',
+    }
+    result = json.loads(store.result(0, "Synopsis other", 1, 0.25))
+    assert result["Synopsis other"] == result["synopsis"] == "other one"
+    assert result["title"] == "Ünïcode" and result["score"] == 8.5
+    assert json.loads(store.result(2, "synopsis", 3, 0.1))["synopsis"] is None
+
+    # Datasets without any non-synopsis column produce results without row fields
+    bare = PayloadStore.build(df[["synopsis"]], ["synopsis"])
+    assert json.loads(bare.result(0, "synopsis", 1, 1.0)) == {
+        "rank": 1,
+        "similarity": 1.0,
+        "synopsis": "first synopsis",
+    }
+
+
+@pytest.mark.order(57)
+def test_persisted_payload_store(tmp_path) -> None:
+    """
+    Test memory-mapped loading and the rebuild of stores that do not match.
+    """
+    df = build_dataset()
+    columns = ["synopsis", "Synopsis other"]
+    assert PayloadStore.load(str(tmp_path)) is None
+    store = PayloadStore.build(df, columns)
+    store.save(payload_store_dir(str(tmp_path), "anime"))
+
+    loaded = load_or_build_payload_store(str(tmp_path), "anime", df, columns)
+    assert isinstance(loaded.row_data, np.memmap)
+    assert loaded.nbytes == store.nbytes
+    for row in range(3):
+        for column in columns:
+            assert loaded.result(row, column, 1, 0.5) == store.result(
+                row, column, 1, 0.5
+            )
+
+    rebuilt = load_or_build_payload_store(str(tmp_path), "anime", df.iloc[:2], columns)
+    assert not isinstance(rebuilt.row_data, np.memmap)
+    assert rebuilt.size == 2
+
+
+@pytest.mark.order(88)
+def test_payload_store_follows_csv(tmp_path) -> None:
+    """
+    Test that a re-merged CSV with the same row count rebuilds the persisted store.
+    """
+    df = build_dataset()
+    columns = ["synopsis", "Synopsis other"]
+    csv_path = dataset_csv_path(str(tmp_path), "anime")
+    df.to_csv(csv_path, index=False)
+    store = PayloadStore.build(df, columns)
+    store.source_mtime = os.path.getmtime(csv_path)
+    store.save(payload_store_dir(str(tmp_path), "anime"))
+
+    loaded = load_or_build_payload_store(str(tmp_path), "anime", df, columns)
+    assert isinstance(loaded.row_data, np.memmap)
+
+    # Re-merge with new titles but the same rows
+    remerged = df.assign(title=["First", "Second", "Third"])
+    remerged.to_csv(csv_path, index=False)
+    mtime = os.path.getmtime(csv_path) + 10
+    os.utime(csv_path, (mtime, mtime))
+    rebuilt = load_or_build_payload_store(str(tmp_path), "anime", remerged, columns)
+    assert not isinstance(rebuilt.row_data, np.memmap)
+    assert rebuilt.source_mtime == mtime
+    assert json.loads(rebuilt.result(0, "synopsis", 1, 0.5))["title"] == "First"
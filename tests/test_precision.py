@@ -0,0 +1,83 @@
+"""
+This module contains unit tests for the storage precisions in src.serving.precision
+and their use by the fused search index.
+
+The tests verify:
+    - bfloat16 conversion rounds to nearest even and matches torch.bfloat16
+    - Reduced-precision matrices are wrapped as tensors without copying
+    - Half-precision indexes are built, persisted and searched in their own dtype
+      with scores close to float32
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from src.serving.precision import Float32View, to_float32, to_storage, to_tensor
+from src.serving.search_index import SearchIndex, build_search_index, l2_normalize
+
+
+@pytest.mark.order(51)
+def test_bf16_rounding_matches_torch() -> None:
+    """
+    Test bfloat16 storage against torch's own float32 to bfloat16 conversion.
+    """
+    values = np.random.default_rng(0).normal(size=(64, 32)).astype(np.float32)
+    stored = to_storage(values, "bf16")
+    assert stored.dtype == np.uint16
+    expected = torch.from_numpy(values).to(torch.bfloat16).float().numpy()
+    np.testing.assert_array_equal(to_float32(stored, "bf16"), expected)
+    # 1 + 2**-8 is halfway between two bfloat16 values and rounds to the even one
+    halfway = np.array([1 + 2**-8, 1 + 3 * 2**-8], dtype=np.float32)
+    np.testing.assert_array_equal(
+        to_float32(to_storage(halfway, "bf16"), "bf16"), [1.0, 1 + 2**-6]
+    )
+
+
+@pytest.mark.order(52)
+@pytest.mark.parametrize("precision", ["fp16", "bf16"])
+def test_reduced_precision_views(precision: str) -> None:
+    """
+    Test zero-copy tensors and the float32 row view of stored matrices.
+    """
+    values = np.random.default_rng(0).normal(size=(10, 8)).astype(np.float32)
+    stored = to_storage(values, precision)
+    tensor = to_tensor(stored, precision)
+    assert tensor.dtype == (torch.float16 if precision == "fp16" else torch.bfloat16)
+    assert tensor.data_ptr() == stored.ctypes.data
+    view = Float32View(stored, precision)
+    assert view.shape == (10, 8) and len(view) == 10
+    np.testing.assert_array_equal(view[[1, 3]], tensor[[1, 3]].float().numpy())
+    np.testing.assert_allclose(view[2:4], values[2:4], rtol=1e-2)
+
+
+@pytest.mark.order(53)
+@pytest.mark.parametrize("precision", ["fp16", "bf16"])
+def test_half_precision_search_index(tmp_path, precision: str) -> None:
+    """
+    Test that a reduced-precision index keeps its dtype and ranks like float32.
+    """
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(20_000, 32)).astype(np.float32)
+    df = pd.DataFrame({"synopsis": ["text"] * len(values)})
+    index = build_search_index(
+        df,
+        ["synopsis"],
+        lambda col: to_storage(values, precision),
+        precision=precision,
+    )
+    assert index.embeddings.dtype == to_storage(values[:1], precision).dtype
+    index.save(str(tmp_path))
+    loaded = SearchIndex.load(str(tmp_path))
+    assert loaded.precision == precision
+    assert loaded.nbytes < values.nbytes
+
+    query = rng.normal(size=32)
+    unit_query = query / np.linalg.norm(query)
+    expected = l2_normalize(values) @ unit_query
+    scores = loaded.scores(query)
+    assert scores.dtype == np.float32
+    np.testing.assert_allclose(scores, expected, atol=2e-2)
+    top_scores, rows, _ = loaded.search(query, top_k=10)
+    np.testing.assert_allclose(top_scores, expected[rows], atol=2e-2)
+    assert len(set(rows) & set(np.argsort(-expected)[:10])) >= 8
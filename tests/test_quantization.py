@@ -0,0 +1,164 @@
+"""
+This module contains unit tests for the int8 scalar quantization in
+src.serving.quantization and its use by the fused search index.
+
+The tests verify:
+    - Codes reconstruct the normalized embeddings within one quantization step
+    - Integer code scores rank vectors like float dot products
+    - Searching with codes and float rescoring recalls the exact top results
+    - Codes and calibration are persisted with the search index
+    - Per-column code files are gathered into the fused index
+    - The fused index saved from the embedding files keeps the codes and is
+      memory-mapped by the API
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.serving.embedding_store import EmbeddingStore, embeddings_path
+from src.serving.manifest import write_manifest
+from src.serving.quantization import Int8Quantizer, quantized_embeddings_path
+from src.serving.search_index import (
+    SearchIndex,
+    build_search_index,
+    l2_normalize,
+    load_or_build_search_index,
+    save_search_index,
+)
+
+
+@pytest.fixture
+def embeddings() -> np.ndarray:
+    """
+    Create random L2-normalized embeddings.
+
+    Returns:
+        np.ndarray: float32 matrix of shape (2000, 48).
+    """
+    rng = np.random.default_rng(0)
+    return l2_normalize(rng.normal(size=(2000, 48)))
+
+
+@pytest.mark.order(44)
+def test_int8_round_trip(embeddings: np.ndarray) -> None:  # pylint: disable=redefined-outer-name
+    """
+    Test that decoding the codes stays within half a step of the original values.
+    """
+    quantizer = Int8Quantizer.calibrate([embeddings[:1000], embeddings[1000:]])
+    codes = quantizer.encode(embeddings)
+    assert codes.dtype == np.int8
+    error = np.abs(quantizer.decode(codes) - embeddings)
+    assert np.all(error <= quantizer.scale * 0.5 + 1e-6)
+
+
+@pytest.mark.order(45)
+def test_int8_scores_rank_like_float(embeddings: np.ndarray) -> None:  # pylint: disable=redefined-outer-name
+    """
+    Test that integer scores are strongly correlated with exact similarities.
+    """
+    quantizer = Int8Quantizer.calibrate([embeddings])
+    codes = quantizer.encode(embeddings)
+    query = embeddings[7]
+    scores = quantizer.scores(codes, query)
+    assert scores.dtype == np.int32
+    assert np.corrcoef(scores, embeddings @ query)[0, 1] > 0.99
+    assert int(np.argmax(scores)) == 7
+
+
+@pytest.mark.order(46)
+def test_int8_search_with_rescoring(
+    embeddings: np.ndarray,  # pylint: disable=redefined-outer-name
+    tmp_path,
+) -> None:
+    """
+    Test that rescored int8 search recalls the exact top-k and survives save/load.
+    """
+    index = SearchIndex(
+        embeddings,
+        np.arange(2000, dtype=np.int32),
+        np.zeros(2000, dtype=np.int32),
+        ["synopsis"],
+    )
+    quantizer = Int8Quantizer.calibrate([embeddings])
+    index.set_quantization(quantizer, quantizer.encode(embeddings))
+    index.save(str(tmp_path))
+    loaded = SearchIndex.load(str(tmp_path))
+    assert loaded.codes is not None
+    np.testing.assert_array_equal(loaded.codes, index.codes)
+
+    rng = np.random.default_rng(1)
+    hits = 0
+    for query in rng.normal(size=(20, 48)):
+        exact = np.argsort(-(embeddings @ l2_normalize(query[None])[0]))[:10]
+        scores, rows, _ = loaded.search(query, top_k=10)
+        assert np.all(np.diff(scores) <= 0)
+        hits += len(set(exact) & set(rows))
+    assert hits / 200 >= 0.95
+
+    # Saving without codes drops the quantization from the persisted index
+    index.codes = index.quantizer = None
+    index.save(str(tmp_path))
+    assert SearchIndex.load(str(tmp_path)).codes is None
+
+
+@pytest.mark.order(47)
+def test_build_search_index_gathers_code_files(embeddings: np.ndarray) -> None:  # pylint: disable=redefined-outer-name
+    """
+    Test that column code files are filtered with the same rows as the vectors.
+    """
+    df = pd.DataFrame(
+        {
+            "a": ["text" if i % 3 else "" for i in range(1000)],
+            "b": ["text" if i % 2 else None for i in range(1000)],
+        }
+    )
+    matrices = {"a": embeddings[:1000], "b": embeddings[1000:]}
+    quantizer = Int8Quantizer.calibrate(matrices.values())
+    code_files = {col: quantizer.encode(matrix) for col, matrix in matrices.items()}
+
+    index = build_search_index(
+        df,
+        ["a", "b"],
+        matrices.get,
+        normalized=True,
+        quantizer=quantizer,
+        load_codes=code_files.get,
+    )
+    assert index.codes is not None
+    np.testing.assert_array_equal(index.codes, quantizer.encode(index.embeddings))
+
+
+@pytest.mark.order(82)
+def test_save_search_index_keeps_codes(
+    embeddings: np.ndarray,  # pylint: disable=redefined-outer-name
+    tmp_path,
+) -> None:
+    """
+    Test that the index saved from int8 embedding files is memory-mapped with codes.
+    """
+    root = str(tmp_path)
+    df = pd.DataFrame({"a": ["text"] * 1000, "b": ["text"] * 1000})
+    matrices = {"a": embeddings[:1000], "b": embeddings[1000:]}
+    quantizer = Int8Quantizer.calibrate(matrices.values())
+    for col, matrix in matrices.items():
+        path = embeddings_path(root, "anime", "m", col)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.save(path, matrix)
+        np.save(quantized_embeddings_path(path), quantizer.encode(matrix))
+    quantizer.save(os.path.dirname(path))
+    write_manifest(
+        os.path.dirname(path),
+        {"normalized": True, "precision": "fp32", "quantization": "int8"},
+    )
+
+    saved = save_search_index(root, "anime", "m", df, ["a", "b"])
+    assert saved.codes is not None and saved.size == 2000
+
+    index = load_or_build_search_index(
+        EmbeddingStore(root=root), df, "anime", "m", ["a", "b"], 48
+    )
+    assert isinstance(index.embeddings, np.memmap)
+    assert isinstance(index.codes, np.memmap)
+    np.testing.assert_array_equal(index.codes, saved.codes)
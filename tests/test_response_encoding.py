@@ -0,0 +1,92 @@
+"""
+This module contains unit tests for the response serialization and compression in
+src.serving.response_encoding.
+
+The tests verify:
+    - numpy values, NaN and missing values are serialized, also through jsonify and
+      request.json of an app using the JSON provider
+    - Content encodings are negotiated by q-value and compressed bodies, buffered or
+      streamed, decode to the original
+"""
+
+import gzip
+import json
+import zlib
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask, jsonify, request
+from src.serving.response_encoding import (
+    FastJSONProvider,
+    compress,
+    compress_stream,
+    dumps,
+    negotiate_encoding,
+)
+
+
+@pytest.mark.order(60)
+def test_json_provider_serializes_numpy() -> None:
+    """
+    Test serialization of numpy and missing values and the Flask JSON provider.
+    """
+    value = {
+        "score": np.float32(0.5),
+        "members": np.int64(3),
+        "ids": np.arange(3),
+        "rating": float("nan"),
+        "status": pd.NA,
+        "title": "Ünïcode",
+    }
+    expected = {
+        "score": 0.5,
+        "members": 3,
+        "ids": [0, 1, 2],
+        "rating": None,
+        "status": None,
+        "title": "Ünïcode",
+    }
+    assert json.loads(dumps(value)) == expected
+    assert "Ü".encode("utf-8") in dumps(value)
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+
+    @app.route("/echo", methods=["POST"])
+    def echo():
+        return jsonify(dict(request.json, **value))
+
+    response = app.test_client().post("/echo", json={"description": "text"})
+    assert response.get_json() == dict(expected, description="text")
+    bad = app.test_client().post(
+        "/echo", data="{bad json", content_type="application/json"
+    )
+    assert bad.status_code == 400
+
+
+@pytest.mark.order(61)
+def test_negotiated_compression() -> None:
+    """
+    Test encoding negotiation and that compressed bodies decode to the original.
+    """
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip;q=0, deflate") is None
+    assert negotiate_encoding("deflate, gzip;q=0.5") == "gzip"
+    assert negotiate_encoding("*") in ("br", "gzip")
+
+    body = b'{"title":"text","similarity":0.5}\n' * 200
+    compressed = compress(body, "gzip")
+    assert len(compressed) < len(body) // 10
+    assert gzip.decompress(compressed) == body
+
+    # Every streamed chunk decodes on its own, without waiting for the end
+    chunks = [b'{"index":0}\n', b'{"index":1}\n']
+    parts = list(compress_stream(chunks, "gzip"))
+    decompressor = zlib.decompressobj(31)
+    assert decompressor.decompress(parts[0]) == chunks[0]
+    assert decompressor.decompress(parts[1]) == chunks[1]
+    assert gzip.decompress(b"".join(parts)) == b"".join(chunks)
@@ -0,0 +1,182 @@
+"""
+This module contains unit tests for the fused search index in src.serving.search_index.
+
+The tests verify:
+    - Only non-empty synopses are added to the fused matrix
+    - Row and column ids map every vector back to its dataset row and column
+    - Searching returns the most similar vectors in descending order
+    - Persisted indexes are memory-mapped and return the same results
+    - Vectors are L2-normalized once so scores are plain dot products
+    - Batched searches return the same results as one search per query
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.serving.manifest import read_manifest, write_manifest
+from src.serving.precision import to_storage
+from src.serving.search_index import SearchIndex, build_search_index
+
+
+@pytest.fixture
+def dataset() -> pd.DataFrame:
+    """
+    Fixture providing a small dataset with missing and blank synopses.
+
+    Returns:
+        pd.DataFrame: Dataset with a title and two synopsis columns.
+    """
+    return pd.DataFrame(
+        {
+            "title": ["a", "b", "c"],
+            "synopsis": ["first", None, "third"],
+            "Synopsis other Dataset": ["  ", "second", "third again"],
+        }
+    )
+
+
+@pytest.fixture
+def column_embeddings() -> dict:
+    """
+    Fixture providing embeddings for each synopsis column of the dataset fixture.
+
+    Returns:
+        dict: Mapping of column name to an embeddings matrix with one row per title.
+    """
+    return {
+        "synopsis": np.array([[1, 0], [0, 0], [0, 1]], dtype=np.float32),
+        "Synopsis other Dataset": np.array([[0, 0], [1, 1], [-1, 0]], dtype=np.float32),
+    }
+
+
+@pytest.mark.order(22)
+def test_build_search_index_skips_empty_synopses(
+    dataset: pd.DataFrame,  # pylint: disable=redefined-outer-name
+    column_embeddings: dict,  # pylint: disable=redefined-outer-name
+) -> None:
+    """
+    Test that only non-empty (row, column) pairs are added to the index.
+    """
+    index = build_search_index(
+        dataset, ["synopsis", "Synopsis other Dataset"], column_embeddings.get
+    )
+
+    assert index.size == 4
+    assert index.row_ids.tolist() == [0, 2, 1, 2]
+    assert index.column_ids.tolist() == [0, 0, 1, 1]
+    assert index.row_ids.dtype == np.int32
+    assert index.column_ids.dtype == np.int32
+    assert index.embeddings.flags["C_CONTIGUOUS"]
+
+
+@pytest.mark.order(23)
+def test_search_index_returns_top_matches(
+    dataset: pd.DataFrame,  # pylint: disable=redefined-outer-name
+    column_embeddings: dict,  # pylint: disable=redefined-outer-name
+    tmp_path,
+) -> None:
+    """
+    Test that a search returns the best matching rows and columns in order, both
+    for an in-memory and a persisted index.
+    """
+    index = build_search_index(
+        dataset, ["synopsis", "Synopsis other Dataset"], column_embeddings.get
+    )
+    index.save(str(tmp_path))
+    loaded = SearchIndex.load(str(tmp_path))
+
+    for candidate in (index, loaded):
+        scores, rows, columns = candidate.search(np.array([[1.0, 0.1]]), top_k=2)
+        assert rows.tolist() == [0, 1]
+        assert columns.tolist() == [0, 1]
+        assert scores[0] > scores[1]
+
+    assert isinstance(loaded.embeddings, np.memmap)
+    assert loaded.columns == ["synopsis", "Synopsis other Dataset"]
+
+
+@pytest.mark.order(24)
+def test_build_search_index_without_embeddings(dataset: pd.DataFrame) -> None:  # pylint: disable=redefined-outer-name
+    """
+    Test that building an index without any embeddings raises a ValueError.
+    """
+    with pytest.raises(ValueError, match="No valid embeddings"):
+        build_search_index(dataset, ["synopsis"], lambda col: None)
+
+
+@pytest.mark.order(25)
+def test_search_index_normalizes_legacy_embeddings(
+    dataset: pd.DataFrame,  # pylint: disable=redefined-outer-name
+    column_embeddings: dict,  # pylint: disable=redefined-outer-name
+) -> None:
+    """
+    Test that unnormalized embeddings are normalized once at build time and that the
+    dot-product scores equal the cosine similarities.
+    """
+    column_embeddings["synopsis"] *= 3.0
+    index = build_search_index(
+        dataset, ["synopsis", "Synopsis other Dataset"], column_embeddings.get
+    )
+
+    assert index.normalized
+    np.testing.assert_allclose(np.linalg.norm(index.embeddings, axis=1), 1.0)
+
+    query = np.array([2.0, 1.0], dtype=np.float32)
+    vectors = np.concatenate(
+        [
+            column_embeddings["synopsis"][[0, 2]],
+            column_embeddings["Synopsis other Dataset"][[1, 2]],
+        ]
+    )
+    expected = (
+        vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    )
+    np.testing.assert_allclose(index.scores(query), expected, rtol=1e-6)
+
+
+@pytest.mark.order(26)
+def test_search_index_keeps_prenormalized_embeddings(
+    dataset: pd.DataFrame,  # pylint: disable=redefined-outer-name
+    tmp_path,
+) -> None:
+    """
+    Test that embeddings flagged as normalized in their manifest are used unchanged.
+    """
+    write_manifest(str(tmp_path), {"normalized": True})
+    assert read_manifest(str(tmp_path))["normalized"]
+    assert not read_manifest(str(tmp_path / "missing"))["normalized"]
+
+    # Deliberately not unit length to show the vectors are not rescaled
+    embeddings = np.array([[2, 0], [0, 0], [0, 2]], dtype=np.float32)
+    index = build_search_index(
+        dataset, ["synopsis"], lambda col: embeddings, normalized=True
+    )
+    np.testing.assert_array_equal(index.embeddings, embeddings[[0, 2]])
+
+
+@pytest.mark.order(52)
+@pytest.mark.parametrize("precision", ["fp32", "bf16"])
+def test_search_batch_matches_search(precision: str) -> None:
+    """
+    Test that a batched search matches searching every query on its own.
+    """
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(3000, 16)).astype(np.float32)
+    df = pd.DataFrame({"synopsis": ["text"] * len(embeddings)})
+    index = build_search_index(
+        df,
+        ["synopsis"],
+        lambda col: to_storage(embeddings, precision),
+        precision=precision,
+    )
+    index.set_row_groups(np.arange(3000) // 3)
+    queries = rng.normal(size=(70, 16))
+
+    for unique in (False, True):
+        batched = index.search_batch(queries, top_k=5, unique=unique)
+        assert len(batched) == len(queries)
+        for query, (scores, rows, columns) in zip(queries, batched):
+            expected = index.search(query, top_k=5, unique=unique)
+            np.testing.assert_allclose(scores, expected[0], rtol=1e-5)
+            np.testing.assert_array_equal(rows, expected[1])
+            np.testing.assert_array_equal(columns, expected[2])
@@ -0,0 +1,96 @@
+"""
+This module contains unit tests for the shared search index segments in
+src.serving.shared_segments.
+
+The tests verify:
+    - A segment is written once and later publishers reuse it
+    - Shared indexes are memory-mapped from the segment and search like the original
+    - Indexes that are already memory-mapped are not copied
+"""
+
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.serving.search_index import SearchIndex, build_search_index
+from src.serving.shared_segments import (
+    publish_segment,
+    segment_name,
+    share_search_index,
+)
+
+
+def build_index() -> SearchIndex:
+    """
+    Build a small in-memory index with title groups.
+
+    Returns:
+        SearchIndex: Index of 600 random vectors in groups of three.
+    """
+    embeddings = np.random.default_rng(0).normal(size=(600, 8)).astype(np.float32)
+    df = pd.DataFrame({"synopsis": ["text"] * len(embeddings)})
+    index = build_search_index(df, ["synopsis"], lambda col: embeddings)
+    index.set_row_groups(np.arange(600) // 3)
+    index.exact_threshold = 123
+    return index
+
+
+def share_in_child(root: str) -> None:
+    """
+    Share the test index from a separate process.
+
+    Args:
+        root (str): Segment root.
+    """
+    share_search_index(build_index(), root, segment_name("anime", "org/model"))
+
+
+@pytest.mark.order(54)
+def test_publish_segment_writes_once(tmp_path) -> None:
+    """
+    Test that a published segment is reused instead of being written again.
+    """
+    calls = []
+
+    def write(directory: str) -> None:
+        calls.append(directory)
+        np.save(os.path.join(directory, "values.npy"), np.arange(3))
+
+    first = publish_segment(str(tmp_path), "segment", write)
+    second = publish_segment(str(tmp_path), "segment", write)
+    assert first == second == os.path.join(tmp_path, "segment")
+    assert len(calls) == 1
+    # The staging directory was renamed, nothing else is left behind
+    assert os.listdir(tmp_path) == ["segment"]
+
+
+@pytest.mark.order(55)
+def test_share_search_index_maps_segment(tmp_path) -> None:
+    """
+    Test that shared indexes map one segment and return the original results.
+    """
+    root = str(tmp_path)
+    process = multiprocessing.get_context("spawn").Process(
+        target=share_in_child, args=(root,)
+    )
+    process.start()
+    process.join(timeout=120)
+    assert process.exitcode == 0
+    assert os.listdir(root) == [segment_name("anime", "org/model")]
+
+    index = build_index()
+    shared = share_search_index(index, root, segment_name("anime", "org/model"))
+    assert isinstance(shared.embeddings, np.memmap)
+    assert isinstance(shared.group_ids, np.memmap)
+    assert shared.exact_threshold == 123
+    assert len(os.listdir(root)) == 1
+
+    query = np.random.default_rng(1).normal(size=8)
+    for expected, actual in zip(
+        index.search(query, top_k=10, unique=True),
+        shared.search(query, top_k=10, unique=True),
+    ):
+        np.testing.assert_array_equal(expected, actual)
+    assert share_search_index(shared, root, "other") is shared
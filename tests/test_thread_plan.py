@@ -0,0 +1,200 @@
+"""
+This module contains unit tests for the worker and thread plans in
+src.serving.thread_plan.
+
+The tests verify:
+    - Plans divide the cores into workers by model size, are bounded by memory and
+      respect a requested worker count, and their environment and Gunicorn options,
+      with a request thread for every admitted and queued search
+    - Benchmark candidates are distinct and include plans that admit more
+      concurrent searches than the default, queries are replayed against a local
+      HTTP server with answered and shed requests counted, and the recommended
+      plan is the one with the lowest p99 latency among the fastest
+    - The benchmark only starts once every worker, told apart by its PID, reported
+      ready, and stops waiting when the server exits
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from src.serving.thread_plan import (
+    THREAD_ENV_VARS,
+    ThreadPlan,
+    candidate_plans,
+    plan_threads,
+    recommend,
+    replay,
+    request_threads,
+    wait_until_ready,
+)
+
+MB = 2**20
+GB = 2**30
+
+
+@pytest.mark.order(75)
+def test_plan_threads() -> None:
+    """
+    Test the worker and thread plans for different machines and models.
+    """
+    # Small models: one intra-op thread per worker, one worker per core
+    plan = plan_threads(8, 90 * MB, 64 * GB)
+    assert (plan.workers, plan.torch_threads) == (8, 1)
+    # Base models: two threads per worker
+    plan = plan_threads(8, 420 * MB, 64 * GB)
+    assert (plan.workers, plan.torch_threads) == (4, 2)
+    # Large models on a small machine
+    plan = plan_threads(2, 5 * GB, 64 * GB)
+    assert (plan.workers, plan.torch_threads) == (1, 2)
+    # Memory for two copies of the models only
+    plan = plan_threads(16, 420 * MB, 3 * GB)
+    assert (plan.workers, plan.torch_threads) == (2, 8)
+    # Requested worker count and CUDA
+    assert plan_threads(8, workers=3).torch_threads == 2
+    assert plan_threads(8, device="cuda").workers == 1
+
+    env = ThreadPlan(4, 2).env()
+    assert all(env[name] == "2" for name in THREAD_ENV_VARS)
+    assert env["TORCH_NUM_THREADS"] == "2"
+    assert env["TORCH_INTEROP_THREADS"] == "1"
+    assert (env["ADMISSION_MAX_CONCURRENT"], env["ADMISSION_MAX_QUEUE"]) == ("4", "16")
+    # A thread for every admitted and queued search, plus the spare threads
+    assert ThreadPlan(4, 2).gunicorn_args() == [
+        "-w",
+        "4",
+        "-k",
+        "gthread",
+        "--threads",
+        "22",
+    ]
+    assert request_threads(8, 0) == 10
+    assert request_threads(0, 16) == 6
+    plan = plan_threads(8, 90 * MB, max_concurrent=2, max_queue=3)
+    assert (plan.max_concurrent, plan.max_queue, plan.threads) == (2, 3, 7)
+    assert ThreadPlan(2, 4, worker_class="sync").gunicorn_args() == [
+        "-w",
+        "2",
+        "-k",
+        "sync",
+    ]
+
+
+@pytest.mark.order(76)
+def test_benchmark_helpers() -> None:
+    """
+    Test the benchmark candidates, the query replay and the recommendation.
+    """
+    plans = candidate_plans(8, 420 * MB, 64 * GB, max_batch_size=16)
+    assert [(p.workers, p.torch_threads, p.max_concurrent) for p in plans] == [
+        (4, 2, 4),
+        (8, 1, 4),
+        (2, 4, 4),
+        (1, 8, 4),
+        (4, 2, 8),
+        (4, 2, 16),
+    ]
+    # Plans with more concurrent searches get as many more request threads
+    assert [p.threads for p in plans[-3:]] == [22, 26, 34]
+    plans = candidate_plans(8, 420 * MB, 3 * GB, max_batch_size=4)
+    assert [(p.workers, p.torch_threads) for p in plans] == [(2, 4), (1, 8)]
+    plans = candidate_plans(8, device="cuda", max_batch_size=8)
+    assert [(p.workers, p.max_concurrent) for p in plans] == [(1, 4), (1, 8)]
+
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        """Answers anime searches and sheds manga searches."""
+
+        def do_POST(self) -> None:  # pylint: disable=invalid-name
+            """Answer a search request."""
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((self.path, json.loads(body)))
+            self.send_response(200 if self.path.endswith("anime") else 503)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"[]")
+
+        def log_message(self, *args) -> None:  # pylint: disable=arguments-differ
+            """Do not log requests."""
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        queries = [
+            {"type": "anime", "model": "model-a", "description": "a hero"},
+            {"type": "manga", "model": "model-a", "description": "a slime"},
+        ]
+        result = replay(
+            f"http://127.0.0.1:{server.server_port}", queries, 2, duration=0.3
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert result["ok"] > 0 and result["shed"] > 0 and result["errors"] == 0
+    assert result["p50_ms"] <= result["p99_ms"]
+    assert result["throughput"] > 0
+    assert ("/anisearchmodel/anime", {"model": "model-a", "description": "a hero"}) in (
+        received
+    )
+
+    def result_of(throughput, p99_ms, shed=0):
+        return {
+            "ok": 10,
+            "shed": shed,
+            "errors": 0,
+            "throughput": throughput,
+            "p99_ms": p99_ms,
+        }
+
+    results = [
+        result_of(100, 80),
+        result_of(95, 40),
+        result_of(120, 10, shed=3),
+        result_of(60, 5),
+    ]
+    assert recommend(results) == 1
+    with pytest.raises(ValueError):
+        recommend([result_of(100, 10, shed=1)])
+
+
+@pytest.mark.order(89)
+def test_wait_until_ready() -> None:
+    """
+    Test that readiness is only reached once every worker answered 200.
+    """
+    # Worker 1 is ready, then fails a warm-up target and recovers after worker 2
+    answers = [(1, 200), (1, 503), (2, 200), (1, 200)]
+    polls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        """Answers /ready with the next scripted worker and status."""
+
+        def do_GET(self) -> None:  # pylint: disable=invalid-name
+            """Answer a readiness probe."""
+            pid, status = answers[min(len(polls), len(answers) - 1)]
+            polls.append(pid)
+            body = json.dumps({"ready": status == 200, "pid": pid}).encode()
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:  # pylint: disable=arguments-differ
+            """Do not log requests."""
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        wait_until_ready(base_url, 2, lambda: None, timeout=10, interval=0.01)
+        assert len(polls) == len(answers)
+
+        with pytest.raises(RuntimeError, match="exited"):
+            wait_until_ready(base_url, 3, lambda: 1, timeout=10)
+        with pytest.raises(RuntimeError, match="1 of 3 workers"):
+            wait_until_ready(base_url, 3, lambda: None, timeout=0.2, interval=0.01)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,121 @@
+"""
+This module contains unit tests for the top-k selection in src.serving.topk.
+
+The tests verify:
+    - Partial top-k selection matches a full descending sort
+    - Ties are broken by index so smaller pages are prefixes of larger ones
+    - Deduplicated top-k keeps the best scoring entry of every group
+    - Oversampling grows until enough unique groups survive deduplication
+    - Group ids are dense and never merge missing values
+    - Batched selection over a score matrix matches selection row by row
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.serving.topk import (
+    batched_rank_candidates,
+    group_ids_for,
+    rank_candidates,
+    top_k_indices,
+    unique_top_k_indices,
+)
+
+
+def reference_unique_top_k(scores: np.ndarray, group_ids: np.ndarray, k: int) -> list:
+    """
+    Compute the deduplicated top-k with a full sort and a Python loop.
+
+    Args:
+        scores (np.ndarray): Scores to rank.
+        group_ids (np.ndarray): Group id of every score.
+        k (int): Number of indices to return.
+
+    Returns:
+        list: Indices of the best entry of the k best groups.
+    """
+    seen = set()
+    result = []
+    for idx in np.argsort(-scores, kind="stable"):
+        if group_ids[idx] not in seen:
+            seen.add(group_ids[idx])
+            result.append(int(idx))
+        if len(result) == k:
+            break
+    return result
+
+
+@pytest.mark.order(27)
+def test_top_k_indices_matches_full_sort() -> None:
+    """
+    Test that the partial top-k equals the head of a full stable sort.
+    """
+    rng = np.random.default_rng(0)
+    scores = rng.random(1000).astype(np.float32)
+    for k in [1, 10, 999, 1000, 5000]:
+        expected = np.argsort(-scores, kind="stable")[:k]
+        np.testing.assert_array_equal(top_k_indices(scores, k), expected)
+    assert top_k_indices(scores, 0).size == 0
+
+
+@pytest.mark.order(28)
+def test_top_k_indices_breaks_ties_by_index() -> None:
+    """
+    Test that tied scores are returned in index order for every k.
+    """
+    scores = np.array([0.5, 0.9, 0.5, 0.5, 0.1, 0.5])
+    assert top_k_indices(scores, 3).tolist() == [1, 0, 2]
+    assert top_k_indices(scores, 5).tolist() == [1, 0, 2, 3, 5]
+
+
+@pytest.mark.order(29)
+def test_unique_top_k_matches_reference() -> None:
+    """
+    Test that deduplication keeps the best entry of each group, including when most
+    candidates belong to the same group and oversampling has to grow.
+    """
+    rng = np.random.default_rng(1)
+    scores = rng.random(500)
+    group_ids = rng.integers(0, 60, size=500)
+    for k in [1, 5, 20, 60, 100]:
+        assert unique_top_k_indices(
+            scores, group_ids, k
+        ).tolist() == reference_unique_top_k(scores, group_ids, k)
+
+    # The 50 best scores all belong to group 0
+    scores = np.linspace(1.0, 0.0, 100)
+    group_ids = np.concatenate([np.zeros(50, dtype=int), np.arange(1, 51)])
+    assert unique_top_k_indices(scores, group_ids, 3, oversample=2).tolist() == [
+        0,
+        50,
+        51,
+    ]
+
+
+@pytest.mark.order(30)
+def test_group_ids_for_titles() -> None:
+    """
+    Test that equal titles share an id and missing titles get distinct ids.
+    """
+    ids = group_ids_for(pd.Series(["a", "b", None, "a", None]))
+    assert ids.dtype == np.int32
+    assert ids[0] == ids[3]
+    assert len({ids[0], ids[1], ids[2], ids[4]}) == 4
+
+
+@pytest.mark.order(51)
+@pytest.mark.parametrize("deduplicate", [False, True])
+def test_batched_rank_candidates_matches_rows(deduplicate: bool) -> None:
+    """
+    Test that batched top-k over a score matrix matches rank_candidates per row.
+    """
+    rng = np.random.default_rng(0)
+    # Rounded scores include ties, which must be broken by index in every row
+    scores = np.round(rng.random((20, 500)), 2)
+    # Few groups force some rows beyond their oversampled candidates
+    group_ids = rng.integers(0, 15, size=500) if deduplicate else None
+    for k in (1, 10, 15, 600):
+        ranked = batched_rank_candidates(scores, k, group_ids)
+        assert len(ranked) == len(scores)
+        for row, indices in zip(scores, ranked):
+            np.testing.assert_array_equal(indices, rank_candidates(row, k, group_ids))
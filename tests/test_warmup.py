@@ -0,0 +1,105 @@
+"""
+This module contains unit tests for the startup warm-up in src.serving.warmup.
+
+The tests verify:
+    - Target lists expand model names to every dataset, keep explicit datasets and
+      reject unknown ones
+    - Readiness is only reported once every target was warmed up, with the status
+      and error of every target, and a failed target keeps the process not ready
+      unless readiness only requires warm-up to finish
+"""
+
+import threading
+
+import pytest
+from src.serving.warmup import WarmUp, parse_targets
+
+
+@pytest.mark.order(69)
+def test_parse_targets() -> None:
+    """
+    Test parsing of warm-up target lists.
+    """
+    assert not parse_targets(None)
+    assert not parse_targets(" , ")
+    assert parse_targets("org/model-a, model-b:manga,org/model-a:anime") == [
+        ("org/model-a", "anime"),
+        ("org/model-a", "manga"),
+        ("model-b", "manga"),
+    ]
+    with pytest.raises(ValueError):
+        parse_targets("model-a:novel")
+
+
+@pytest.mark.order(70)
+def test_ready_after_warm_up() -> None:
+    """
+    Test that readiness waits for every target and fails with a failed target.
+    """
+    release = threading.Event()
+    warmed = []
+
+    def warm_up(model_name: str, dataset_type: str) -> None:
+        release.wait(timeout=10)
+        if model_name == "broken":
+            raise ValueError("Failed to load model")
+        warmed.append((model_name, dataset_type))
+
+    warmup = WarmUp([("model-a", "anime"), ("broken", "manga")], warm_up)
+    warmup.start()
+    assert not warmup.is_ready()
+    assert [target["status"] for target in warmup.stats()["targets"]] == [
+        "pending",
+        "pending",
+    ]
+
+    release.set()
+    assert warmup.wait(timeout=10)
+    stats = warmup.stats()
+    assert stats["finished"] and not stats["ready"]
+    assert warmed == [("model-a", "anime")]
+    assert [(t["model"], t["status"]) for t in stats["targets"]] == [
+        ("model-a", "warm"),
+        ("broken", "failed"),
+    ]
+    assert stats["targets"][1]["error"] == "Failed to load model"
+    assert stats["targets"][0]["seconds"] >= 0
+
+    empty = WarmUp([], warm_up)
+    empty.start()
+    assert empty.wait(timeout=10)
+
+
+@pytest.mark.order(84)
+def test_ready_with_failed_targets() -> None:
+    """
+    Test readiness with failed targets, with and without require_all.
+    """
+
+    def warm_up(model_name: str, dataset_type: str) -> None:
+        if model_name == "broken":
+            raise OSError(f"Cannot load {model_name} for {dataset_type}")
+
+    targets = [("model-a", "anime"), ("broken", "anime"), ("model-a", "manga")]
+    strict = WarmUp(targets, warm_up)
+    strict.start()
+    assert strict.wait(timeout=10)
+    assert strict.is_finished() and not strict.is_ready()
+    assert [t["status"] for t in strict.stats()["targets"]] == [
+        "warm",
+        "failed",
+        "warm",
+    ]
+
+    lenient = WarmUp(targets, warm_up, require_all=False)
+    lenient.start()
+    assert lenient.wait(timeout=10)
+    assert lenient.is_ready()
+    assert lenient.stats()["ready"]
+
+    # Every target warm
+    healthy = WarmUp(targets[::2], warm_up)
+    healthy.start()
+    assert healthy.wait(timeout=10)
+    stats = healthy.stats()
+    assert stats["ready"] and stats["finished"]